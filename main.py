@@ -12,7 +12,9 @@ Data: 2025-11-15
 import os
 import sys
 
+from services import database, regras
 from services.armazenamento import inicializar_sistema
+from services.relatorio import gerar_relatorio_do_banco
 from utils.menu import (
     exibir_menu_principal,
     cadastrar_peca_interface,
@@ -61,24 +63,47 @@ def usar_modo_classico() -> bool:
     return False
 
 
+def usar_gravacao_assincrona() -> bool:
+    """
+    Verifica se a gravação no banco deve ser feita em segundo plano.
+
+    Returns:
+        True se PECAS_GRAVACAO_ASSINCRONA estiver habilitada
+    """
+    return os.getenv('PECAS_GRAVACAO_ASSINCRONA', '').lower() in ('1', 'true', 'yes')
+
+
 def main() -> None:
     """
     Função principal do sistema.
     Inicializa o sistema e executa o loop do menu interativo.
     """
-    # Verifica qual modo usar
-    if usar_modo_classico():
-        # Modo clássico (menu numérico)
-        if not TEXTUAL_DISPONIVEL:
-            console.print("[yellow]⚠️  TUI interativo não disponível. Usando modo clássico.[/yellow]")
-            console.print("[cyan]💡 Para habilitar navegação por setas, instale: pip install textual[/cyan]\n")
-
-        main_classico()
-    else:
-        # Modo TUI interativo (navegação por setas)
-        console.print("[green]✨ Iniciando interface TUI interativa...[/green]")
-        console.print("[cyan]💡 Use --classic para voltar ao modo numérico[/cyan]\n")
-        run_tui_app()
+    if usar_gravacao_assincrona():
+        database.ativar_gravacao_assincrona()
+
+    try:
+        # Relatório direto do banco, sem carregar o sistema em memória
+        if '--relatorio' in sys.argv:
+            database.inicializar_database()
+            console.print(gerar_relatorio_do_banco())
+            return
+
+        # Verifica qual modo usar
+        if usar_modo_classico():
+            # Modo clássico (menu numérico)
+            if not TEXTUAL_DISPONIVEL:
+                console.print("[yellow]⚠️  TUI interativo não disponível. Usando modo clássico.[/yellow]")
+                console.print("[cyan]💡 Para habilitar navegação por setas, instale: pip install textual[/cyan]\n")
+
+            main_classico()
+        else:
+            # Modo TUI interativo (navegação por setas)
+            console.print("[green]✨ Iniciando interface TUI interativa...[/green]")
+            console.print("[cyan]💡 Use --classic para voltar ao modo numérico[/cyan]\n")
+            run_tui_app()
+    finally:
+        # Grava o que estiver pendente antes de sair
+        database.encerrar_gravacao_assincrona()
 
 
 def main_classico() -> None:
@@ -87,6 +112,7 @@ def main_classico() -> None:
     """
     # Inicializa o sistema
     sistema = inicializar_sistema()
+    regras.verificar_regras()
 
     # Banner de boas-vindas com Rich
     limpar_terminal()
@@ -111,6 +137,8 @@ def main_classico() -> None:
 
     # Loop principal do menu
     while True:
+        # Adota regras de qualidade alteradas enquanto o menu estava aberto
+        regras.verificar_regras()
         exibir_menu_principal()
 
         opcao = input("\nEscolha uma opção: ").strip()
@@ -1,9 +1,10 @@
 """
 Módulo de modelos de dados.
-Contém as estruturas de Peça e Caixa.
+Contém as estruturas de Peça e Caixa e a lista de peças do sistema.
 """
 
 from .peca import Peca, criar_peca
 from .caixa import Caixa, criar_caixa
+from .lista_pecas import ListaPecas
 
-__all__ = ['Peca', 'criar_peca', 'Caixa', 'criar_caixa']
+__all__ = ['Peca', 'criar_peca', 'Caixa', 'criar_caixa', 'ListaPecas']
@@ -0,0 +1,248 @@
+"""
+Lista de peças com remoção por chave sem percorrer a lista.
+"""
+
+from array import array
+from bisect import bisect_left
+from typing import Any, Iterable, Iterator, List, MutableSequence, Optional, Tuple, Union, overload
+
+from .peca import Peca
+
+
+# Fração de posições removidas a partir da qual a lista é compactada
+FRACAO_COMPACTACAO = 0.25
+
+
+class ListaPecas(MutableSequence):
+    """
+    Sequência de peças que preserva a ordem de inserção e permite remover
+    uma peça a partir da sua chave sem percorrer a lista.
+
+    Cada peça incluída recebe uma chave estável (não muda quando outras peças
+    são removidas). As chaves são crescentes e ficam em uma coluna compacta
+    paralela à lista de peças: localizar uma chave é uma busca binária.
+    Remover pela chave só marca a posição como removida (lápide), sem deslocar
+    as seguintes; as posições removidas são puladas na iteração e em len(), e
+    a lista é compactada quando passam de FRACAO_COMPACTACAO das posições, o
+    que mantém o custo amortizado de cada remoção em O(log N). O acesso por
+    índice compacta antes as posições pendentes. Compara-se igual a uma
+    lista com as mesmas peças.
+
+    O atributo versao muda a cada alteração, permitindo a quem guarda dados
+    derivados da lista (como o índice de peças) saber se estão atualizados.
+
+    Subclasses podem guardar outra representação das peças redefinindo
+    _novos_itens(), _guardar() e _peca().
+    """
+
+    def __init__(self, pecas: Iterable[Peca] = ()) -> None:
+        self._pecas = self._novos_itens()
+        self._chaves = array('q')
+        # 1 nas posições removidas e ainda não compactadas
+        self._removidas = bytearray()
+        self._total_removidas = 0
+        self._proxima_chave = 0
+        self.versao = 0
+        for peca in pecas:
+            self.adicionar(peca)
+
+    def adicionar(self, peca: Peca) -> int:
+        """
+        Inclui uma peça no final da lista.
+
+        Args:
+            peca: Peça a incluir
+
+        Returns:
+            Chave estável da peça, usada em remover_chave()
+        """
+        chave = self._proxima_chave
+        self._proxima_chave += 1
+        self._pecas.append(self._guardar(peca))
+        self._chaves.append(chave)
+        self._removidas.append(0)
+        self.versao += 1
+        return chave
+
+    def _novos_itens(self) -> Any:
+        """Coleção vazia em que os itens guardados ficam, em ordem."""
+        return []
+
+    def _guardar(self, peca: Peca) -> Any:
+        """Converte uma peça no item guardado."""
+        return peca
+
+    def _peca(self, item: Any) -> Peca:
+        """Converte um item guardado na peça devolvida."""
+        return item
+
+    def _posicao(self, chave: Optional[int]) -> Optional[int]:
+        if chave is None:
+            return None
+        posicao = bisect_left(self._chaves, chave)
+        if (
+            posicao < len(self._chaves)
+            and self._chaves[posicao] == chave
+            and not self._removidas[posicao]
+        ):
+            return posicao
+        return None
+
+    def _compactar(self) -> None:
+        # Descarta as posições removidas; as chaves das demais não mudam
+        if not self._total_removidas:
+            return
+        vivas = [i for i, removida in enumerate(self._removidas) if not removida]
+        pecas = self._novos_itens()
+        pecas.extend(self._pecas[i] for i in vivas)
+        self._pecas = pecas
+        self._chaves = array('q', (self._chaves[i] for i in vivas))
+        self._removidas = bytearray(len(vivas))
+        self._total_removidas = 0
+
+    def obter_chave(self, chave: Optional[int]) -> Optional[Peca]:
+        """
+        Retorna a peça associada à chave.
+
+        Args:
+            chave: Chave devolvida por adicionar()
+
+        Returns:
+            A peça, ou None se a chave não existir (mais)
+        """
+        posicao = self._posicao(chave)
+        return self._peca(self._pecas[posicao]) if posicao is not None else None
+
+    def remover_chave(self, chave: int) -> Peca:
+        """
+        Remove a peça associada à chave: busca binária na coluna de chaves e
+        marcação da posição como removida, sem deslocar as seguintes.
+
+        Args:
+            chave: Chave devolvida por adicionar()
+
+        Returns:
+            A peça removida
+
+        Raises:
+            KeyError: Se a chave não existir
+        """
+        posicao = self._posicao(chave)
+        if posicao is None:
+            raise KeyError(chave)
+        peca = self._peca(self._pecas[posicao])
+        self._removidas[posicao] = 1
+        self._total_removidas += 1
+        self.versao += 1
+        if self._total_removidas > FRACAO_COMPACTACAO * len(self._removidas):
+            self._compactar()
+        return peca
+
+    def _vivos(self, inicio: int = 0, fim: Optional[int] = None, passo: int = 1) -> Iterator[int]:
+        # Posições não removidas no intervalo
+        fim = len(self._removidas) if fim is None else fim
+        removidas = self._removidas
+        return (i for i in range(inicio, fim, passo) if not removidas[i])
+
+    def itens(self) -> Iterator[Tuple[int, Peca]]:
+        """Itera sobre os pares (chave, peça) em ordem de inserção."""
+        return iter([(self._chaves[i], self._peca(self._pecas[i])) for i in self._vivos()])
+
+    def itens_recentes(self, antes: Optional[int] = None) -> Iterator[Tuple[int, Peca]]:
+        """
+        Itera sobre os pares (chave, peça) da inclusão mais recente para a
+        mais antiga, a partir da chave informada: a busca da posição inicial
+        é binária, e cada passo custa O(1).
+
+        Args:
+            antes: Retorna apenas peças com chave menor que esta (None: todas)
+
+        Returns:
+            Iterador de pares (chave, peça)
+        """
+        posicao = len(self._chaves) if antes is None else bisect_left(self._chaves, antes)
+        for i in self._vivos(posicao - 1, -1, -1):
+            yield self._chaves[i], self._peca(self._pecas[i])
+
+    def _recriar(self, pecas: Iterable[Peca]) -> None:
+        # As chaves continuam crescentes: as peças recebem chaves novas
+        pecas = list(pecas)
+        self._pecas = self._novos_itens()
+        self._chaves = array('q')
+        self._removidas = bytearray()
+        self._total_removidas = 0
+        for peca in pecas:
+            self.adicionar(peca)
+        self.versao += 1
+
+    # Protocolo de sequência mutável (compatível com list)
+
+    def __len__(self) -> int:
+        return len(self._pecas) - self._total_removidas
+
+    def __iter__(self) -> Iterator[Peca]:
+        if not self._total_removidas:
+            return map(self._peca, self._pecas)
+        pecas = self._pecas
+        return (self._peca(pecas[i]) for i in self._vivos())
+
+    @overload
+    def __getitem__(self, indice: int) -> Peca: ...
+
+    @overload
+    def __getitem__(self, indice: slice) -> List[Peca]: ...
+
+    def __getitem__(self, indice: Union[int, slice]) -> Union[Peca, List[Peca]]:
+        self._compactar()
+        if isinstance(indice, slice):
+            return [self._peca(item) for item in self._pecas[indice]]
+        return self._peca(self._pecas[indice])
+
+    def __setitem__(self, indice, valor) -> None:
+        if isinstance(indice, slice):
+            pecas = self[:]
+            pecas[indice] = valor
+            self._recriar(pecas)
+            return
+        # A posição mantém sua chave
+        self._compactar()
+        self._pecas[indice] = self._guardar(valor)
+        self.versao += 1
+
+    def __delitem__(self, indice) -> None:
+        self._compactar()
+        del self._pecas[indice]
+        del self._chaves[indice]
+        del self._removidas[indice]
+        self.versao += 1
+
+    def insert(self, indice: int, valor: Peca) -> None:
+        if indice >= len(self):
+            self.adicionar(valor)
+            return
+        # Inserir no meio quebraria a ordem das chaves
+        pecas = self[:]
+        pecas.insert(indice, valor)
+        self._recriar(pecas)
+
+    def append(self, valor: Peca) -> None:
+        self.adicionar(valor)
+
+    def copy(self) -> "ListaPecas":
+        return ListaPecas(self)
+
+    def __eq__(self, outro: object) -> bool:
+        if isinstance(outro, (list, ListaPecas)):
+            return list(self) == list(outro)
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __add__(self, outro: Iterable[Peca]) -> List[Peca]:
+        return list(self) + list(outro)
+
+    def __radd__(self, outro: Iterable[Peca]) -> List[Peca]:
+        return list(outro) + list(self)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({list(self)!r})"
@@ -5,7 +5,16 @@ Modelo de dados para Peça.
 from typing import TypedDict, List, Optional
 
 
-class Peca(TypedDict):
+class _PecaBase(TypedDict):
+    id: str
+    peso: float
+    cor: str
+    comprimento: float
+    aprovada: bool
+    motivos_reprovacao: List[str]
+
+
+class Peca(_PecaBase, total=False):
     """
     Representa uma peça com suas características e status de aprovação.
     
@@ -16,13 +25,13 @@ class Peca(TypedDict):
         comprimento: Comprimento da peça em centímetros
         aprovada: Status de aprovação (True/False)
         motivos_reprovacao: Lista de motivos caso seja reprovada
+        codigo_reprovacao: Bitmask de MotivoReprovacao (opcional; presente
+            nas peças validadas, ausente nas cadastradas só com texto)
+        codigo_produto: Código do produto (SKU) cujo perfil de tolerâncias
+            se aplica (opcional; ausente usa os critérios gerais)
     """
-    id: str
-    peso: float
-    cor: str
-    comprimento: float
-    aprovada: bool
-    motivos_reprovacao: List[str]
+    codigo_reprovacao: int
+    codigo_produto: str
 
 
 def criar_peca(
@@ -31,7 +40,9 @@ def criar_peca(
     cor: str,
     comprimento: float,
     aprovada: bool = False,
-    motivos_reprovacao: Optional[List[str]] = None
+    motivos_reprovacao: Optional[List[str]] = None,
+    codigo_reprovacao: Optional[int] = None,
+    codigo_produto: Optional[str] = None
 ) -> Peca:
     """
     Factory function para criar uma instância de Peça.
@@ -43,11 +54,13 @@ def criar_peca(
         comprimento: Comprimento da peça em centímetros
         aprovada: Status de aprovação (default: False)
         motivos_reprovacao: Lista de motivos de reprovação (default: [])
+        codigo_reprovacao: Bitmask de MotivoReprovacao (default: ausente)
+        codigo_produto: Código do produto (default: ausente)
     
     Returns:
         Instância de Peca
     """
-    return Peca(
+    peca = Peca(
         id=id_peca,
         peso=peso,
         cor=cor,
@@ -55,3 +68,8 @@ def criar_peca(
         aprovada=aprovada,
         motivos_reprovacao=motivos_reprovacao if motivos_reprovacao else []
     )
+    if codigo_reprovacao is not None:
+        peca['codigo_reprovacao'] = codigo_reprovacao
+    if codigo_produto:
+        peca['codigo_produto'] = codigo_produto
+    return peca
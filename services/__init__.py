@@ -3,8 +3,15 @@ Módulo de serviços.
 Contém a lógica de negócio: validação, armazenamento e relatórios.
 """
 
-from .validacao import validar_peso, validar_cor, validar_comprimento, validar_peca
-from .armazenamento import adicionar_peca_em_caixa, remover_peca_por_id
+from .validacao import validar_peso, validar_cor, validar_comprimento, validar_peca, aplicar_validacao
+from .armazenamento import (
+    adicionar_peca_em_caixa,
+    registrar_peca_reprovada,
+    remover_peca_por_id,
+    remover_pecas_por_ids,
+    existe_peca,
+    localizar_peca
+)
 from .relatorio import gerar_relatorio_completo
 
 __all__ = [
@@ -12,7 +19,12 @@ __all__ = [
     'validar_cor', 
     'validar_comprimento',
     'validar_peca',
+    'aplicar_validacao',
     'adicionar_peca_em_caixa',
+    'registrar_peca_reprovada',
     'remover_peca_por_id',
+    'remover_pecas_por_ids',
+    'existe_peca',
+    'localizar_peca',
     'gerar_relatorio_completo'
 ]
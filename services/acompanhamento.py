@@ -0,0 +1,147 @@
+"""
+Acompanhamento das alterações gravadas no banco por outros processos.
+
+O dashboard mantém o sistema em memória; cadastros feitos pela CLI ou pela TUI
+só chegavam a ele recarregando tudo. Aqui o sistema é atualizado pelo que mudou:
+com as tabelas normalizadas, gatilhos registram cada peça gravada ou removida e
+cada caixa fechada em registro_alteracoes; com o journal ativo, os próprios
+eventos servem de registro. Basta guardar o último número sequencial visto,
+comparar com ultima_sequencia() (consulta de custo constante) e aplicar só as
+alterações posteriores.
+
+A aplicação é idempotente: alterações já presentes no sistema (por exemplo,
+gravadas pela própria sessão) são ignoradas. Se o registro não cobre mais o
+ponto em que o sistema parou (alterações antigas descartadas, banco limpo ou
+recriado), buscar_alteracoes() retorna None e o sistema deve ser recarregado.
+"""
+
+from typing import List, Optional, Tuple
+
+from models.caixa import CAPACIDADE_MAXIMA_CAIXA
+from models.peca import Peca
+from services import database, journal
+from services.armazenamento import SistemaArmazenamento, incluir_peca, localizar_peca, retirar_peca
+
+
+# Campos comparados para decidir se uma peça registrada já está no sistema
+CAMPOS_PECA = ('peso', 'cor', 'comprimento', 'aprovada', 'codigo_produto')
+
+
+def _tabela_registro() -> str:
+    """Tabela que registra as alterações no motor de armazenamento em uso."""
+    return 'eventos' if journal.journal_ativo() else 'registro_alteracoes'
+
+
+def ultima_sequencia() -> int:
+    """
+    Retorna o número sequencial da última alteração gravada no banco.
+
+    Returns:
+        Último seq do registro em uso (0 se nenhum)
+    """
+    return database.ultima_sequencia(_tabela_registro())
+
+
+def buscar_alteracoes(desde: int) -> Optional[Tuple[List[journal.Evento], int]]:
+    """
+    Busca as alterações gravadas depois de um número sequencial, como eventos.
+
+    Args:
+        desde: Último seq já aplicado ao sistema
+
+    Returns:
+        Tupla (eventos em ordem de gravação, último seq), ou None se o
+        registro não cobre mais as alterações desde esse ponto
+    """
+    ultima = ultima_sequencia()
+    if ultima == desde:
+        return [], ultima
+    if ultima < desde:
+        # Banco recriado: a numeração recomeçou
+        return None
+
+    if journal.journal_ativo():
+        registros = [
+            (registro['seq'], journal.criar_evento(registro['tipo'], registro['dados']))
+            for registro in journal.listar_eventos(desde)
+        ]
+    else:
+        registros = [
+            (alteracao['seq'], _evento_da_alteracao(alteracao))
+            for alteracao in database.carregar_alteracoes(desde)
+        ]
+
+    if not registros or registros[0][0] != desde + 1:
+        return None
+    return [evento for _, evento in registros], registros[-1][0]
+
+
+def _evento_da_alteracao(alteracao: database.AlteracaoRegistrada) -> journal.Evento:
+    """Converte uma linha de registro_alteracoes no evento equivalente do journal."""
+    tipo = alteracao['tipo']
+    if tipo == journal.EVENTO_PECA_REGISTRADA:
+        peca = alteracao['peca']
+        dados = dict(peca) if peca is not None else {'id': alteracao['chave']}
+    elif tipo == journal.EVENTO_CAIXA_FECHADA:
+        id_caixa = int(alteracao['chave'])
+        dados = {'id': id_caixa, 'proxima_caixa': id_caixa + 1}
+    else:
+        dados = {'id': alteracao['chave']}
+    return journal.criar_evento(tipo, dados)
+
+
+def _fechar_caixa_atual(sistema: SistemaArmazenamento) -> None:
+    proxima = sistema['caixa_atual']['id'] + 1
+    journal.aplicar_evento(sistema, journal.criar_evento(
+        journal.EVENTO_CAIXA_FECHADA, {'id': sistema['caixa_atual']['id'], 'proxima_caixa': proxima}
+    ))
+
+
+def aplicar_alteracoes(sistema: SistemaArmazenamento, eventos: List[journal.Evento]) -> int:
+    """
+    Aplica eventos ao sistema em memória, sem gravá-los de novo no banco.
+
+    Peças aprovadas entram na caixa atual, que é fechada ao atingir a
+    capacidade, como em adicionar_peca_em_caixa(). Peças já presentes com os
+    mesmos dados, remoções de peças ausentes e caixas já fechadas são ignoradas.
+
+    Args:
+        sistema: Estado a atualizar
+        eventos: Eventos em ordem de gravação
+
+    Returns:
+        Quantidade de eventos que alteraram o sistema
+    """
+    aplicados = 0
+    for evento in eventos:
+        tipo = evento['tipo']
+        dados = evento['dados']
+
+        if tipo == journal.EVENTO_PECA_REGISTRADA:
+            if 'aprovada' not in dados:
+                # Peça removida depois de registrada: a remoção vem em seguida
+                continue
+            localizacao = localizar_peca(dados['id'], sistema)
+            if localizacao is not None:
+                atual = localizacao['peca']
+                if all(atual.get(campo) == dados.get(campo) for campo in CAMPOS_PECA):
+                    continue
+                retirar_peca(dados['id'], sistema)
+            incluir_peca(Peca(**dados), sistema)
+            if dados['aprovada'] and len(sistema['caixa_atual']['pecas']) >= CAPACIDADE_MAXIMA_CAIXA:
+                _fechar_caixa_atual(sistema)
+
+        elif tipo == journal.EVENTO_PECA_REMOVIDA:
+            if retirar_peca(dados['id'], sistema) is None:
+                continue
+
+        elif tipo == journal.EVENTO_CAIXA_FECHADA:
+            if dados['id'] != sistema['caixa_atual']['id']:
+                continue
+            journal.aplicar_evento(sistema, evento)
+
+        else:
+            raise ValueError(f"Tipo de evento desconhecido: {tipo}")
+
+        aplicados += 1
+    return aplicados
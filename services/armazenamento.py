@@ -2,11 +2,13 @@
 Serviço de gerenciamento de armazenamento de peças em caixas.
 """
 
+import itertools
 import logging
 import sqlite3
-from typing import TypedDict, List, Tuple, Optional
+from typing import Any, TypedDict, List, Tuple, Optional, Dict, MutableMapping, Sequence, Set
 from models.peca import Peca
 from models.caixa import Caixa, CAPACIDADE_MAXIMA_CAIXA, criar_caixa
+from models.lista_pecas import ListaPecas
 
 # Importação condicional para evitar dependência circular
 import sys
@@ -14,12 +16,66 @@ if 'services.database' not in sys.modules:
     from services import database
 else:
     database = sys.modules['services.database']
+from services import journal
+from services import armazenamento_colunar
+from services import estatisticas
+from services import controle
+from services import spc
 
 # Configurar logger
 logger = logging.getLogger(__name__)
 
 
-class SistemaArmazenamento(TypedDict):
+class AlteracoesPendentes(TypedDict):
+    """
+    Conjunto de alterações feitas no sistema desde a última persistência.
+    
+    Attributes:
+        pecas_salvas: Peças inseridas ou alteradas, indexadas por ID
+        pecas_removidas: IDs das peças removidas
+        caixas_salvas: Caixas cujo status ou composição mudou, indexadas por ID
+        contador_alterado: Indica se contador_caixas precisa ser persistido
+        eventos: As mesmas alterações como eventos, para o motor de journal
+        alertas: Alertas de controle disparados pelas peças registradas
+        produtos_alterados: Produtos (chaves do agregado de estatísticas)
+            cujos totais mudaram
+    """
+    pecas_salvas: Dict[str, Peca]
+    pecas_removidas: Set[str]
+    caixas_salvas: Dict[int, Caixa]
+    contador_alterado: bool
+    eventos: List[journal.Evento]
+    alertas: List[controle.AlertaControle]
+    produtos_alterados: Set[str]
+
+
+class LocalizacaoPeca(TypedDict):
+    """
+    Localização de uma peça no sistema.
+    
+    Attributes:
+        peca: A peça localizada
+        aprovada: True se está em pecas_aprovadas, False se em pecas_reprovadas
+        caixa: Caixa que contém a peça (None se não estiver em caixa)
+        chave: Chave estável da peça na ListaPecas (None em listas comuns)
+        posicao_caixa: Posição da peça em caixa['pecas'] (None sem caixa)
+    """
+    peca: Peca
+    aprovada: bool
+    caixa: Optional[Caixa]
+    chave: Optional[int]
+    posicao_caixa: Optional[int]
+
+
+class _SistemaArmazenamentoBase(TypedDict):
+    pecas_aprovadas: List[Peca]
+    pecas_reprovadas: List[Peca]
+    caixas_fechadas: List[Caixa]
+    caixa_atual: Caixa
+    contador_caixas: int
+
+
+class SistemaArmazenamento(_SistemaArmazenamentoBase, total=False):
     """
     Representa o estado do sistema de armazenamento.
     
@@ -29,12 +85,577 @@ class SistemaArmazenamento(TypedDict):
         caixas_fechadas: Lista de caixas que atingiram capacidade máxima
         caixa_atual: Caixa em preenchimento
         contador_caixas: Contador para gerar IDs únicos de caixas
+        alteracoes: Alterações ainda não persistidas (opcional, criado sob demanda)
+        indice_pecas: Localização de cada peça por ID (opcional, criado sob demanda;
+            IndicePecasColunar com a memória colunar)
+        versao_indice: Marca das listas refletida em indice_pecas (opcional)
+        estatisticas: Agregado de contadores para relatórios (opcional, criado sob demanda)
+        controle: Monitor das regras de controle (opcional, criado sob demanda)
+        versao: Marca da última alteração, única no processo (opcional, criado sob demanda)
+        eventos_sem_snapshot: Eventos gravados no journal desde o último snapshot (opcional)
+        estatisticas_gravadas: Agregado cujas partes estão todas em sistema_config;
+            enquanto for o mesmo objeto de estatisticas, só os produtos alterados
+            são regravados (opcional)
     """
-    pecas_aprovadas: List[Peca]
-    pecas_reprovadas: List[Peca]
-    caixas_fechadas: List[Caixa]
-    caixa_atual: Caixa
-    contador_caixas: int
+    alteracoes: AlteracoesPendentes
+    indice_pecas: MutableMapping[str, LocalizacaoPeca]
+    versao_indice: "VersaoListas"
+    estatisticas: estatisticas.EstatisticasSistema
+    controle: controle.MonitorControle
+    versao: int
+    eventos_sem_snapshot: int
+    estatisticas_gravadas: estatisticas.EstatisticasSistema
+
+
+# Marcas de versão, únicas entre todos os sistemas do processo (inclusive recarregados)
+_VERSOES = itertools.count(1)
+
+# Marca de versão dos dados: última alteração e tamanho das listas
+VersaoDados = Tuple[int, int, int, int]
+
+# Marca das listas de peças: identidade e versão (ou tamanho) de cada uma
+VersaoListas = Tuple[int, int, int, int]
+
+
+def criar_alteracoes_pendentes() -> AlteracoesPendentes:
+    """
+    Factory function para criar um conjunto de alterações vazio.
+    
+    Returns:
+        Instância de AlteracoesPendentes sem nenhuma alteração
+    """
+    return AlteracoesPendentes(
+        pecas_salvas={},
+        pecas_removidas=set(),
+        caixas_salvas={},
+        contador_alterado=False,
+        eventos=[],
+        alertas=[],
+        produtos_alterados=set()
+    )
+
+
+def _obter_alteracoes(sistema: SistemaArmazenamento) -> AlteracoesPendentes:
+    """Retorna as alterações pendentes do sistema, criando-as se necessário."""
+    alteracoes = sistema.get('alteracoes')
+    if alteracoes is None:
+        alteracoes = criar_alteracoes_pendentes()
+        sistema['alteracoes'] = alteracoes
+    return alteracoes
+
+
+def _registrar_peca_salva(sistema: SistemaArmazenamento, peca: Peca) -> None:
+    """Marca uma peça como inserida/alterada desde a última persistência."""
+    alteracoes = _obter_alteracoes(sistema)
+    alteracoes['pecas_removidas'].discard(peca['id'])
+    alteracoes['pecas_salvas'][peca['id']] = peca
+    alteracoes['produtos_alterados'].add(estatisticas.chave_produto(peca))
+    alteracoes['eventos'].append(
+        journal.criar_evento(journal.EVENTO_PECA_REGISTRADA, dict(peca))
+    )
+
+
+def _registrar_peca_removida(sistema: SistemaArmazenamento, peca: Peca) -> None:
+    """Marca uma peça como removida desde a última persistência."""
+    id_peca = peca['id']
+    alteracoes = _obter_alteracoes(sistema)
+    alteracoes['pecas_salvas'].pop(id_peca, None)
+    alteracoes['pecas_removidas'].add(id_peca)
+    alteracoes['produtos_alterados'].add(estatisticas.chave_produto(peca))
+    alteracoes['eventos'].append(
+        journal.criar_evento(journal.EVENTO_PECA_REMOVIDA, {'id': id_peca})
+    )
+
+
+def _registrar_caixa_salva(sistema: SistemaArmazenamento, caixa: Caixa) -> None:
+    """Marca uma caixa como alterada desde a última persistência."""
+    _obter_alteracoes(sistema)['caixas_salvas'][caixa['id']] = caixa
+
+
+def _bases_controle(sistema: SistemaArmazenamento, peca: Peca) -> Dict[str, Optional[controle.BaseControle]]:
+    """Bases fixas das regras de controle: o SPC do agregado, sem a peça recém-incluída."""
+    agregado = sistema.get('estatisticas')
+    if agregado is None:
+        return {}
+    bases = {}
+    for nome, medida in agregado['spc'].items():
+        anterior = spc.MedidaSPC(**medida)
+        spc.remover_valor(anterior, peca[nome])
+        bases[nome] = controle.base_do_spc(anterior)
+    return bases
+
+
+def _monitorar_peca(sistema: SistemaArmazenamento, peca: Peca) -> None:
+    """Avalia as regras de controle com a peça e guarda os alertas para gravação."""
+    monitor = sistema.get('controle')
+    if monitor is None:
+        monitor = controle.MonitorControle(bases=_bases_controle(sistema, peca))
+        sistema['controle'] = monitor
+    alertas = monitor.registrar(peca)
+    if alertas:
+        _obter_alteracoes(sistema)['alertas'].extend(alertas)
+        for alerta in alertas:
+            logger.warning("Alerta de controle: %s", alerta['descricao'])
+
+
+def obter_ultimos_alertas(sistema: SistemaArmazenamento) -> List[controle.AlertaControle]:
+    """
+    Retorna os alertas de controle disparados pela última peça registrada.
+    
+    Args:
+        sistema: Estado atual do sistema de armazenamento
+    
+    Returns:
+        Lista de AlertaControle (vazia se a peça não disparou alertas)
+    """
+    monitor = sistema.get('controle')
+    if monitor is None:
+        return []
+    return monitor.ultimos_alertas
+
+
+def _marcar_alteracao(sistema: SistemaArmazenamento) -> None:
+    """Atribui ao sistema uma nova marca de versão."""
+    sistema['versao'] = next(_VERSOES)
+
+
+def obter_versao(sistema: SistemaArmazenamento) -> VersaoDados:
+    """
+    Retorna uma marca barata da versão dos dados, para memorizar o que é
+    calculado a partir deles (gráficos, tabelas). Muda a cada inclusão,
+    retirada ou fechamento de caixa, e também quando as listas são
+    alteradas diretamente, pelo tamanho delas.
+    
+    Args:
+        sistema: Estado atual do sistema de armazenamento
+    
+    Returns:
+        Tupla (última alteração, aprovadas, reprovadas, caixas fechadas)
+    """
+    if 'versao' not in sistema:
+        _marcar_alteracao(sistema)
+    return (
+        sistema['versao'],
+        len(sistema['pecas_aprovadas']),
+        len(sistema['pecas_reprovadas']),
+        len(sistema['caixas_fechadas'])
+    )
+
+
+def _novo_indice(sistema: SistemaArmazenamento) -> MutableMapping[str, LocalizacaoPeca]:
+    """
+    Cria o índice vazio: com as duas listas nas mesmas colunas, o índice
+    colunar (a linha de cada peça, sem objetos por peça); senão, um dict.
+    """
+    aprovadas = sistema['pecas_aprovadas']
+    reprovadas = sistema['pecas_reprovadas']
+    if (
+        isinstance(aprovadas, armazenamento_colunar.ListaPecasColunar)
+        and isinstance(reprovadas, armazenamento_colunar.ListaPecasColunar)
+        and aprovadas.colunas is reprovadas.colunas
+    ):
+        return armazenamento_colunar.IndicePecasColunar(aprovadas.colunas)
+    return {}
+
+
+def _construir_indice(sistema: SistemaArmazenamento) -> MutableMapping[str, LocalizacaoPeca]:
+    """Monta o índice ID -> localização percorrendo as listas e as caixas."""
+    indice = _novo_indice(sistema)
+    for aprovada, lista in ((True, sistema['pecas_aprovadas']), (False, sistema['pecas_reprovadas'])):
+        itens = lista.itens() if isinstance(lista, ListaPecas) else ((None, peca) for peca in lista)
+        for chave, peca in itens:
+            indice[peca['id']] = LocalizacaoPeca(
+                peca=peca, aprovada=aprovada, caixa=None, chave=chave, posicao_caixa=None
+            )
+    
+    for caixa in list(sistema['caixas_fechadas']) + [sistema['caixa_atual']]:
+        for posicao, peca in enumerate(caixa['pecas']):
+            localizacao = indice.get(peca['id'])
+            if localizacao is not None:
+                localizacao['caixa'] = caixa
+                localizacao['posicao_caixa'] = posicao
+                # O índice colunar monta a localização a cada consulta
+                indice[peca['id']] = localizacao
+    return indice
+
+
+def _versao_listas(sistema: SistemaArmazenamento) -> VersaoListas:
+    """Marca das listas de peças: muda a cada alteração (em listas comuns, pelo tamanho)."""
+    aprovadas = sistema['pecas_aprovadas']
+    reprovadas = sistema['pecas_reprovadas']
+    return (
+        id(aprovadas),
+        aprovadas.versao if isinstance(aprovadas, ListaPecas) else len(aprovadas),
+        id(reprovadas),
+        reprovadas.versao if isinstance(reprovadas, ListaPecas) else len(reprovadas)
+    )
+
+
+def _indice_atualizado(sistema: SistemaArmazenamento) -> Optional[MutableMapping[str, LocalizacaoPeca]]:
+    """Retorna o índice de peças, se existir e refletir as listas atuais."""
+    indice = sistema.get('indice_pecas')
+    if indice is None or sistema.get('versao_indice') != _versao_listas(sistema):
+        return None
+    return indice
+
+
+def _obter_indice(sistema: SistemaArmazenamento) -> MutableMapping[str, LocalizacaoPeca]:
+    """
+    Retorna o índice de peças do sistema, reconstruindo-o se estiver ausente
+    ou desatualizado (listas alteradas diretamente, sem passar pelo serviço).
+    """
+    indice = _indice_atualizado(sistema)
+    if indice is None:
+        indice = _construir_indice(sistema)
+        sistema['indice_pecas'] = indice
+        sistema['versao_indice'] = _versao_listas(sistema)
+    return indice
+
+
+def _anexar(lista: List[Peca], peca: Peca) -> Optional[int]:
+    """Inclui a peça no final da lista e retorna sua chave (só em ListaPecas)."""
+    if isinstance(lista, ListaPecas):
+        return lista.adicionar(peca)
+    lista.append(peca)
+    return None
+
+
+def _mesma_peca(encontrada: Optional[Peca], peca: Peca) -> bool:
+    # Listas colunares criam uma view nova a cada acesso: compara a linha
+    if isinstance(peca, armazenamento_colunar.PecaColunar):
+        return encontrada == peca
+    return encontrada is peca
+
+
+def _retirar_da_lista(lista: List[Peca], localizacao: LocalizacaoPeca) -> bool:
+    """Retira da lista a peça localizada: O(1) em ListaPecas, busca nas demais."""
+    peca = localizacao['peca']
+    if isinstance(lista, ListaPecas) and _mesma_peca(lista.obter_chave(localizacao['chave']), peca):
+        lista.remover_chave(localizacao['chave'])
+        return True
+    
+    for i, peca_lista in enumerate(lista):
+        if peca_lista['id'] == peca['id']:
+            lista.pop(i)
+            return True
+    return False
+
+
+def _retirar_da_caixa(
+    caixa: Caixa,
+    localizacao: LocalizacaoPeca,
+    indice: MutableMapping[str, LocalizacaoPeca]
+) -> None:
+    """
+    Retira da caixa a peça localizada, pela posição guardada no índice, e
+    atualiza a posição das peças seguintes da caixa (no máximo
+    CAPACIDADE_MAXIMA_CAIXA - 1). Busca na caixa se a posição não confere.
+    """
+    pecas = caixa['pecas']
+    id_peca = localizacao['peca']['id']
+    posicao = localizacao['posicao_caixa']
+    if posicao is None or posicao >= len(pecas) or pecas[posicao]['id'] != id_peca:
+        posicao = next((i for i, peca in enumerate(pecas) if peca['id'] == id_peca), None)
+        if posicao is None:
+            return
+    del pecas[posicao]
+    
+    for nova_posicao in range(posicao, len(pecas)):
+        seguinte = indice.get(pecas[nova_posicao]['id'])
+        if seguinte is not None and seguinte['caixa'] is caixa:
+            seguinte['posicao_caixa'] = nova_posicao
+            indice[pecas[nova_posicao]['id']] = seguinte
+
+
+def incluir_peca(peca: Peca, sistema: SistemaArmazenamento) -> None:
+    """
+    Inclui uma peça na lista correspondente ao seu status (e na caixa atual,
+    se aprovada), no índice e nas estatísticas. Não fecha caixas nem registra alterações:
+    use adicionar_peca_em_caixa() ou registrar_peca_reprovada().
+    
+    Args:
+        peca: Peça a incluir
+        sistema: Estado atual do sistema
+    """
+    if peca['aprovada']:
+        caixa: Optional[Caixa] = sistema['caixa_atual']
+        lista = sistema['pecas_aprovadas']
+    else:
+        caixa = None
+        lista = sistema['pecas_reprovadas']
+    
+    indice = _indice_atualizado(sistema)
+    chave = _anexar(lista, peca)
+    if chave is not None:
+        # A lista pode guardar outra representação da peça (ex.: colunar)
+        peca = lista.obter_chave(chave)
+    posicao_caixa: Optional[int] = None
+    if caixa is not None:
+        posicao_caixa = len(caixa['pecas'])
+        if isinstance(peca, armazenamento_colunar.PecaColunar):
+            armazenamento_colunar.anexar_na_caixa(caixa, peca)
+        else:
+            caixa['pecas'].append(peca)
+    
+    if indice is not None:
+        indice[peca['id']] = LocalizacaoPeca(
+            peca=peca, aprovada=peca['aprovada'], caixa=caixa, chave=chave,
+            posicao_caixa=posicao_caixa
+        )
+        sistema['versao_indice'] = _versao_listas(sistema)
+    else:
+        # Índice ausente ou desatualizado: é reconstruído quando for usado
+        sistema.pop('indice_pecas', None)
+    
+    agregado = sistema.get('estatisticas')
+    if agregado is not None:
+        estatisticas.registrar_inclusao(agregado, peca)
+    
+    _marcar_alteracao(sistema)
+
+
+def retirar_peca(
+    id_peca: str,
+    sistema: SistemaArmazenamento
+) -> Optional[LocalizacaoPeca]:
+    """
+    Retira uma peça da sua lista, da caixa que a contém, do índice e das
+    estatísticas, sem percorrer as listas. Não registra alterações: use remover_peca_por_id().
+    
+    Args:
+        id_peca: Identificador da peça
+        sistema: Estado atual do sistema
+    
+    Returns:
+        Localização que a peça ocupava, ou None se não foi encontrada
+    """
+    localizacao = localizar_peca(id_peca, sistema)
+    if localizacao is None:
+        return None
+    
+    lista = sistema['pecas_aprovadas'] if localizacao['aprovada'] else sistema['pecas_reprovadas']
+    if not _retirar_da_lista(lista, localizacao):
+        # Índice desatualizado (listas substituídas diretamente): reconstrói
+        sistema.pop('indice_pecas', None)
+        localizacao = localizar_peca(id_peca, sistema)
+        if localizacao is None:
+            return None
+        lista = sistema['pecas_aprovadas'] if localizacao['aprovada'] else sistema['pecas_reprovadas']
+        _retirar_da_lista(lista, localizacao)
+    
+    caixa = localizacao['caixa']
+    if caixa is not None:
+        _retirar_da_caixa(caixa, localizacao, sistema['indice_pecas'])
+    
+    sistema['indice_pecas'].pop(id_peca, None)
+    sistema['versao_indice'] = _versao_listas(sistema)
+    
+    agregado = sistema.get('estatisticas')
+    if agregado is not None:
+        estatisticas.registrar_remocao(agregado, localizacao['peca'], localizacao['aprovada'])
+    
+    _marcar_alteracao(sistema)
+    return localizacao
+
+
+def existe_peca(id_peca: str, sistema: SistemaArmazenamento) -> bool:
+    """
+    Verifica se já existe uma peça cadastrada com o ID informado.
+    Consulta o índice de peças em tempo constante.
+    
+    Args:
+        id_peca: Identificador da peça
+        sistema: Estado atual do sistema
+    
+    Returns:
+        True se a peça estiver cadastrada (aprovada ou reprovada)
+    """
+    return id_peca in _obter_indice(sistema)
+
+
+def localizar_peca(
+    id_peca: str,
+    sistema: SistemaArmazenamento
+) -> Optional[LocalizacaoPeca]:
+    """
+    Localiza uma peça pelo ID usando o índice de peças.
+    
+    Args:
+        id_peca: Identificador da peça
+        sistema: Estado atual do sistema
+    
+    Returns:
+        LocalizacaoPeca com a peça, seu status e a caixa que a contém,
+        ou None se não houver peça com esse ID
+    """
+    return _obter_indice(sistema).get(id_peca)
+
+
+def carregar_pagina_reprovadas(
+    sistema: SistemaArmazenamento,
+    filtros: Optional["database.FiltroReprovadas"] = None,
+    apos: Optional[int] = None,
+    limite: Optional[int] = None
+) -> "database.PaginaReprovadas":
+    """
+    Carrega uma página de peças reprovadas, da mais recente para a mais antiga.
+    
+    No modo de tabelas a página vem do banco (database.carregar_pagina_reprovadas).
+    Com o journal ativo a tabela pecas não é gravada, então a página é montada
+    a partir de sistema['pecas_reprovadas'], com os mesmos filtros e a chave
+    da peça na lista como cursor; registrada_em fica None.
+    
+    Args:
+        sistema: Estado atual do sistema
+        filtros: Filtros da listagem (opcional)
+        apos: Cursor retornado em 'proxima' pela página anterior (None: primeira página)
+        limite: Quantidade máxima de peças na página (padrão: TAMANHO_PAGINA_REPROVADAS)
+    
+    Returns:
+        PaginaReprovadas com as linhas e o cursor da página seguinte
+    
+    Raises:
+        ValueError: Se o filtro de motivo não é um critério conhecido
+    """
+    if limite is None:
+        limite = database.TAMANHO_PAGINA_REPROVADAS
+    if not journal.journal_ativo():
+        return database.carregar_pagina_reprovadas(filtros, apos, limite)
+    
+    filtros = filtros or database.FiltroReprovadas()
+    motivo = filtros.get('motivo')
+    if motivo and motivo not in estatisticas.CRITERIOS:
+        raise ValueError(f"Motivo inválido: {motivo}")
+    
+    reprovadas = sistema['pecas_reprovadas']
+    if isinstance(reprovadas, ListaPecas):
+        itens = reprovadas.itens_recentes(apos)
+    else:
+        fim = len(reprovadas) if apos is None else min(apos, len(reprovadas))
+        itens = ((i, reprovadas[i]) for i in range(fim - 1, -1, -1))
+    
+    linhas: List["database.LinhaReprovada"] = []
+    for posicao, peca in itens:
+        if filtros.get('cor') and peca['cor'] != filtros['cor']:
+            continue
+        if filtros.get('codigo_produto') and peca.get('codigo_produto') != filtros['codigo_produto']:
+            continue
+        if filtros.get('busca_id') and filtros['busca_id'] not in peca['id']:
+            continue
+        reprovacoes = estatisticas.contar_reprovacoes(peca)
+        if motivo and not reprovacoes[motivo]:
+            continue
+        if len(linhas) == limite:
+            return database.PaginaReprovadas(linhas=linhas, proxima=linhas[-1]['posicao'])
+        linhas.append(database.LinhaReprovada(
+            posicao=posicao,
+            id=peca['id'],
+            peso=peca['peso'],
+            cor=peca['cor'],
+            comprimento=peca['comprimento'],
+            codigo_produto=peca.get('codigo_produto'),
+            registrada_em=None,
+            reprovada_peso=bool(reprovacoes['peso']),
+            reprovada_cor=bool(reprovacoes['cor']),
+            reprovada_comprimento=bool(reprovacoes['comprimento'])
+        ))
+    return database.PaginaReprovadas(linhas=linhas, proxima=None)
+
+
+def carregar_peca_registrada(id_peca: str, sistema: SistemaArmazenamento) -> Optional[Peca]:
+    """
+    Carrega uma peça com todos os campos: do banco no modo de tabelas, ou da
+    memória com o journal ativo (a tabela pecas não é gravada).
+    
+    Args:
+        id_peca: Identificador da peça
+        sistema: Estado atual do sistema
+    
+    Returns:
+        Cópia da peça, ou None se não existir
+    """
+    if not journal.journal_ativo():
+        return database.carregar_peca(id_peca)
+    localizacao = localizar_peca(id_peca, sistema)
+    return Peca(**localizacao['peca']) if localizacao is not None else None
+
+
+def carregar_colunas_pecas(
+    sistema: SistemaArmazenamento,
+    colunas: Optional[Sequence[str]] = None,
+    filtros: Optional["database.FiltroPecas"] = None
+) -> Dict[str, Sequence[Any]]:
+    """
+    Carrega peças em formato colunar, no formato de database.carregar_colunas_pecas().
+    
+    No modo de tabelas as colunas vêm do banco. Com o journal ativo a tabela
+    pecas não é gravada, então as colunas são montadas a partir da memória:
+    aprovadas e depois reprovadas (ou por caixa e posição na caixa com o
+    filtro em_caixa), com registrada_em None.
+    
+    Args:
+        sistema: Estado atual do sistema
+        colunas: Campos a carregar, dentre database.COLUNAS_PECAS (padrão: todos)
+        filtros: Filtros das peças (opcional)
+    
+    Returns:
+        Dicionário {coluna: valores}, todas com o mesmo comprimento
+    
+    Raises:
+        ValueError: Se alguma coluna não existe, ou se há filtro de data com o
+            journal ativo (a memória não guarda o instante de gravação)
+    """
+    if not journal.journal_ativo():
+        return database.carregar_colunas_pecas(colunas, filtros)
+    
+    colunas = database.validar_colunas_pecas(colunas)
+    filtros = filtros or database.FiltroPecas()
+    if 'desde' in filtros or 'ate' in filtros:
+        raise ValueError("Filtro de data indisponível com o journal ativo")
+    
+    caixas = sorted(
+        itertools.chain(sistema['caixas_fechadas'], [sistema['caixa_atual']]),
+        key=lambda caixa: caixa['id']
+    )
+    if filtros.get('em_caixa'):
+        pecas = [(peca, caixa['id']) for caixa in caixas for peca in caixa['pecas']]
+    else:
+        caixa_da_peca = {peca['id']: caixa['id'] for caixa in caixas for peca in caixa['pecas']}
+        pecas = [
+            (peca, caixa_da_peca.get(peca['id']))
+            for peca in itertools.chain(sistema['pecas_aprovadas'], sistema['pecas_reprovadas'])
+        ]
+    
+    linhas = []
+    for peca, caixa_id in pecas:
+        if 'aprovada' in filtros and peca['aprovada'] != bool(filtros['aprovada']):
+            continue
+        if 'cor' in filtros and peca['cor'] != filtros['cor']:
+            continue
+        if 'codigo_produto' in filtros and peca.get('codigo_produto') != filtros['codigo_produto']:
+            continue
+        valores = {
+            'id': peca['id'],
+            'peso': peca['peso'],
+            'cor': peca['cor'],
+            'comprimento': peca['comprimento'],
+            'aprovada': peca['aprovada'],
+            'codigo_reprovacao': peca.get('codigo_reprovacao'),
+            'codigo_produto': peca.get('codigo_produto'),
+            'registrada_em': None,
+            'caixa_id': caixa_id,
+        }
+        linhas.append(tuple(valores[coluna] for coluna in colunas))
+    return database.montar_colunas_pecas(colunas, linhas)
+
+
+def _persistir_alteracoes(sistema: SistemaArmazenamento) -> None:
+    """Envia as alterações pendentes ao banco de dados, se ele existir."""
+    if database.banco_existe():
+        if journal.journal_ativo():
+            journal.persistir_eventos(sistema)
+        else:
+            database.persistir_alteracoes(sistema)
 
 
 def adicionar_peca_em_caixa(
@@ -58,8 +679,10 @@ def adicionar_peca_em_caixa(
         return False, "Apenas peças aprovadas podem ser armazenadas em caixas"
     
     # Adiciona peça na caixa atual
-    sistema['caixa_atual']['pecas'].append(peca)
-    sistema['pecas_aprovadas'].append(peca)
+    incluir_peca(peca, sistema)
+    _registrar_peca_salva(sistema, peca)
+    _monitorar_peca(sistema, peca)
+    _registrar_caixa_salva(sistema, sistema['caixa_atual'])
     
     total_pecas_caixa = len(sistema['caixa_atual']['pecas'])
     
@@ -68,10 +691,22 @@ def adicionar_peca_em_caixa(
         # Fecha a caixa atual
         sistema['caixa_atual']['fechada'] = True
         sistema['caixas_fechadas'].append(sistema['caixa_atual'])
+        _marcar_alteracao(sistema)
+        id_caixa_fechada = sistema['caixa_atual']['id']
+        agregado = sistema.get('estatisticas')
+        if agregado is not None:
+            estatisticas.registrar_caixa_fechada(agregado)
         
         # Cria nova caixa
         sistema['contador_caixas'] += 1
         sistema['caixa_atual'] = criar_caixa(sistema['contador_caixas'])
+        _registrar_caixa_salva(sistema, sistema['caixa_atual'])
+        alteracoes = _obter_alteracoes(sistema)
+        alteracoes['contador_alterado'] = True
+        alteracoes['eventos'].append(journal.criar_evento(
+            journal.EVENTO_CAIXA_FECHADA,
+            {'id': id_caixa_fechada, 'proxima_caixa': sistema['contador_caixas']}
+        ))
         
         mensagem = (
             f"Peça {peca['id']} adicionada. "
@@ -79,9 +714,8 @@ def adicionar_peca_em_caixa(
             f"🆕 Caixa #{sistema['contador_caixas']} iniciada"
         )
         
-        # Sincroniza com o banco de dados
-        if database.banco_existe():
-            database.sincronizar_sistema(sistema)
+        # Persiste apenas o que mudou
+        _persistir_alteracoes(sistema)
         
         return True, mensagem
     
@@ -90,19 +724,59 @@ def adicionar_peca_em_caixa(
         f"({total_pecas_caixa}/{CAPACIDADE_MAXIMA_CAIXA} peças)"
     )
     
-    # Sincroniza com o banco de dados
-    if database.banco_existe():
-        database.sincronizar_sistema(sistema)
+    # Persiste apenas o que mudou
+    _persistir_alteracoes(sistema)
     
     return False, mensagem
 
 
+def registrar_peca_reprovada(
+    peca: Peca,
+    sistema: SistemaArmazenamento
+) -> None:
+    """
+    Registra uma peça reprovada no sistema e persiste a inclusão.
+    
+    Args:
+        peca: Peça reprovada a ser registrada
+        sistema: Estado atual do sistema de armazenamento
+    """
+    incluir_peca(peca, sistema)
+    _registrar_peca_salva(sistema, peca)
+    _monitorar_peca(sistema, peca)
+    _persistir_alteracoes(sistema)
+
+
+def _remover_peca(id_peca: str, sistema: SistemaArmazenamento) -> Tuple[bool, str]:
+    """Remove a peça e registra as alterações, sem persistir."""
+    localizacao = retirar_peca(id_peca, sistema)
+    if localizacao is None:
+        return False, f"Peça {id_peca} não encontrada no sistema"
+    
+    _registrar_peca_removida(sistema, localizacao['peca'])
+    
+    if not localizacao['aprovada']:
+        return True, f"Peça {id_peca} removida (reprovada)"
+    
+    caixa = localizacao['caixa']
+    if caixa is None:
+        return True, f"Peça {id_peca} removida (aprovada)"
+    
+    _registrar_caixa_salva(sistema, caixa)
+    if caixa is sistema['caixa_atual']:
+        return True, f"Peça {id_peca} removida da caixa atual"
+    
+    # Caixa fechada (não deve acontecer normalmente)
+    return True, f"Peça {id_peca} removida da Caixa #{caixa['id']}"
+
+
 def remover_peca_por_id(
     id_peca: str,
     sistema: SistemaArmazenamento
 ) -> Tuple[bool, str]:
     """
     Remove uma peça cadastrada do sistema.
+    Localiza a peça pelo índice, sem percorrer listas nem caixas.
     
     Args:
         id_peca: Identificador da peça a ser removida
@@ -113,68 +787,74 @@ def remover_peca_por_id(
         - sucesso: True se a peça foi encontrada e removida
         - mensagem: Mensagem descritiva do resultado
     """
-    # Busca em peças aprovadas
-    for i, peca in enumerate(sistema['pecas_aprovadas']):
-        if peca['id'] == id_peca:
-            sistema['pecas_aprovadas'].pop(i)
-            
-            # Remove da caixa atual se estiver lá
-            for j, peca_caixa in enumerate(sistema['caixa_atual']['pecas']):
-                if peca_caixa['id'] == id_peca:
-                    sistema['caixa_atual']['pecas'].pop(j)
-                    
-                    # Sincroniza com o banco de dados
-                    if database.banco_existe():
-                        database.sincronizar_sistema(sistema)
-                    
-                    return True, f"Peça {id_peca} removida da caixa atual"
-            
-            # Remove de caixas fechadas (não deve acontecer normalmente)
-            for caixa in sistema['caixas_fechadas']:
-                for j, peca_caixa in enumerate(caixa['pecas']):
-                    if peca_caixa['id'] == id_peca:
-                        caixa['pecas'].pop(j)
-                        
-                        # Sincroniza com o banco de dados
-                        if database.banco_existe():
-                            database.sincronizar_sistema(sistema)
-                        
-                        return True, f"Peça {id_peca} removida da Caixa #{caixa['id']}"
-            
-            # Sincroniza com o banco de dados
-            if database.banco_existe():
-                database.sincronizar_sistema(sistema)
-            
-            return True, f"Peça {id_peca} removida (aprovada)"
+    resultado = _remover_peca(id_peca, sistema)
     
-    # Busca em peças reprovadas
-    for i, peca in enumerate(sistema['pecas_reprovadas']):
-        if peca['id'] == id_peca:
-            sistema['pecas_reprovadas'].pop(i)
-            
-            # Sincroniza com o banco de dados
-            if database.banco_existe():
-                database.sincronizar_sistema(sistema)
-            
-            return True, f"Peça {id_peca} removida (reprovada)"
+    # Persiste apenas o que mudou
+    if resultado[0]:
+        _persistir_alteracoes(sistema)
+    
+    return resultado
+
+
+def remover_pecas_por_ids(
+    ids_pecas: List[str],
+    sistema: SistemaArmazenamento
+) -> List[Tuple[bool, str]]:
+    """
+    Remove várias peças (ex.: recall) e persiste tudo em uma única gravação.
+    
+    Args:
+        ids_pecas: Identificadores das peças a remover
+        sistema: Estado atual do sistema
+    
+    Returns:
+        Lista com o resultado (sucesso, mensagem) de cada ID, na mesma ordem
+    """
+    resultados = [_remover_peca(id_peca, sistema) for id_peca in ids_pecas]
     
-    return False, f"Peça {id_peca} não encontrada no sistema"
+    if any(sucesso for sucesso, _ in resultados):
+        _persistir_alteracoes(sistema)
+    
+    return resultados
 
 
 def inicializar_sistema() -> SistemaArmazenamento:
     """
     Inicializa o sistema de armazenamento com valores padrão.
     Carrega dados do banco se existir, senão cria sistema novo.
+    Com o motor de journal ativo, reconstrói o estado a partir do último
+    snapshot mais os eventos posteriores. Com PECAS_MEMORIA=colunar, as
+    peças são mantidas no armazenamento colunar. As estatísticas gravadas
+    são reaproveitadas quando conferem com os dados carregados.
     
     Returns:
         Instância de SistemaArmazenamento inicializada
     """
+    sistema = _carregar_sistema()
+    estatisticas.obter_estatisticas(sistema)
+    
+    if armazenamento_colunar.memoria_colunar_ativa():
+        armazenamento_colunar.converter_para_colunar(sistema)
+    
+    return sistema
+
+
+def _carregar_sistema() -> SistemaArmazenamento:
+    """Carrega o sistema do banco (tabelas ou journal) ou cria um novo."""
     # Inicializa o banco de dados (cria schema se não existir)
     database.inicializar_database()
     
     # Se o banco já tem dados, carrega do banco
     if database.banco_existe():
         try:
+            if journal.journal_ativo():
+                sistema = journal.carregar_sistema()
+                if sistema is None:
+                    # Journal vazio: parte do estado atual das tabelas
+                    sistema = database.carregar_sistema_completo()
+                    journal.gravar_snapshot(sistema)
+                return sistema
+            
             # Tenta carregar sistema existente
             sistema = database.carregar_sistema_completo()
             
@@ -184,8 +864,8 @@ def inicializar_sistema() -> SistemaArmazenamento:
                 not sistema['caixas_fechadas']):
                 # Sistema vazio, cria novo
                 sistema = SistemaArmazenamento(
-                    pecas_aprovadas=[],
-                    pecas_reprovadas=[],
+                    pecas_aprovadas=ListaPecas(),
+                    pecas_reprovadas=ListaPecas(),
                     caixas_fechadas=[],
                     caixa_atual=criar_caixa(1),
                     contador_caixas=1
@@ -209,8 +889,8 @@ def inicializar_sistema() -> SistemaArmazenamento:
     
     # Cria sistema novo
     sistema = SistemaArmazenamento(
-        pecas_aprovadas=[],
-        pecas_reprovadas=[],
+        pecas_aprovadas=ListaPecas(),
+        pecas_reprovadas=ListaPecas(),
         caixas_fechadas=[],
         caixa_atual=criar_caixa(1),
         contador_caixas=1
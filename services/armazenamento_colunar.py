@@ -0,0 +1,549 @@
+"""
+Armazenamento colunar das peças em memória.
+
+Em vez de um dict por peça (com floats, string e lista próprios), os campos
+ficam em colunas compactas do módulo array, compartilhadas pelas listas de
+aprovadas e reprovadas. Cores e listas de motivos são internadas: cada valor
+distinto é guardado uma única vez e as peças guardam apenas o seu código.
+Peças com codigo_reprovacao não guardam texto: as mensagens são montadas a
+partir do código a cada leitura, com os limites de validação em vigor quando
+a peça foi incluída (também internados).
+
+As listas e as caixas guardam só os números das linhas. As peças continuam
+sendo acessadas como Peca (peca['peso'], dict(peca), Peca(**peca)...) por
+meio de PecaColunar, uma view de poucos bytes sobre uma linha das colunas,
+criada a cada acesso. O índice de peças por ID (IndicePecasColunar) também
+guarda só linhas: uma tabela hash sobre os IDs já guardados nas colunas.
+
+Ativado com a variável de ambiente PECAS_MEMORIA=colunar.
+"""
+
+import os
+from array import array
+from typing import (
+    Any, Dict, Iterable, Iterator, List, Mapping, MutableMapping, MutableSequence, Optional, Tuple,
+    TYPE_CHECKING
+)
+
+from models.peca import Peca
+from models.caixa import Caixa
+from models.lista_pecas import ListaPecas
+from services.regras import CriteriosCompilados, obter_criterios
+from services.validacao import descrever_motivos
+
+# Importação condicional para evitar importação circular
+if TYPE_CHECKING:
+    from services.armazenamento import LocalizacaoPeca, SistemaArmazenamento
+
+
+CAMPOS_PECA = ('id', 'peso', 'cor', 'comprimento', 'aprovada', 'motivos_reprovacao')
+
+# Valor da coluna de códigos para peças sem codigo_reprovacao
+SEM_CODIGO = -1
+
+# Posições livres da tabela do índice: nunca usada e liberada por remoção
+POSICAO_VAZIA = -1
+POSICAO_REMOVIDA = -2
+
+# Ocupação máxima da tabela do índice (posições usadas ou liberadas)
+OCUPACAO_MAXIMA_INDICE = 2 / 3
+
+# Bit da coluna de motivos que indica "montar a partir do codigo_reprovacao";
+# os demais bits dão os limites de validação em vigor quando a peça foi incluída
+MOTIVOS_DO_CODIGO = 0x80000000
+
+
+def memoria_colunar_ativa() -> bool:
+    """
+    Verifica se as peças devem ser mantidas em memória no formato colunar.
+
+    Returns:
+        True se PECAS_MEMORIA=colunar
+    """
+    return os.getenv('PECAS_MEMORIA', '').lower() == 'colunar'
+
+
+class ColunasPecas:
+    """
+    Colunas com os campos de todas as peças armazenadas.
+
+    Os IDs ficam concatenados em UTF-8 em um único bytearray, localizados por
+    colunas de início e fim. Linhas nunca são reaproveitadas nem liberadas:
+    uma peça removida das listas continua ocupando sua linha (e o texto do
+    seu ID) até o próximo carregamento do sistema, assim como as colunas do
+    IndicePecasColunar indexadas pela linha.
+    """
+
+    def __init__(self) -> None:
+        self._ids = bytearray()
+        self.inicio_ids = array('Q')
+        self.fim_ids = array('Q')
+        self.pesos = array('d')
+        self.comprimentos = array('d')
+        self.cores = array('I')
+        self.aprovadas = array('b')
+        self.motivos = array('I')
+        self.codigos = array('b')
+        self.produtos = array('I')
+        self._cores: List[str] = []
+        self._codigos_cores: Dict[str, int] = {}
+        self._motivos: List[Tuple[str, ...]] = [()]
+        self._codigos_motivos: Dict[Tuple[str, ...], int] = {(): 0}
+        self._produtos: List[Optional[str]] = [None]
+        self._codigos_produtos: Dict[Optional[str], int] = {None: 0}
+        self._limites: List[CriteriosCompilados] = []
+        self._codigos_limites: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.pesos)
+
+    def _codigo_cor(self, cor: str) -> int:
+        codigo = self._codigos_cores.get(cor)
+        if codigo is None:
+            codigo = len(self._cores)
+            self._cores.append(cor)
+            self._codigos_cores[cor] = codigo
+        return codigo
+
+    def _codigo_motivos(self, motivos: List[str]) -> int:
+        chave = tuple(motivos)
+        codigo = self._codigos_motivos.get(chave)
+        if codigo is None:
+            codigo = len(self._motivos)
+            self._motivos.append(chave)
+            self._codigos_motivos[chave] = codigo
+        return codigo
+
+    def _codigo_produto(self, produto: Optional[str]) -> int:
+        codigo = self._codigos_produtos.get(produto)
+        if codigo is None:
+            codigo = len(self._produtos)
+            self._produtos.append(produto)
+            self._codigos_produtos[produto] = codigo
+        return codigo
+
+    def _codigo_limites(self, criterios: CriteriosCompilados) -> int:
+        # Os critérios compilados não mudam: a identidade basta (e a lista
+        # mantém o objeto vivo, então o id não é reaproveitado)
+        codigo = self._codigos_limites.get(id(criterios))
+        if codigo is None:
+            codigo = len(self._limites)
+            self._limites.append(criterios)
+            self._codigos_limites[id(criterios)] = codigo
+        return codigo
+
+    def _guardar_id(self, linha: int, id_peca: str) -> None:
+        inicio = len(self._ids)
+        self._ids += id_peca.encode('utf-8')
+        if linha == len(self.inicio_ids):
+            self.inicio_ids.append(inicio)
+            self.fim_ids.append(len(self._ids))
+        else:
+            # ID alterado: o texto antigo fica sem referência
+            self.inicio_ids[linha] = inicio
+            self.fim_ids[linha] = len(self._ids)
+
+    def _motivos_do_codigo(self, linha: int, criterios: CriteriosCompilados) -> List[str]:
+        return descrever_motivos(
+            self.codigos[linha], self.pesos[linha], self.ler(linha, 'cor'),
+            self.comprimentos[linha], criterios
+        )
+
+    def _codigo_motivos_peca(self, motivos: List[str], linha: int) -> int:
+        if self.codigos[linha] not in (SEM_CODIGO, 0):
+            # Limites em vigor agora: o texto não muda se as regras mudarem depois
+            criterios = obter_criterios(self._produtos[self.produtos[linha]])
+            if list(motivos) == self._motivos_do_codigo(linha, criterios):
+                return MOTIVOS_DO_CODIGO | self._codigo_limites(criterios)
+        return self._codigo_motivos(motivos)
+
+    def armazenar(self, peca: Mapping[str, Any]) -> "PecaColunar":
+        """
+        Copia uma peça para uma nova linha das colunas.
+
+        Args:
+            peca: Peça (dict ou qualquer mapeamento com os campos de Peca)
+
+        Returns:
+            PecaColunar apontando para a nova linha
+        """
+        return PecaColunar(self, self.armazenar_linha(peca))
+
+    def armazenar_linha(self, peca: Mapping[str, Any]) -> int:
+        """
+        Copia uma peça para uma nova linha das colunas, sem criar a view.
+
+        Args:
+            peca: Peça (dict ou qualquer mapeamento com os campos de Peca)
+
+        Returns:
+            Número da nova linha
+        """
+        linha = len(self.pesos)
+        self._guardar_id(linha, peca['id'])
+        self.pesos.append(peca['peso'])
+        self.comprimentos.append(peca['comprimento'])
+        self.cores.append(self._codigo_cor(peca['cor']))
+        self.aprovadas.append(1 if peca['aprovada'] else 0)
+        codigo = peca.get('codigo_reprovacao')
+        self.codigos.append(SEM_CODIGO if codigo is None else codigo)
+        self.produtos.append(self._codigo_produto(peca.get('codigo_produto')))
+        self.motivos.append(self._codigo_motivos_peca(peca['motivos_reprovacao'], linha))
+        return linha
+
+    def linha_de(self, peca: Mapping[str, Any]) -> int:
+        """
+        Retorna a linha de uma peça, copiando-a para as colunas se ainda não
+        for uma view delas.
+
+        Args:
+            peca: PecaColunar destas colunas, ou outra peça
+
+        Returns:
+            Número da linha
+        """
+        if isinstance(peca, PecaColunar) and peca.colunas is self:
+            return peca.linha
+        return self.armazenar_linha(peca)
+
+    def tem_codigo(self, linha: int) -> bool:
+        """Indica se a linha tem codigo_reprovacao."""
+        return self.codigos[linha] != SEM_CODIGO
+
+    def tem_produto(self, linha: int) -> bool:
+        """Indica se a linha tem codigo_produto."""
+        return self.produtos[linha] != 0
+
+    def ler(self, linha: int, campo: str) -> Any:
+        """Lê um campo de uma linha."""
+        if campo == 'id':
+            return self._ids[self.inicio_ids[linha]:self.fim_ids[linha]].decode('utf-8')
+        if campo == 'peso':
+            return self.pesos[linha]
+        if campo == 'cor':
+            return self._cores[self.cores[linha]]
+        if campo == 'comprimento':
+            return self.comprimentos[linha]
+        if campo == 'aprovada':
+            return bool(self.aprovadas[linha])
+        if campo == 'motivos_reprovacao':
+            codigo_motivos = self.motivos[linha]
+            if codigo_motivos & MOTIVOS_DO_CODIGO:
+                criterios = self._limites[codigo_motivos & ~MOTIVOS_DO_CODIGO]
+                return self._motivos_do_codigo(linha, criterios)
+            return list(self._motivos[codigo_motivos])
+        if campo == 'codigo_reprovacao' and self.tem_codigo(linha):
+            return self.codigos[linha]
+        if campo == 'codigo_produto' and self.tem_produto(linha):
+            return self._produtos[self.produtos[linha]]
+        raise KeyError(campo)
+
+    def escrever(self, linha: int, campo: str, valor: Any) -> None:
+        """Altera um campo de uma linha."""
+        if campo == 'id':
+            self._guardar_id(linha, valor)
+        elif campo == 'peso':
+            self.pesos[linha] = valor
+        elif campo == 'cor':
+            self.cores[linha] = self._codigo_cor(valor)
+        elif campo == 'comprimento':
+            self.comprimentos[linha] = valor
+        elif campo == 'aprovada':
+            self.aprovadas[linha] = 1 if valor else 0
+        elif campo == 'motivos_reprovacao':
+            self.motivos[linha] = self._codigo_motivos_peca(valor, linha)
+        elif campo == 'codigo_reprovacao':
+            # Fixa o texto atual antes de trocar o código do qual ele derivaria
+            if self.motivos[linha] & MOTIVOS_DO_CODIGO:
+                self.motivos[linha] = self._codigo_motivos(self.ler(linha, 'motivos_reprovacao'))
+            self.codigos[linha] = valor
+        elif campo == 'codigo_produto':
+            self.produtos[linha] = self._codigo_produto(valor)
+        else:
+            raise KeyError(campo)
+
+
+class PecaColunar(MutableMapping):
+    """
+    View de uma peça armazenada em ColunasPecas, compatível com Peca.
+
+    Leituras e atribuições de campos vão direto para as colunas. A lista
+    devolvida em 'motivos_reprovacao' é uma cópia: para alterá-la, atribua
+    uma nova lista ao campo. As views são criadas a cada acesso pelas listas
+    e caixas: duas views da mesma linha são iguais, mas não o mesmo objeto.
+    """
+
+    __slots__ = ('colunas', 'linha')
+
+    def __init__(self, colunas: ColunasPecas, linha: int) -> None:
+        self.colunas = colunas
+        self.linha = linha
+
+    def __getitem__(self, campo: str) -> Any:
+        return self.colunas.ler(self.linha, campo)
+
+    def __setitem__(self, campo: str, valor: Any) -> None:
+        self.colunas.escrever(self.linha, campo, valor)
+
+    def __delitem__(self, campo: str) -> None:
+        raise TypeError("Campos de uma peça não podem ser removidos")
+
+    def __iter__(self) -> Iterator[str]:
+        yield from CAMPOS_PECA
+        if self.colunas.tem_codigo(self.linha):
+            yield 'codigo_reprovacao'
+        if self.colunas.tem_produto(self.linha):
+            yield 'codigo_produto'
+
+    def __len__(self) -> int:
+        return (
+            len(CAMPOS_PECA)
+            + (1 if self.colunas.tem_codigo(self.linha) else 0)
+            + (1 if self.colunas.tem_produto(self.linha) else 0)
+        )
+
+    def __eq__(self, outro: object) -> bool:
+        if isinstance(outro, PecaColunar) and outro.colunas is self.colunas and outro.linha == self.linha:
+            return True
+        return super().__eq__(outro)
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def copy(self) -> Peca:
+        return Peca(**self)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class ListaPecasColunar(ListaPecas):
+    """
+    ListaPecas cujas peças ficam em ColunasPecas.
+
+    A lista guarda apenas os números das linhas, em uma coluna compacta;
+    peças incluídas como dict são copiadas para as colunas, e cada acesso
+    devolve uma view PecaColunar nova.
+    """
+
+    def __init__(self, pecas=(), colunas: Optional[ColunasPecas] = None) -> None:
+        self.colunas = colunas if colunas is not None else ColunasPecas()
+        super().__init__(pecas)
+
+    def _novos_itens(self) -> array:
+        return array('q')
+
+    def _guardar(self, peca: Peca) -> int:
+        return self.colunas.linha_de(peca)
+
+    def _peca(self, linha: int) -> PecaColunar:
+        return PecaColunar(self.colunas, linha)
+
+    def copy(self) -> "ListaPecasColunar":
+        return ListaPecasColunar(self, self.colunas)
+
+
+class PecasCaixaColunar(MutableSequence):
+    """
+    Peças de uma caixa no armazenamento colunar: guarda os números das
+    linhas e devolve views a cada acesso, como ListaPecasColunar.
+    """
+
+    def __init__(self, pecas: Iterable[Peca] = (), colunas: Optional[ColunasPecas] = None) -> None:
+        self.colunas = colunas if colunas is not None else ColunasPecas()
+        self._linhas = array('q', (self.colunas.linha_de(peca) for peca in pecas))
+
+    def __len__(self) -> int:
+        return len(self._linhas)
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [PecaColunar(self.colunas, linha) for linha in self._linhas[indice]]
+        return PecaColunar(self.colunas, self._linhas[indice])
+
+    def __setitem__(self, indice, valor) -> None:
+        if isinstance(indice, slice):
+            self._linhas[indice] = array('q', (self.colunas.linha_de(peca) for peca in valor))
+        else:
+            self._linhas[indice] = self.colunas.linha_de(valor)
+
+    def __delitem__(self, indice) -> None:
+        del self._linhas[indice]
+
+    def insert(self, indice: int, valor: Peca) -> None:
+        self._linhas.insert(indice, self.colunas.linha_de(valor))
+
+    def __eq__(self, outro: object) -> bool:
+        if isinstance(outro, (list, MutableSequence)):
+            return self[:] == list(outro)
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"PecasCaixaColunar({self[:]!r})"
+
+
+class IndicePecasColunar(MutableMapping):
+    """
+    Índice ID -> LocalizacaoPeca das peças guardadas em ColunasPecas, sem
+    objetos por peça.
+
+    Uma tabela hash de endereçamento aberto (sondagem linear) guarda só o
+    número da linha de cada peça; o ID procurado é comparado com o texto
+    guardado no bytearray das colunas, sem um str por peça. A lista, a chave
+    na lista, a caixa e a posição na caixa ficam em colunas compactas
+    indexadas pela linha. A LocalizacaoPeca é montada a cada consulta: para
+    alterá-la, atribua a localização de novo ao ID.
+    """
+
+    def __init__(self, colunas: ColunasPecas) -> None:
+        self.colunas = colunas
+        self._tabela = array('q', [POSICAO_VAZIA]) * 8
+        self._total = 0
+        self._ocupadas = 0
+        self.aprovadas = array('b')
+        self.chaves = array('q')
+        self.caixas = array('i')
+        self.posicoes_caixa = array('h')
+        self._caixas: Dict[int, Caixa] = {}
+
+    def _procurar(self, id_peca: str) -> Tuple[int, Optional[int]]:
+        # (posição da tabela, linha): a posição é a da linha encontrada ou a
+        # primeira livre onde o ID seria incluído
+        texto = id_peca.encode('utf-8')
+        tabela = self._tabela
+        ids, inicios, fins = self.colunas._ids, self.colunas.inicio_ids, self.colunas.fim_ids
+        mascara = len(tabela) - 1
+        posicao = hash(id_peca) & mascara
+        livre: Optional[int] = None
+        while True:
+            linha = tabela[posicao]
+            if linha == POSICAO_VAZIA:
+                return (posicao if livre is None else livre), None
+            if linha == POSICAO_REMOVIDA:
+                if livre is None:
+                    livre = posicao
+            elif ids[inicios[linha]:fins[linha]] == texto:
+                return posicao, linha
+            posicao = (posicao + 1) & mascara
+
+    def _redimensionar(self) -> None:
+        # Metade da tabela livre depois de refeita
+        tamanho = 8
+        while tamanho < self._total * 2:
+            tamanho *= 2
+        linhas = [linha for linha in self._tabela if linha >= 0]
+        self._tabela = array('q', [POSICAO_VAZIA]) * tamanho
+        self._ocupadas = len(linhas)
+        mascara = tamanho - 1
+        for linha in linhas:
+            posicao = hash(self.colunas.ler(linha, 'id')) & mascara
+            while self._tabela[posicao] != POSICAO_VAZIA:
+                posicao = (posicao + 1) & mascara
+            self._tabela[posicao] = linha
+
+    def _reservar_linha(self, linha: int) -> None:
+        while len(self.chaves) <= linha:
+            self.aprovadas.append(0)
+            self.chaves.append(-1)
+            self.caixas.append(-1)
+            self.posicoes_caixa.append(-1)
+
+    def __getitem__(self, id_peca: str) -> "LocalizacaoPeca":
+        _, linha = self._procurar(id_peca)
+        if linha is None:
+            raise KeyError(id_peca)
+        chave = self.chaves[linha]
+        caixa = self.caixas[linha]
+        posicao_caixa = self.posicoes_caixa[linha]
+        return {
+            'peca': PecaColunar(self.colunas, linha),
+            'aprovada': bool(self.aprovadas[linha]),
+            'caixa': self._caixas[caixa] if caixa >= 0 else None,
+            'chave': chave if chave >= 0 else None,
+            'posicao_caixa': posicao_caixa if posicao_caixa >= 0 else None,
+        }
+
+    def __setitem__(self, id_peca: str, localizacao: "LocalizacaoPeca") -> None:
+        peca = localizacao['peca']
+        if not (isinstance(peca, PecaColunar) and peca.colunas is self.colunas):
+            raise ValueError("O índice colunar só localiza peças das suas colunas")
+        linha = peca.linha
+        posicao, encontrada = self._procurar(id_peca)
+        if encontrada is None:
+            if self._tabela[posicao] == POSICAO_VAZIA:
+                self._ocupadas += 1
+            self._total += 1
+        self._tabela[posicao] = linha
+
+        self._reservar_linha(linha)
+        caixa = localizacao['caixa']
+        if caixa is not None:
+            self._caixas[caixa['id']] = caixa
+        chave = localizacao['chave']
+        posicao_caixa = localizacao['posicao_caixa']
+        self.aprovadas[linha] = 1 if localizacao['aprovada'] else 0
+        self.chaves[linha] = -1 if chave is None else chave
+        self.caixas[linha] = -1 if caixa is None else caixa['id']
+        self.posicoes_caixa[linha] = -1 if posicao_caixa is None else posicao_caixa
+
+        if self._ocupadas > len(self._tabela) * OCUPACAO_MAXIMA_INDICE:
+            self._redimensionar()
+
+    def __delitem__(self, id_peca: str) -> None:
+        posicao, linha = self._procurar(id_peca)
+        if linha is None:
+            raise KeyError(id_peca)
+        self._tabela[posicao] = POSICAO_REMOVIDA
+        self._total -= 1
+
+    def __contains__(self, id_peca: object) -> bool:
+        return isinstance(id_peca, str) and self._procurar(id_peca)[1] is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return (self.colunas.ler(linha, 'id') for linha in self._tabela if linha >= 0)
+
+    def __len__(self) -> int:
+        return self._total
+
+
+def anexar_na_caixa(caixa: Caixa, peca: PecaColunar) -> None:
+    """
+    Inclui uma peça colunar em uma caixa, passando as peças da caixa para o
+    formato colunar se ainda não estiverem (ex.: caixa recém-criada).
+
+    Args:
+        caixa: Caixa que recebe a peça
+        peca: View da peça
+    """
+    pecas = caixa['pecas']
+    if not (isinstance(pecas, PecasCaixaColunar) and pecas.colunas is peca.colunas):
+        pecas = PecasCaixaColunar(pecas, peca.colunas)
+        caixa['pecas'] = pecas
+    pecas.append(peca)
+
+
+def converter_para_colunar(sistema: "SistemaArmazenamento") -> None:
+    """
+    Move as peças do sistema para o armazenamento colunar.
+    As caixas passam a referenciar as mesmas linhas das listas.
+
+    Args:
+        sistema: Sistema a converter (alterado no lugar)
+    """
+    colunas = ColunasPecas()
+    linhas: Dict[int, PecaColunar] = {}
+
+    for chave in ('pecas_aprovadas', 'pecas_reprovadas'):
+        lista = ListaPecasColunar(colunas=colunas)
+        for peca in sistema[chave]:
+            linhas[id(peca)] = lista.obter_chave(lista.adicionar(peca))
+        sistema[chave] = lista
+
+    for caixa in list(sistema['caixas_fechadas']) + [sistema['caixa_atual']]:
+        caixa['pecas'] = PecasCaixaColunar(
+            (linhas.get(id(peca), peca) for peca in caixa['pecas']), colunas
+        )
+
+    # As localizações indexadas apontam para os dicts antigos
+    sistema.pop('indice_pecas', None)
@@ -0,0 +1,130 @@
+"""
+Memorização de resultados calculados a partir do sistema, por versão dos dados.
+
+Gráficos e tabelas do dashboard são refeitos a cada interação, mesmo quando
+nenhuma peça mudou. memorizar_por_versao() guarda o resultado de uma função
+f(sistema, ...) sob a marca de versão do sistema (obter_versao) mais a versão
+das regras de validação, já que os gráficos desenham os limites dos critérios.
+Enquanto nenhuma das duas muda, as chamadas seguintes devolvem o mesmo objeto,
+sem percorrer as peças. Cada função guarda no máximo algumas versões, com
+descarte da menos usada (LRU); o cache é do processo e serve a todas as sessões.
+
+Funções que leem o banco de dados (e não só a memória do sistema) usam
+memorizar_por_versao(banco=True): a chave inclui também o seq da última
+alteração gravada, que muda quando outra sessão ou processo grava peças
+mesmo que este sistema ainda não as tenha aplicado.
+
+Os resultados são compartilhados: quem os recebe não deve alterá-los.
+"""
+
+import functools
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Tuple, TypeVar
+
+from services import acompanhamento
+from services.armazenamento import SistemaArmazenamento, obter_versao
+from services.regras import obter_plano
+
+
+# Versões guardadas por função (ex.: a atual e as de outras sessões/recargas)
+MAXIMO_ENTRADAS = 8
+
+R = TypeVar('R')
+
+
+class CacheVersionado:
+    """
+    Cache limitado, com descarte do item usado há mais tempo.
+
+    Attributes:
+        maximo: Número máximo de entradas guardadas
+    """
+
+    def __init__(self, maximo: int = MAXIMO_ENTRADAS) -> None:
+        if maximo < 1:
+            raise ValueError("O cache precisa de pelo menos uma entrada")
+        self.maximo = maximo
+        self._entradas: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._trava = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    def obter(self, chave: Hashable, construir: Callable[[], R]) -> R:
+        """
+        Retorna o valor guardado para a chave, ou o constrói e guarda.
+
+        Args:
+            chave: Chave da entrada
+            construir: Função chamada quando a chave não está no cache
+
+        Returns:
+            Valor da entrada
+        """
+        with self._trava:
+            if chave in self._entradas:
+                self._entradas.move_to_end(chave)
+                return self._entradas[chave]
+
+        # Constrói fora da trava: duas sessões podem calcular a mesma
+        # versão ao mesmo tempo, mas nenhuma espera pela outra
+        valor = construir()
+
+        with self._trava:
+            self._entradas[chave] = valor
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False)
+        return valor
+
+    def limpar(self) -> None:
+        """Descarta todas as entradas."""
+        with self._trava:
+            self._entradas.clear()
+
+
+def chave_versao(sistema: SistemaArmazenamento) -> Tuple[Hashable, ...]:
+    """
+    Monta a chave de versão de um sistema: dados e regras de validação.
+
+    Args:
+        sistema: Estado atual do sistema de armazenamento
+
+    Returns:
+        Tupla que muda sempre que os dados ou as regras mudam
+    """
+    return obter_versao(sistema) + (obter_plano()['versao'],)
+
+
+def memorizar_por_versao(
+    maximo: int = MAXIMO_ENTRADAS,
+    banco: bool = False
+) -> Callable[[Callable[..., R]], Callable[..., R]]:
+    """
+    Decorador que memoriza f(sistema, *args) pela versão do sistema.
+    Os argumentos extras entram na chave e precisam ser hashable.
+
+    Args:
+        maximo: Número máximo de versões guardadas para a função
+        banco: Inclui na chave o seq da última alteração gravada no banco
+            (uma consulta de custo constante por chamada), para funções que
+            leem o banco
+
+    Returns:
+        Decorador; a função decorada ganha o atributo cache (CacheVersionado)
+    """
+    def decorador(funcao: Callable[..., R]) -> Callable[..., R]:
+        cache = CacheVersionado(maximo)
+
+        @functools.wraps(funcao)
+        def memorizada(sistema: SistemaArmazenamento, *args: Hashable) -> R:
+            chave = chave_versao(sistema) + args
+            if banco:
+                chave += (acompanhamento.ultima_sequencia(),)
+            return cache.obter(chave, lambda: funcao(sistema, *args))
+
+        memorizada.cache = cache  # type: ignore[attr-defined]
+        return memorizada
+
+    return decorador
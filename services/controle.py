@@ -0,0 +1,240 @@
+"""
+Detecção online de deriva do processo com as regras de Western Electric.
+
+Para peso e comprimento é mantida uma janela circular com os últimos
+TAMANHO_JANELA valores, com soma e soma dos quadrados atualizadas a cada
+entrada e saída. Cada peça nova é comparada com uma base fixa (média e
+desvio da fase I): a informada ao criar o monitor (ex.: o estado de SPC do
+agregado) ou, sem ela, a dos primeiros MINIMO_PONTOS valores. Uma base que
+acompanhasse a janela absorveria a própria deriva que deveria denunciar.
+Os contadores de sequência (mesmo lado da média, tendência) e as últimas
+zonas (até 5) são atualizados no lugar, sem reavaliar a janela.
+
+Regras avaliadas:
+- Um ponto além de 3σ
+- 2 de 3 pontos consecutivos além de 2σ, do mesmo lado
+- 4 de 5 pontos consecutivos além de 1σ, do mesmo lado
+- 8 pontos consecutivos do mesmo lado da média
+- 6 pontos consecutivos subindo ou descendo (tendência)
+"""
+
+import math
+from collections import deque
+from typing import Deque, Dict, List, Mapping, Any, Optional, Tuple, TypedDict
+
+from services.spc import MEDIDAS_SPC, MedidaSPC, desvio_padrao
+
+
+# Quantidade de valores recentes mantidos por medida
+TAMANHO_JANELA = 50
+
+# Valores da fase I: necessários para fixar a base das regras que dependem de média e desvio
+MINIMO_PONTOS = 20
+
+# Base das regras: média e desvio padrão da fase I
+BaseControle = Tuple[float, float]
+
+# Identificadores das regras
+REGRA_ALEM_3_SIGMA = "alem_3_sigma"
+REGRA_2_DE_3 = "2_de_3_alem_2_sigma"
+REGRA_4_DE_5 = "4_de_5_alem_1_sigma"
+REGRA_MESMO_LADO = "8_mesmo_lado"
+REGRA_TENDENCIA = "tendencia_6"
+
+PONTOS_MESMO_LADO = 8
+PONTOS_TENDENCIA = 6
+
+DESCRICOES_REGRAS = {
+    REGRA_ALEM_3_SIGMA: "ponto além de 3σ da média",
+    REGRA_2_DE_3: "2 de 3 pontos além de 2σ do mesmo lado",
+    REGRA_4_DE_5: "4 de 5 pontos além de 1σ do mesmo lado",
+    REGRA_MESMO_LADO: f"{PONTOS_MESMO_LADO} pontos seguidos do mesmo lado da média",
+    REGRA_TENDENCIA: f"{PONTOS_TENDENCIA} pontos seguidos em tendência",
+}
+
+
+class AlertaControle(TypedDict):
+    """
+    Alerta de processo fora de controle.
+
+    Attributes:
+        medida: 'peso' ou 'comprimento'
+        regra: Identificador da regra violada (REGRA_*)
+        peca_id: Peça cuja medição disparou o alerta
+        valor: Valor medido
+        descricao: Texto do alerta
+    """
+    medida: str
+    regra: str
+    peca_id: str
+    valor: float
+    descricao: str
+
+
+class AlertaRegistrado(AlertaControle):
+    """
+    Alerta lido do banco de dados.
+
+    Attributes:
+        registrado_em: Data e hora da gravação do alerta
+    """
+    registrado_em: str
+
+
+def base_do_spc(medida: MedidaSPC) -> Optional[BaseControle]:
+    """
+    Usa o estado de SPC de uma medida como base das regras.
+
+    Args:
+        medida: Estado incremental da medida (ex.: do agregado de estatísticas)
+
+    Returns:
+        (média, desvio padrão), ou None com menos de MINIMO_PONTOS valores
+    """
+    if medida['n'] < MINIMO_PONTOS:
+        return None
+    return medida['media'], desvio_padrao(medida)
+
+
+class JanelaControle:
+    """
+    Janela circular de uma medida com o estado incremental das regras.
+
+    Attributes:
+        base: Média e desvio fixos usados pelas regras (None até a fase I terminar)
+    """
+
+    def __init__(self, tamanho: int = TAMANHO_JANELA, base: Optional[BaseControle] = None) -> None:
+        self.base = base
+        self.valores: Deque[float] = deque(maxlen=tamanho)
+        self.soma = 0.0
+        self.soma_quadrados = 0.0
+        # Zonas dos últimos pontos: +k/-k = além de kσ acima/abaixo (0 = dentro de 1σ)
+        self.zonas: Deque[int] = deque(maxlen=5)
+        # Pontos seguidos acima (>0) ou abaixo (<0) da média
+        self.lado = 0
+        # Pontos seguidos subindo (>0) ou descendo (<0), contando o primeiro
+        self.tendencia = 0
+        self.ultimo: Optional[float] = None
+
+    def _fixar_base(self) -> None:
+        # Fim da fase I: a base fica fixa daqui em diante
+        n = len(self.valores)
+        media = self.soma / n
+        variancia = max(0.0, (self.soma_quadrados - n * media * media) / (n - 1))
+        self.base = (media, math.sqrt(variancia))
+
+    def _incluir(self, valor: float) -> None:
+        if len(self.valores) == self.valores.maxlen:
+            saindo = self.valores[0]
+            self.soma -= saindo
+            self.soma_quadrados -= saindo * saindo
+        self.valores.append(valor)
+        self.soma += valor
+        self.soma_quadrados += valor * valor
+
+    def _atualizar_tendencia(self, valor: float) -> bool:
+        if self.ultimo is None or valor == self.ultimo:
+            self.tendencia = 1 if self.ultimo is None else 0
+        elif valor > self.ultimo:
+            self.tendencia = self.tendencia + 1 if self.tendencia > 0 else 2
+        else:
+            self.tendencia = self.tendencia - 1 if self.tendencia < 0 else -2
+        self.ultimo = valor
+        return abs(self.tendencia) == PONTOS_TENDENCIA
+
+    def _zonas_do_lado(self, ultimos: int, minimo_zona: int, sinal: int) -> int:
+        recentes = list(self.zonas)[-ultimos:]
+        return sum(1 for zona in recentes if zona * sinal >= minimo_zona)
+
+    def avaliar(self, valor: float) -> List[str]:
+        """
+        Avalia as regras para um novo valor e o inclui na janela.
+
+        Args:
+            valor: Valor medido
+
+        Returns:
+            Regras violadas com a chegada do valor (REGRA_*)
+        """
+        regras: List[str] = []
+
+        if self._atualizar_tendencia(valor):
+            regras.append(REGRA_TENDENCIA)
+
+        if self.base is not None:
+            media, sigma = self.base
+            sinal = 1 if valor > media else -1 if valor < media else 0
+
+            if sinal == 0:
+                self.lado = 0
+            elif self.lado * sinal > 0:
+                self.lado += sinal
+            else:
+                self.lado = sinal
+            if abs(self.lado) == PONTOS_MESMO_LADO:
+                regras.append(REGRA_MESMO_LADO)
+
+            if sigma > 0:
+                zona = sinal * min(3, int(abs(valor - media) / sigma))
+                self.zonas.append(zona)
+                if abs(zona) >= 3:
+                    regras.append(REGRA_ALEM_3_SIGMA)
+                elif abs(zona) >= 2 and self._zonas_do_lado(3, 2, sinal) >= 2:
+                    regras.append(REGRA_2_DE_3)
+                elif abs(zona) >= 1 and self._zonas_do_lado(5, 1, sinal) >= 4:
+                    regras.append(REGRA_4_DE_5)
+
+        self._incluir(valor)
+        if self.base is None and len(self.valores) >= MINIMO_PONTOS:
+            self._fixar_base()
+        return regras
+
+
+class MonitorControle:
+    """
+    Monitor das medidas de peso e comprimento das peças registradas.
+
+    Args:
+        tamanho: Tamanho da janela de cada medida
+        bases: Base fixa de cada medida (as ausentes usam a fase I)
+
+    Attributes:
+        janelas: JanelaControle de cada medida
+        ultimos_alertas: Alertas disparados pela última peça registrada
+    """
+
+    def __init__(
+        self,
+        tamanho: int = TAMANHO_JANELA,
+        bases: Optional[Mapping[str, Optional[BaseControle]]] = None
+    ) -> None:
+        bases = bases or {}
+        self.janelas: Dict[str, JanelaControle] = {
+            medida: JanelaControle(tamanho, bases.get(medida)) for medida in MEDIDAS_SPC
+        }
+        self.ultimos_alertas: List[AlertaControle] = []
+
+    def registrar(self, peca: Mapping[str, Any]) -> List[AlertaControle]:
+        """
+        Avalia as medidas de uma peça recém-registrada.
+
+        Args:
+            peca: Peça registrada (aprovada ou reprovada)
+
+        Returns:
+            Alertas disparados (também guardados em ultimos_alertas)
+        """
+        alertas = [
+            AlertaControle(
+                medida=medida,
+                regra=regra,
+                peca_id=peca['id'],
+                valor=peca[medida],
+                descricao=f"{medida.capitalize()}: {DESCRICOES_REGRAS[regra]} (peça {peca['id']}, {peca[medida]})"
+            )
+            for medida, janela in self.janelas.items()
+            for regra in janela.avaliar(peca[medida])
+        ]
+        self.ultimos_alertas = alertas
+        return alertas
@@ -8,41 +8,243 @@ Autor: Gabriel Falcão
 Data: 2025-11-16
 """
 
+import atexit
+import json
+import logging
+import queue
 import sqlite3
+import threading
+import time
+from array import array
 from pathlib import Path
-from typing import List, Optional, Tuple, TYPE_CHECKING
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypedDict, TYPE_CHECKING
 from contextlib import contextmanager
 
 from models.peca import Peca, criar_peca
 from models.caixa import Caixa, criar_caixa
+from models.lista_pecas import ListaPecas
+from services import controle, distribuicao, estatisticas, rollups, spc
+from services.regras import CriteriosCompilados, compilar_criterios, obter_criterios
+from services.validacao import MotivoReprovacao, descrever_motivos
+
+# NumPy é opcional: com ele, carregar_colunas_pecas devolve arrays do NumPy
+NUMPY_DISPONIVEL = False
+try:
+    import numpy as np
+    NUMPY_DISPONIVEL = True
+except ImportError:
+    NUMPY_DISPONIVEL = False
 
 # Importação condicional para evitar importação circular
 if TYPE_CHECKING:
     from services.armazenamento import SistemaArmazenamento
 
 
+# Configurar logger
+logger = logging.getLogger(__name__)
+
+
 # Caminho do banco de dados na raiz do projeto
 DB_PATH = Path(__file__).parent.parent / "sistema_pecas.db"
 
+# Tamanho do cache de páginas por conexão, em KiB (padrão do SQLite: 2000 KiB)
+CACHE_PAGINAS_KIB = 16384
+
+# Índices secundários do schema. As chaves estrangeiras peca_id não são
+# cobertas pelas chaves primárias e, sem índice, cada busca/remoção por peça
+# (e cada verificação de foreign key ao remover uma peça) varre a tabela inteira.
+INDICES = (
+    "CREATE INDEX IF NOT EXISTS idx_motivos_reprovacao_peca_id ON motivos_reprovacao(peca_id)",
+    "CREATE INDEX IF NOT EXISTS idx_caixas_pecas_peca_id ON caixas_pecas(peca_id)",
+    "CREATE INDEX IF NOT EXISTS idx_pecas_aprovada ON pecas(aprovada)",
+    "CREATE INDEX IF NOT EXISTS idx_pecas_created_at ON pecas(created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_pecas_codigo_produto ON pecas(codigo_produto)",
+)
+
+# Campos de um perfil de produto (colunas de perfis_produto além do código)
+CAMPOS_PERFIL = (
+    'peso_minimo', 'peso_maximo', 'cores_aceitas', 'comprimento_minimo', 'comprimento_maximo'
+)
+
+# Linha da tabela pecas:
+# (id, peso, cor, comprimento, aprovada, codigo_reprovacao, codigo_produto, limites_id)
+LinhaPeca = Tuple[str, float, str, float, int, Optional[int], Optional[str], Optional[int]]
+
+# Linha a gravar em pecas: como LinhaPeca, mas com os limites em JSON no lugar do limites_id
+LinhaGravacaoPeca = Tuple[str, float, str, float, int, Optional[int], Optional[str], Optional[str]]
+
+# Critérios de reprovação, na ordem em que motivos em texto são classificados
+CRITERIOS_REPROVACAO = ('peso', 'cor', 'comprimento')
+
+# Peças por página na listagem de reprovadas
+TAMANHO_PAGINA_REPROVADAS = 50
+
+# Colunas de carregar_colunas_pecas(): expressão SQL e tipo numérico
+# ('d': float, '?': bool; None: lista de valores, como vêm do banco)
+COLUNAS_PECAS: Dict[str, Tuple[str, Optional[str]]] = {
+    'id': ('p.id', None),
+    'peso': ('p.peso', 'd'),
+    'cor': ('p.cor', None),
+    'comprimento': ('p.comprimento', 'd'),
+    'aprovada': ('p.aprovada', '?'),
+    'codigo_reprovacao': ('p.codigo_reprovacao', None),
+    'codigo_produto': ('p.codigo_produto', None),
+    'registrada_em': ('p.created_at', None),
+    'caixa_id': ('cp.caixa_id', None),
+}
+
+# Alterações mantidas em registro_alteracoes; as mais antigas são descartadas
+# e quem ficou para trás recarrega o sistema inteiro
+MAXIMO_REGISTRO_ALTERACOES = 10000
+
+# Gatilhos que registram, em ordem, cada peça gravada ou removida e cada caixa
+# fechada, por qualquer processo. Os tipos são os mesmos dos eventos do journal.
+GATILHOS_REGISTRO_ALTERACOES = (
+    """
+    CREATE TRIGGER IF NOT EXISTS registro_peca_inserida AFTER INSERT ON pecas
+    BEGIN
+        INSERT INTO registro_alteracoes (tipo, chave) VALUES ('peca_registrada', NEW.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS registro_peca_removida AFTER DELETE ON pecas
+    BEGIN
+        INSERT INTO registro_alteracoes (tipo, chave) VALUES ('peca_removida', OLD.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS registro_peca_alterada
+    AFTER UPDATE OF peso, cor, comprimento, aprovada, codigo_reprovacao, codigo_produto ON pecas
+    WHEN OLD.peso IS NOT NEW.peso OR OLD.cor IS NOT NEW.cor
+        OR OLD.comprimento IS NOT NEW.comprimento OR OLD.aprovada IS NOT NEW.aprovada
+        OR OLD.codigo_reprovacao IS NOT NEW.codigo_reprovacao
+        OR OLD.codigo_produto IS NOT NEW.codigo_produto
+    BEGIN
+        INSERT INTO registro_alteracoes (tipo, chave) VALUES ('peca_removida', OLD.id);
+        INSERT INTO registro_alteracoes (tipo, chave) VALUES ('peca_registrada', NEW.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS registro_caixa_fechada AFTER UPDATE OF fechada ON caixas
+    WHEN NEW.fechada = 1 AND OLD.fechada = 0
+    BEGIN
+        INSERT INTO registro_alteracoes (tipo, chave) VALUES ('caixa_fechada', NEW.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS registro_caixa_inserida_fechada AFTER INSERT ON caixas
+    WHEN NEW.fechada = 1
+    BEGIN
+        INSERT INTO registro_alteracoes (tipo, chave) VALUES ('caixa_fechada', NEW.id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS registro_alteracoes_limite AFTER INSERT ON registro_alteracoes
+    BEGIN
+        DELETE FROM registro_alteracoes WHERE seq <= NEW.seq - {MAXIMO_REGISTRO_ALTERACOES};
+    END
+    """,
+)
+
+# Conexão de longa duração de cada thread
+_local = threading.local()
+
+# Incrementada por fechar_conexoes() para que todas as threads reabram a conexão
+_geracao_conexoes = 0
+
+
+def _abrir_conexao(caminho: Path) -> sqlite3.Connection:
+    """
+    Abre uma conexão e aplica as configurações de desempenho uma única vez.
+    
+    - journal_mode=WAL: leitores (ex.: dashboard) não bloqueiam o escritor (CLI)
+    - synchronous=NORMAL: seguro com WAL e evita fsync a cada commit
+    - cache_size: cache de páginas maior para cargas e relatórios
+    - foreign_keys=ON: integridade referencial (desabilitada por padrão no SQLite)
+    
+    Args:
+        caminho: Caminho do arquivo do banco
+    
+    Returns:
+        sqlite3.Connection configurada
+    """
+    conn = sqlite3.connect(str(caminho))
+    conn.row_factory = sqlite3.Row  # Permite acessar colunas por nome
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_PAGINAS_KIB}")
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+def _obter_conexao() -> sqlite3.Connection:
+    """
+    Retorna a conexão da thread atual, abrindo uma nova se necessário.
+    
+    A conexão é reaberta quando DB_PATH muda, quando o arquivo do banco
+    deixa de existir ou após fechar_conexoes().
+    """
+    conn = getattr(_local, 'conexao', None)
+    if conn is not None and (
+        _local.caminho != DB_PATH
+        or _local.geracao != _geracao_conexoes
+        or not DB_PATH.exists()
+    ):
+        if _local.profundidade == 0:
+            conn.close()
+            conn = None
+    
+    if conn is None:
+        conn = _abrir_conexao(DB_PATH)
+        _local.conexao = conn
+        _local.caminho = DB_PATH
+        _local.geracao = _geracao_conexoes
+        _local.profundidade = 0
+    
+    return conn
+
 
 @contextmanager
 def get_connection():
     """
-    Context manager para gerenciar conexões com o banco de dados.
+    Context manager para usar a conexão de longa duração da thread atual.
+    
+    A conexão permanece aberta entre chamadas. Usos aninhados compartilham a
+    mesma transação: apenas o bloco mais externo faz commit ou rollback.
     
     Yields:
         sqlite3.Connection: Conexão com o banco de dados
     """
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row  # Permite acessar colunas por nome
+    conn = _obter_conexao()
+    _local.profundidade += 1
     try:
         yield conn
-        conn.commit()
+        if _local.profundidade == 1:
+            conn.commit()
     except Exception as e:
-        conn.rollback()
+        if _local.profundidade == 1:
+            conn.rollback()
         raise e
     finally:
+        _local.profundidade -= 1
+
+
+def fechar_conexoes() -> None:
+    """
+    Fecha a conexão da thread atual e invalida as conexões das demais threads,
+    que serão reabertas no próximo uso. Útil no encerramento da aplicação.
+    """
+    global _geracao_conexoes
+    _geracao_conexoes += 1
+    _fechar_conexao_local()
+
+
+def _fechar_conexao_local() -> None:
+    """Fecha a conexão da thread atual, se não houver transação aberta."""
+    conn = getattr(_local, 'conexao', None)
+    if conn is not None and _local.profundidade == 0:
         conn.close()
+        _local.conexao = None
 
 
 def criar_schema() -> None:
@@ -61,10 +263,21 @@ def criar_schema() -> None:
                 cor TEXT NOT NULL,
                 comprimento REAL NOT NULL,
                 aprovada BOOLEAN NOT NULL,
+                codigo_reprovacao INTEGER,
+                codigo_produto TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
         
+        # Limites de validação em vigor quando peças foram reprovadas: as
+        # mensagens das peças gravadas só com o código são montadas com eles
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS limites_validacao (
+                id INTEGER PRIMARY KEY,
+                criterios TEXT NOT NULL UNIQUE
+            )
+        """)
+        
         # Tabela de Motivos de Reprovação
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS motivos_reprovacao (
@@ -104,8 +317,83 @@ def criar_schema() -> None:
             )
         """)
         
-        # Habilita foreign keys (desabilitado por padrão no SQLite)
-        cursor.execute("PRAGMA foreign_keys = ON")
+        # Perfis de tolerância por produto (NULL: herda o critério geral)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS perfis_produto (
+                codigo TEXT PRIMARY KEY,
+                peso_minimo REAL,
+                peso_maximo REAL,
+                cores_aceitas TEXT,
+                comprimento_minimo REAL,
+                comprimento_maximo REAL
+            )
+        """)
+        
+        # Journal de eventos (motor de armazenamento alternativo, ver journal.py)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS eventos (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo TEXT NOT NULL,
+                dados TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # Snapshots do estado completo, identificados pelo último evento aplicado
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS snapshots (
+                seq_evento INTEGER PRIMARY KEY,
+                estado TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # Alertas das regras de controle (ver controle.py)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS alertas_controle (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                medida TEXT NOT NULL,
+                regra TEXT NOT NULL,
+                peca_id TEXT NOT NULL,
+                valor REAL NOT NULL,
+                descricao TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # Registro de alterações, lido pelo dashboard para se atualizar sem
+        # recarregar o sistema (ver acompanhamento.py)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS registro_alteracoes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo TEXT NOT NULL,
+                chave TEXT NOT NULL
+            )
+        """)
+        
+        _migrar_colunas(cursor)
+        
+        # Índices secundários (IF NOT EXISTS: criados também em bancos antigos)
+        for comando in INDICES:
+            cursor.execute(comando)
+        
+        # Rollups por hora e por turno, mantidos por gatilhos (ver rollups.py)
+        rollups.criar_rollups(cursor)
+        
+        for comando in GATILHOS_REGISTRO_ALTERACOES:
+            cursor.execute(comando)
+
+
+def _migrar_colunas(cursor: sqlite3.Cursor) -> None:
+    """Acrescenta em bancos antigos as colunas criadas depois da primeira versão."""
+    cursor.execute("PRAGMA table_info(pecas)")
+    colunas = {linha['name'] for linha in cursor.fetchall()}
+    if 'codigo_reprovacao' not in colunas:
+        cursor.execute("ALTER TABLE pecas ADD COLUMN codigo_reprovacao INTEGER")
+    if 'codigo_produto' not in colunas:
+        cursor.execute("ALTER TABLE pecas ADD COLUMN codigo_produto TEXT")
+    if 'limites_id' not in colunas:
+        cursor.execute("ALTER TABLE pecas ADD COLUMN limites_id INTEGER REFERENCES limites_validacao(id)")
 
 
 def inicializar_database() -> None:
@@ -126,325 +414,1784 @@ def banco_existe() -> bool:
     return DB_PATH.exists()
 
 
-def salvar_peca(peca: Peca) -> None:
+def _linhas_pecas(
+    pecas: Iterable[Peca]
+) -> Tuple[List[LinhaGravacaoPeca], List[Tuple[str, str]]]:
     """
-    Salva ou atualiza uma peça no banco de dados.
+    Converte peças nas linhas das tabelas pecas e motivos_reprovacao.
+    
+    Peças com codigo_reprovacao têm gravados só o código e os limites de
+    validação que produziram suas mensagens: o texto é remontado na leitura
+    com esses limites, mesmo que as regras tenham mudado depois. O texto vai
+    para motivos_reprovacao apenas quando não há código ou quando difere do
+    que o código produziria com os limites em vigor.
     
     Args:
-        peca: Peça a ser salva
+        pecas: Peças a converter (IDs repetidos: vale a última ocorrência)
+    
+    Returns:
+        Tupla (linhas_pecas, linhas_motivos)
     """
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        
-        # Insere ou substitui a peça
-        cursor.execute("""
-            INSERT OR REPLACE INTO pecas (id, peso, cor, comprimento, aprovada)
-            VALUES (?, ?, ?, ?, ?)
-        """, (
+    lote = list({peca['id']: peca for peca in pecas}.values())
+    
+    linhas_pecas: List[LinhaGravacaoPeca] = []
+    linhas_motivos: List[Tuple[str, str]] = []
+    for peca in lote:
+        limites = _limites_dos_motivos(peca)
+        linhas_pecas.append((
             peca['id'],
             peca['peso'],
             peca['cor'],
             peca['comprimento'],
-            int(peca['aprovada'])  # SQLite não tem boolean nativo
+            int(peca['aprovada']),  # SQLite não tem boolean nativo
+            peca.get('codigo_reprovacao'),
+            peca.get('codigo_produto'),
+            limites
         ))
-        
-        # Remove motivos antigos (se existirem)
-        cursor.execute("DELETE FROM motivos_reprovacao WHERE peca_id = ?", (peca['id'],))
-        
-        # Insere novos motivos de reprovação
-        for motivo in peca['motivos_reprovacao']:
-            cursor.execute("""
-                INSERT INTO motivos_reprovacao (peca_id, motivo)
-                VALUES (?, ?)
-            """, (peca['id'], motivo))
+        if limites is None:
+            linhas_motivos.extend((peca['id'], motivo) for motivo in peca['motivos_reprovacao'])
+    return linhas_pecas, linhas_motivos
 
 
-def deletar_peca(id_peca: str) -> None:
+# Limites em JSON dos últimos critérios usados (evita serializá-los a cada peça)
+_TEXTO_LIMITES: Dict[int, Tuple[CriteriosCompilados, str]] = {}
+
+
+def _texto_limites(criterios: CriteriosCompilados) -> str:
+    """Serializa os limites dos critérios, como gravados em limites_validacao."""
+    em_cache = _TEXTO_LIMITES.get(id(criterios))
+    if em_cache is not None and em_cache[0] is criterios:
+        return em_cache[1]
+    texto = json.dumps(criterios['criterios'], sort_keys=True)
+    if len(_TEXTO_LIMITES) >= 64:
+        _TEXTO_LIMITES.clear()
+    _TEXTO_LIMITES[id(criterios)] = (criterios, texto)
+    return texto
+
+
+def _limites_dos_motivos(peca: Peca) -> Optional[str]:
     """
-    Remove uma peça do banco de dados.
+    Retorna os limites em vigor (em JSON) se os motivos da peça podem ser
+    remontados a partir do código com eles, ou None se o texto deve ser gravado.
+    """
+    codigo = peca.get('codigo_reprovacao')
+    if not codigo:
+        return None
+    criterios = obter_criterios(peca.get('codigo_produto'))
+    motivos = descrever_motivos(codigo, peca['peso'], peca['cor'], peca['comprimento'], criterios)
+    if list(peca['motivos_reprovacao']) != motivos:
+        return None
+    return _texto_limites(criterios)
+
+
+def _internar_limites(cursor: sqlite3.Cursor, textos: Iterable[str]) -> Dict[str, int]:
+    """Grava cada conjunto de limites uma única vez e retorna {texto: id}."""
+    textos = list(set(textos))
+    if not textos:
+        return {}
+    cursor.executemany(
+        "INSERT OR IGNORE INTO limites_validacao (criterios) VALUES (?)",
+        [(texto,) for texto in textos]
+    )
+    marcadores = ", ".join("?" for _ in textos)
+    cursor.execute(
+        f"SELECT id, criterios FROM limites_validacao WHERE criterios IN ({marcadores})", textos
+    )
+    return {linha['criterios']: linha['id'] for linha in cursor.fetchall()}
+
+
+def _gravar_linhas_pecas(
+    cursor: sqlite3.Cursor,
+    linhas_pecas: List[LinhaGravacaoPeca],
+    linhas_motivos: List[Tuple[str, str]]
+) -> None:
+    """Grava linhas de peças e motivos com executemany."""
+    ids_limites = _internar_limites(
+        cursor, (linha[7] for linha in linhas_pecas if linha[7] is not None)
+    )
+    
+    # Insere ou atualiza as peças sem apagar as linhas existentes
+    cursor.executemany("""
+        INSERT INTO pecas (id, peso, cor, comprimento, aprovada, codigo_reprovacao, codigo_produto, limites_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            peso = excluded.peso,
+            cor = excluded.cor,
+            comprimento = excluded.comprimento,
+            aprovada = excluded.aprovada,
+            codigo_reprovacao = excluded.codigo_reprovacao,
+            codigo_produto = excluded.codigo_produto,
+            limites_id = excluded.limites_id
+    """, [linha[:7] + (ids_limites.get(linha[7]),) for linha in linhas_pecas])
+    
+    # Remove motivos antigos (se existirem)
+    cursor.executemany(
+        "DELETE FROM motivos_reprovacao WHERE peca_id = ?",
+        [(linha[0],) for linha in linhas_pecas]
+    )
+    
+    # Insere novos motivos de reprovação
+    cursor.executemany("""
+        INSERT INTO motivos_reprovacao (peca_id, motivo)
+        VALUES (?, ?)
+    """, linhas_motivos)
+
+
+def _salvar_pecas(cursor: sqlite3.Cursor, pecas: Iterable[Peca]) -> None:
+    """
+    Grava várias peças e seus motivos com executemany, usando o cursor informado.
     
     Args:
-        id_peca: ID da peça a ser removida
+        cursor: Cursor da transação em andamento
+        pecas: Peças a serem salvas (IDs repetidos: vale a última ocorrência)
     """
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        
-        # Remove da tabela caixas_pecas primeiro (foreign key)
-        cursor.execute("DELETE FROM caixas_pecas WHERE peca_id = ?", (id_peca,))
-        
-        # Remove motivos de reprovação (CASCADE já faz isso, mas por segurança)
-        cursor.execute("DELETE FROM motivos_reprovacao WHERE peca_id = ?", (id_peca,))
-        
-        # Remove a peça
-        cursor.execute("DELETE FROM pecas WHERE id = ?", (id_peca,))
+    _gravar_linhas_pecas(cursor, *_linhas_pecas(pecas))
 
 
-def carregar_pecas() -> Tuple[List[Peca], List[Peca]]:
+def salvar_pecas_em_lote(pecas: Iterable[Peca]) -> None:
     """
-    Carrega todas as peças do banco de dados.
+    Salva ou atualiza várias peças em uma única transação.
     
-    Returns:
-        Tupla (pecas_aprovadas, pecas_reprovadas)
+    Args:
+        pecas: Peças a serem salvas
     """
     with get_connection() as conn:
-        cursor = conn.cursor()
-        
-        # Carrega todas as peças
-        cursor.execute("SELECT * FROM pecas")
-        rows = cursor.fetchall()
-        
-        pecas_aprovadas: List[Peca] = []
-        pecas_reprovadas: List[Peca] = []
-        
-        for row in rows:
-            # Carrega motivos de reprovação
-            cursor.execute(
-                "SELECT motivo FROM motivos_reprovacao WHERE peca_id = ?",
-                (row['id'],)
-            )
-            motivos = [m['motivo'] for m in cursor.fetchall()]
-            
-            # Cria objeto Peca
-            peca = criar_peca(
-                id_peca=row['id'],
-                peso=row['peso'],
-                cor=row['cor'],
-                comprimento=row['comprimento'],
-                aprovada=bool(row['aprovada']),
-                motivos_reprovacao=motivos
-            )
-            
-            # Adiciona na lista apropriada
-            if peca['aprovada']:
-                pecas_aprovadas.append(peca)
-            else:
-                pecas_reprovadas.append(peca)
-        
-        return pecas_aprovadas, pecas_reprovadas
+        _salvar_pecas(conn.cursor(), pecas)
 
 
-def salvar_caixa(caixa: Caixa) -> None:
+def salvar_peca(peca: Peca) -> None:
     """
-    Salva ou atualiza uma caixa no banco de dados.
+    Salva ou atualiza uma peça no banco de dados.
     
     Args:
-        caixa: Caixa a ser salva
+        peca: Peça a ser salva
     """
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        
-        # Insere ou substitui a caixa
-        cursor.execute("""
-            INSERT OR REPLACE INTO caixas (id, fechada)
-            VALUES (?, ?)
-        """, (caixa['id'], int(caixa['fechada'])))
-        
-        # Remove associações antigas
-        cursor.execute("DELETE FROM caixas_pecas WHERE caixa_id = ?", (caixa['id'],))
-        
-        # Insere peças da caixa
-        for ordem, peca in enumerate(caixa['pecas']):
-            cursor.execute("""
-                INSERT INTO caixas_pecas (caixa_id, peca_id, ordem)
-                VALUES (?, ?, ?)
-            """, (caixa['id'], peca['id'], ordem))
+    salvar_pecas_em_lote([peca])
 
 
-def carregar_caixas() -> Tuple[List[Caixa], Caixa, int]:
+def _deletar_pecas(cursor: sqlite3.Cursor, ids_pecas: Iterable[str]) -> None:
     """
-    Carrega todas as caixas do banco de dados.
+    Remove várias peças e suas associações usando o cursor informado.
     
-    Returns:
-        Tupla (caixas_fechadas, caixa_atual, contador_caixas)
+    Args:
+        cursor: Cursor da transação em andamento
+        ids_pecas: IDs das peças a serem removidas
     """
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        
-        # Carrega todas as caixas
-        cursor.execute("SELECT * FROM caixas ORDER BY id")
-        rows = cursor.fetchall()
-        
-        caixas_fechadas: List[Caixa] = []
-        caixa_atual: Optional[Caixa] = None
-        contador_caixas = 0
-        
-        for row in rows:
-            # Carrega peças da caixa
-            cursor.execute("""
-                SELECT p.*, cp.ordem
-                FROM pecas p
-                JOIN caixas_pecas cp ON p.id = cp.peca_id
-                WHERE cp.caixa_id = ?
-                ORDER BY cp.ordem
-            """, (row['id'],))
-            
-            pecas_rows = cursor.fetchall()
-            pecas: List[Peca] = []
-            
-            for peca_row in pecas_rows:
-                # Carrega motivos (geralmente vazio para aprovadas)
-                cursor.execute(
-                    "SELECT motivo FROM motivos_reprovacao WHERE peca_id = ?",
-                    (peca_row['id'],)
-                )
-                motivos = [m['motivo'] for m in cursor.fetchall()]
-                
-                peca = criar_peca(
-                    id_peca=peca_row['id'],
-                    peso=peca_row['peso'],
-                    cor=peca_row['cor'],
-                    comprimento=peca_row['comprimento'],
-                    aprovada=bool(peca_row['aprovada']),
-                    motivos_reprovacao=motivos
-                )
-                pecas.append(peca)
-            
-            # Cria objeto Caixa
-            caixa = criar_caixa(row['id'])
-            caixa['pecas'] = pecas
-            caixa['fechada'] = bool(row['fechada'])
-            
-            # Adiciona na lista apropriada
-            if caixa['fechada']:
-                caixas_fechadas.append(caixa)
-            else:
-                caixa_atual = caixa
-            
-            # Atualiza contador
-            if row['id'] > contador_caixas:
-                contador_caixas = row['id']
-        
-        # Se não há caixa atual, cria uma nova
-        if caixa_atual is None:
-            contador_caixas += 1
-            caixa_atual = criar_caixa(contador_caixas)
-        
-        return caixas_fechadas, caixa_atual, contador_caixas
+    parametros = [(id_peca,) for id_peca in ids_pecas]
+    
+    # Remove da tabela caixas_pecas primeiro (foreign key)
+    cursor.executemany("DELETE FROM caixas_pecas WHERE peca_id = ?", parametros)
+    
+    # Remove motivos de reprovação (CASCADE já faz isso, mas por segurança)
+    cursor.executemany("DELETE FROM motivos_reprovacao WHERE peca_id = ?", parametros)
+    
+    # Remove as peças
+    cursor.executemany("DELETE FROM pecas WHERE id = ?", parametros)
 
 
-def salvar_config(chave: str, valor: str) -> None:
+def deletar_peca(id_peca: str) -> None:
     """
-    Salva uma configuração do sistema.
+    Remove uma peça do banco de dados.
     
     Args:
-        chave: Nome da configuração
-        valor: Valor da configuração
+        id_peca: ID da peça a ser removida
     """
     with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT OR REPLACE INTO sistema_config (chave, valor)
-            VALUES (?, ?)
-        """, (chave, valor))
+        _deletar_pecas(conn.cursor(), [id_peca])
 
 
-def carregar_config(chave: str, default: str = "") -> str:
+def _mapear_motivos(cursor: sqlite3.Cursor) -> Dict[str, List[str]]:
     """
-    Carrega uma configuração do sistema.
+    Carrega todos os motivos de reprovação em uma única consulta.
     
     Args:
-        chave: Nome da configuração
-        default: Valor padrão se não existir
+        cursor: Cursor da conexão em uso
     
     Returns:
-        Valor da configuração
+        Dicionário {peca_id: [motivos na ordem de gravação]}
     """
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT valor FROM sistema_config WHERE chave = ?",
-            (chave,)
-        )
-        row = cursor.fetchone()
-        return row['valor'] if row else default
+    motivos: Dict[str, List[str]] = {}
+    cursor.execute("SELECT peca_id, motivo FROM motivos_reprovacao ORDER BY id")
+    for peca_id, motivo in cursor:
+        motivos.setdefault(peca_id, []).append(motivo)
+    return motivos
 
 
-def carregar_sistema_completo():
+def _mapear_limites(cursor: sqlite3.Cursor) -> Dict[int, CriteriosCompilados]:
     """
-    Carrega o sistema completo do banco de dados.
+    Carrega os limites de validação gravados (poucas linhas: uma por
+    configuração de regras que já reprovou peças).
+    
+    Args:
+        cursor: Cursor da conexão em uso
     
     Returns:
-        SistemaArmazenamento completo com todas as peças, caixas e configurações
+        Dicionário {limites_id: critérios compilados}
     """
-    # Import local para evitar circular import
-    from services.armazenamento import SistemaArmazenamento
-    
-    # Carrega peças
-    pecas_aprovadas, pecas_reprovadas = carregar_pecas()
-    
-    # Carrega caixas
-    caixas_fechadas, caixa_atual, contador_caixas = carregar_caixas()
-    
-    # Reconstrói o SistemaArmazenamento
-    sistema = SistemaArmazenamento(
-        pecas_aprovadas=pecas_aprovadas,
-        pecas_reprovadas=pecas_reprovadas,
-        caixas_fechadas=caixas_fechadas,
-        caixa_atual=caixa_atual,
-        contador_caixas=contador_caixas
-    )
-    
-    return sistema
+    cursor.execute("SELECT id, criterios FROM limites_validacao")
+    return {
+        linha['id']: compilar_criterios(json.loads(linha['criterios']))
+        for linha in cursor.fetchall()
+    }
 
 
-def sincronizar_sistema(sistema) -> None:
+def _carregar_mapa_pecas(cursor: sqlite3.Cursor) -> Dict[str, Peca]:
     """
-    Sincroniza o estado completo do sistema com o banco de dados.
-    Salva todas as peças, caixas e configurações.
+    Carrega todas as peças com seus motivos usando três consultas fixas.
+    Motivos não gravados em texto são montados a partir do codigo_reprovacao.
     
     Args:
-        sistema: Sistema a ser sincronizado (SistemaArmazenamento)
-    """
-    # Primeiro, identifica peças que existem no sistema
-    ids_sistema = set()
-    for peca in sistema['pecas_aprovadas']:
-        ids_sistema.add(peca['id'])
-        salvar_peca(peca)
+        cursor: Cursor da conexão em uso
     
-    for peca in sistema['pecas_reprovadas']:
-        ids_sistema.add(peca['id'])
-        salvar_peca(peca)
-    
-    # Remove peças do banco que não estão mais no sistema
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM pecas")
-        ids_banco = {row['id'] for row in cursor.fetchall()}
-        
-        ids_para_remover = ids_banco - ids_sistema
-        for id_peca in ids_para_remover:
-            deletar_peca(id_peca)
+    Returns:
+        Dicionário {id: Peca} na ordem de inserção das peças
+    """
+    motivos = _mapear_motivos(cursor)
+    limites = _mapear_limites(cursor)
     
-    # Salva todas as caixas fechadas
-    for caixa in sistema['caixas_fechadas']:
-        salvar_caixa(caixa)
+    pecas: Dict[str, Peca] = {}
+    cursor.execute("""
+        SELECT id, peso, cor, comprimento, aprovada, codigo_reprovacao, codigo_produto, limites_id
+        FROM pecas
+        ORDER BY rowid
+    """)
+    for linha in cursor:
+        pecas[linha[0]] = _montar_peca(tuple(linha), motivos.get(linha[0]), limites)
+    return pecas
+
+
+def _montar_peca(
+    linha: LinhaPeca,
+    motivos_peca: Optional[List[str]],
+    limites: Dict[int, CriteriosCompilados]
+) -> Peca:
+    """
+    Cria a Peca de uma linha da tabela pecas.
+    Motivos não gravados em texto são montados a partir do codigo_reprovacao,
+    com os limites em vigor na validação (os atuais, em linhas sem limites).
+    """
+    id_peca, peso, cor, comprimento, aprovada, codigo, produto, limites_id = linha
+    if motivos_peca is None and codigo:
+        criterios = limites.get(limites_id) if limites_id is not None else None
+        motivos_peca = descrever_motivos(
+            codigo, peso, cor, comprimento, criterios or obter_criterios(produto)
+        )
+    return criar_peca(
+        id_peca=id_peca,
+        peso=peso,
+        cor=cor,
+        comprimento=comprimento,
+        aprovada=bool(aprovada),
+        motivos_reprovacao=motivos_peca,
+        codigo_reprovacao=codigo,
+        codigo_produto=produto
+    )
+
+
+def _separar_pecas(pecas: Dict[str, Peca]) -> Tuple[List[Peca], List[Peca]]:
+    """Separa o mapa de peças em (aprovadas, reprovadas) preservando a ordem."""
+    pecas_aprovadas: List[Peca] = []
+    pecas_reprovadas: List[Peca] = []
     
-    # Salva a caixa atual
-    salvar_caixa(sistema['caixa_atual'])
+    for peca in pecas.values():
+        if peca['aprovada']:
+            pecas_aprovadas.append(peca)
+        else:
+            pecas_reprovadas.append(peca)
     
-    # Salva configurações do sistema
-    salvar_config('contador_caixas', str(sistema['contador_caixas']))
+    return pecas_aprovadas, pecas_reprovadas
 
 
-def limpar_banco() -> None:
+def carregar_pecas() -> Tuple[List[Peca], List[Peca]]:
     """
-    Remove todos os dados do banco (útil para testes).
-    Mantém o schema intacto.
+    Carrega todas as peças do banco de dados.
+    
+    Returns:
+        Tupla (pecas_aprovadas, pecas_reprovadas)
     """
     with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM caixas_pecas")
-        cursor.execute("DELETE FROM motivos_reprovacao")
-        cursor.execute("DELETE FROM pecas")
-        cursor.execute("DELETE FROM caixas")
-        cursor.execute("DELETE FROM sistema_config")
+        return _separar_pecas(_carregar_mapa_pecas(conn.cursor()))
 
 
-def remover_banco() -> None:
+class FiltroPecas(TypedDict, total=False):
     """
-    Remove o arquivo do banco de dados completamente.
-    Útil para reset completo do sistema.
+    Filtros de carregar_colunas_pecas (todos opcionais).
+    
+    Attributes:
+        aprovada: Apenas aprovadas (True) ou reprovadas (False)
+        cor: Cor exata da peça
+        codigo_produto: Código do produto
+        desde: Gravadas a partir deste instante ('AAAA-MM-DD HH:MM:SS', UTC)
+        ate: Gravadas até este instante (inclusive), no mesmo formato
+        em_caixa: Apenas peças que estão em alguma caixa
+    """
+    aprovada: bool
+    cor: str
+    codigo_produto: str
+    desde: str
+    ate: str
+    em_caixa: bool
+
+
+def _converter_coluna(valores: Sequence[Any], tipo: Optional[str]) -> Sequence[Any]:
+    """Converte os valores de uma coluna no tipo compacto correspondente."""
+    if tipo is None:
+        return list(valores)
+    if NUMPY_DISPONIVEL:
+        return np.array(valores, dtype=float if tipo == 'd' else bool)
+    if tipo == 'd':
+        return array('d', valores)
+    return [bool(valor) for valor in valores]
+
+
+def validar_colunas_pecas(colunas: Optional[Sequence[str]] = None) -> List[str]:
     """
-    if DB_PATH.exists():
-        DB_PATH.unlink()
+    Valida os campos pedidos a carregar_colunas_pecas().
+    
+    Args:
+        colunas: Campos a carregar, dentre COLUNAS_PECAS (padrão: todos)
+    
+    Returns:
+        Lista dos campos, na ordem pedida
+    
+    Raises:
+        ValueError: Se alguma coluna não existe em COLUNAS_PECAS
+    """
+    colunas = list(colunas) if colunas is not None else list(COLUNAS_PECAS)
+    desconhecidas = [coluna for coluna in colunas if coluna not in COLUNAS_PECAS]
+    if desconhecidas:
+        raise ValueError(f"Colunas desconhecidas: {', '.join(desconhecidas)}")
+    return colunas
+
+
+def montar_colunas_pecas(colunas: Sequence[str], linhas: Iterable[Sequence[Any]]) -> Dict[str, Sequence[Any]]:
+    """
+    Transpõe linhas de peças no formato colunar de carregar_colunas_pecas(),
+    com o tipo compacto de cada coluna.
+    
+    Args:
+        colunas: Campos de cada linha, dentre COLUNAS_PECAS
+        linhas: Valores de cada peça, na ordem de colunas
+    
+    Returns:
+        Dicionário {coluna: valores}, todas com o mesmo comprimento
+    """
+    valores = list(zip(*linhas)) or [()] * len(colunas)
+    return {
+        coluna: _converter_coluna(valores_coluna, COLUNAS_PECAS[coluna][1])
+        for coluna, valores_coluna in zip(colunas, valores)
+    }
+
+
+def carregar_colunas_pecas(
+    colunas: Optional[Sequence[str]] = None,
+    filtros: Optional[FiltroPecas] = None
+) -> Dict[str, Sequence[Any]]:
+    """
+    Carrega peças em formato colunar, com uma única consulta: um array por
+    campo em vez de um dict por peça. Pronto para pd.DataFrame(colunas) e para
+    cálculos vetorizados nas páginas e relatórios analíticos.
+    
+    Peso e comprimento vêm como arrays de float e aprovada como bool (arrays
+    do NumPy quando disponível); os demais campos como listas. A ordem é a de
+    gravação, ou por caixa e posição na caixa com o filtro em_caixa.
+    
+    Com o journal de eventos ativo a tabela pecas não é gravada e o resultado
+    fica vazio; armazenamento.carregar_colunas_pecas() monta as colunas a
+    partir da memória nesse modo.
+    
+    Args:
+        colunas: Campos a carregar, dentre COLUNAS_PECAS (padrão: todos)
+        filtros: Filtros das peças (opcional)
+    
+    Returns:
+        Dicionário {coluna: valores}, todas com o mesmo comprimento
+    
+    Raises:
+        ValueError: Se alguma coluna não existe em COLUNAS_PECAS
+    """
+    colunas = validar_colunas_pecas(colunas)
+    filtros = filtros or FiltroPecas()
+    
+    condicoes: List[str] = []
+    parametros: List[Any] = []
+    for campo, condicao in (
+        ('aprovada', "p.aprovada = ?"),
+        ('cor', "p.cor = ?"),
+        ('codigo_produto', "p.codigo_produto = ?"),
+        ('desde', "p.created_at >= ?"),
+        ('ate', "p.created_at <= ?"),
+    ):
+        if campo in filtros:
+            condicoes.append(condicao)
+            parametros.append(int(filtros[campo]) if campo == 'aprovada' else filtros[campo])
+    
+    por_caixa = bool(filtros.get('em_caixa'))
+    juncao = ""
+    if por_caixa:
+        juncao = "JOIN caixas_pecas cp ON cp.peca_id = p.id"
+    elif 'caixa_id' in colunas:
+        juncao = "LEFT JOIN caixas_pecas cp ON cp.peca_id = p.id"
+    
+    sql = (
+        f"SELECT {', '.join(COLUNAS_PECAS[coluna][0] for coluna in colunas)} FROM pecas p {juncao}"
+        + (f" WHERE {' AND '.join(condicoes)}" if condicoes else "")
+        + (" ORDER BY cp.caixa_id, cp.ordem, p.rowid" if por_caixa else " ORDER BY p.rowid")
+    )
+    
+    aguardar_gravacoes()
+    
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        # Tuplas em vez de sqlite3.Row: as linhas só são transpostas em colunas
+        cursor.row_factory = None
+        cursor.execute(sql, parametros)
+        linhas = cursor.fetchall()
+    
+    return montar_colunas_pecas(colunas, linhas)
+
+
+def carregar_peca(id_peca: str) -> Optional[Peca]:
+    """
+    Carrega uma única peça, com seus motivos de reprovação.
+    
+    Args:
+        id_peca: ID da peça
+    
+    Returns:
+        Peça encontrada, ou None se não existe no banco
+    """
+    aguardar_gravacoes()
+    
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT p.id, p.peso, p.cor, p.comprimento, p.aprovada, p.codigo_reprovacao,
+                   p.codigo_produto, p.limites_id, l.criterios
+            FROM pecas p
+            LEFT JOIN limites_validacao l ON l.id = p.limites_id
+            WHERE p.id = ?
+        """, (id_peca,))
+        linha = cursor.fetchone()
+        if linha is None:
+            return None
+        limites = {}
+        if linha['criterios'] is not None:
+            limites[linha['limites_id']] = compilar_criterios(json.loads(linha['criterios']))
+        
+        cursor.execute(
+            "SELECT motivo FROM motivos_reprovacao WHERE peca_id = ? ORDER BY id", (id_peca,)
+        )
+        motivos = [row['motivo'] for row in cursor.fetchall()]
+        return _montar_peca(tuple(linha)[:8], motivos or None, limites)
+
+
+class FiltroReprovadas(TypedDict, total=False):
+    """
+    Filtros da listagem de peças reprovadas (todos opcionais).
+    
+    Attributes:
+        motivo: Critério reprovado ('peso', 'cor' ou 'comprimento')
+        cor: Cor exata da peça
+        codigo_produto: Código do produto
+        busca_id: Trecho do ID da peça
+    """
+    motivo: str
+    cor: str
+    codigo_produto: str
+    busca_id: str
+
+
+class LinhaReprovada(TypedDict):
+    """
+    Peça reprovada na listagem, com um indicador por critério reprovado.
+    
+    Attributes:
+        posicao: Posição da peça no banco (cursor da paginação)
+        id: ID da peça
+        peso: Peso em gramas
+        cor: Cor da peça
+        comprimento: Comprimento em centímetros
+        codigo_produto: Código do produto, ou None
+        registrada_em: Data e hora (UTC) da gravação (None se a página veio da
+            memória, com o journal ativo)
+        reprovada_peso: True se reprovada pelo peso
+        reprovada_cor: True se reprovada pela cor
+        reprovada_comprimento: True se reprovada pelo comprimento
+    """
+    posicao: int
+    id: str
+    peso: float
+    cor: str
+    comprimento: float
+    codigo_produto: Optional[str]
+    registrada_em: Optional[str]
+    reprovada_peso: bool
+    reprovada_cor: bool
+    reprovada_comprimento: bool
+
+
+class PaginaReprovadas(TypedDict):
+    """
+    Uma página da listagem de peças reprovadas.
+    
+    Attributes:
+        linhas: Peças da página, da mais recente para a mais antiga
+        proxima: Cursor da página seguinte, ou None se esta é a última
+    """
+    linhas: List[LinhaReprovada]
+    proxima: Optional[int]
+
+
+def _expressao_motivo(criterio: str) -> str:
+    """
+    Expressão SQL que indica se a peça p foi reprovada pelo critério: pelo
+    codigo_reprovacao ou, nas peças sem código, pelo texto dos motivos,
+    classificado como nas estatísticas (cada motivo conta para um critério).
+    """
+    bit = MotivoReprovacao[criterio.upper()].value
+    anteriores = CRITERIOS_REPROVACAO[:CRITERIOS_REPROVACAO.index(criterio)]
+    condicoes = [f"m.motivo NOT LIKE '%{anterior}%'" for anterior in anteriores]
+    condicoes.append(f"m.motivo LIKE '%{criterio}%'")
+    return (
+        f"CASE WHEN p.codigo_reprovacao IS NOT NULL "
+        f"THEN (p.codigo_reprovacao & {bit}) != 0 "
+        f"ELSE EXISTS (SELECT 1 FROM motivos_reprovacao m "
+        f"WHERE m.peca_id = p.id AND {' AND '.join(condicoes)}) END"
+    )
+
+
+def _consulta_reprovadas(
+    filtros: FiltroReprovadas,
+    apos: Optional[int],
+    limite: int
+) -> Tuple[str, Tuple[Any, ...]]:
+    """
+    Monta a consulta de uma página de reprovadas (paginação por cursor).
+    
+    Args:
+        filtros: Filtros da listagem
+        apos: Cursor da página (posição da última peça da página anterior)
+        limite: Quantidade de linhas a buscar
+    
+    Returns:
+        Tupla (sql, parâmetros)
+    """
+    if filtros.get('motivo') and filtros['motivo'] not in CRITERIOS_REPROVACAO:
+        raise ValueError(f"Motivo inválido: {filtros['motivo']}")
+    
+    condicoes = ["p.aprovada = 0"]
+    parametros: List[Any] = []
+    if apos is not None:
+        condicoes.append("p.rowid < ?")
+        parametros.append(apos)
+    if filtros.get('motivo'):
+        condicoes.append(_expressao_motivo(filtros['motivo']))
+    if filtros.get('cor'):
+        condicoes.append("p.cor = ?")
+        parametros.append(filtros['cor'])
+    if filtros.get('codigo_produto'):
+        condicoes.append("p.codigo_produto = ?")
+        parametros.append(filtros['codigo_produto'])
+    if filtros.get('busca_id'):
+        condicoes.append("instr(p.id, ?) > 0")
+        parametros.append(filtros['busca_id'])
+    
+    colunas_motivos = ", ".join(
+        f"{_expressao_motivo(criterio)} AS reprovada_{criterio}" for criterio in CRITERIOS_REPROVACAO
+    )
+    sql = f"""
+        SELECT p.rowid AS posicao, p.id, p.peso, p.cor, p.comprimento, p.codigo_produto,
+               p.created_at AS registrada_em, {colunas_motivos}
+        FROM pecas p
+        WHERE {' AND '.join(condicoes)}
+        ORDER BY p.rowid DESC
+        LIMIT ?
+    """
+    parametros.append(limite)
+    return sql, tuple(parametros)
+
+
+def carregar_pagina_reprovadas(
+    filtros: Optional[FiltroReprovadas] = None,
+    apos: Optional[int] = None,
+    limite: int = TAMANHO_PAGINA_REPROVADAS
+) -> PaginaReprovadas:
+    """
+    Carrega uma página de peças reprovadas, da mais recente para a mais antiga.
+    
+    A paginação é por cursor (keyset): cada página continua a partir da
+    posição da última peça da anterior, pelo índice de pecas(aprovada), e o
+    custo não depende de quantas páginas vêm antes nem do total de peças.
+    Os motivos vêm como colunas (reprovada_peso, reprovada_cor,
+    reprovada_comprimento); o texto completo fica em carregar_peca().
+    
+    Com o journal de eventos ativo a tabela pecas não é gravada e a
+    listagem fica vazia: use armazenamento.carregar_pagina_reprovadas, que
+    monta a página a partir da memória nesse modo.
+    
+    Args:
+        filtros: Filtros da listagem (opcional)
+        apos: Cursor retornado em 'proxima' pela página anterior (None: primeira página)
+        limite: Quantidade máxima de peças na página
+    
+    Returns:
+        PaginaReprovadas com as linhas e o cursor da página seguinte
+    
+    Raises:
+        ValueError: Se o filtro de motivo não é um critério conhecido
+    """
+    sql, parametros = _consulta_reprovadas(filtros or FiltroReprovadas(), apos, limite + 1)
+    
+    aguardar_gravacoes()
+    
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql, parametros)
+        linhas = [
+            LinhaReprovada(
+                posicao=row['posicao'],
+                id=row['id'],
+                peso=row['peso'],
+                cor=row['cor'],
+                comprimento=row['comprimento'],
+                codigo_produto=row['codigo_produto'],
+                registrada_em=row['registrada_em'],
+                reprovada_peso=bool(row['reprovada_peso']),
+                reprovada_cor=bool(row['reprovada_cor']),
+                reprovada_comprimento=bool(row['reprovada_comprimento'])
+            )
+            for row in cursor.fetchall()
+        ]
+    
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        return PaginaReprovadas(linhas=linhas, proxima=linhas[-1]['posicao'])
+    return PaginaReprovadas(linhas=linhas, proxima=None)
+
+
+def _salvar_linhas_caixas(cursor: sqlite3.Cursor, caixas: Iterable[Caixa]) -> None:
+    """Insere ou atualiza apenas as linhas das caixas (sem as associações)."""
+    cursor.executemany("""
+        INSERT INTO caixas (id, fechada)
+        VALUES (?, ?)
+        ON CONFLICT(id) DO UPDATE SET fechada = excluded.fechada
+    """, [(caixa['id'], int(caixa['fechada'])) for caixa in caixas])
+
+
+def _salvar_caixas(cursor: sqlite3.Cursor, caixas: Iterable[Caixa]) -> None:
+    """
+    Grava várias caixas e regrava todas as suas associações com peças.
+    
+    Args:
+        cursor: Cursor da transação em andamento
+        caixas: Caixas a serem salvas (IDs repetidos: vale a última ocorrência)
+    """
+    lote = list({caixa['id']: caixa for caixa in caixas}.values())
+    
+    _salvar_linhas_caixas(cursor, lote)
+    
+    # Remove associações antigas
+    cursor.executemany(
+        "DELETE FROM caixas_pecas WHERE caixa_id = ?",
+        [(caixa['id'],) for caixa in lote]
+    )
+    
+    # Insere peças das caixas
+    cursor.executemany("""
+        INSERT INTO caixas_pecas (caixa_id, peca_id, ordem)
+        VALUES (?, ?, ?)
+    """, [
+        (caixa['id'], peca['id'], ordem)
+        for caixa in lote
+        for ordem, peca in enumerate(caixa['pecas'])
+    ])
+
+
+def salvar_caixas_em_lote(caixas: Iterable[Caixa]) -> None:
+    """
+    Salva ou atualiza várias caixas em uma única transação.
+    As peças referenciadas já devem estar salvas.
+    
+    Args:
+        caixas: Caixas a serem salvas
+    """
+    with get_connection() as conn:
+        _salvar_caixas(conn.cursor(), caixas)
+
+
+def salvar_caixa(caixa: Caixa) -> None:
+    """
+    Salva ou atualiza uma caixa no banco de dados.
+    
+    Args:
+        caixa: Caixa a ser salva
+    """
+    salvar_caixas_em_lote([caixa])
+
+
+def _montar_caixas(
+    cursor: sqlite3.Cursor,
+    pecas: Dict[str, Peca]
+) -> Tuple[List[Caixa], Caixa, int]:
+    """
+    Monta as caixas com duas consultas fixas, reutilizando os objetos Peca
+    já carregados em vez de criar cópias.
+    
+    Args:
+        cursor: Cursor da conexão em uso
+        pecas: Peças já carregadas, indexadas por ID
+    
+    Returns:
+        Tupla (caixas_fechadas, caixa_atual, contador_caixas)
+    """
+    cursor.execute("SELECT id, fechada FROM caixas ORDER BY id")
+    caixas = [(id_caixa, bool(fechada)) for id_caixa, fechada in cursor]
+    
+    # Associações de todas as caixas, já na ordem de empacotamento
+    pecas_por_caixa: Dict[int, List[Peca]] = {}
+    cursor.execute("""
+        SELECT caixa_id, peca_id
+        FROM caixas_pecas
+        ORDER BY caixa_id, ordem
+    """)
+    for caixa_id, peca_id in cursor:
+        peca = pecas.get(peca_id)
+        if peca is not None:
+            pecas_por_caixa.setdefault(caixa_id, []).append(peca)
+    
+    caixas_fechadas: List[Caixa] = []
+    caixa_atual: Optional[Caixa] = None
+    contador_caixas = 0
+    
+    for id_caixa, fechada in caixas:
+        # Cria objeto Caixa
+        caixa = criar_caixa(id_caixa)
+        caixa['pecas'] = pecas_por_caixa.get(id_caixa, [])
+        caixa['fechada'] = fechada
+        
+        # Adiciona na lista apropriada
+        if caixa['fechada']:
+            caixas_fechadas.append(caixa)
+        else:
+            caixa_atual = caixa
+        
+        # Atualiza contador
+        if id_caixa > contador_caixas:
+            contador_caixas = id_caixa
+    
+    # Se não há caixa atual, cria uma nova
+    if caixa_atual is None:
+        contador_caixas += 1
+        caixa_atual = criar_caixa(contador_caixas)
+    
+    return caixas_fechadas, caixa_atual, contador_caixas
+
+
+def carregar_caixas() -> Tuple[List[Caixa], Caixa, int]:
+    """
+    Carrega todas as caixas do banco de dados.
+    
+    Returns:
+        Tupla (caixas_fechadas, caixa_atual, contador_caixas)
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        return _montar_caixas(cursor, _carregar_mapa_pecas(cursor))
+
+
+def _salvar_config(cursor: sqlite3.Cursor, chave: str, valor: str) -> None:
+    """Grava uma configuração usando o cursor informado."""
+    cursor.execute("""
+        INSERT OR REPLACE INTO sistema_config (chave, valor)
+        VALUES (?, ?)
+    """, (chave, valor))
+
+
+def salvar_config(chave: str, valor: str) -> None:
+    """
+    Salva uma configuração do sistema.
+    
+    Args:
+        chave: Nome da configuração
+        valor: Valor da configuração
+    """
+    with get_connection() as conn:
+        _salvar_config(conn.cursor(), chave, valor)
+
+
+def carregar_config(chave: str, default: str = "") -> str:
+    """
+    Carrega uma configuração do sistema.
+    
+    Args:
+        chave: Nome da configuração
+        default: Valor padrão se não existir
+    
+    Returns:
+        Valor da configuração
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT valor FROM sistema_config WHERE chave = ?",
+            (chave,)
+        )
+        row = cursor.fetchone()
+        return row['valor'] if row else default
+
+
+def salvar_perfil_produto(codigo: str, perfil: Dict[str, Any]) -> None:
+    """
+    Salva (ou substitui) o perfil de tolerâncias de um produto.
+    
+    Args:
+        codigo: Código do produto
+        perfil: Critérios do produto (campos de CAMPOS_PERFIL; ausentes herdam os gerais)
+    """
+    cores = perfil.get('cores_aceitas')
+    with get_connection() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO perfis_produto
+                (codigo, peso_minimo, peso_maximo, cores_aceitas, comprimento_minimo, comprimento_maximo)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (
+            codigo,
+            perfil.get('peso_minimo'),
+            perfil.get('peso_maximo'),
+            json.dumps(cores) if cores is not None else None,
+            perfil.get('comprimento_minimo'),
+            perfil.get('comprimento_maximo')
+        ))
+
+
+def carregar_perfis_produto() -> Dict[str, Dict[str, Any]]:
+    """
+    Carrega os perfis de tolerâncias de todos os produtos.
+    
+    Returns:
+        Dicionário {codigo: critérios definidos no perfil}, ordenado pelo código
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT codigo, {', '.join(CAMPOS_PERFIL)} FROM perfis_produto ORDER BY codigo")
+        perfis: Dict[str, Dict[str, Any]] = {}
+        for linha in cursor.fetchall():
+            perfil = {campo: linha[campo] for campo in CAMPOS_PERFIL if linha[campo] is not None}
+            if 'cores_aceitas' in perfil:
+                perfil['cores_aceitas'] = json.loads(perfil['cores_aceitas'])
+            perfis[linha['codigo']] = perfil
+        return perfis
+
+
+def deletar_perfil_produto(codigo: str) -> bool:
+    """
+    Remove o perfil de tolerâncias de um produto.
+    
+    Args:
+        codigo: Código do produto
+    
+    Returns:
+        True se o perfil existia
+    """
+    with get_connection() as conn:
+        cursor = conn.execute("DELETE FROM perfis_produto WHERE codigo = ?", (codigo,))
+        return cursor.rowcount > 0
+
+
+def carregar_sistema_completo():
+    """
+    Carrega o sistema completo do banco de dados.
+    
+    Usa um número fixo de consultas (peças, motivos, caixas, associações e
+    estatísticas), independentemente da quantidade de peças, e monta tudo
+    em uma passada.
+    Uma peça aprovada é o mesmo objeto em pecas_aprovadas e na sua caixa.
+    As estatísticas gravadas são reaproveitadas se conferirem com os dados.
+    
+    Returns:
+        SistemaArmazenamento completo com todas as peças, caixas e configurações
+    """
+    # Import local para evitar circular import
+    from services.armazenamento import SistemaArmazenamento
+    
+    # Garante que gravações em segundo plano já estejam no banco
+    aguardar_gravacoes()
+    
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Carrega peças
+        pecas = _carregar_mapa_pecas(cursor)
+        pecas_aprovadas, pecas_reprovadas = _separar_pecas(pecas)
+        
+        # Carrega caixas
+        caixas_fechadas, caixa_atual, contador_caixas = _montar_caixas(cursor, pecas)
+        
+        # Carrega o agregado de estatísticas
+        agregado = _carregar_agregado(cursor)
+    
+    # Reconstrói o SistemaArmazenamento
+    sistema = SistemaArmazenamento(
+        pecas_aprovadas=ListaPecas(pecas_aprovadas),
+        pecas_reprovadas=ListaPecas(pecas_reprovadas),
+        caixas_fechadas=caixas_fechadas,
+        caixa_atual=caixa_atual,
+        contador_caixas=contador_caixas
+    )
+    if agregado is not None and estatisticas.estatisticas_conferem(agregado, sistema):
+        sistema['estatisticas'] = agregado
+        sistema['estatisticas_gravadas'] = agregado
+    
+    return sistema
+
+
+def _carregar_agregado(cursor: sqlite3.Cursor) -> Optional[estatisticas.EstatisticasSistema]:
+    """
+    Carrega o agregado de estatísticas gravado, se ainda corresponder às
+    tabelas: o seq de registro_alteracoes gravado com ele precisa ser o
+    atual, ou seja, nenhuma peça ou caixa mudou sem que ele fosse regravado.
+    
+    Args:
+        cursor: Cursor da conexão em uso
+    
+    Returns:
+        EstatisticasSistema, ou None se ausente, inválido ou desatualizado
+    """
+    cursor.execute("""
+        SELECT chave, valor,
+               (SELECT seq FROM sqlite_sequence WHERE name = 'registro_alteracoes') AS seq_atual
+        FROM sistema_config
+        WHERE chave IN (?, ?) OR chave LIKE ?
+    """, (
+        estatisticas.CHAVE_CONFIG_ESTATISTICAS,
+        estatisticas.CHAVE_CONFIG_SEQUENCIA,
+        estatisticas.PREFIXO_CONFIG_PRODUTO + '%'
+    ))
+    linhas = cursor.fetchall()
+    partes = {row['chave']: row['valor'] for row in linhas}
+    sequencia = partes.pop(estatisticas.CHAVE_CONFIG_SEQUENCIA, None)
+    if not linhas or sequencia != str(linhas[0]['seq_atual'] or 0):
+        return None
+    return estatisticas.desserializar_partes(partes)
+
+
+def carregar_estatisticas_gravadas() -> Optional[estatisticas.EstatisticasSistema]:
+    """
+    Carrega o agregado de estatísticas gravado em sistema_config.
+    
+    Returns:
+        EstatisticasSistema, ou None se ausente, inválido ou desatualizado
+            em relação às tabelas
+    """
+    aguardar_gravacoes()
+    
+    with get_connection() as conn:
+        return _carregar_agregado(conn.cursor())
+
+
+def _salvar_partes_estatisticas(
+    cursor: sqlite3.Cursor,
+    partes: Dict[str, Optional[str]],
+    completo: bool
+) -> None:
+    """
+    Grava partes do agregado (ver estatisticas.serializar_partes) e o seq
+    atual de registro_alteracoes, que valida o agregado na carga. Deve ser
+    chamada depois de gravar as peças e caixas da mesma transação.
+    
+    Args:
+        cursor: Cursor da transação em andamento
+        partes: Dicionário {chave: JSON, ou None para remover}
+        completo: True se as partes trazem todos os produtos (os gravados
+            que não estiverem nelas são removidos)
+    """
+    if completo:
+        cursor.execute(
+            "DELETE FROM sistema_config WHERE chave LIKE ?",
+            (estatisticas.PREFIXO_CONFIG_PRODUTO + '%',)
+        )
+    cursor.executemany("""
+        INSERT OR REPLACE INTO sistema_config (chave, valor)
+        VALUES (?, ?)
+    """, [(chave, valor) for chave, valor in partes.items() if valor is not None])
+    cursor.executemany(
+        "DELETE FROM sistema_config WHERE chave = ?",
+        [(chave,) for chave, valor in partes.items() if valor is None]
+    )
+    _salvar_config(
+        cursor, estatisticas.CHAVE_CONFIG_SEQUENCIA, str(_ultima_sequencia(cursor, 'registro_alteracoes'))
+    )
+
+
+def agregar_estatisticas() -> Tuple[estatisticas.EstatisticasSistema, int]:
+    """
+    Calcula as estatísticas dos relatórios direto no SQLite, com COUNT e
+    GROUP BY, sem carregar as peças em memória.
+    
+    As reprovações por critério seguem a mesma regra do agregado em memória:
+    bits do codigo_reprovacao e, só para peças sem código, o texto dos
+    motivos ('peso', senão 'cor', senão 'comprimento'). As medidas de SPC
+    são calculadas em duas passadas (média e extremos, depois desvios) e os
+    histogramas com GROUP BY da classe de cada valor.
+    
+    Returns:
+        Tupla (estatisticas, pecas_caixa_atual)
+    """
+    # Garante que gravações em segundo plano já estejam no banco
+    aguardar_gravacoes()
+    
+    agregado = estatisticas.criar_estatisticas()
+    
+    def contagem_produto(produto: Optional[str]) -> estatisticas.ContagemProduto:
+        chave = produto or estatisticas.SEM_CODIGO_PRODUTO
+        return agregado['produtos'].setdefault(chave, estatisticas.ContagemProduto(
+            aprovadas=0, reprovadas=0, reprovacoes={criterio: 0 for criterio in estatisticas.CRITERIOS}
+        ))
+    
+    def somar_reprovacoes(produto: Optional[str], criterio: str, quantidade: int) -> None:
+        agregado['reprovacoes'][criterio] += quantidade
+        contagem_produto(produto)['reprovacoes'][criterio] += quantidade
+    
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Totais e bits de reprovação por produto e status
+        cursor.execute("""
+            SELECT codigo_produto, aprovada, COUNT(*) AS total,
+                   COALESCE(SUM((codigo_reprovacao & 1) != 0), 0) AS peso,
+                   COALESCE(SUM((codigo_reprovacao & 2) != 0), 0) AS cor,
+                   COALESCE(SUM((codigo_reprovacao & 4) != 0), 0) AS comprimento
+            FROM pecas
+            GROUP BY codigo_produto, aprovada
+        """)
+        for row in cursor.fetchall():
+            contagem = contagem_produto(row['codigo_produto'])
+            if row['aprovada']:
+                agregado['aprovadas'] += row['total']
+                contagem['aprovadas'] += row['total']
+                continue
+            agregado['reprovadas'] += row['total']
+            contagem['reprovadas'] += row['total']
+            for criterio in estatisticas.CRITERIOS:
+                somar_reprovacoes(row['codigo_produto'], criterio, row[criterio])
+        
+        # Peças sem código: classifica cada motivo pelo texto
+        cursor.execute("""
+            SELECT p.codigo_produto,
+                   CASE
+                       WHEN m.motivo LIKE '%peso%' THEN 'peso'
+                       WHEN m.motivo LIKE '%cor%' THEN 'cor'
+                       WHEN m.motivo LIKE '%comprimento%' THEN 'comprimento'
+                   END AS criterio,
+                   COUNT(*) AS quantidade
+            FROM motivos_reprovacao m
+            JOIN pecas p ON p.id = m.peca_id
+            WHERE p.aprovada = 0 AND p.codigo_reprovacao IS NULL
+            GROUP BY p.codigo_produto, criterio
+        """)
+        for row in cursor.fetchall():
+            if row['criterio'] is not None:
+                somar_reprovacoes(row['codigo_produto'], row['criterio'], row['quantidade'])
+        
+        # SPC: média e extremos, depois soma dos quadrados dos desvios
+        for nome in spc.MEDIDAS_SPC:
+            cursor.execute(f"SELECT COUNT(*), AVG({nome}), MIN({nome}), MAX({nome}) FROM pecas")
+            n, media, minimo, maximo = cursor.fetchone()
+            if not n:
+                continue
+            cursor.execute(f"""
+                SELECT SUM(({nome} - ?) * ({nome} - ?)),
+                       SUM({nome} = ?),
+                       SUM({nome} = ?)
+                FROM pecas
+            """, (media, media, minimo, maximo))
+            m2, n_minimo, n_maximo = cursor.fetchone()
+            agregado['spc'][nome] = spc.MedidaSPC(
+                n=n, media=media, m2=m2, minimo=minimo, maximo=maximo,
+                n_minimo=n_minimo, n_maximo=n_maximo, extremos_exatos=True
+            )
+            
+            # Histograma: piso de ROUND(valor * classes, 6), como em distribuicao.indice_classe
+            cursor.execute(f"""
+                SELECT CAST(escala AS INTEGER) - (escala < CAST(escala AS INTEGER)) AS classe,
+                       COUNT(*) AS quantidade
+                FROM (SELECT ROUND({nome} * ?, 6) AS escala FROM pecas)
+                GROUP BY classe
+            """, (distribuicao.CLASSES_POR_UNIDADE,))
+            histograma = agregado['distribuicao'][nome]
+            for row in cursor.fetchall():
+                distribuicao.contar_classe(histograma, row['classe'], row['quantidade'])
+        
+        # Caixas: fechadas e peças da caixa em preenchimento (a aberta de maior ID)
+        cursor.execute("SELECT COUNT(*) FROM caixas WHERE fechada = 1")
+        agregado['caixas_fechadas'] = cursor.fetchone()[0]
+        cursor.execute("""
+            SELECT COUNT(*)
+            FROM caixas_pecas cp
+            JOIN pecas p ON p.id = cp.peca_id
+            WHERE cp.caixa_id = (SELECT MAX(id) FROM caixas WHERE fechada = 0)
+        """)
+        pecas_caixa_atual = cursor.fetchone()[0]
+    
+    return agregado, pecas_caixa_atual
+
+
+def sincronizar_sistema(sistema) -> None:
+    """
+    Sincroniza o estado completo do sistema com o banco de dados.
+    Salva todas as peças, caixas e configurações em uma única transação
+    e descarta as alterações pendentes, que ficam cobertas pela sincronização.
+    
+    Args:
+        sistema: Sistema a ser sincronizado (SistemaArmazenamento)
+    """
+    todas_pecas = list(sistema['pecas_aprovadas']) + list(sistema['pecas_reprovadas'])
+    ids_sistema = {peca['id'] for peca in todas_pecas}
+    
+    # Lotes ainda na fila não podem ser gravados depois do estado completo
+    aguardar_gravacoes()
+    
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        
+        _salvar_pecas(cursor, todas_pecas)
+        
+        # Remove peças do banco que não estão mais no sistema
+        cursor.execute("SELECT id FROM pecas")
+        ids_banco = {row['id'] for row in cursor.fetchall()}
+        _deletar_pecas(cursor, ids_banco - ids_sistema)
+        
+        # Salva todas as caixas fechadas e a caixa atual
+        _salvar_caixas(cursor, list(sistema['caixas_fechadas']) + [sistema['caixa_atual']])
+        
+        # Salva configurações do sistema
+        _salvar_config(cursor, 'contador_caixas', str(sistema['contador_caixas']))
+        agregado = estatisticas.obter_estatisticas(sistema)
+        _salvar_partes_estatisticas(cursor, estatisticas.serializar_partes(agregado), True)
+        
+        # Alertas pendentes não fazem parte do estado e seriam perdidos
+        alteracoes = sistema.get('alteracoes')
+        if alteracoes:
+            _inserir_alertas(cursor, _linhas_alertas(alteracoes.get('alertas', [])))
+    
+    sistema.pop('alteracoes', None)
+    sistema['estatisticas_gravadas'] = agregado
+
+
+def carregar_rollups_horas(inicio: str, fim: str) -> List[Dict[str, Any]]:
+    """
+    Carrega os rollups por hora de um intervalo.
+    
+    Args:
+        inicio: Primeira hora, no formato 'AAAA-MM-DD HH:00' (hora local)
+        fim: Última hora (inclusive), no mesmo formato
+    
+    Returns:
+        Linhas de rollup_horas (hora e COLUNAS_ROLLUP) em ordem cronológica
+    """
+    aguardar_gravacoes()
+    
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT * FROM rollup_horas WHERE hora BETWEEN ? AND ? ORDER BY hora",
+            (inicio, fim)
+        )
+        return [dict(row) for row in cursor.fetchall()]
+
+
+def carregar_rollups_turnos(inicio: str, fim: str) -> List[Dict[str, Any]]:
+    """
+    Carrega os rollups por turno de um intervalo de dias.
+    
+    Args:
+        inicio: Primeiro dia, no formato 'AAAA-MM-DD'
+        fim: Último dia (inclusive), no mesmo formato
+    
+    Returns:
+        Linhas de rollup_turnos (dia, turno e COLUNAS_ROLLUP) em ordem cronológica
+    """
+    aguardar_gravacoes()
+    
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT * FROM rollup_turnos WHERE dia BETWEEN ? AND ? ORDER BY dia, turno",
+            (inicio, fim)
+        )
+        return [dict(row) for row in cursor.fetchall()]
+
+
+def _linhas_alertas(
+    alertas: Iterable[controle.AlertaControle]
+) -> List[Tuple[str, str, str, float, str]]:
+    """Converte alertas de controle em linhas da tabela alertas_controle."""
+    return [
+        (alerta['medida'], alerta['regra'], alerta['peca_id'], alerta['valor'], alerta['descricao'])
+        for alerta in alertas
+    ]
+
+
+def _inserir_alertas(cursor: sqlite3.Cursor, linhas: List[Tuple[str, str, str, float, str]]) -> None:
+    """Insere linhas de alertas usando o cursor informado."""
+    cursor.executemany("""
+        INSERT INTO alertas_controle (medida, regra, peca_id, valor, descricao)
+        VALUES (?, ?, ?, ?, ?)
+    """, linhas)
+
+
+def salvar_alertas(
+    alertas: Iterable[controle.AlertaControle],
+    cursor: Optional[sqlite3.Cursor] = None
+) -> None:
+    """
+    Grava alertas de controle em uma única transação.
+    
+    Args:
+        alertas: Alertas a gravar
+        cursor: Cursor de uma transação em andamento; sem ele, abre uma nova
+    """
+    linhas = _linhas_alertas(alertas)
+    if not linhas:
+        return
+    
+    if cursor is not None:
+        _inserir_alertas(cursor, linhas)
+        return
+    
+    with get_connection() as conn:
+        _inserir_alertas(conn.cursor(), linhas)
+
+
+def carregar_alertas(limite: int = 20) -> List[controle.AlertaRegistrado]:
+    """
+    Carrega os alertas de controle mais recentes.
+    
+    Args:
+        limite: Quantidade máxima de alertas
+    
+    Returns:
+        Lista de AlertaRegistrado, do mais recente para o mais antigo
+    """
+    aguardar_gravacoes()
+    
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT medida, regra, peca_id, valor, descricao, created_at
+            FROM alertas_controle
+            ORDER BY id DESC
+            LIMIT ?
+        """, (limite,))
+        return [
+            controle.AlertaRegistrado(
+                medida=row['medida'],
+                regra=row['regra'],
+                peca_id=row['peca_id'],
+                valor=row['valor'],
+                descricao=row['descricao'],
+                registrado_em=row['created_at']
+            )
+            for row in cursor.fetchall()
+        ]
+
+
+class AlteracaoRegistrada(TypedDict):
+    """
+    Alteração lida de registro_alteracoes.
+    
+    Attributes:
+        seq: Número sequencial da alteração
+        tipo: 'peca_registrada', 'peca_removida' ou 'caixa_fechada'
+        chave: ID da peça ou da caixa
+        peca: Estado atual da peça registrada (None nos demais tipos, ou se
+            a peça já foi removida)
+    """
+    seq: int
+    tipo: str
+    chave: str
+    peca: Optional[Peca]
+
+
+def ultima_sequencia(tabela: str) -> int:
+    """
+    Retorna o último número sequencial atribuído em uma tabela AUTOINCREMENT
+    (registro_alteracoes ou eventos). Consulta de custo constante, que muda a
+    cada gravação e não volta atrás quando linhas são removidas.
+    
+    Args:
+        tabela: Nome da tabela
+    
+    Returns:
+        Último seq atribuído (0 se nenhum)
+    """
+    with get_connection() as conn:
+        return _ultima_sequencia(conn.cursor(), tabela)
+
+
+def _ultima_sequencia(cursor: sqlite3.Cursor, tabela: str) -> int:
+    """Retorna o último seq de uma tabela AUTOINCREMENT usando o cursor informado."""
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (tabela,))
+    linha = cursor.fetchone()
+    return linha['seq'] if linha else 0
+
+
+def carregar_alteracoes(desde: int) -> List[AlteracaoRegistrada]:
+    """
+    Carrega as alterações registradas depois de um número sequencial, com o
+    estado atual das peças registradas, em número fixo de consultas.
+    
+    Args:
+        desde: Retorna apenas alterações com seq maior que este valor
+    
+    Returns:
+        Lista de AlteracaoRegistrada em ordem de gravação
+    """
+    aguardar_gravacoes()
+    
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT peca_id, motivo FROM motivos_reprovacao
+            WHERE peca_id IN (
+                SELECT chave FROM registro_alteracoes WHERE seq > ? AND tipo = 'peca_registrada'
+            )
+            ORDER BY id
+        """, (desde,))
+        motivos: Dict[str, List[str]] = {}
+        for peca_id, motivo in cursor:
+            motivos.setdefault(peca_id, []).append(motivo)
+        limites = _mapear_limites(cursor)
+        
+        cursor.execute("""
+            SELECT r.seq, r.tipo, r.chave,
+                   p.id, p.peso, p.cor, p.comprimento, p.aprovada, p.codigo_reprovacao, p.codigo_produto,
+                   p.limites_id
+            FROM registro_alteracoes r
+            LEFT JOIN pecas p ON r.tipo = 'peca_registrada' AND p.id = r.chave
+            WHERE r.seq > ?
+            ORDER BY r.seq
+        """, (desde,))
+        alteracoes = []
+        for row in cursor.fetchall():
+            linha = tuple(row)
+            peca = _montar_peca(linha[3:], motivos.get(row['chave']), limites) if row['id'] is not None else None
+            alteracoes.append(AlteracaoRegistrada(
+                seq=row['seq'], tipo=row['tipo'], chave=row['chave'], peca=peca
+            ))
+        return alteracoes
+
+
+class LoteGravacao(TypedDict):
+    """
+    Cópia, em linhas prontas para o banco, de um conjunto de alterações.
+    
+    Por não referenciar os objetos Peca/Caixa do sistema, pode ser gravado
+    por outra thread enquanto o sistema continua sendo modificado.
+    
+    Attributes:
+        ids_removidos: IDs das peças removidas
+        linhas_pecas: Linhas (id, peso, cor, comprimento, aprovada, codigo, produto, limites) a gravar
+        linhas_motivos: Linhas (peca_id, motivo) das peças gravadas
+        linhas_caixas: Linhas (id, fechada) das caixas alteradas
+        associacoes_novas: Linhas (caixa_id, peca_id, ordem) a inserir
+        associacoes_reordenadas: Linhas (ordem, caixa_id, peca_id) a atualizar
+        contador_caixas: Novo valor do contador, ou None se não mudou
+        estatisticas: Partes alteradas do agregado de estatísticas, já serializadas
+        estatisticas_completas: True se estatisticas traz todos os produtos
+        linhas_alertas: Linhas (medida, regra, peca_id, valor, descricao) dos alertas de controle
+    """
+    ids_removidos: List[str]
+    linhas_pecas: List[LinhaGravacaoPeca]
+    linhas_motivos: List[Tuple[str, str]]
+    linhas_caixas: List[Tuple[int, int]]
+    associacoes_novas: List[Tuple[int, str, int]]
+    associacoes_reordenadas: List[Tuple[int, int, str]]
+    contador_caixas: Optional[int]
+    estatisticas: Dict[str, Optional[str]]
+    estatisticas_completas: bool
+    linhas_alertas: List[Tuple[str, str, str, float, str]]
+
+
+def _preparar_lote(
+    alteracoes,
+    contador_caixas: int,
+    agregado: Dict[str, Optional[str]],
+    agregado_completo: bool
+) -> LoteGravacao:
+    """
+    Converte alterações pendentes em um LoteGravacao independente do sistema.
+    
+    Args:
+        alteracoes: AlteracoesPendentes do sistema
+        contador_caixas: Valor atual do contador de caixas
+        agregado: Partes das estatísticas já serializadas
+        agregado_completo: True se agregado traz todos os produtos
+    
+    Returns:
+        LoteGravacao com as linhas a gravar
+    """
+    pecas_salvas = alteracoes['pecas_salvas']
+    caixas_salvas = alteracoes['caixas_salvas'].values()
+    linhas_pecas, linhas_motivos = _linhas_pecas(pecas_salvas.values())
+    
+    # Peças novas ganham associação; as demais só têm a ordem ajustada
+    associacoes_novas = []
+    associacoes_reordenadas = []
+    for caixa in caixas_salvas:
+        for ordem, peca in enumerate(caixa['pecas']):
+            if peca['id'] in pecas_salvas:
+                associacoes_novas.append((caixa['id'], peca['id'], ordem))
+            else:
+                associacoes_reordenadas.append((ordem, caixa['id'], peca['id']))
+    
+    return LoteGravacao(
+        ids_removidos=list(alteracoes['pecas_removidas']),
+        linhas_pecas=linhas_pecas,
+        linhas_motivos=linhas_motivos,
+        linhas_caixas=[(caixa['id'], int(caixa['fechada'])) for caixa in caixas_salvas],
+        associacoes_novas=associacoes_novas,
+        associacoes_reordenadas=associacoes_reordenadas,
+        contador_caixas=contador_caixas if alteracoes['contador_alterado'] else None,
+        estatisticas=agregado,
+        estatisticas_completas=agregado_completo,
+        linhas_alertas=_linhas_alertas(alteracoes.get('alertas', []))
+    )
+
+
+def _aplicar_lote(cursor: sqlite3.Cursor, lote: LoteGravacao) -> None:
+    """
+    Grava um LoteGravacao usando o cursor informado.
+    
+    Args:
+        cursor: Cursor da transação em andamento
+        lote: Lote a ser gravado
+    """
+    _deletar_pecas(cursor, lote['ids_removidos'])
+    _gravar_linhas_pecas(cursor, lote['linhas_pecas'], lote['linhas_motivos'])
+    
+    cursor.executemany("""
+        INSERT INTO caixas (id, fechada)
+        VALUES (?, ?)
+        ON CONFLICT(id) DO UPDATE SET fechada = excluded.fechada
+    """, lote['linhas_caixas'])
+    cursor.executemany("""
+        INSERT INTO caixas_pecas (caixa_id, peca_id, ordem)
+        VALUES (?, ?, ?)
+        ON CONFLICT(caixa_id, peca_id) DO UPDATE SET ordem = excluded.ordem
+    """, lote['associacoes_novas'])
+    cursor.executemany("""
+        UPDATE caixas_pecas SET ordem = ?
+        WHERE caixa_id = ? AND peca_id = ?
+    """, lote['associacoes_reordenadas'])
+    
+    if lote['contador_caixas'] is not None:
+        _salvar_config(cursor, 'contador_caixas', str(lote['contador_caixas']))
+    _salvar_partes_estatisticas(cursor, lote['estatisticas'], lote['estatisticas_completas'])
+    _inserir_alertas(cursor, lote['linhas_alertas'])
+
+
+def persistir_alteracoes(sistema) -> None:
+    """
+    Persiste somente as alterações pendentes do sistema (inclusões, remoções
+    e caixas modificadas) em uma única transação. Do agregado de estatísticas
+    são regravados os totais gerais e os dos produtos alterados.
+    
+    O custo depende apenas do tamanho do delta: cada caixa alterada regrava
+    no máximo CAPACIDADE_MAXIMA_CAIXA associações, independentemente do
+    total de peças já cadastradas. Com a gravação assíncrona ativa, o lote é
+    apenas enfileirado e gravado em segundo plano.
+    
+    Args:
+        sistema: Sistema com alterações pendentes (SistemaArmazenamento)
+    
+    Raises:
+        sqlite3.Error: Se a gravação falhar; as alterações continuam pendentes
+    """
+    alteracoes = sistema.get('alteracoes')
+    if not alteracoes:
+        return
+    
+    # Com o agregado gravado por inteiro, basta regravar os produtos alterados
+    agregado = estatisticas.obter_estatisticas(sistema)
+    completo = sistema.get('estatisticas_gravadas') is not agregado
+    lote = _preparar_lote(
+        alteracoes,
+        sistema['contador_caixas'],
+        estatisticas.serializar_partes(agregado, None if completo else alteracoes['produtos_alterados']),
+        completo
+    )
+    agendar_gravacao(lambda cursor: _aplicar_lote(cursor, lote))
+    
+    del sistema['alteracoes']
+    sistema['estatisticas_gravadas'] = agregado
+
+
+# Gravação agendada: recebe o cursor da transação e grava dados já copiados
+Gravacao = Callable[[sqlite3.Cursor], None]
+
+# Espera (s) antes de repetir gravações que falharam em segundo plano
+INTERVALO_REPETICAO = 1.0
+
+
+def agendar_gravacao(gravacao: Gravacao) -> None:
+    """
+    Executa uma gravação em uma transação ou, com a gravação assíncrona
+    ativa, a enfileira para a thread de gravação.
+    
+    A gravação não deve referenciar objetos que o sistema continua
+    alterando: o que ela grava precisa ser copiado antes de agendá-la.
+    
+    Args:
+        gravacao: Função que grava usando o cursor recebido
+    
+    Raises:
+        sqlite3.Error: Se a gravação síncrona falhar, ou se uma gravação
+            anterior falhou em segundo plano (a nova não é enfileirada e a
+            anterior será repetida)
+    """
+    if _gravador is not None:
+        _gravador.enfileirar(gravacao)
+        return
+    
+    with get_connection() as conn:
+        gravacao(conn.cursor())
+
+
+class _GravadorAssincrono:
+    """
+    Thread de gravação em segundo plano (write-behind).
+    
+    Consome gravações de uma fila limitada e executa várias por transação,
+    até max_lotes por commit ou intervalo segundos após a primeira.
+    Com a fila cheia, enfileirar() bloqueia, limitando a memória usada.
+    
+    Gravações que falham não são descartadas: ficam pendentes, na ordem, e
+    são repetidas antes das seguintes. O erro é relançado a quem agendar a
+    próxima gravação ou aguardar a fila.
+    """
+    
+    _PARAR = None
+    _REPETIR = object()
+    
+    def __init__(self, max_lotes: int, intervalo: float, tamanho_fila: int) -> None:
+        self.max_lotes = max_lotes
+        self.intervalo = intervalo
+        self.fila: "queue.Queue[Any]" = queue.Queue(maxsize=tamanho_fila)
+        self.erro: Optional[BaseException] = None
+        self._pendentes: List[Gravacao] = []
+        self.thread = threading.Thread(
+            target=self._executar,
+            name="gravador-assincrono",
+            daemon=True
+        )
+        self.thread.start()
+    
+    def _relancar_erro(self) -> None:
+        if self.erro is not None:
+            erro, self.erro = self.erro, None
+            raise erro
+    
+    def enfileirar(self, gravacao: Gravacao) -> None:
+        """Enfileira uma gravação (bloqueia se a fila estiver cheia)."""
+        self._relancar_erro()
+        self.fila.put(gravacao)
+    
+    def aguardar(self) -> None:
+        """Bloqueia até todas as gravações enfileiradas, e as pendentes, serem feitas."""
+        self.fila.join()
+        if self.erro is None and self._pendentes:
+            self.fila.put(self._REPETIR)
+            self.fila.join()
+        self._relancar_erro()
+    
+    def parar(self) -> None:
+        """Grava o que estiver pendente e encerra a thread."""
+        self.fila.put(self._PARAR)
+        self.thread.join()
+    
+    def _gravar(self, gravacoes: List[Gravacao]) -> None:
+        """Grava em uma transação; se falhar, uma a uma, parando na primeira falha."""
+        try:
+            with get_connection() as conn:
+                cursor = conn.cursor()
+                for gravacao in gravacoes:
+                    gravacao(cursor)
+            return
+        except Exception as e:
+            if len(gravacoes) == 1:
+                self._falhou(gravacoes, e)
+                return
+        
+        for posicao, gravacao in enumerate(gravacoes):
+            try:
+                with get_connection() as conn:
+                    gravacao(conn.cursor())
+            except Exception as e:
+                self._falhou(gravacoes[posicao:], e)
+                return
+    
+    def _falhou(self, gravacoes: List[Gravacao], erro: Exception) -> None:
+        logger.error(
+            "Falha ao gravar em segundo plano; %d gravação(ões) mantida(s) para nova tentativa: %s",
+            len(gravacoes), erro, exc_info=True
+        )
+        self._pendentes = gravacoes
+        self.erro = erro
+    
+    def _executar(self) -> None:
+        parar = False
+        while not parar:
+            # Com gravações pendentes, acorda periodicamente para repeti-las
+            recebidos = 0
+            gravacoes: List[Gravacao] = []
+            try:
+                primeiro = self.fila.get(timeout=INTERVALO_REPETICAO if self._pendentes else None)
+                recebidos = 1
+            except queue.Empty:
+                primeiro = self._REPETIR
+            
+            if primeiro is self._PARAR:
+                parar = True
+            elif primeiro is not self._REPETIR:
+                gravacoes.append(primeiro)
+                
+                # Agrupa gravações até o limite de quantidade ou de tempo
+                limite = time.monotonic() + self.intervalo
+                while len(gravacoes) < self.max_lotes:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        break
+                    try:
+                        gravacao = self.fila.get(timeout=restante)
+                    except queue.Empty:
+                        break
+                    recebidos += 1
+                    if gravacao is self._PARAR:
+                        parar = True
+                        break
+                    if gravacao is not self._REPETIR:
+                        gravacoes.append(gravacao)
+            
+            # As que falharam antes vão primeiro, para manter a ordem
+            gravacoes = self._pendentes + gravacoes
+            self._pendentes = []
+            try:
+                if gravacoes:
+                    self._gravar(gravacoes)
+            finally:
+                for _ in range(recebidos):
+                    self.fila.task_done()
+        
+        if self._pendentes:
+            logger.error(
+                "Gravação em segundo plano encerrada com %d gravação(ões) não gravada(s)",
+                len(self._pendentes)
+            )
+        _fechar_conexao_local()
+
+
+# Gravador ativo (None = gravação síncrona)
+_gravador: Optional[_GravadorAssincrono] = None
+
+
+def ativar_gravacao_assincrona(
+    max_lotes: int = 200,
+    intervalo: float = 0.2,
+    tamanho_fila: int = 10000
+) -> None:
+    """
+    Ativa a gravação em segundo plano: persistir_alteracoes passa a apenas
+    enfileirar as alterações, e uma thread as grava em grupos.
+    
+    Args:
+        max_lotes: Máximo de lotes gravados por transação
+        intervalo: Tempo máximo (s) que um lote aguarda para ser agrupado
+        tamanho_fila: Capacidade da fila; acima dela o cadastro aguarda a gravação
+    """
+    global _gravador
+    if _gravador is None:
+        _gravador = _GravadorAssincrono(max_lotes, intervalo, tamanho_fila)
+        atexit.register(encerrar_gravacao_assincrona)
+
+
+def gravacao_assincrona_ativa() -> bool:
+    """
+    Verifica se a gravação em segundo plano está ativa.
+    
+    Returns:
+        True se persistir_alteracoes estiver enfileirando as alterações
+    """
+    return _gravador is not None
+
+
+def aguardar_gravacoes() -> None:
+    """
+    Bloqueia até todas as alterações enfileiradas estarem gravadas (flush),
+    repetindo antes as que falharam. Sem gravação assíncrona ativa, retorna
+    imediatamente.
+    
+    Raises:
+        Exception: A última falha ocorrida na thread de gravação, se houver;
+            as gravações que falharam continuam pendentes
+    """
+    if _gravador is not None:
+        _gravador.aguardar()
+
+
+def encerrar_gravacao_assincrona() -> None:
+    """
+    Grava tudo o que estiver pendente, encerra a thread de gravação e volta
+    ao modo síncrono. Deve ser chamada no encerramento das aplicações.
+    
+    Raises:
+        Exception: A última falha de gravação, se alguma não foi relançada
+    """
+    global _gravador
+    gravador, _gravador = _gravador, None
+    if gravador is not None:
+        gravador.parar()
+        atexit.unregister(encerrar_gravacao_assincrona)
+        if gravador.erro is not None:
+            raise gravador.erro
+
+
+def limpar_banco() -> None:
+    """
+    Remove todos os dados do banco (útil para testes).
+    Mantém o schema intacto.
+    """
+    aguardar_gravacoes()
+    
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM caixas_pecas")
+        cursor.execute("DELETE FROM motivos_reprovacao")
+        cursor.execute("DELETE FROM pecas")
+        cursor.execute("DELETE FROM limites_validacao")
+        cursor.execute("DELETE FROM caixas")
+        cursor.execute("DELETE FROM sistema_config")
+        cursor.execute("DELETE FROM perfis_produto")
+        cursor.execute("DELETE FROM eventos")
+        cursor.execute("DELETE FROM snapshots")
+        cursor.execute("DELETE FROM alertas_controle")
+        cursor.execute("DELETE FROM rollup_horas")
+        cursor.execute("DELETE FROM rollup_turnos")
+        cursor.execute("DELETE FROM registro_alteracoes")
+
+
+def remover_banco() -> None:
+    """
+    Remove o arquivo do banco de dados completamente.
+    Útil para reset completo do sistema.
+    """
+    aguardar_gravacoes()
+    fechar_conexoes()
+    
+    # Remove também os arquivos auxiliares do modo WAL
+    for sufixo in ("", "-wal", "-shm"):
+        arquivo = Path(str(DB_PATH) + sufixo)
+        if arquivo.exists():
+            arquivo.unlink()
 
@@ -0,0 +1,361 @@
+"""
+Histogramas incrementais das medidas (peso e comprimento).
+
+Cada medida é contada em classes de largura fixa (1 / CLASSES_POR_UNIDADE)
+dentro de uma faixa fixa, tirada dos limites de aceitação da medida e
+alargada por MARGEM_FAIXA de cada lado. Valores fora da faixa vão para as
+classes de excesso (abaixo e acima): o tamanho do histograma é limitado pela
+faixa, não pela quantidade de peças nem por valores extremos. As classes da
+faixa são guardadas de forma esparsa como {índice da classe: quantidade}.
+Incluir ou retirar uma peça custa O(1), dois histogramas se combinam somando
+as contagens e os quantis (p50, p95, p99) são estimados percorrendo as
+classes, com erro de no máximo uma largura de classe dentro da faixa.
+
+Ao contrário de estimadores como P² ou t-digest, o histograma aceita a
+retirada de valores, necessária quando uma peça é removida. Os histogramas
+ficam no agregado de services.estatisticas, que cuida da persistência.
+"""
+
+import math
+from typing import Any, Dict, List, Optional, Tuple, TypedDict
+
+from services.regras import obter_criterios
+
+
+# Classes por unidade de medida (0.1 g no peso, 0.1 cm no comprimento)
+CLASSES_POR_UNIDADE = 10
+
+# Margem da faixa do histograma em cada lado, em frações da largura da faixa de aceitação
+MARGEM_FAIXA = 1.0
+
+# Quantis exibidos nos relatórios e no dashboard
+QUANTIS = {'p50': 0.50, 'p95': 0.95, 'p99': 0.99}
+
+# Máximo de barras entregues aos gráficos (incluindo as de excesso)
+MAXIMO_BARRAS = 30
+
+
+class Histograma(TypedDict):
+    """
+    Histograma de uma medida em uma faixa fixa.
+
+    Attributes:
+        inicio: Primeira classe da faixa (inclusive)
+        fim: Última classe da faixa (exclusive)
+        classes: Índice da classe -> quantidade de valores (só classes com valores)
+        abaixo: Valores abaixo da faixa
+        acima: Valores acima da faixa
+    """
+    inicio: int
+    fim: int
+    classes: Dict[int, int]
+    abaixo: int
+    acima: int
+
+
+class BarraHistograma(TypedDict):
+    """
+    Barra de um histograma agrupado para exibição.
+
+    Attributes:
+        inicio: Limite inferior da barra (inclusive)
+        fim: Limite superior da barra (exclusive)
+        quantidade: Valores na barra
+        fora_da_faixa: True nas barras de excesso, que contam os valores
+            abaixo ou acima da faixa e são desenhadas com a largura das demais
+    """
+    inicio: float
+    fim: float
+    quantidade: int
+    fora_da_faixa: bool
+
+
+class DistribuicaoMedida(TypedDict):
+    """
+    Resumo da distribuição de uma medida.
+
+    Attributes:
+        n: Quantidade de valores
+        quantis: Quantis estimados por nome ('p50', 'p95', 'p99'); None sem valores
+        barras: Histograma agrupado em no máximo MAXIMO_BARRAS barras
+    """
+    n: int
+    quantis: Dict[str, Optional[float]]
+    barras: List[BarraHistograma]
+
+
+def indice_classe(valor: float) -> int:
+    """
+    Calcula a classe de um valor.
+
+    O arredondamento antes do piso evita que 100.3 * 10 = 1002.999... caia na
+    classe anterior; as consultas de database.agregar_estatisticas usam a
+    mesma expressão.
+
+    Args:
+        valor: Valor medido
+
+    Returns:
+        Índice da classe
+    """
+    return math.floor(round(valor * CLASSES_POR_UNIDADE, 6))
+
+
+def faixa_padrao(medida: str) -> Tuple[float, float]:
+    """
+    Calcula a faixa do histograma de uma medida a partir dos limites de
+    aceitação gerais em uso, alargados por MARGEM_FAIXA de cada lado.
+
+    Args:
+        medida: 'peso' ou 'comprimento'
+
+    Returns:
+        Tupla (início, fim) da faixa, na unidade da medida
+    """
+    criterios = obter_criterios()
+    minimo, maximo = criterios[f'{medida}_minimo'], criterios[f'{medida}_maximo']
+    margem = (maximo - minimo) * MARGEM_FAIXA
+    return minimo - margem, maximo + margem
+
+
+def criar_histograma(inicio: float, fim: float) -> Histograma:
+    """
+    Factory function para criar um histograma vazio.
+
+    Args:
+        inicio: Início da faixa, na unidade da medida
+        fim: Fim da faixa, na unidade da medida
+
+    Returns:
+        Histograma sem valores
+
+    Raises:
+        ValueError: Se a faixa não tiver ao menos uma classe
+    """
+    primeira, ultima = indice_classe(inicio), math.ceil(round(fim * CLASSES_POR_UNIDADE, 6))
+    if ultima <= primeira:
+        raise ValueError(f"Faixa vazia para o histograma: {inicio}-{fim}")
+    return Histograma(inicio=primeira, fim=ultima, classes={}, abaixo=0, acima=0)
+
+
+def contar_classe(histograma: Histograma, classe: int, quantidade: int) -> None:
+    """
+    Soma (ou, com quantidade negativa, desconta) valores de uma classe,
+    levando as classes fora da faixa para as de excesso.
+
+    Args:
+        histograma: Histograma a atualizar
+        classe: Índice da classe (ver indice_classe)
+        quantidade: Valores a somar
+    """
+    if classe < histograma['inicio']:
+        histograma['abaixo'] = max(0, histograma['abaixo'] + quantidade)
+    elif classe >= histograma['fim']:
+        histograma['acima'] = max(0, histograma['acima'] + quantidade)
+    else:
+        restante = histograma['classes'].get(classe, 0) + quantidade
+        if restante > 0:
+            histograma['classes'][classe] = restante
+        else:
+            histograma['classes'].pop(classe, None)
+
+
+def adicionar_valor(histograma: Histograma, valor: float) -> None:
+    """
+    Conta um valor no histograma.
+
+    Args:
+        histograma: Histograma a atualizar
+        valor: Valor medido
+    """
+    contar_classe(histograma, indice_classe(valor), 1)
+
+
+def remover_valor(histograma: Histograma, valor: float) -> None:
+    """
+    Desconta um valor contado antes; classes zeradas são descartadas.
+
+    Args:
+        histograma: Histograma a atualizar
+        valor: Valor a descontar
+    """
+    contar_classe(histograma, indice_classe(valor), -1)
+
+
+def total_valores(histograma: Histograma) -> int:
+    """Quantidade de valores contados, dentro e fora da faixa."""
+    return histograma['abaixo'] + sum(histograma['classes'].values()) + histograma['acima']
+
+
+def mesclar_histogramas(destino: Histograma, origem: Histograma) -> None:
+    """
+    Soma as contagens de outro histograma (ex.: de outra estação ou turno).
+    Se as faixas diferirem, as classes da origem são redistribuídas pela
+    faixa do destino; os excessos da origem continuam como excessos.
+
+    Args:
+        destino: Histograma que recebe as contagens
+        origem: Histograma somado
+    """
+    for classe, quantidade in origem['classes'].items():
+        contar_classe(destino, classe, quantidade)
+    destino['abaixo'] += origem['abaixo']
+    destino['acima'] += origem['acima']
+
+
+def estimar_quantil(
+    histograma: Histograma,
+    q: float,
+    minimo: Optional[float] = None,
+    maximo: Optional[float] = None
+) -> Optional[float]:
+    """
+    Estima um quantil interpolando linearmente dentro da classe que o contém.
+    Nas classes de excesso, a interpolação vai da borda da faixa até o
+    extremo exato (sem ele, a estimativa fica na borda).
+
+    Args:
+        histograma: Histograma da medida
+        q: Quantil desejado (0 a 1)
+        minimo: Menor valor exato, se conhecido (limita a estimativa)
+        maximo: Maior valor exato, se conhecido (limita a estimativa)
+
+    Returns:
+        Valor estimado, ou None sem valores
+    """
+    total = total_valores(histograma)
+    if total == 0:
+        return None
+
+    alvo = q * total
+    inicio = histograma['inicio'] / CLASSES_POR_UNIDADE
+    fim = histograma['fim'] / CLASSES_POR_UNIDADE
+
+    abaixo = histograma['abaixo']
+    if abaixo and alvo <= abaixo:
+        base = minimo if minimo is not None and minimo < inicio else inicio
+        estimativa = base + (inicio - base) * alvo / abaixo
+    else:
+        acumulado = abaixo
+        estimativa = None
+        for classe in sorted(histograma['classes']):
+            quantidade = histograma['classes'][classe]
+            if acumulado + quantidade >= alvo:
+                estimativa = (classe + (alvo - acumulado) / quantidade) / CLASSES_POR_UNIDADE
+                break
+            acumulado += quantidade
+        if estimativa is None:
+            topo = maximo if maximo is not None and maximo > fim else fim
+            estimativa = fim + (topo - fim) * (alvo - acumulado) / histograma['acima']
+
+    if minimo is not None:
+        estimativa = max(estimativa, minimo)
+    if maximo is not None:
+        estimativa = min(estimativa, maximo)
+    return estimativa
+
+
+def agrupar_barras(histograma: Histograma, maximo_barras: int = MAXIMO_BARRAS) -> List[BarraHistograma]:
+    """
+    Agrupa as classes da faixa em barras de mesma largura (a última pode ser
+    mais estreita), que cobrem a faixa inteira, inclusive barras vazias, mais
+    as barras de excesso que tiverem valores. O total não passa de maximo_barras, e a escala do gráfico depende
+    só da faixa, não dos valores extremos.
+
+    Args:
+        histograma: Histograma da medida
+        maximo_barras: Quantidade máxima de barras (ao menos 3)
+
+    Returns:
+        Barras em ordem crescente (vazia sem valores)
+    """
+    if total_valores(histograma) == 0:
+        return []
+
+    primeira = histograma['inicio']
+    amplitude = histograma['fim'] - primeira
+    classes_por_barra = math.ceil(amplitude / (maximo_barras - 2))
+    quantidade_barras = math.ceil(amplitude / classes_por_barra)
+
+    quantidades = [0] * quantidade_barras
+    for classe, quantidade in histograma['classes'].items():
+        quantidades[(classe - primeira) // classes_por_barra] += quantidade
+
+    largura = classes_por_barra / CLASSES_POR_UNIDADE
+    inicio = primeira / CLASSES_POR_UNIDADE
+    barras = [
+        BarraHistograma(
+            inicio=(primeira + barra * classes_por_barra) / CLASSES_POR_UNIDADE,
+            fim=min(primeira + (barra + 1) * classes_por_barra, histograma['fim']) / CLASSES_POR_UNIDADE,
+            quantidade=quantidade,
+            fora_da_faixa=False
+        )
+        for barra, quantidade in enumerate(quantidades)
+    ]
+    if histograma['abaixo']:
+        barras.insert(0, BarraHistograma(
+            inicio=inicio - largura, fim=inicio, quantidade=histograma['abaixo'], fora_da_faixa=True
+        ))
+    if histograma['acima']:
+        fim = barras[-1]['fim']
+        barras.append(BarraHistograma(
+            inicio=fim, fim=fim + largura, quantidade=histograma['acima'], fora_da_faixa=True
+        ))
+    return barras
+
+
+def resumir_distribuicao(
+    histograma: Histograma,
+    minimo: Optional[float] = None,
+    maximo: Optional[float] = None
+) -> DistribuicaoMedida:
+    """
+    Calcula os quantis e as barras de uma medida.
+
+    Args:
+        histograma: Histograma da medida
+        minimo: Menor valor exato, se conhecido
+        maximo: Maior valor exato, se conhecido
+
+    Returns:
+        DistribuicaoMedida
+    """
+    return DistribuicaoMedida(
+        n=total_valores(histograma),
+        quantis={
+            nome: estimar_quantil(histograma, q, minimo, maximo) for nome, q in QUANTIS.items()
+        },
+        barras=agrupar_barras(histograma)
+    )
+
+
+def montar_histograma(dados: Any) -> Histograma:
+    """
+    Monta um histograma a partir de dados decodificados de JSON (chaves texto).
+
+    Args:
+        dados: Dicionário com os campos de Histograma
+
+    Returns:
+        Histograma
+
+    Raises:
+        AttributeError, KeyError, TypeError, ValueError: Se os dados forem inválidos
+    """
+    histograma = Histograma(
+        inicio=int(dados['inicio']),
+        fim=int(dados['fim']),
+        classes={int(classe): int(quantidade) for classe, quantidade in dados['classes'].items()},
+        abaixo=int(dados['abaixo']),
+        acima=int(dados['acima'])
+    )
+    if histograma['fim'] <= histograma['inicio']:
+        raise ValueError("Faixa inválida no histograma")
+    if histograma['abaixo'] < 0 or histograma['acima'] < 0:
+        raise ValueError("Quantidade inválida no histograma")
+    if any(
+        quantidade <= 0 or not histograma['inicio'] <= classe < histograma['fim']
+        for classe, quantidade in histograma['classes'].items()
+    ):
+        raise ValueError("Classe inválida no histograma")
+    return histograma
@@ -0,0 +1,88 @@
+"""
+Estado do sistema compartilhado entre as sessões de uma mesma aplicação.
+
+Em vez de cada sessão (uma aba do dashboard, uma tela no chão de fábrica)
+carregar o próprio SistemaArmazenamento, o processo mantém uma única cópia,
+e as sessões guardam só a referência a este objeto. Leituras usam o sistema
+diretamente; alterações passam por alterar(), que serializa as gravações
+entre as sessões e incrementa a versão, usada pelas telas para saber se o
+que exibem está atualizado. atualizar_do_banco() traz para o sistema o que
+outros processos (CLI, TUI) gravaram desde a carga, sem recarregar tudo.
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from services import acompanhamento
+from services.armazenamento import SistemaArmazenamento, inicializar_sistema
+
+
+class EstadoCompartilhado:
+    """
+    Sistema de armazenamento compartilhado, com contador de versão.
+
+    Attributes:
+        sistema: SistemaArmazenamento usado por todas as sessões
+        versao: Incrementada a cada alteração ou recarga do sistema
+        sequencia: Última alteração do banco já refletida no sistema
+    """
+
+    def __init__(self, carregar: Callable[[], SistemaArmazenamento] = inicializar_sistema) -> None:
+        self._carregar = carregar
+        self._trava = threading.RLock()
+        # Lida antes da carga: o que for gravado durante ela é reaplicado (e ignorado)
+        self.sequencia = acompanhamento.ultima_sequencia()
+        self.sistema = carregar()
+        self.versao = 0
+
+    @contextmanager
+    def alterar(self) -> Iterator[SistemaArmazenamento]:
+        """
+        Dá acesso exclusivo ao sistema para uma alteração (cadastro, remoção).
+        A versão é incrementada ao final, mesmo que a alteração falhe no meio.
+
+        Yields:
+            O sistema compartilhado
+        """
+        with self._trava:
+            try:
+                yield self.sistema
+            finally:
+                self.versao += 1
+
+    def recarregar(self, carregar: Optional[Callable[[], SistemaArmazenamento]] = None) -> None:
+        """
+        Substitui o sistema por uma nova carga, para todas as sessões.
+
+        Args:
+            carregar: Função de carga (padrão: a usada na criação)
+        """
+        with self._trava:
+            self.sequencia = acompanhamento.ultima_sequencia()
+            self.sistema = (carregar or self._carregar)()
+            self.versao += 1
+
+    def atualizar_do_banco(self) -> bool:
+        """
+        Aplica ao sistema as alterações gravadas no banco desde a última
+        atualização. Sem alterações novas, custa uma consulta de custo
+        constante; se o registro não cobre mais esse intervalo, recarrega tudo.
+
+        Returns:
+            True se o sistema mudou (e a versão foi incrementada)
+        """
+        if acompanhamento.ultima_sequencia() == self.sequencia:
+            return False
+
+        with self._trava:
+            resultado = acompanhamento.buscar_alteracoes(self.sequencia)
+            if resultado is None:
+                self.recarregar()
+                return True
+
+            eventos, self.sequencia = resultado
+            if acompanhamento.aplicar_alteracoes(self.sistema, eventos) == 0:
+                return False
+            self.versao += 1
+            return True
@@ -0,0 +1,434 @@
+"""
+Agregado incremental das estatísticas do sistema.
+
+Os contadores (peças aprovadas e reprovadas, reprovações por critério,
+caixas fechadas, os mesmos totais por produto, as medidas de SPC e os
+histogramas de peso e comprimento) são atualizados a cada peça
+incluída ou retirada e a cada caixa fechada. Assim os relatórios custam o
+mesmo com dez ou com um milhão de peças, sem percorrer as listas.
+
+O agregado é gravado junto com os dados (sistema_config no modo de tabelas,
+com uma chave por produto para regravar só os alterados; snapshot no
+journal) e reaproveitado na carga quando confere com as listas carregadas;
+caso contrário é recalculado uma vez.
+"""
+
+import json
+from typing import Any, Dict, Iterable, Mapping, Optional, TypedDict, TYPE_CHECKING
+
+from services import distribuicao
+from services.spc import (
+    MEDIDAS_SPC,
+    MedidaSPC,
+    adicionar_valor,
+    criar_medida,
+    montar_medida,
+    recalcular_extremos,
+    remover_valor
+)
+from services.validacao import MotivoReprovacao
+
+# Importação condicional para evitar importação circular
+if TYPE_CHECKING:
+    from services.armazenamento import SistemaArmazenamento
+
+
+# Chave do agregado em sistema_config (sem os totais por produto)
+CHAVE_CONFIG_ESTATISTICAS = "estatisticas"
+
+# Prefixo das chaves dos totais por produto em sistema_config (um por produto)
+PREFIXO_CONFIG_PRODUTO = "estatisticas.produto."
+
+# Chave, em sistema_config, do seq de registro_alteracoes em que o agregado foi gravado
+CHAVE_CONFIG_SEQUENCIA = "estatisticas.seq"
+
+# Critérios contabilizados nas reprovações
+CRITERIOS = ('peso', 'cor', 'comprimento')
+
+# Chave, em 'produtos', das peças sem codigo_produto
+SEM_CODIGO_PRODUTO = ""
+
+
+class ContagemProduto(TypedDict):
+    """
+    Contadores de um produto.
+
+    Attributes:
+        aprovadas: Peças aprovadas do produto
+        reprovadas: Peças reprovadas do produto
+        reprovacoes: Reprovações por critério (peso, cor, comprimento)
+    """
+    aprovadas: int
+    reprovadas: int
+    reprovacoes: Dict[str, int]
+
+
+class EstatisticasSistema(TypedDict):
+    """
+    Agregado das estatísticas do sistema.
+
+    Attributes:
+        aprovadas: Total de peças aprovadas
+        reprovadas: Total de peças reprovadas
+        reprovacoes: Reprovações por critério (peso, cor, comprimento)
+        caixas_fechadas: Total de caixas fechadas
+        produtos: Contadores por codigo_produto (SEM_CODIGO_PRODUTO para peças sem produto)
+        spc: Estado de SPC de cada medida ('peso', 'comprimento') de todas as peças
+        distribuicao: Histograma de cada medida de todas as peças
+    """
+    aprovadas: int
+    reprovadas: int
+    reprovacoes: Dict[str, int]
+    caixas_fechadas: int
+    produtos: Dict[str, ContagemProduto]
+    spc: Dict[str, MedidaSPC]
+    distribuicao: Dict[str, distribuicao.Histograma]
+
+
+def _zerar_criterios() -> Dict[str, int]:
+    return {criterio: 0 for criterio in CRITERIOS}
+
+
+def criar_estatisticas() -> EstatisticasSistema:
+    """
+    Factory function para criar um agregado zerado.
+
+    Returns:
+        EstatisticasSistema sem nenhuma peça ou caixa
+    """
+    return EstatisticasSistema(
+        aprovadas=0,
+        reprovadas=0,
+        reprovacoes=_zerar_criterios(),
+        caixas_fechadas=0,
+        produtos={},
+        spc={nome: criar_medida() for nome in MEDIDAS_SPC},
+        distribuicao={
+            nome: distribuicao.criar_histograma(*distribuicao.faixa_padrao(nome)) for nome in MEDIDAS_SPC
+        }
+    )
+
+
+def contar_reprovacoes(peca: Mapping[str, Any]) -> Dict[str, int]:
+    """
+    Classifica as reprovações de uma peça por critério.
+    Usa o codigo_reprovacao; só peças sem código são classificadas pelo
+    texto dos motivos (uma contagem por motivo).
+
+    Args:
+        peca: Peça reprovada
+
+    Returns:
+        Dicionário com a contagem de cada critério
+    """
+    contadores = _zerar_criterios()
+
+    codigo = peca.get('codigo_reprovacao')
+    if codigo is not None:
+        if codigo & MotivoReprovacao.PESO:
+            contadores['peso'] += 1
+        if codigo & MotivoReprovacao.COR:
+            contadores['cor'] += 1
+        if codigo & MotivoReprovacao.COMPRIMENTO:
+            contadores['comprimento'] += 1
+        return contadores
+
+    for motivo in peca['motivos_reprovacao']:
+        motivo_lower = motivo.lower()
+        if 'peso' in motivo_lower:
+            contadores['peso'] += 1
+        elif 'cor' in motivo_lower:
+            contadores['cor'] += 1
+        elif 'comprimento' in motivo_lower:
+            contadores['comprimento'] += 1
+    return contadores
+
+
+def chave_produto(peca: Mapping[str, Any]) -> str:
+    """
+    Retorna a chave, em 'produtos', dos totais do produto da peça.
+
+    Args:
+        peca: Peça contabilizada
+
+    Returns:
+        codigo_produto da peça, ou SEM_CODIGO_PRODUTO
+    """
+    return peca.get('codigo_produto') or SEM_CODIGO_PRODUTO
+
+
+def _acumular(
+    estatisticas: EstatisticasSistema,
+    peca: Mapping[str, Any],
+    aprovada: bool,
+    sinal: int
+) -> None:
+    """Soma (sinal=1) ou subtrai (sinal=-1) uma peça dos contadores."""
+    chave = chave_produto(peca)
+    produto = estatisticas['produtos'].get(chave)
+    if produto is None:
+        produto = ContagemProduto(aprovadas=0, reprovadas=0, reprovacoes=_zerar_criterios())
+        estatisticas['produtos'][chave] = produto
+
+    if aprovada:
+        estatisticas['aprovadas'] += sinal
+        produto['aprovadas'] += sinal
+    else:
+        estatisticas['reprovadas'] += sinal
+        produto['reprovadas'] += sinal
+        for criterio, quantidade in contar_reprovacoes(peca).items():
+            estatisticas['reprovacoes'][criterio] += sinal * quantidade
+            produto['reprovacoes'][criterio] += sinal * quantidade
+
+    if produto['aprovadas'] == 0 and produto['reprovadas'] == 0:
+        del estatisticas['produtos'][chave]
+
+    atualizar = adicionar_valor if sinal > 0 else remover_valor
+    for nome, medida in estatisticas['spc'].items():
+        atualizar(medida, peca[nome])
+    contar = distribuicao.adicionar_valor if sinal > 0 else distribuicao.remover_valor
+    for nome, histograma in estatisticas['distribuicao'].items():
+        contar(histograma, peca[nome])
+
+
+def registrar_inclusao(estatisticas: EstatisticasSistema, peca: Mapping[str, Any]) -> None:
+    """
+    Contabiliza uma peça incluída no sistema.
+
+    Args:
+        estatisticas: Agregado a atualizar
+        peca: Peça incluída (aprovada ou reprovada, conforme peca['aprovada'])
+    """
+    _acumular(estatisticas, peca, peca['aprovada'], 1)
+
+
+def registrar_remocao(
+    estatisticas: EstatisticasSistema,
+    peca: Mapping[str, Any],
+    aprovada: bool
+) -> None:
+    """
+    Desconta uma peça retirada do sistema.
+
+    Args:
+        estatisticas: Agregado a atualizar
+        peca: Peça retirada
+        aprovada: True se a peça estava em pecas_aprovadas
+    """
+    _acumular(estatisticas, peca, aprovada, -1)
+
+
+def registrar_caixa_fechada(estatisticas: EstatisticasSistema) -> None:
+    """
+    Contabiliza uma caixa fechada.
+
+    Args:
+        estatisticas: Agregado a atualizar
+    """
+    estatisticas['caixas_fechadas'] += 1
+
+
+def calcular_estatisticas(sistema: "SistemaArmazenamento") -> EstatisticasSistema:
+    """
+    Calcula o agregado percorrendo todas as peças do sistema.
+
+    Args:
+        sistema: Estado atual do sistema
+
+    Returns:
+        EstatisticasSistema correspondente ao sistema
+    """
+    estatisticas = criar_estatisticas()
+    for peca in sistema['pecas_aprovadas']:
+        _acumular(estatisticas, peca, True, 1)
+    for peca in sistema['pecas_reprovadas']:
+        _acumular(estatisticas, peca, False, 1)
+    estatisticas['caixas_fechadas'] = len(sistema['caixas_fechadas'])
+    return estatisticas
+
+
+def estatisticas_conferem(
+    estatisticas: EstatisticasSistema,
+    sistema: "SistemaArmazenamento"
+) -> bool:
+    """
+    Confere, em tempo constante, os totais do agregado com o tamanho das
+    listas do sistema (que podem ter sido alteradas sem passar pelo serviço).
+
+    Args:
+        estatisticas: Agregado a conferir
+        sistema: Estado atual do sistema
+
+    Returns:
+        True se os totais de peças e de caixas fechadas coincidem
+    """
+    return (
+        estatisticas['aprovadas'] == len(sistema['pecas_aprovadas'])
+        and estatisticas['reprovadas'] == len(sistema['pecas_reprovadas'])
+        and estatisticas['caixas_fechadas'] == len(sistema['caixas_fechadas'])
+    )
+
+
+def obter_estatisticas(sistema: "SistemaArmazenamento") -> EstatisticasSistema:
+    """
+    Retorna o agregado do sistema, recalculando-o se estiver ausente ou
+    desatualizado.
+
+    Args:
+        sistema: Estado atual do sistema
+
+    Returns:
+        EstatisticasSistema do sistema (o mesmo objeto mantido em sistema['estatisticas'])
+    """
+    estatisticas = sistema.get('estatisticas')
+    if estatisticas is None or not estatisticas_conferem(estatisticas, sistema):
+        estatisticas = calcular_estatisticas(sistema)
+        sistema['estatisticas'] = estatisticas
+    return estatisticas
+
+
+def obter_medidas_spc(sistema: "SistemaArmazenamento") -> Dict[str, MedidaSPC]:
+    """
+    Retorna as medidas de SPC do agregado com mínimo e máximo exatos.
+    Só percorre as peças quando a remoção do último valor extremo de uma
+    medida deixou seus extremos pendentes.
+
+    Args:
+        sistema: Estado atual do sistema
+
+    Returns:
+        Dicionário {medida: MedidaSPC}
+    """
+    medidas = obter_estatisticas(sistema)['spc']
+    for nome, medida in medidas.items():
+        if not medida['extremos_exatos']:
+            recalcular_extremos(
+                medida,
+                [peca[nome] for lista in (sistema['pecas_aprovadas'], sistema['pecas_reprovadas']) for peca in lista]
+            )
+    return medidas
+
+
+def serializar_estatisticas(estatisticas: EstatisticasSistema) -> str:
+    """
+    Serializa o agregado para JSON.
+
+    Args:
+        estatisticas: Agregado a serializar
+
+    Returns:
+        String JSON
+    """
+    return json.dumps(estatisticas)
+
+
+def serializar_partes(
+    estatisticas: EstatisticasSistema,
+    produtos: Optional[Iterable[str]] = None
+) -> Dict[str, Optional[str]]:
+    """
+    Serializa o agregado em partes gravadas separadamente em sistema_config:
+    os totais, SPC e histogramas em CHAVE_CONFIG_ESTATISTICAS e cada produto
+    em PREFIXO_CONFIG_PRODUTO + código. Assim uma alteração regrava só os
+    produtos que mudaram, e não todos.
+
+    Args:
+        estatisticas: Agregado a serializar
+        produtos: Chaves dos produtos a incluir (None para todos)
+
+    Returns:
+        Dicionário {chave de configuração: JSON}; produtos que deixaram de
+        existir no agregado vêm com None (a chave deve ser removida)
+    """
+    geral = {campo: valor for campo, valor in estatisticas.items() if campo != 'produtos'}
+    partes: Dict[str, Optional[str]] = {CHAVE_CONFIG_ESTATISTICAS: json.dumps(geral)}
+    if produtos is None:
+        produtos = estatisticas['produtos']
+    for chave in produtos:
+        produto = estatisticas['produtos'].get(chave)
+        partes[PREFIXO_CONFIG_PRODUTO + chave] = json.dumps(produto) if produto is not None else None
+    return partes
+
+
+def desserializar_partes(partes: Mapping[str, str]) -> Optional[EstatisticasSistema]:
+    """
+    Reconstrói o agregado gravado por serializar_partes.
+
+    Args:
+        partes: Dicionário {chave de configuração: JSON} com a chave geral e
+            as dos produtos
+
+    Returns:
+        EstatisticasSistema, ou None se a parte geral estiver ausente ou
+        alguma parte for inválida
+    """
+    texto = partes.get(CHAVE_CONFIG_ESTATISTICAS)
+    if not texto:
+        return None
+    try:
+        dados = json.loads(texto)
+        if not isinstance(dados, dict):
+            return None
+        dados['produtos'] = {
+            chave[len(PREFIXO_CONFIG_PRODUTO):]: json.loads(valor)
+            for chave, valor in partes.items()
+            if chave.startswith(PREFIXO_CONFIG_PRODUTO)
+        }
+    except ValueError:
+        return None
+    return montar_estatisticas(dados)
+
+
+def montar_estatisticas(dados: Any) -> Optional[EstatisticasSistema]:
+    """
+    Monta o agregado a partir de dados decodificados de JSON, conferindo
+    os campos.
+
+    Args:
+        dados: Dicionário com os campos de EstatisticasSistema
+
+    Returns:
+        EstatisticasSistema, ou None se os dados estiverem ausentes ou inválidos
+    """
+    try:
+        return EstatisticasSistema(
+            aprovadas=int(dados['aprovadas']),
+            reprovadas=int(dados['reprovadas']),
+            reprovacoes={criterio: int(dados['reprovacoes'][criterio]) for criterio in CRITERIOS},
+            caixas_fechadas=int(dados['caixas_fechadas']),
+            produtos={
+                str(chave): ContagemProduto(
+                    aprovadas=int(produto['aprovadas']),
+                    reprovadas=int(produto['reprovadas']),
+                    reprovacoes={
+                        criterio: int(produto['reprovacoes'][criterio]) for criterio in CRITERIOS
+                    }
+                )
+                for chave, produto in dados['produtos'].items()
+            },
+            spc={nome: montar_medida(dados['spc'][nome]) for nome in MEDIDAS_SPC},
+            distribuicao={
+                nome: distribuicao.montar_histograma(dados['distribuicao'][nome]) for nome in MEDIDAS_SPC
+            }
+        )
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return None
+
+
+def desserializar_estatisticas(texto: str) -> Optional[EstatisticasSistema]:
+    """
+    Reconstrói o agregado gravado por serializar_estatisticas.
+
+    Args:
+        texto: String JSON (vazia se nunca foi gravado)
+
+    Returns:
+        EstatisticasSistema, ou None se o texto estiver vazio ou inválido
+    """
+    if not texto:
+        return None
+    try:
+        dados = json.loads(texto)
+    except ValueError:
+        return None
+    return montar_estatisticas(dados)
@@ -0,0 +1,415 @@
+"""
+Motor de armazenamento por journal de eventos (append-only) com snapshots.
+
+Em vez de espelhar o sistema nas tabelas normalizadas a cada alteração, cada
+operação vira um evento compacto gravado com um único INSERT na tabela
+eventos. Periodicamente (em intervalos que crescem com o estado) o estado
+completo é gravado em um snapshot, que substitui o anterior, e o sistema é reconstruído a partir dele mais os eventos
+posteriores. Os eventos são mantidos como trilha de auditoria.
+
+Ativado com a variável de ambiente PECAS_ARMAZENAMENTO=journal.
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Optional, TypedDict, TYPE_CHECKING
+
+from models.peca import Peca
+from models.caixa import Caixa, criar_caixa
+from models.lista_pecas import ListaPecas
+from services import database
+from services import estatisticas
+
+# Importação condicional para evitar importação circular
+if TYPE_CHECKING:
+    from services.armazenamento import SistemaArmazenamento
+
+
+# Tipos de evento
+EVENTO_PECA_REGISTRADA = "peca_registrada"
+EVENTO_PECA_REMOVIDA = "peca_removida"
+EVENTO_CAIXA_FECHADA = "caixa_fechada"
+
+# Quantidade mínima de eventos entre dois snapshots automáticos
+INTERVALO_SNAPSHOT = 500
+
+# Eventos entre dois snapshots por peça no estado: com o intervalo crescendo
+# junto com o estado, o custo de serializá-lo fica constante por evento
+# (com 0.5, um estado que só cresce é gravado a cada vez que dobra)
+PROPORCAO_SNAPSHOT = 0.5
+
+
+class Evento(TypedDict):
+    """
+    Evento do journal.
+
+    Attributes:
+        tipo: Um de EVENTO_PECA_REGISTRADA, EVENTO_PECA_REMOVIDA, EVENTO_CAIXA_FECHADA
+        dados: Conteúdo do evento (peça registrada, ID removido ou caixas)
+    """
+    tipo: str
+    dados: Dict[str, Any]
+
+
+class RegistroEvento(TypedDict):
+    """
+    Evento gravado no journal, usado na trilha de auditoria.
+
+    Attributes:
+        seq: Número sequencial do evento
+        tipo: Tipo do evento
+        dados: Conteúdo do evento
+        created_at: Data/hora da gravação
+    """
+    seq: int
+    tipo: str
+    dados: Dict[str, Any]
+    created_at: str
+
+
+def journal_ativo() -> bool:
+    """
+    Verifica se o journal de eventos é o motor de armazenamento em uso.
+
+    Returns:
+        True se PECAS_ARMAZENAMENTO=journal
+    """
+    return os.getenv('PECAS_ARMAZENAMENTO', '').lower() == 'journal'
+
+
+def criar_evento(tipo: str, dados: Dict[str, Any]) -> Evento:
+    """
+    Factory function para criar um evento.
+
+    Args:
+        tipo: Tipo do evento
+        dados: Conteúdo do evento
+
+    Returns:
+        Instância de Evento
+    """
+    return Evento(tipo=tipo, dados=dados)
+
+
+def aplicar_evento(sistema: "SistemaArmazenamento", evento: Evento) -> None:
+    """
+    Aplica um evento sobre o estado do sistema (usado na reconstrução).
+
+    Args:
+        sistema: Estado a ser atualizado
+        evento: Evento a aplicar
+
+    Raises:
+        ValueError: Se o tipo do evento for desconhecido
+    """
+    # Import local para evitar circular import
+    from services.armazenamento import incluir_peca, retirar_peca
+
+    tipo = evento['tipo']
+    dados = evento['dados']
+
+    if tipo == EVENTO_PECA_REGISTRADA:
+        incluir_peca(Peca(**dados), sistema)
+
+    elif tipo == EVENTO_PECA_REMOVIDA:
+        retirar_peca(dados['id'], sistema)
+
+    elif tipo == EVENTO_CAIXA_FECHADA:
+        sistema['caixa_atual']['fechada'] = True
+        sistema['caixas_fechadas'].append(sistema['caixa_atual'])
+        sistema['contador_caixas'] = dados['proxima_caixa']
+        sistema['caixa_atual'] = criar_caixa(dados['proxima_caixa'])
+        agregado = sistema.get('estatisticas')
+        if agregado is not None:
+            estatisticas.registrar_caixa_fechada(agregado)
+
+    else:
+        raise ValueError(f"Tipo de evento desconhecido: {tipo}")
+
+
+def _serializar_caixa(caixa: Caixa) -> Dict[str, Any]:
+    return {
+        'id': caixa['id'],
+        'fechada': caixa['fechada'],
+        'pecas': [peca['id'] for peca in caixa['pecas']]
+    }
+
+
+def serializar_sistema(sistema: "SistemaArmazenamento") -> str:
+    """
+    Serializa o estado completo do sistema para JSON.
+    Caixas referenciam as peças pelo ID, sem duplicá-las; as estatísticas
+    agregadas vão junto.
+
+    Args:
+        sistema: Sistema a ser serializado
+
+    Returns:
+        String JSON com o estado
+    """
+    caixas = list(sistema['caixas_fechadas']) + [sistema['caixa_atual']]
+    pecas: Dict[str, Peca] = {}
+    for peca in list(sistema['pecas_aprovadas']) + list(sistema['pecas_reprovadas']):
+        pecas[peca['id']] = peca
+    for caixa in caixas:
+        for peca in caixa['pecas']:
+            pecas.setdefault(peca['id'], peca)
+
+    return json.dumps({
+        'pecas': [dict(peca) for peca in pecas.values()],
+        'pecas_aprovadas': [peca['id'] for peca in sistema['pecas_aprovadas']],
+        'pecas_reprovadas': [peca['id'] for peca in sistema['pecas_reprovadas']],
+        'caixas_fechadas': [_serializar_caixa(caixa) for caixa in sistema['caixas_fechadas']],
+        'caixa_atual': _serializar_caixa(sistema['caixa_atual']),
+        'contador_caixas': sistema['contador_caixas'],
+        'estatisticas': estatisticas.obter_estatisticas(sistema)
+    })
+
+
+def desserializar_sistema(estado_json: str) -> "SistemaArmazenamento":
+    """
+    Reconstrói o sistema a partir do JSON gerado por serializar_sistema.
+    Uma peça é o mesmo objeto nas listas e na caixa que a contém.
+
+    Args:
+        estado_json: String JSON com o estado
+
+    Returns:
+        SistemaArmazenamento reconstruído
+    """
+    # Import local para evitar circular import
+    from services.armazenamento import SistemaArmazenamento
+
+    estado = json.loads(estado_json)
+    pecas = {dados['id']: Peca(**dados) for dados in estado['pecas']}
+    agregado = estatisticas.montar_estatisticas(estado.get('estatisticas'))
+
+    def montar_caixa(dados: Dict[str, Any]) -> Caixa:
+        caixa = criar_caixa(dados['id'])
+        caixa['fechada'] = dados['fechada']
+        caixa['pecas'] = [pecas[id_peca] for id_peca in dados['pecas']]
+        return caixa
+
+    sistema = SistemaArmazenamento(
+        pecas_aprovadas=ListaPecas(pecas[id_peca] for id_peca in estado['pecas_aprovadas']),
+        pecas_reprovadas=ListaPecas(pecas[id_peca] for id_peca in estado['pecas_reprovadas']),
+        caixas_fechadas=[montar_caixa(dados) for dados in estado['caixas_fechadas']],
+        caixa_atual=montar_caixa(estado['caixa_atual']),
+        contador_caixas=estado['contador_caixas']
+    )
+    # Snapshots antigos não têm o agregado: é recalculado sob demanda
+    if agregado is not None and estatisticas.estatisticas_conferem(agregado, sistema):
+        sistema['estatisticas'] = agregado
+    return sistema
+
+
+def _inserir_eventos(cursor, eventos: List[Evento]) -> int:
+    cursor.executemany(
+        "INSERT INTO eventos (tipo, dados) VALUES (?, ?)",
+        [(evento['tipo'], json.dumps(evento['dados'])) for evento in eventos]
+    )
+    cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM eventos")
+    return cursor.fetchone()[0]
+
+
+def _inserir_snapshot(cursor, seq_evento: int, estado: str) -> None:
+    # Só o snapshot mais recente é usado na reconstrução; os eventos
+    # continuam no journal como trilha de auditoria
+    cursor.execute("""
+        INSERT INTO snapshots (seq_evento, estado) VALUES (?, ?)
+        ON CONFLICT(seq_evento) DO UPDATE SET estado = excluded.estado
+    """, (seq_evento, estado))
+    cursor.execute("DELETE FROM snapshots WHERE seq_evento < ?", (seq_evento,))
+
+
+def anexar_eventos(eventos: List[Evento]) -> int:
+    """
+    Grava eventos no final do journal, em uma única transação.
+
+    Args:
+        eventos: Eventos a gravar, na ordem em que ocorreram
+
+    Returns:
+        Número sequencial do último evento do journal
+    """
+    database.aguardar_gravacoes()
+    with database.get_connection() as conn:
+        return _inserir_eventos(conn.cursor(), eventos)
+
+
+def _ultimo_snapshot(cursor) -> Optional[Any]:
+    cursor.execute("""
+        SELECT seq_evento, estado FROM snapshots
+        ORDER BY seq_evento DESC LIMIT 1
+    """)
+    return cursor.fetchone()
+
+
+def gravar_snapshot(sistema: "SistemaArmazenamento", seq_evento: Optional[int] = None) -> int:
+    """
+    Grava o estado completo do sistema como snapshot, substituindo os
+    snapshots anteriores.
+
+    Args:
+        sistema: Estado atual, com todos os eventos até seq_evento aplicados
+        seq_evento: Último evento refletido no estado (default: último do journal)
+
+    Returns:
+        Número sequencial do evento associado ao snapshot
+    """
+    database.aguardar_gravacoes()
+    with database.get_connection() as conn:
+        cursor = conn.cursor()
+        if seq_evento is None:
+            cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM eventos")
+            seq_evento = cursor.fetchone()[0]
+        _inserir_snapshot(cursor, seq_evento, serializar_sistema(sistema))
+    sistema['eventos_sem_snapshot'] = 0
+    return seq_evento
+
+
+def intervalo_snapshot(sistema: "SistemaArmazenamento") -> int:
+    """
+    Calcula quantos eventos separam o último snapshot do próximo: pelo menos
+    INTERVALO_SNAPSHOT, ou PROPORCAO_SNAPSHOT eventos por peça do estado.
+    Serializar o estado custa O(N); com o intervalo proporcional a N, o custo
+    amortizado por evento e os bytes gravados por evento ficam constantes, e a
+    reconstrução reaplica no máximo eventos da ordem de metade do estado.
+
+    Args:
+        sistema: Estado atual do sistema
+
+    Returns:
+        Quantidade de eventos até o próximo snapshot automático
+    """
+    pecas = len(sistema['pecas_aprovadas']) + len(sistema['pecas_reprovadas'])
+    return max(INTERVALO_SNAPSHOT, int(PROPORCAO_SNAPSHOT * pecas))
+
+
+def persistir_eventos(sistema: "SistemaArmazenamento") -> None:
+    """
+    Grava no journal os eventos pendentes do sistema e descarta as demais
+    alterações pendentes. A cada intervalo_snapshot() eventos grava também um
+    snapshot no lugar do anterior. Eventos, alertas e snapshot vão na mesma
+    transação, enfileirada se a gravação assíncrona estiver ativa.
+
+    Args:
+        sistema: Sistema com alterações pendentes
+
+    Raises:
+        sqlite3.Error: Se a gravação falhar; as alterações continuam pendentes
+    """
+    alteracoes = sistema.get('alteracoes')
+    if not alteracoes:
+        return
+    if not alteracoes.get('eventos'):
+        del sistema['alteracoes']
+        return
+
+    # Cópias: com a gravação assíncrona, o sistema continua mudando
+    eventos = list(alteracoes['eventos'])
+    alertas = list(alteracoes.get('alertas', []))
+    sem_snapshot = sistema.get('eventos_sem_snapshot', 0) + len(eventos)
+    estado = serializar_sistema(sistema) if sem_snapshot >= intervalo_snapshot(sistema) else None
+
+    def gravar(cursor) -> None:
+        seq = _inserir_eventos(cursor, eventos)
+        database.salvar_alertas(alertas, cursor)
+        if estado is not None:
+            _inserir_snapshot(cursor, seq, estado)
+
+    database.agendar_gravacao(gravar)
+
+    del sistema['alteracoes']
+    sistema['eventos_sem_snapshot'] = 0 if estado is not None else sem_snapshot
+
+
+def carregar_sistema() -> Optional["SistemaArmazenamento"]:
+    """
+    Reconstrói o sistema a partir do último snapshot mais os eventos posteriores.
+
+    Returns:
+        SistemaArmazenamento reconstruído, ou None se o journal estiver vazio
+    """
+    # Import local para evitar circular import
+    from services.armazenamento import SistemaArmazenamento
+
+    database.aguardar_gravacoes()
+    with database.get_connection() as conn:
+        cursor = conn.cursor()
+        snapshot = _ultimo_snapshot(cursor)
+        seq_inicial = snapshot['seq_evento'] if snapshot else 0
+        cursor.execute(
+            "SELECT tipo, dados FROM eventos WHERE seq > ? ORDER BY seq",
+            (seq_inicial,)
+        )
+        linhas = cursor.fetchall()
+
+    if snapshot is None and not linhas:
+        return None
+
+    if snapshot is not None:
+        sistema = desserializar_sistema(snapshot['estado'])
+    else:
+        sistema = SistemaArmazenamento(
+            pecas_aprovadas=ListaPecas(),
+            pecas_reprovadas=ListaPecas(),
+            caixas_fechadas=[],
+            caixa_atual=criar_caixa(1),
+            contador_caixas=1
+        )
+
+    for linha in linhas:
+        aplicar_evento(sistema, criar_evento(linha['tipo'], json.loads(linha['dados'])))
+    sistema['eventos_sem_snapshot'] = len(linhas)
+
+    return sistema
+
+
+def listar_eventos(desde_seq: int = 0) -> List[RegistroEvento]:
+    """
+    Lista os eventos gravados (trilha de auditoria da linha).
+
+    Args:
+        desde_seq: Retorna apenas eventos com seq maior que este valor
+
+    Returns:
+        Lista de RegistroEvento em ordem de gravação
+    """
+    database.aguardar_gravacoes()
+    with database.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT seq, tipo, dados, created_at FROM eventos WHERE seq > ? ORDER BY seq",
+            (desde_seq,)
+        )
+        return [
+            RegistroEvento(
+                seq=linha['seq'],
+                tipo=linha['tipo'],
+                dados=json.loads(linha['dados']),
+                created_at=linha['created_at']
+            )
+            for linha in cursor.fetchall()
+        ]
+
+
+def compactar_journal() -> int:
+    """
+    Remove os eventos já cobertos pelo último snapshot e os snapshots antigos.
+    Descarta a trilha de auditoria anterior ao snapshot; use apenas quando o
+    histórico não for mais necessário.
+
+    Returns:
+        Quantidade de eventos removidos
+    """
+    database.aguardar_gravacoes()
+    with database.get_connection() as conn:
+        cursor = conn.cursor()
+        snapshot = _ultimo_snapshot(cursor)
+        if snapshot is None:
+            return 0
+        cursor.execute("DELETE FROM eventos WHERE seq <= ?", (snapshot['seq_evento'],))
+        removidos = cursor.rowcount
+        cursor.execute("DELETE FROM snapshots WHERE seq_evento < ?", (snapshot['seq_evento'],))
+    return removidos
@@ -0,0 +1,427 @@
+"""
+Motor de regras de qualidade configurável.
+
+Os critérios de aprovação (faixas de peso e comprimento, cores aceitas e
+substituições por produto) são lidos de um arquivo JSON (variável de ambiente
+PECAS_REGRAS) ou da chave 'regras_qualidade' da tabela sistema_config. Na
+ausência de ambos valem os critérios padrão. Os perfis de produto gravados na
+tabela perfis_produto se sobrepõem aos da configuração.
+
+Os critérios são compilados uma única vez em um PlanoValidacao (limites em
+floats, cores em frozenset, mensagens pré-formatadas e uma tabela por
+produto). O plano em uso é trocado atomicamente a cada recarga: quem valida
+apenas lê a referência atual, sem travas nem acesso ao banco.
+
+Formato da configuração:
+
+    {
+        "peso_minimo": 95.0, "peso_maximo": 105.0,
+        "cores_aceitas": ["azul", "verde"],
+        "comprimento_minimo": 10.0, "comprimento_maximo": 20.0,
+        "produtos": {"SKU-1": {"peso_minimo": 90.0}}
+    }
+
+Campos omitidos herdam os critérios padrão (e, nos produtos, os critérios
+gerais da própria configuração).
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, FrozenSet, List, Mapping, Optional, Tuple, TypedDict
+
+
+logger = logging.getLogger(__name__)
+
+# Chave da tabela sistema_config com a configuração em JSON
+CHAVE_CONFIG_REGRAS = "regras_qualidade"
+
+# Intervalo (s) sugerido para as interfaces chamarem verificar_regras()
+INTERVALO_VERIFICACAO_REGRAS = 5.0
+
+CAMPOS_CRITERIOS = (
+    'peso_minimo', 'peso_maximo', 'cores_aceitas', 'comprimento_minimo', 'comprimento_maximo'
+)
+
+
+class CriteriosQualidade(TypedDict):
+    """
+    Critérios de aprovação de uma peça.
+
+    Attributes:
+        peso_minimo: Peso mínimo aceito (g)
+        peso_maximo: Peso máximo aceito (g)
+        cores_aceitas: Cores aceitas, em minúsculas
+        comprimento_minimo: Comprimento mínimo aceito (cm)
+        comprimento_maximo: Comprimento máximo aceito (cm)
+    """
+    peso_minimo: float
+    peso_maximo: float
+    cores_aceitas: List[str]
+    comprimento_minimo: float
+    comprimento_maximo: float
+
+
+CRITERIOS_PADRAO = CriteriosQualidade(
+    peso_minimo=95.0,
+    peso_maximo=105.0,
+    cores_aceitas=['azul', 'verde'],
+    comprimento_minimo=10.0,
+    comprimento_maximo=20.0
+)
+
+
+class CriteriosCompilados(TypedDict):
+    """
+    Critérios prontos para avaliação.
+
+    Attributes:
+        peso_minimo: Peso mínimo aceito (g)
+        peso_maximo: Peso máximo aceito (g)
+        cores_aceitas: Cores aceitas, para teste de pertinência em O(1)
+        comprimento_minimo: Comprimento mínimo aceito (cm)
+        comprimento_maximo: Comprimento máximo aceito (cm)
+        texto_cores: Cores aceitas já formatadas para mensagens ("azul ou verde")
+        criterios: Critérios de origem, na ordem configurada
+    """
+    peso_minimo: float
+    peso_maximo: float
+    cores_aceitas: FrozenSet[str]
+    comprimento_minimo: float
+    comprimento_maximo: float
+    texto_cores: str
+    criterios: CriteriosQualidade
+
+
+class PlanoValidacao(TypedDict):
+    """
+    Plano de validação compilado a partir de uma configuração.
+
+    Attributes:
+        versao: Número da recarga que gerou o plano (começa em 0)
+        origem: De onde vieram as regras ('padrao', 'banco' ou caminho do arquivo)
+        padrao: Critérios gerais
+        produtos: Critérios por código de produto
+    """
+    versao: int
+    origem: str
+    padrao: CriteriosCompilados
+    produtos: Dict[str, CriteriosCompilados]
+
+
+def _numero(config: Mapping[str, Any], campo: str, base: float) -> float:
+    valor = config.get(campo, base)
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+        raise ValueError(f"Critério '{campo}' deve ser numérico: {valor!r}")
+    return float(valor)
+
+
+def _mesclar_criterios(config: Mapping[str, Any], base: CriteriosQualidade) -> CriteriosQualidade:
+    """Aplica os campos informados sobre os critérios base, validando-os."""
+    desconhecidos = set(config) - set(CAMPOS_CRITERIOS)
+    if desconhecidos:
+        raise ValueError(f"Critérios desconhecidos: {', '.join(sorted(desconhecidos))}")
+
+    cores = config.get('cores_aceitas', base['cores_aceitas'])
+    if isinstance(cores, str) or not cores or not all(isinstance(cor, str) for cor in cores):
+        raise ValueError(f"'cores_aceitas' deve ser uma lista não vazia de cores: {cores!r}")
+
+    criterios = CriteriosQualidade(
+        peso_minimo=_numero(config, 'peso_minimo', base['peso_minimo']),
+        peso_maximo=_numero(config, 'peso_maximo', base['peso_maximo']),
+        cores_aceitas=[cor.lower().strip() for cor in cores],
+        comprimento_minimo=_numero(config, 'comprimento_minimo', base['comprimento_minimo']),
+        comprimento_maximo=_numero(config, 'comprimento_maximo', base['comprimento_maximo'])
+    )
+    if criterios['peso_minimo'] > criterios['peso_maximo']:
+        raise ValueError("'peso_minimo' maior que 'peso_maximo'")
+    if criterios['comprimento_minimo'] > criterios['comprimento_maximo']:
+        raise ValueError("'comprimento_minimo' maior que 'comprimento_maximo'")
+    return criterios
+
+
+def _compilar_criterios(criterios: CriteriosQualidade) -> CriteriosCompilados:
+    return CriteriosCompilados(
+        peso_minimo=criterios['peso_minimo'],
+        peso_maximo=criterios['peso_maximo'],
+        cores_aceitas=frozenset(criterios['cores_aceitas']),
+        comprimento_minimo=criterios['comprimento_minimo'],
+        comprimento_maximo=criterios['comprimento_maximo'],
+        texto_cores=" ou ".join(criterios['cores_aceitas']),
+        criterios=criterios
+    )
+
+
+def compilar_regras(
+    config: Mapping[str, Any],
+    versao: int = 0,
+    origem: str = "padrao",
+    perfis: Optional[Mapping[str, Mapping[str, Any]]] = None
+) -> PlanoValidacao:
+    """
+    Valida uma configuração de regras e a compila em um plano de validação.
+
+    Args:
+        config: Configuração (ver formato no docstring do módulo)
+        versao: Versão atribuída ao plano
+        origem: Descrição da origem das regras
+        perfis: Perfis de produto {codigo: critérios}, aplicados por cima
+            dos produtos da configuração
+
+    Returns:
+        PlanoValidacao pronto para uso
+
+    Raises:
+        ValueError: Se a configuração for inválida
+    """
+    if not isinstance(config, Mapping):
+        raise ValueError("A configuração de regras deve ser um objeto JSON")
+
+    gerais = {campo: valor for campo, valor in config.items() if campo != 'produtos'}
+    padrao = _mesclar_criterios(gerais, CRITERIOS_PADRAO)
+
+    produtos_config = config.get('produtos', {})
+    if not isinstance(produtos_config, Mapping):
+        raise ValueError("'produtos' deve mapear código do produto para critérios")
+
+    substituicoes_produtos = dict(produtos_config)
+    for produto, perfil in (perfis or {}).items():
+        substituicoes_produtos[produto] = {**substituicoes_produtos.get(produto, {}), **perfil}
+
+    produtos: Dict[str, CriteriosCompilados] = {}
+    for produto, substituicoes in substituicoes_produtos.items():
+        if not isinstance(substituicoes, Mapping):
+            raise ValueError(f"Critérios do produto '{produto}' devem ser um objeto JSON")
+        try:
+            produtos[produto] = _compilar_criterios(_mesclar_criterios(substituicoes, padrao))
+        except ValueError as e:
+            raise ValueError(f"Produto '{produto}': {e}") from e
+
+    return PlanoValidacao(
+        versao=versao,
+        origem=origem,
+        padrao=_compilar_criterios(padrao),
+        produtos=produtos
+    )
+
+
+# Assinatura de uma origem: (nome da origem, conteúdo JSON, perfis de produto)
+Assinatura = Tuple[str, Optional[str], Dict[str, Dict[str, Any]]]
+
+
+# Plano em uso: substituído por inteiro a cada recarga, nunca alterado no lugar
+_plano: PlanoValidacao = compilar_regras({})
+_assinatura_origem: Optional[Assinatura] = None
+_trava_recarga = threading.Lock()
+
+
+def obter_plano() -> PlanoValidacao:
+    """
+    Retorna o plano de validação em uso.
+
+    Returns:
+        PlanoValidacao atual (leia-o uma vez por operação para ter uma visão consistente)
+    """
+    return _plano
+
+
+def obter_criterios(produto: Optional[str] = None) -> CriteriosCompilados:
+    """
+    Retorna os critérios compilados de um produto, ou os gerais.
+
+    Args:
+        produto: Código do produto (None ou desconhecido: critérios gerais)
+
+    Returns:
+        CriteriosCompilados aplicáveis
+    """
+    plano = _plano
+    if produto is None:
+        return plano['padrao']
+    return plano['produtos'].get(produto, plano['padrao'])
+
+
+def compilar_criterios(criterios: Mapping[str, Any]) -> CriteriosCompilados:
+    """
+    Compila critérios avulsos (por exemplo, os gravados junto de uma peça).
+
+    Args:
+        criterios: Campos de CriteriosQualidade; os omitidos herdam os padrões
+
+    Returns:
+        CriteriosCompilados correspondentes
+
+    Raises:
+        ValueError: Se algum critério for inválido
+    """
+    return _compilar_criterios(_mesclar_criterios(criterios, CRITERIOS_PADRAO))
+
+
+def _arquivo_regras() -> Optional[str]:
+    return os.getenv('PECAS_REGRAS') or None
+
+
+def _ler_origem() -> Assinatura:
+    """
+    Lê a origem das regras e os perfis de produto do banco.
+
+    Returns:
+        Assinatura com o conteúdo JSON (None se não houver regras configuradas)
+    """
+    # Import local para evitar circular import (database importa regras)
+    from services import database
+
+    perfis = database.carregar_perfis_produto() if database.banco_existe() else {}
+
+    caminho = _arquivo_regras()
+    if caminho is not None:
+        with open(caminho, encoding='utf-8') as arquivo:
+            return caminho, arquivo.read(), perfis
+
+    if not database.banco_existe():
+        return 'banco', None, perfis
+    return 'banco', database.carregar_config(CHAVE_CONFIG_REGRAS) or None, perfis
+
+
+def _interpretar(conteudo: Optional[str]) -> Any:
+    """Converte o conteúdo JSON da origem na configuração ({} se ausente)."""
+    if conteudo is None:
+        return {}
+    try:
+        return json.loads(conteudo)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Regras de qualidade com JSON inválido: {e}") from e
+
+
+def _instalar(assinatura: Assinatura) -> PlanoValidacao:
+    global _plano, _assinatura_origem
+
+    nome_origem, conteudo, perfis = assinatura
+    config = _interpretar(conteudo)
+    origem = "padrao" if conteudo is None else nome_origem
+
+    # Compila por inteiro antes de trocar: em caso de erro o plano atual continua
+    plano = compilar_regras(config, versao=_plano['versao'] + 1, origem=origem, perfis=perfis)
+    _plano = plano
+    _assinatura_origem = assinatura
+    return plano
+
+
+def recarregar_regras() -> PlanoValidacao:
+    """
+    Relê as regras da origem configurada e troca o plano em uso.
+
+    Returns:
+        Novo PlanoValidacao
+
+    Raises:
+        ValueError: Se a configuração for inválida (o plano atual é mantido)
+        OSError: Se o arquivo de regras não puder ser lido
+    """
+    with _trava_recarga:
+        return _instalar(_ler_origem())
+
+
+def verificar_regras() -> bool:
+    """
+    Recarrega as regras se a origem mudou desde a última carga.
+    Pensado para ser chamado periodicamente pelas interfaces: erros são
+    registrados em log e o plano atual é mantido.
+
+    Returns:
+        True se um novo plano foi instalado
+    """
+    with _trava_recarga:
+        try:
+            assinatura = _ler_origem()
+            if assinatura == _assinatura_origem:
+                return False
+            _instalar(assinatura)
+            return True
+        except (OSError, ValueError) as e:
+            logger.warning("Regras de qualidade não recarregadas: %s", e)
+            return False
+
+
+def salvar_regras(config: Mapping[str, Any]) -> PlanoValidacao:
+    """
+    Valida e grava a configuração de regras no banco e passa a usá-la.
+    As demais interfaces a adotam na próxima chamada a verificar_regras().
+
+    Args:
+        config: Configuração (ver formato no docstring do módulo)
+
+    Returns:
+        Novo PlanoValidacao
+
+    Raises:
+        ValueError: Se a configuração for inválida (nada é gravado)
+    """
+    # Import local para evitar circular import
+    from services import database
+
+    compilar_regras(config)
+    conteudo = json.dumps(config, ensure_ascii=False, sort_keys=True)
+    database.salvar_config(CHAVE_CONFIG_REGRAS, conteudo)
+    return recarregar_regras()
+
+
+def restaurar_regras_padrao() -> PlanoValidacao:
+    """
+    Volta aos critérios padrão sem consultar nenhuma origem
+    (útil em testes e para descartar uma configuração carregada).
+
+    Returns:
+        Novo PlanoValidacao com os critérios padrão
+    """
+    with _trava_recarga:
+        return _instalar(('padrao', None, {}))
+
+
+def salvar_perfil_produto(codigo: str, perfil: Mapping[str, Any]) -> PlanoValidacao:
+    """
+    Valida e grava o perfil de tolerâncias de um produto e passa a usá-lo.
+
+    Args:
+        codigo: Código do produto
+        perfil: Critérios do produto (campos omitidos herdam os critérios gerais)
+
+    Returns:
+        Novo PlanoValidacao
+
+    Raises:
+        ValueError: Se o código for vazio ou o perfil inválido (nada é gravado)
+    """
+    # Import local para evitar circular import
+    from services import database
+
+    codigo = codigo.strip()
+    if not codigo:
+        raise ValueError("Código do produto não pode ser vazio")
+
+    with _trava_recarga:
+        _, conteudo, perfis = _ler_origem()
+        compilar_regras(_interpretar(conteudo), perfis={**perfis, codigo: perfil})
+        database.salvar_perfil_produto(codigo, dict(perfil))
+    return recarregar_regras()
+
+
+def remover_perfil_produto(codigo: str) -> bool:
+    """
+    Remove o perfil de um produto; suas peças passam aos critérios gerais
+    (ou ao perfil definido na configuração de regras, se houver).
+
+    Args:
+        codigo: Código do produto
+
+    Returns:
+        True se o perfil existia
+    """
+    # Import local para evitar circular import
+    from services import database
+
+    removido = database.deletar_perfil_produto(codigo)
+    if removido:
+        recarregar_regras()
+    return removido
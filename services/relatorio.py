@@ -1,10 +1,29 @@
 """
 Serviço de geração de relatórios consolidados.
+
+Os totais vêm do agregado incremental de services.estatisticas, de modo que
+gerar um relatório não depende da quantidade de peças cadastradas. As
+variantes *_do_banco calculam os mesmos números com consultas de agregação
+no SQLite, sem carregar o sistema em memória.
 """
 
-from typing import Dict, List, TypedDict
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple, TypedDict
 from services.armazenamento import SistemaArmazenamento
 from models.peca import Peca
+from services import database, journal
+from services.distribuicao import DistribuicaoMedida, resumir_distribuicao
+from services.estatisticas import (
+    CRITERIOS,
+    SEM_CODIGO_PRODUTO,
+    ContagemProduto,
+    EstatisticasSistema,
+    contar_reprovacoes,
+    obter_estatisticas,
+    obter_medidas_spc
+)
+from services.regras import obter_criterios
+from services.spc import IndicadoresSPC, MedidaSPC, indicadores_por_medida
 
 
 class EstatisticasReprovacao(TypedDict):
@@ -21,6 +40,205 @@ class EstatisticasReprovacao(TypedDict):
     comprimento_inadequado: int
 
 
+class EstatisticasProduto(TypedDict):
+    """
+    Estatísticas de um produto.
+    
+    Attributes:
+        total: Peças processadas do produto
+        aprovadas: Peças aprovadas
+        reprovadas: Peças reprovadas
+        percentual_aprovadas: Percentual de aprovação (0-100)
+        reprovacoes: Contadores por critério (peso, cor, comprimento)
+    """
+    total: int
+    aprovadas: int
+    reprovadas: int
+    percentual_aprovadas: float
+    reprovacoes: Dict[str, int]
+
+
+class ResumoRelatorio(TypedDict):
+    """
+    Números principais do relatório.
+    
+    Attributes:
+        total_processadas: Peças processadas (aprovadas + reprovadas)
+        total_aprovadas: Peças aprovadas
+        total_reprovadas: Peças reprovadas
+        percentual_aprovadas: Percentual de aprovação (0-100)
+        percentual_reprovadas: Percentual de reprovação (0-100)
+        caixas_fechadas: Caixas fechadas
+        pecas_caixa_atual: Peças na caixa em preenchimento
+        reprovacoes: Contadores por critério (peso, cor, comprimento)
+    """
+    total_processadas: int
+    total_aprovadas: int
+    total_reprovadas: int
+    percentual_aprovadas: float
+    percentual_reprovadas: float
+    caixas_fechadas: int
+    pecas_caixa_atual: int
+    reprovacoes: Dict[str, int]
+
+
+class TendenciaPeriodo(TypedDict):
+    """
+    Números de um intervalo de tempo (hora ou turno), lidos dos rollups.
+    
+    Attributes:
+        periodo: Identificação do intervalo ('AAAA-MM-DD HH:00' ou 'AAAA-MM-DD turno N')
+        total: Peças processadas no intervalo
+        aprovadas: Peças aprovadas
+        reprovadas: Peças reprovadas
+        percentual_aprovadas: Percentual de aprovação (0-100)
+        reprovacoes: Contadores por critério (peso, cor, comprimento)
+        caixas_fechadas: Caixas fechadas no intervalo
+        media_peso: Peso médio (None sem peças)
+        media_comprimento: Comprimento médio (None sem peças)
+    """
+    periodo: str
+    total: int
+    aprovadas: int
+    reprovadas: int
+    percentual_aprovadas: float
+    reprovacoes: Dict[str, int]
+    caixas_fechadas: int
+    media_peso: Optional[float]
+    media_comprimento: Optional[float]
+
+
+# Chave das peças sem codigo_produto em gerar_estatisticas_por_produto
+SEM_PRODUTO = "(sem produto)"
+
+
+def _montar_resumo(agregado: EstatisticasSistema, pecas_caixa_atual: int) -> ResumoRelatorio:
+    """Calcula os percentuais e monta o ResumoRelatorio a partir do agregado."""
+    total_aprovadas = agregado['aprovadas']
+    total_reprovadas = agregado['reprovadas']
+    total_processadas = total_aprovadas + total_reprovadas
+    
+    # Calcula percentuais
+    if total_processadas > 0:
+        percentual_aprovadas = (total_aprovadas / total_processadas) * 100
+        percentual_reprovadas = (total_reprovadas / total_processadas) * 100
+    else:
+        percentual_aprovadas = 0.0
+        percentual_reprovadas = 0.0
+    
+    return ResumoRelatorio(
+        total_processadas=total_processadas,
+        total_aprovadas=total_aprovadas,
+        total_reprovadas=total_reprovadas,
+        percentual_aprovadas=percentual_aprovadas,
+        percentual_reprovadas=percentual_reprovadas,
+        caixas_fechadas=agregado['caixas_fechadas'],
+        pecas_caixa_atual=pecas_caixa_atual,
+        reprovacoes=dict(agregado['reprovacoes'])
+    )
+
+
+def _agregar_do_banco() -> Tuple[EstatisticasSistema, int]:
+    """
+    Obtém as estatísticas do banco. Com o journal ativo as tabelas não
+    refletem as alterações, então o sistema é reconstruído do journal.
+    """
+    if journal.journal_ativo():
+        sistema = journal.carregar_sistema()
+        if sistema is not None:
+            obter_medidas_spc(sistema)
+            return obter_estatisticas(sistema), len(sistema['caixa_atual']['pecas'])
+    return database.agregar_estatisticas()
+
+
+def gerar_resumo(sistema: SistemaArmazenamento) -> ResumoRelatorio:
+    """
+    Gera os números principais do relatório a partir das estatísticas
+    agregadas, em tempo constante.
+    
+    Args:
+        sistema: Estado atual do sistema
+    
+    Returns:
+        ResumoRelatorio com totais, percentuais, caixas e reprovações por critério
+    """
+    return _montar_resumo(obter_estatisticas(sistema), len(sistema['caixa_atual']['pecas']))
+
+
+def gerar_resumo_do_banco() -> ResumoRelatorio:
+    """
+    Gera os números principais do relatório direto do banco de dados,
+    com COUNT/GROUP BY, sem carregar as peças.
+    
+    Returns:
+        ResumoRelatorio com totais, percentuais, caixas e reprovações por critério
+    """
+    return _montar_resumo(*_agregar_do_banco())
+
+
+def gerar_indicadores_spc(sistema: SistemaArmazenamento) -> Dict[str, IndicadoresSPC]:
+    """
+    Gera os indicadores de controle estatístico (média, desvio padrão,
+    mínimo, máximo, Cp e Cpk) de peso e comprimento de todas as peças,
+    contra os limites gerais em uso, a partir das medidas incrementais.
+    
+    Args:
+        sistema: Estado atual do sistema
+    
+    Returns:
+        Dicionário {'peso': IndicadoresSPC, 'comprimento': IndicadoresSPC}
+    """
+    return indicadores_por_medida(obter_medidas_spc(sistema), obter_criterios())
+
+
+def gerar_indicadores_spc_do_banco() -> Dict[str, IndicadoresSPC]:
+    """
+    Gera os indicadores de controle estatístico direto do banco de dados.
+    
+    Returns:
+        Dicionário {'peso': IndicadoresSPC, 'comprimento': IndicadoresSPC}
+    """
+    agregado, _ = _agregar_do_banco()
+    return indicadores_por_medida(agregado['spc'], obter_criterios())
+
+
+def _distribuicoes(
+    agregado: EstatisticasSistema,
+    medidas: Dict[str, MedidaSPC]
+) -> Dict[str, DistribuicaoMedida]:
+    """Resume os histogramas do agregado, limitando os quantis aos extremos exatos."""
+    return {
+        nome: resumir_distribuicao(histograma, medidas[nome]['minimo'], medidas[nome]['maximo'])
+        for nome, histograma in agregado['distribuicao'].items()
+    }
+
+
+def gerar_distribuicoes(sistema: SistemaArmazenamento) -> Dict[str, DistribuicaoMedida]:
+    """
+    Gera os quantis (p50, p95, p99) e o histograma agrupado de peso e
+    comprimento a partir dos histogramas incrementais, sem percorrer as peças.
+    
+    Args:
+        sistema: Estado atual do sistema
+    
+    Returns:
+        Dicionário {'peso': DistribuicaoMedida, 'comprimento': DistribuicaoMedida}
+    """
+    medidas = obter_medidas_spc(sistema)
+    return _distribuicoes(obter_estatisticas(sistema), medidas)
+
+
+def gerar_distribuicoes_do_banco() -> Dict[str, DistribuicaoMedida]:
+    """
+    Gera os quantis e histogramas de peso e comprimento direto do banco de dados.
+    
+    Returns:
+        Dicionário {'peso': DistribuicaoMedida, 'comprimento': DistribuicaoMedida}
+    """
+    agregado, _ = _agregar_do_banco()
+    return _distribuicoes(agregado, agregado['spc'])
+
+
 def gerar_relatorio_completo(sistema: SistemaArmazenamento) -> str:
     """
     Gera um relatório consolidado com todas as estatísticas do sistema.
@@ -32,6 +250,7 @@ def gerar_relatorio_completo(sistema: SistemaArmazenamento) -> str:
     - Quantidade de caixas fechadas
     - Status da caixa em preenchimento
     - Detalhamento de reprovações por critério
+    - Detalhamento por produto (quando há peças com codigo_produto)
     
     Args:
         sistema: Estado atual do sistema
@@ -39,24 +258,109 @@ def gerar_relatorio_completo(sistema: SistemaArmazenamento) -> str:
     Returns:
         String formatada com o relatório completo
     """
-    total_aprovadas = len(sistema['pecas_aprovadas'])
-    total_reprovadas = len(sistema['pecas_reprovadas'])
-    total_processadas = total_aprovadas + total_reprovadas
+    return _formatar_relatorio(
+        gerar_resumo(sistema),
+        _estatisticas_por_produto(obter_estatisticas(sistema)['produtos']),
+        gerar_indicadores_spc(sistema),
+        gerar_distribuicoes(sistema)
+    )
+
+
+def gerar_relatorio_do_banco() -> str:
+    """
+    Gera o mesmo relatório de gerar_relatorio_completo com consultas de
+    agregação no banco de dados, sem carregar o sistema em memória.
     
-    # Calcula percentuais
-    if total_processadas > 0:
-        percentual_aprovadas = (total_aprovadas / total_processadas) * 100
-        percentual_reprovadas = (total_reprovadas / total_processadas) * 100
-    else:
-        percentual_aprovadas = 0.0
-        percentual_reprovadas = 0.0
+    Returns:
+        String formatada com o relatório completo
+    """
+    agregado, pecas_caixa_atual = _agregar_do_banco()
+    return _formatar_relatorio(
+        _montar_resumo(agregado, pecas_caixa_atual),
+        _estatisticas_por_produto(agregado['produtos']),
+        indicadores_por_medida(agregado['spc'], obter_criterios()),
+        _distribuicoes(agregado, agregado['spc'])
+    )
+
+
+def _montar_tendencia(periodo: str, linha: Dict[str, Any]) -> TendenciaPeriodo:
+    """Converte uma linha de rollup em TendenciaPeriodo."""
+    total = linha['aprovadas'] + linha['reprovadas']
+    return TendenciaPeriodo(
+        periodo=periodo,
+        total=total,
+        aprovadas=linha['aprovadas'],
+        reprovadas=linha['reprovadas'],
+        percentual_aprovadas=(linha['aprovadas'] / total) * 100 if total else 0.0,
+        reprovacoes={criterio: linha[f'reprovacoes_{criterio}'] for criterio in CRITERIOS},
+        caixas_fechadas=linha['caixas_fechadas'],
+        media_peso=linha['soma_peso'] / total if total else None,
+        media_comprimento=linha['soma_comprimento'] / total if total else None
+    )
+
+
+def gerar_tendencia_por_hora(inicio: date, fim: date) -> List[TendenciaPeriodo]:
+    """
+    Gera os números de cada hora com movimento entre dois dias, a partir dos
+    rollups por hora, sem percorrer as peças.
     
-    # Contabiliza caixas
-    total_caixas_fechadas = len(sistema['caixas_fechadas'])
-    pecas_caixa_atual = len(sistema['caixa_atual']['pecas'])
+    Args:
+        inicio: Primeiro dia
+        fim: Último dia (inclusive)
     
-    # Analisa motivos de reprovação
-    contadores_motivos = analisar_motivos_reprovacao(sistema['pecas_reprovadas'])
+    Returns:
+        Lista de TendenciaPeriodo em ordem cronológica
+    """
+    linhas = database.carregar_rollups_horas(f"{inicio.isoformat()} 00:00", f"{fim.isoformat()} 23:00")
+    return [_montar_tendencia(linha['hora'], linha) for linha in linhas]
+
+
+def gerar_tendencia_por_turno(inicio: date, fim: date) -> List[TendenciaPeriodo]:
+    """
+    Gera os números de cada turno com movimento entre dois dias, a partir
+    dos rollups por turno. O turno que atravessa a meia-noite pertence ao
+    dia em que começou.
+    
+    Args:
+        inicio: Primeiro dia
+        fim: Último dia (inclusive)
+    
+    Returns:
+        Lista de TendenciaPeriodo em ordem cronológica
+    """
+    linhas = database.carregar_rollups_turnos(inicio.isoformat(), fim.isoformat())
+    return [_montar_tendencia(f"{linha['dia']} turno {linha['turno']}", linha) for linha in linhas]
+
+
+def formatar_indicador(valor: Optional[float], casas: int = 2) -> str:
+    """
+    Formata um indicador de SPC, usando "-" quando não pode ser calculado.
+    
+    Args:
+        valor: Valor do indicador (ou None)
+        casas: Casas decimais
+    
+    Returns:
+        Texto do indicador
+    """
+    return "-" if valor is None else f"{valor:.{casas}f}"
+
+
+def _formatar_relatorio(
+    resumo: ResumoRelatorio,
+    por_produto: Dict[str, EstatisticasProduto],
+    indicadores_spc: Dict[str, IndicadoresSPC],
+    distribuicoes: Dict[str, DistribuicaoMedida]
+) -> str:
+    """Formata o texto do relatório a partir do resumo, dos produtos, do SPC e dos quantis."""
+    total_aprovadas = resumo['total_aprovadas']
+    total_reprovadas = resumo['total_reprovadas']
+    total_processadas = resumo['total_processadas']
+    percentual_aprovadas = resumo['percentual_aprovadas']
+    percentual_reprovadas = resumo['percentual_reprovadas']
+    total_caixas_fechadas = resumo['caixas_fechadas']
+    pecas_caixa_atual = resumo['pecas_caixa_atual']
+    contadores_motivos = resumo['reprovacoes']
     
     # Formata relatório
     relatorio = []
@@ -86,6 +390,35 @@ def gerar_relatorio_completo(sistema: SistemaArmazenamento) -> str:
         relatorio.append(f"  Por comprimento inadequado: {contadores_motivos['comprimento']} peças")
         relatorio.append("")
     
+    if set(por_produto) - {SEM_PRODUTO}:
+        relatorio.append("🏷️ POR PRODUTO:")
+        for produto, estatisticas in por_produto.items():
+            relatorio.append(
+                f"  {produto}: {estatisticas['total']} peças, "
+                f"{estatisticas['aprovadas']} aprovadas ({estatisticas['percentual_aprovadas']:.1f}%), "
+                f"{estatisticas['reprovadas']} reprovadas"
+            )
+        relatorio.append("")
+    
+    if total_processadas > 0:
+        relatorio.append("📈 CONTROLE ESTATÍSTICO (SPC):")
+        for medida, indicadores in indicadores_spc.items():
+            relatorio.append(
+                f"  {medida.capitalize()}: média {formatar_indicador(indicadores['media'])}"
+                f" | σ {formatar_indicador(indicadores['desvio_padrao'])}"
+                f" | mín {formatar_indicador(indicadores['minimo'])}"
+                f" | máx {formatar_indicador(indicadores['maximo'])}"
+                f" | Cp {formatar_indicador(indicadores['cp'])}"
+                f" | Cpk {formatar_indicador(indicadores['cpk'])}"
+            )
+            quantis = distribuicoes[medida]['quantis']
+            relatorio.append(
+                "    " + " | ".join(
+                    f"{nome} {formatar_indicador(valor)}" for nome, valor in quantis.items()
+                )
+            )
+        relatorio.append("")
+    
     relatorio.append("=" * 40)
     
     return "\n".join(relatorio)
@@ -110,9 +443,42 @@ def gerar_estatisticas_reprovacao(pecas_reprovadas: List[Peca]) -> EstatisticasR
     )
 
 
+def gerar_estatisticas_por_produto(sistema: SistemaArmazenamento) -> Dict[str, EstatisticasProduto]:
+    """
+    Gera as estatísticas de aprovação e reprovação de cada produto a partir
+    dos contadores por produto das estatísticas agregadas.
+    
+    Args:
+        sistema: Estado atual do sistema
+    
+    Returns:
+        Dicionário {codigo_produto: EstatisticasProduto} ordenado pelo código;
+        peças sem produto ficam em SEM_PRODUTO
+    """
+    return _estatisticas_por_produto(obter_estatisticas(sistema)['produtos'])
+
+
+def _estatisticas_por_produto(produtos: Dict[str, ContagemProduto]) -> Dict[str, EstatisticasProduto]:
+    """Converte os contadores por produto do agregado em EstatisticasProduto ordenadas."""
+    estatisticas: Dict[str, EstatisticasProduto] = {}
+    for produto in sorted(produtos, key=lambda p: (p == SEM_CODIGO_PRODUTO, p)):
+        contagem = produtos[produto]
+        total = contagem['aprovadas'] + contagem['reprovadas']
+        estatisticas[produto if produto != SEM_CODIGO_PRODUTO else SEM_PRODUTO] = EstatisticasProduto(
+            total=total,
+            aprovadas=contagem['aprovadas'],
+            reprovadas=contagem['reprovadas'],
+            percentual_aprovadas=(contagem['aprovadas'] / total) * 100,
+            reprovacoes=dict(contagem['reprovacoes'])
+        )
+    return estatisticas
+
+
 def analisar_motivos_reprovacao(pecas_reprovadas: list) -> Dict[str, int]:
     """
     Analisa e contabiliza os motivos de reprovação por critério.
+    Usa o codigo_reprovacao das peças; só peças sem código são
+    classificadas pelo texto dos motivos.
     
     Args:
         pecas_reprovadas: Lista de peças reprovadas
@@ -120,20 +486,10 @@ def analisar_motivos_reprovacao(pecas_reprovadas: list) -> Dict[str, int]:
     Returns:
         Dicionário com contadores por tipo de motivo
     """
-    contadores = {
-        'peso': 0,
-        'cor': 0,
-        'comprimento': 0
-    }
+    contadores = {criterio: 0 for criterio in CRITERIOS}
     
     for peca in pecas_reprovadas:
-        for motivo in peca['motivos_reprovacao']:
-            motivo_lower = motivo.lower()
-            if 'peso' in motivo_lower:
-                contadores['peso'] += 1
-            elif 'cor' in motivo_lower:
-                contadores['cor'] += 1
-            elif 'comprimento' in motivo_lower:
-                contadores['comprimento'] += 1
+        for criterio, quantidade in contar_reprovacoes(peca).items():
+            contadores[criterio] += quantidade
     
     return contadores
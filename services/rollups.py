@@ -0,0 +1,231 @@
+"""
+Agregados por hora e por turno (rollups) mantidos pelo próprio SQLite.
+
+As tabelas rollup_horas e rollup_turnos acumulam, por intervalo de tempo,
+peças aprovadas e reprovadas, reprovações por critério, caixas fechadas e
+as somas de peso e comprimento (para as médias). Gatilhos (triggers) em
+pecas, motivos_reprovacao e caixas atualizam os dois níveis na mesma
+transação de cada gravação, qualquer que seja o caminho (persistência
+incremental, gravação em segundo plano ou sincronização completa), e usam o
+created_at da peça. Consultar meses de tendência lê poucas linhas por dia,
+sem percorrer as peças.
+
+Os intervalos usam a hora local. Os turnos têm HORAS_POR_TURNO horas a partir
+de INICIO_PRIMEIRO_TURNO; o turno que atravessa a meia-noite pertence ao dia
+em que começou.
+
+Os rollups seguem as tabelas normalizadas: com o journal de eventos ativo
+elas não são gravadas e os rollups ficam vazios.
+"""
+
+import sqlite3
+from typing import Dict, List, Tuple
+
+
+# Hora de início do primeiro turno do dia e duração de cada turno
+INICIO_PRIMEIRO_TURNO = 6
+HORAS_POR_TURNO = 8
+
+# Colunas acumuladas nos dois níveis
+COLUNAS_ROLLUP = (
+    'aprovadas', 'reprovadas',
+    'reprovacoes_peso', 'reprovacoes_cor', 'reprovacoes_comprimento',
+    'caixas_fechadas', 'soma_peso', 'soma_comprimento'
+)
+
+_DEFINICAO_COLUNAS = ",\n".join(
+    f"    {coluna} {'REAL' if coluna.startswith('soma_') else 'INTEGER'} NOT NULL DEFAULT 0"
+    for coluna in COLUNAS_ROLLUP
+)
+
+TABELAS_ROLLUP = (
+    f"""
+    CREATE TABLE IF NOT EXISTS rollup_horas (
+        hora TEXT PRIMARY KEY,
+    {_DEFINICAO_COLUNAS}
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS rollup_turnos (
+        dia TEXT NOT NULL,
+        turno INTEGER NOT NULL,
+    {_DEFINICAO_COLUNAS},
+        PRIMARY KEY (dia, turno)
+    )
+    """,
+)
+
+
+def _chaves(momento: str) -> Dict[str, Tuple[str, ...]]:
+    """Expressões SQL das chaves de cada tabela para um instante (UTC)."""
+    deslocamento = f"'-{INICIO_PRIMEIRO_TURNO} hours'"
+    return {
+        'rollup_horas': (f"strftime('%Y-%m-%d %H:00', {momento}, 'localtime')",),
+        'rollup_turnos': (
+            f"date({momento}, 'localtime', {deslocamento})",
+            f"CAST(strftime('%H', {momento}, 'localtime', {deslocamento}) AS INTEGER)"
+            f" / {HORAS_POR_TURNO} + 1",
+        ),
+    }
+
+
+_COLUNAS_CHAVE = {'rollup_horas': ('hora',), 'rollup_turnos': ('dia', 'turno')}
+
+
+def _acumular(momento: str, valores: Dict[str, str], origem: str = "") -> List[str]:
+    """
+    Monta os comandos que somam valores às linhas de hora e de turno.
+
+    Args:
+        momento: Expressão SQL do instante (UTC) que define o intervalo
+        valores: Expressão SQL do incremento de cada coluna (demais: 0)
+        origem: Cláusulas FROM/WHERE para somar várias linhas, agrupadas
+            por intervalo (opcional; o WHERE é obrigatório no upsert com SELECT)
+
+    Returns:
+        Um comando INSERT ... ON CONFLICT por tabela
+    """
+    comandos = []
+    for tabela, chaves in _chaves(momento).items():
+        colunas = _COLUNAS_CHAVE[tabela] + tuple(valores)
+        expressoes = chaves + tuple(valores.values())
+        if origem:
+            agrupamento = ", ".join(str(posicao) for posicao in range(1, len(chaves) + 1))
+            fonte = f"SELECT {', '.join(expressoes)} {origem} GROUP BY {agrupamento}"
+        else:
+            fonte = f"VALUES ({', '.join(expressoes)})"
+        atualizacoes = ", ".join(f"{coluna} = {coluna} + excluded.{coluna}" for coluna in valores)
+        comandos.append(
+            f"INSERT INTO {tabela} ({', '.join(colunas)}) {fonte} "
+            f"ON CONFLICT({', '.join(_COLUNAS_CHAVE[tabela])}) DO UPDATE SET {atualizacoes}"
+        )
+    return comandos
+
+
+def _valores_peca(linha: str, sinal: str = "", soma: bool = False) -> Dict[str, str]:
+    """Incrementos de uma linha de pecas (NEW/OLD ou alias), com sinal opcional."""
+    agregar = (lambda expressao: f"SUM({expressao})") if soma else (lambda expressao: expressao)
+    valores = {
+        'aprovadas': f"{linha}.aprovada",
+        'reprovadas': f"(1 - {linha}.aprovada)",
+        'reprovacoes_peso': f"COALESCE(({linha}.codigo_reprovacao & 1) != 0, 0)",
+        'reprovacoes_cor': f"COALESCE(({linha}.codigo_reprovacao & 2) != 0, 0)",
+        'reprovacoes_comprimento': f"COALESCE(({linha}.codigo_reprovacao & 4) != 0, 0)",
+        'soma_peso': f"{linha}.peso",
+        'soma_comprimento': f"{linha}.comprimento",
+    }
+    return {coluna: agregar(f"{sinal}{expressao}") for coluna, expressao in valores.items()}
+
+
+def _valores_motivo(linha: str, sinal: str = "", soma: bool = False) -> Dict[str, str]:
+    """Incrementos de um motivo em texto (peças sem codigo_reprovacao)."""
+    agregar = (lambda expressao: f"SUM({expressao})") if soma else (lambda expressao: expressao)
+    peso = f"{linha}.motivo LIKE '%peso%'"
+    cor = f"{linha}.motivo LIKE '%cor%'"
+    comprimento = f"{linha}.motivo LIKE '%comprimento%'"
+    valores = {
+        'reprovacoes_peso': f"({peso})",
+        'reprovacoes_cor': f"(NOT {peso} AND {cor})",
+        'reprovacoes_comprimento': f"(NOT {peso} AND NOT {cor} AND {comprimento})",
+    }
+    return {coluna: agregar(f"{sinal}{expressao}") for coluna, expressao in valores.items()}
+
+
+def _gatilho(nome: str, evento: str, comandos: List[str], condicao: str = "") -> str:
+    quando = f"WHEN {condicao}" if condicao else ""
+    corpo = ";\n".join(comandos)
+    return f"CREATE TRIGGER IF NOT EXISTS {nome} {evento} {quando}\nBEGIN\n{corpo};\nEND"
+
+
+def _motivo_sem_codigo(linha: str) -> str:
+    return (
+        f"EXISTS (SELECT 1 FROM pecas WHERE id = {linha}.peca_id "
+        f"AND aprovada = 0 AND codigo_reprovacao IS NULL)"
+    )
+
+
+def _criado_em_da_peca(linha: str) -> str:
+    return f"(SELECT created_at FROM pecas WHERE id = {linha}.peca_id)"
+
+
+GATILHOS_ROLLUP = (
+    _gatilho(
+        "rollup_peca_inserida", "AFTER INSERT ON pecas",
+        _acumular("NEW.created_at", _valores_peca("NEW"))
+    ),
+    _gatilho(
+        "rollup_peca_removida", "AFTER DELETE ON pecas",
+        _acumular("OLD.created_at", _valores_peca("OLD", "-"))
+    ),
+    _gatilho(
+        "rollup_peca_alterada",
+        "AFTER UPDATE OF peso, comprimento, aprovada, codigo_reprovacao ON pecas",
+        _acumular("OLD.created_at", _valores_peca("OLD", "-"))
+        + _acumular("NEW.created_at", _valores_peca("NEW")),
+        "OLD.peso IS NOT NEW.peso OR OLD.comprimento IS NOT NEW.comprimento"
+        " OR OLD.aprovada IS NOT NEW.aprovada OR OLD.codigo_reprovacao IS NOT NEW.codigo_reprovacao"
+    ),
+    _gatilho(
+        "rollup_motivo_inserido", "AFTER INSERT ON motivos_reprovacao",
+        _acumular(_criado_em_da_peca("NEW"), _valores_motivo("NEW")),
+        _motivo_sem_codigo("NEW")
+    ),
+    _gatilho(
+        "rollup_motivo_removido", "AFTER DELETE ON motivos_reprovacao",
+        _acumular(_criado_em_da_peca("OLD"), _valores_motivo("OLD", "-")),
+        _motivo_sem_codigo("OLD")
+    ),
+    _gatilho(
+        "rollup_caixa_fechada", "AFTER UPDATE OF fechada ON caixas",
+        _acumular("CURRENT_TIMESTAMP", {'caixas_fechadas': "1"}),
+        "NEW.fechada = 1 AND OLD.fechada = 0"
+    ),
+    _gatilho(
+        "rollup_caixa_inserida_fechada", "AFTER INSERT ON caixas",
+        _acumular("CURRENT_TIMESTAMP", {'caixas_fechadas': "1"}),
+        "NEW.fechada = 1"
+    ),
+)
+
+
+def criar_rollups(cursor: sqlite3.Cursor) -> None:
+    """
+    Cria as tabelas e os gatilhos de rollup. Em bancos que já tinham peças
+    antes dos rollups existirem, preenche as tabelas a partir dos dados.
+
+    Args:
+        cursor: Cursor da transação em andamento
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'rollup_horas'")
+    existia = cursor.fetchone() is not None
+
+    for comando in TABELAS_ROLLUP + GATILHOS_ROLLUP:
+        cursor.execute(comando)
+
+    if not existia:
+        reconstruir_rollups(cursor)
+
+
+def reconstruir_rollups(cursor: sqlite3.Cursor) -> None:
+    """
+    Recalcula os rollups a partir das tabelas, com GROUP BY por intervalo.
+    Caixas fechadas antes dos rollups entram no intervalo da sua criação.
+
+    Args:
+        cursor: Cursor da transação em andamento
+    """
+    cursor.execute("DELETE FROM rollup_horas")
+    cursor.execute("DELETE FROM rollup_turnos")
+
+    comandos = (
+        _acumular("p.created_at", _valores_peca("p", soma=True), "FROM pecas p WHERE 1")
+        + _acumular(
+            "p.created_at",
+            _valores_motivo("m", soma=True),
+            "FROM motivos_reprovacao m JOIN pecas p ON p.id = m.peca_id"
+            " WHERE p.aprovada = 0 AND p.codigo_reprovacao IS NULL"
+        )
+        + _acumular("c.created_at", {'caixas_fechadas': "COUNT(*)"}, "FROM caixas c WHERE c.fechada = 1")
+    )
+    for comando in comandos:
+        cursor.execute(comando)
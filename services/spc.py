@@ -0,0 +1,261 @@
+"""
+Controle estatístico de processo (SPC) incremental.
+
+Para cada medida (peso e comprimento) são mantidos a contagem, a média e a
+soma dos quadrados dos desvios pelo algoritmo de Welford, além do mínimo e
+do máximo. Cada peça registrada ou removida custa O(1), e os índices de
+capacidade Cp/Cpk são calculados sob demanda contra os limites em uso.
+
+As medidas ficam no agregado de services.estatisticas, que cuida da
+persistência e do recálculo quando necessário.
+"""
+
+import math
+from typing import Any, Dict, Iterable, Optional, TypedDict
+
+from services.regras import CriteriosCompilados
+
+
+# Medidas acompanhadas e os campos de limite correspondentes nos critérios
+MEDIDAS_SPC = {
+    'peso': ('peso_minimo', 'peso_maximo'),
+    'comprimento': ('comprimento_minimo', 'comprimento_maximo'),
+}
+
+
+class MedidaSPC(TypedDict):
+    """
+    Estado incremental de uma medida.
+
+    Attributes:
+        n: Quantidade de valores
+        media: Média dos valores
+        m2: Soma dos quadrados dos desvios em relação à média (Welford)
+        minimo: Menor valor (None sem valores)
+        maximo: Maior valor (None sem valores)
+        n_minimo: Quantos valores são iguais ao mínimo
+        n_maximo: Quantos valores são iguais ao máximo
+        extremos_exatos: False se o último valor igual ao mínimo ou ao máximo
+            foi removido; os extremos então precisam ser recalculados
+    """
+    n: int
+    media: float
+    m2: float
+    minimo: Optional[float]
+    maximo: Optional[float]
+    n_minimo: int
+    n_maximo: int
+    extremos_exatos: bool
+
+
+class IndicadoresSPC(TypedDict):
+    """
+    Indicadores de uma medida em relação aos limites de especificação.
+
+    Attributes:
+        n: Quantidade de valores
+        media: Média
+        desvio_padrao: Desvio padrão amostral (None com menos de 2 valores)
+        minimo: Menor valor
+        maximo: Maior valor
+        limite_inferior: Limite inferior de especificação
+        limite_superior: Limite superior de especificação
+        cp: Capacidade potencial (None sem dispersão)
+        cpk: Capacidade real, considerando a centralização (None sem dispersão)
+    """
+    n: int
+    media: Optional[float]
+    desvio_padrao: Optional[float]
+    minimo: Optional[float]
+    maximo: Optional[float]
+    limite_inferior: float
+    limite_superior: float
+    cp: Optional[float]
+    cpk: Optional[float]
+
+
+def criar_medida() -> MedidaSPC:
+    """
+    Factory function para criar uma medida sem valores.
+
+    Returns:
+        MedidaSPC vazia
+    """
+    return MedidaSPC(
+        n=0, media=0.0, m2=0.0, minimo=None, maximo=None, n_minimo=0, n_maximo=0, extremos_exatos=True
+    )
+
+
+def adicionar_valor(medida: MedidaSPC, valor: float) -> None:
+    """
+    Inclui um valor na medida (passo de Welford).
+
+    Args:
+        medida: Medida a atualizar
+        valor: Valor observado
+    """
+    medida['n'] += 1
+    delta = valor - medida['media']
+    medida['media'] += delta / medida['n']
+    medida['m2'] += delta * (valor - medida['media'])
+    if medida['minimo'] is None or valor < medida['minimo']:
+        medida['minimo'] = valor
+        medida['n_minimo'] = 1
+    elif valor == medida['minimo']:
+        medida['n_minimo'] += 1
+    if medida['maximo'] is None or valor > medida['maximo']:
+        medida['maximo'] = valor
+        medida['n_maximo'] = 1
+    elif valor == medida['maximo']:
+        medida['n_maximo'] += 1
+
+
+def remover_valor(medida: MedidaSPC, valor: float) -> None:
+    """
+    Retira um valor incluído antes (passo de Welford invertido).
+    Se era o último valor igual ao mínimo ou ao máximo, os extremos deixam
+    de ser exatos até recalcular_extremos().
+
+    Args:
+        medida: Medida a atualizar
+        valor: Valor a retirar
+    """
+    if medida['n'] <= 1:
+        medida.update(criar_medida())
+        return
+
+    n_anterior = medida['n']
+    medida['n'] -= 1
+    media_nova = (n_anterior * medida['media'] - valor) / medida['n']
+    medida['m2'] = max(0.0, medida['m2'] - (valor - medida['media']) * (valor - media_nova))
+    medida['media'] = media_nova
+    if valor == medida['minimo']:
+        medida['n_minimo'] -= 1
+        if medida['n_minimo'] == 0:
+            medida['extremos_exatos'] = False
+    if valor == medida['maximo']:
+        medida['n_maximo'] -= 1
+        if medida['n_maximo'] == 0:
+            medida['extremos_exatos'] = False
+
+
+def recalcular_extremos(medida: MedidaSPC, valores: Iterable[float]) -> None:
+    """
+    Recalcula mínimo e máximo a partir de todos os valores da medida.
+
+    Args:
+        medida: Medida a corrigir
+        valores: Todos os valores atualmente contabilizados na medida
+    """
+    minimo = maximo = None
+    n_minimo = n_maximo = 0
+    for valor in valores:
+        if minimo is None or valor < minimo:
+            minimo, n_minimo = valor, 1
+        elif valor == minimo:
+            n_minimo += 1
+        if maximo is None or valor > maximo:
+            maximo, n_maximo = valor, 1
+        elif valor == maximo:
+            n_maximo += 1
+    medida.update(
+        minimo=minimo, maximo=maximo, n_minimo=n_minimo, n_maximo=n_maximo, extremos_exatos=True
+    )
+
+
+def desvio_padrao(medida: MedidaSPC) -> Optional[float]:
+    """
+    Desvio padrão amostral da medida.
+
+    Args:
+        medida: Medida
+
+    Returns:
+        Desvio padrão, ou None com menos de 2 valores
+    """
+    if medida['n'] < 2:
+        return None
+    return math.sqrt(medida['m2'] / (medida['n'] - 1))
+
+
+def calcular_indicadores(
+    medida: MedidaSPC,
+    limite_inferior: float,
+    limite_superior: float
+) -> IndicadoresSPC:
+    """
+    Calcula média, desvio, extremos e Cp/Cpk da medida.
+
+    Cp = (LSE - LIE) / 6σ e Cpk = min(LSE - μ, μ - LIE) / 3σ.
+
+    Args:
+        medida: Medida
+        limite_inferior: Limite inferior de especificação (LIE)
+        limite_superior: Limite superior de especificação (LSE)
+
+    Returns:
+        IndicadoresSPC da medida
+    """
+    sigma = desvio_padrao(medida)
+    media = medida['media'] if medida['n'] > 0 else None
+    cp = cpk = None
+    if sigma:
+        cp = (limite_superior - limite_inferior) / (6 * sigma)
+        cpk = min(limite_superior - media, media - limite_inferior) / (3 * sigma)
+
+    return IndicadoresSPC(
+        n=medida['n'],
+        media=media,
+        desvio_padrao=sigma,
+        minimo=medida['minimo'],
+        maximo=medida['maximo'],
+        limite_inferior=limite_inferior,
+        limite_superior=limite_superior,
+        cp=cp,
+        cpk=cpk
+    )
+
+
+def indicadores_por_medida(
+    medidas: Dict[str, MedidaSPC],
+    criterios: CriteriosCompilados
+) -> Dict[str, IndicadoresSPC]:
+    """
+    Calcula os indicadores de todas as medidas contra os limites dos critérios.
+
+    Args:
+        medidas: Medidas indexadas pelo nome ('peso', 'comprimento')
+        criterios: Critérios com os limites de especificação
+
+    Returns:
+        Dicionário {medida: IndicadoresSPC}
+    """
+    return {
+        nome: calcular_indicadores(medidas[nome], criterios[minimo], criterios[maximo])
+        for nome, (minimo, maximo) in MEDIDAS_SPC.items()
+    }
+
+
+def montar_medida(dados: Any) -> MedidaSPC:
+    """
+    Monta uma medida a partir de dados decodificados de JSON.
+
+    Args:
+        dados: Dicionário com os campos de MedidaSPC
+
+    Returns:
+        MedidaSPC
+
+    Raises:
+        KeyError, TypeError, ValueError: Se os dados forem inválidos
+    """
+    return MedidaSPC(
+        n=int(dados['n']),
+        media=float(dados['media']),
+        m2=float(dados['m2']),
+        minimo=None if dados['minimo'] is None else float(dados['minimo']),
+        maximo=None if dados['maximo'] is None else float(dados['maximo']),
+        n_minimo=int(dados['n_minimo']),
+        n_maximo=int(dados['n_maximo']),
+        extremos_exatos=bool(dados['extremos_exatos'])
+    )
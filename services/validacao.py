@@ -1,78 +1,120 @@
 """
 Serviço de validação de qualidade de peças.
 Implementa os critérios de aprovação/reprovação.
+
+Os limites vêm do plano de validação em uso (services.regras), que pode ser
+recarregado sem reiniciar as interfaces.
 """
 
-from typing import Tuple, List
+from enum import IntFlag
+from typing import Any, Dict, List, Optional, Sequence, Tuple, TypedDict
 from models.peca import Peca
+from services.regras import CRITERIOS_PADRAO, CriteriosCompilados, obter_criterios
+
+# NumPy é opcional: com ele, validar_lote compara arrays inteiros de uma vez
+NUMPY_DISPONIVEL = False
+try:
+    import numpy as np
+    NUMPY_DISPONIVEL = True
+except ImportError:
+    NUMPY_DISPONIVEL = False
+
+
+# Critérios de qualidade padrão (valem enquanto nenhuma regra for configurada;
+# os critérios em uso são obtidos com services.regras.obter_criterios())
+PESO_MINIMO = CRITERIOS_PADRAO['peso_minimo']
+PESO_MAXIMO = CRITERIOS_PADRAO['peso_maximo']
+CORES_ACEITAS = list(CRITERIOS_PADRAO['cores_aceitas'])
+COMPRIMENTO_MINIMO = CRITERIOS_PADRAO['comprimento_minimo']
+COMPRIMENTO_MAXIMO = CRITERIOS_PADRAO['comprimento_maximo']
+
 
+def _mensagem_peso(peso: float, criterios: CriteriosCompilados) -> str:
+    return f"Peso fora do intervalo ({criterios['peso_minimo']}-{criterios['peso_maximo']}g): {peso}g"
 
-# Constantes dos critérios de qualidade
-PESO_MINIMO = 95.0
-PESO_MAXIMO = 105.0
-CORES_ACEITAS = ['azul', 'verde']
-COMPRIMENTO_MINIMO = 10.0
-COMPRIMENTO_MAXIMO = 20.0
 
+def _mensagem_cor(cor: str, criterios: CriteriosCompilados) -> str:
+    return f"Cor inadequada (esperado: {criterios['texto_cores']}): {cor}"
 
-def validar_peso(peso: float) -> Tuple[bool, str]:
+
+def _mensagem_comprimento(comprimento: float, criterios: CriteriosCompilados) -> str:
+    return (
+        f"Comprimento fora do intervalo ({criterios['comprimento_minimo']}-"
+        f"{criterios['comprimento_maximo']}cm): {comprimento}cm"
+    )
+
+
+def validar_peso(peso: float, criterios: Optional[CriteriosCompilados] = None) -> Tuple[bool, str]:
     """
     Valida se o peso está dentro do intervalo aceitável.
     
     Args:
         peso: Peso da peça em gramas
+        criterios: Critérios a aplicar (default: critérios gerais em uso)
     
     Returns:
         Tupla (válido, mensagem_erro)
-        - válido: True se o peso estiver no intervalo [95g, 105g]
+        - válido: True se o peso estiver no intervalo (padrão: [95g, 105g])
         - mensagem_erro: String vazia se válido, mensagem de erro caso contrário
     """
-    if PESO_MINIMO <= peso <= PESO_MAXIMO:
+    if criterios is None:
+        criterios = obter_criterios()
+    if criterios['peso_minimo'] <= peso <= criterios['peso_maximo']:
         return True, ""
-    return False, f"Peso fora do intervalo ({PESO_MINIMO}-{PESO_MAXIMO}g): {peso}g"
+    return False, _mensagem_peso(peso, criterios)
 
 
-def validar_cor(cor: str) -> Tuple[bool, str]:
+def validar_cor(cor: str, criterios: Optional[CriteriosCompilados] = None) -> Tuple[bool, str]:
     """
     Valida se a cor está entre as cores aceitas.
     
     Args:
         cor: Cor da peça
+        criterios: Critérios a aplicar (default: critérios gerais em uso)
     
     Returns:
         Tupla (válido, mensagem_erro)
-        - válido: True se a cor for azul ou verde (case-insensitive)
+        - válido: True se a cor for aceita (padrão: azul ou verde, case-insensitive)
         - mensagem_erro: String vazia se válido, mensagem de erro caso contrário
     """
+    if criterios is None:
+        criterios = obter_criterios()
     cor_normalizada = cor.lower().strip()
-    if cor_normalizada in CORES_ACEITAS:
+    if cor_normalizada in criterios['cores_aceitas']:
         return True, ""
-    cores_formatadas = " ou ".join(CORES_ACEITAS)
-    return False, f"Cor inadequada (esperado: {cores_formatadas}): {cor}"
+    return False, _mensagem_cor(cor, criterios)
 
 
-def validar_comprimento(comprimento: float) -> Tuple[bool, str]:
+def validar_comprimento(
+    comprimento: float,
+    criterios: Optional[CriteriosCompilados] = None
+) -> Tuple[bool, str]:
     """
     Valida se o comprimento está dentro do intervalo aceitável.
     
     Args:
         comprimento: Comprimento da peça em centímetros
+        criterios: Critérios a aplicar (default: critérios gerais em uso)
     
     Returns:
         Tupla (válido, mensagem_erro)
-        - válido: True se o comprimento estiver no intervalo [10cm, 20cm]
+        - válido: True se o comprimento estiver no intervalo (padrão: [10cm, 20cm])
         - mensagem_erro: String vazia se válido, mensagem de erro caso contrário
     """
-    if COMPRIMENTO_MINIMO <= comprimento <= COMPRIMENTO_MAXIMO:
+    if criterios is None:
+        criterios = obter_criterios()
+    if criterios['comprimento_minimo'] <= comprimento <= criterios['comprimento_maximo']:
         return True, ""
-    return False, f"Comprimento fora do intervalo ({COMPRIMENTO_MINIMO}-{COMPRIMENTO_MAXIMO}cm): {comprimento}cm"
+    return False, _mensagem_comprimento(comprimento, criterios)
 
 
 def validar_peca(peca: Peca) -> Tuple[bool, List[str]]:
     """
     Valida todos os critérios de qualidade de uma peça.
     
-    Uma peça é aprovada apenas se TODOS os critérios forem atendidos:
+    Uma peça é aprovada apenas se TODOS os critérios forem atendidos
+    (valores padrão; os limites em uso vêm de services.regras, segundo o
+    codigo_produto da peça):
     - Peso entre 95g e 105g
     - Cor azul ou verde
     - Comprimento entre 10cm e 20cm
@@ -85,19 +127,244 @@ def validar_peca(peca: Peca) -> Tuple[bool, List[str]]:
         - aprovada: True se todos os critérios forem atendidos
         - motivos_reprovacao: Lista de strings com os motivos de reprovação (vazia se aprovada)
     """
-    motivos = []
-    
-    peso_valido, mensagem_peso = validar_peso(peca['peso'])
-    if not peso_valido:
-        motivos.append(mensagem_peso)
+    criterios = obter_criterios(peca.get('codigo_produto'))
+    codigo = avaliar_peca(peca, criterios)
+    motivos = descrever_motivos(codigo, peca['peso'], peca['cor'], peca['comprimento'], criterios)
+    return codigo == MotivoReprovacao.NENHUM, motivos
+
+
+def aplicar_validacao(peca: Peca) -> Tuple[bool, List[str]]:
+    """
+    Valida a peça e grava o resultado nela: aprovada, codigo_reprovacao e
+    motivos_reprovacao (mensagens montadas a partir do código).
     
-    cor_valida, mensagem_cor = validar_cor(peca['cor'])
-    if not cor_valida:
-        motivos.append(mensagem_cor)
+    Args:
+        peca: Peça a ser validada (alterada no lugar)
     
-    comprimento_valido, mensagem_comprimento = validar_comprimento(peca['comprimento'])
-    if not comprimento_valido:
-        motivos.append(mensagem_comprimento)
+    Returns:
+        Tupla (aprovada, motivos_reprovacao), como em validar_peca
+    """
+    criterios = obter_criterios(peca.get('codigo_produto'))
+    codigo = avaliar_peca(peca, criterios)
+    aprovada = codigo == MotivoReprovacao.NENHUM
+    motivos = descrever_motivos(codigo, peca['peso'], peca['cor'], peca['comprimento'], criterios)
     
-    aprovada = len(motivos) == 0
+    peca['aprovada'] = aprovada
+    peca['codigo_reprovacao'] = int(codigo)
+    peca['motivos_reprovacao'] = motivos
     return aprovada, motivos
+
+
+class MotivoReprovacao(IntFlag):
+    """
+    Códigos dos critérios reprovados, combináveis como bitmask.
+    
+    Exemplo: MotivoReprovacao.PESO | MotivoReprovacao.COR == 3
+    """
+    NENHUM = 0
+    PESO = 1
+    COR = 2
+    COMPRIMENTO = 4
+
+
+def avaliar_peca(
+    peca: Peca,
+    criterios: Optional[CriteriosCompilados] = None
+) -> MotivoReprovacao:
+    """
+    Avalia os critérios de qualidade de uma peça sem montar mensagens.
+    
+    Args:
+        peca: Peça a ser avaliada
+        criterios: Critérios a aplicar (default: perfil do produto da peça)
+    
+    Returns:
+        Bitmask com os critérios reprovados (NENHUM se aprovada)
+    """
+    if criterios is None:
+        criterios = obter_criterios(peca.get('codigo_produto'))
+    codigo = MotivoReprovacao.NENHUM
+    if not criterios['peso_minimo'] <= peca['peso'] <= criterios['peso_maximo']:
+        codigo |= MotivoReprovacao.PESO
+    if peca['cor'].lower().strip() not in criterios['cores_aceitas']:
+        codigo |= MotivoReprovacao.COR
+    if not criterios['comprimento_minimo'] <= peca['comprimento'] <= criterios['comprimento_maximo']:
+        codigo |= MotivoReprovacao.COMPRIMENTO
+    return codigo
+
+
+class ResultadoLote(TypedDict):
+    """
+    Resultado da validação de um lote de peças.
+    
+    Attributes:
+        aprovadas: Indicador de aprovação de cada peça, na ordem do lote
+        codigos: Bitmask de MotivoReprovacao de cada peça (0 se aprovada)
+    """
+    aprovadas: Sequence[bool]
+    codigos: Sequence[int]
+
+
+def _usar_numpy(*colunas: Any) -> bool:
+    """Indica se as colunas devem ser validadas com operações do NumPy."""
+    return NUMPY_DISPONIVEL and any(
+        not isinstance(coluna, (list, tuple)) and hasattr(coluna, '__array__')
+        for coluna in colunas
+    )
+
+
+def _codigos_numpy(pesos: Any, cores: Any, comprimentos: Any, criterios: CriteriosCompilados) -> Any:
+    """Calcula os códigos de um lote com operações vetorizadas do NumPy."""
+    pesos_np = np.asarray(pesos, dtype=float)
+    comprimentos_np = np.asarray(comprimentos, dtype=float)
+    cores_np = np.char.strip(np.char.lower(np.asarray(cores, dtype=str)))
+    
+    return (
+        np.where(
+            (pesos_np >= criterios['peso_minimo']) & (pesos_np <= criterios['peso_maximo']),
+            0, int(MotivoReprovacao.PESO)
+        )
+        | np.where(np.isin(cores_np, list(criterios['cores_aceitas'])), 0, int(MotivoReprovacao.COR))
+        | np.where(
+            (comprimentos_np >= criterios['comprimento_minimo'])
+            & (comprimentos_np <= criterios['comprimento_maximo']),
+            0, int(MotivoReprovacao.COMPRIMENTO)
+        )
+    ).astype(np.uint8)
+
+
+def _codigos_python(
+    pesos: Sequence[float],
+    cores: Sequence[str],
+    comprimentos: Sequence[float],
+    criterios: CriteriosCompilados
+) -> List[int]:
+    """Calcula os códigos de um lote com uma passada por coluna."""
+    # Limites em variáveis locais
+    peso_min, peso_max = criterios['peso_minimo'], criterios['peso_maximo']
+    comp_min, comp_max = criterios['comprimento_minimo'], criterios['comprimento_maximo']
+    cores_aceitas = criterios['cores_aceitas']
+    bit_peso = int(MotivoReprovacao.PESO)
+    bit_cor = int(MotivoReprovacao.COR)
+    bit_comprimento = int(MotivoReprovacao.COMPRIMENTO)
+    
+    codigos = [0 if peso_min <= peso <= peso_max else bit_peso for peso in pesos]
+    for i, cor in enumerate(cores):
+        if cor.lower().strip() not in cores_aceitas:
+            codigos[i] |= bit_cor
+    for i, comprimento in enumerate(comprimentos):
+        if not comp_min <= comprimento <= comp_max:
+            codigos[i] |= bit_comprimento
+    return codigos
+
+
+def validar_lote(
+    pesos: Sequence[float],
+    cores: Sequence[str],
+    comprimentos: Sequence[float],
+    criterios: Optional[CriteriosCompilados] = None,
+    produtos: Optional[Sequence[Optional[str]]] = None
+) -> ResultadoLote:
+    """
+    Valida um lote de peças a partir das colunas de medições.
+    
+    Aplica os mesmos critérios de validar_peca, mas sem montar mensagens:
+    cada peça recebe um bitmask de MotivoReprovacao. Com arrays NumPy ou
+    Series do pandas (e NumPy instalado), as comparações são vetorizadas e o
+    resultado vem em arrays; com listas, em listas.
+    
+    Com a coluna produtos, as peças são agrupadas por produto e cada grupo é
+    validado com o perfil do seu produto.
+    
+    Args:
+        pesos: Pesos em gramas
+        cores: Cores informadas
+        comprimentos: Comprimentos em centímetros
+        criterios: Critérios a aplicar (default: critérios gerais em uso;
+            ignorado quando produtos é informado)
+        produtos: Código do produto de cada peça (None: critérios gerais)
+    
+    Returns:
+        ResultadoLote com aprovação e códigos de motivo de cada peça
+    
+    Raises:
+        ValueError: Se as colunas tiverem tamanhos diferentes
+    """
+    if not len(pesos) == len(cores) == len(comprimentos):
+        raise ValueError(
+            f"Colunas com tamanhos diferentes: {len(pesos)} pesos, "
+            f"{len(cores)} cores, {len(comprimentos)} comprimentos"
+        )
+    if produtos is not None and len(produtos) != len(pesos):
+        raise ValueError(f"Coluna de produtos com {len(produtos)} itens para {len(pesos)} peças")
+    
+    usar_numpy = _usar_numpy(pesos, cores, comprimentos)
+    
+    if produtos is None:
+        if criterios is None:
+            criterios = obter_criterios()
+        if usar_numpy:
+            codigos_np = _codigos_numpy(pesos, cores, comprimentos, criterios)
+            return ResultadoLote(aprovadas=codigos_np == 0, codigos=codigos_np)
+        codigos = _codigos_python(pesos, cores, comprimentos, criterios)
+        return ResultadoLote(aprovadas=[codigo == 0 for codigo in codigos], codigos=codigos)
+    
+    # Agrupa as linhas por produto: uma consulta ao plano por produto distinto
+    grupos: Dict[Optional[str], List[int]] = {}
+    for i, produto in enumerate(produtos):
+        grupos.setdefault(produto, []).append(i)
+    
+    if usar_numpy:
+        pesos_np = np.asarray(pesos, dtype=float)
+        comprimentos_np = np.asarray(comprimentos, dtype=float)
+        cores_np = np.asarray(cores, dtype=str)
+        codigos_np = np.zeros(len(pesos_np), dtype=np.uint8)
+        for produto, linhas in grupos.items():
+            codigos_np[linhas] = _codigos_numpy(
+                pesos_np[linhas], cores_np[linhas], comprimentos_np[linhas], obter_criterios(produto)
+            )
+        return ResultadoLote(aprovadas=codigos_np == 0, codigos=codigos_np)
+    
+    codigos = [0] * len(pesos)
+    for produto, linhas in grupos.items():
+        codigos_grupo = _codigos_python(
+            [pesos[i] for i in linhas],
+            [cores[i] for i in linhas],
+            [comprimentos[i] for i in linhas],
+            obter_criterios(produto)
+        )
+        for i, codigo in zip(linhas, codigos_grupo):
+            codigos[i] = codigo
+    return ResultadoLote(aprovadas=[codigo == 0 for codigo in codigos], codigos=codigos)
+
+
+def descrever_motivos(
+    codigo: int,
+    peso: float,
+    cor: str,
+    comprimento: float,
+    criterios: Optional[CriteriosCompilados] = None
+) -> List[str]:
+    """
+    Monta as mensagens de reprovação de uma peça a partir do seu código.
+    
+    Args:
+        codigo: Bitmask de MotivoReprovacao (ex.: de validar_lote)
+        peso: Peso da peça em gramas
+        cor: Cor da peça
+        comprimento: Comprimento da peça em centímetros
+        criterios: Critérios a aplicar (default: critérios gerais em uso)
+    
+    Returns:
+        Lista de mensagens, idêntica à de validar_peca para a mesma peça
+    """
+    if criterios is None:
+        criterios = obter_criterios()
+    motivos = []
+    if codigo & MotivoReprovacao.PESO:
+        motivos.append(_mensagem_peso(peso, criterios))
+    if codigo & MotivoReprovacao.COR:
+        motivos.append(_mensagem_cor(cor, criterios))
+    if codigo & MotivoReprovacao.COMPRIMENTO:
+        motivos.append(_mensagem_comprimento(comprimento, criterios))
+    return motivos
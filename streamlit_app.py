@@ -16,20 +16,31 @@ import pandas as pd
 from typing import Dict, List
 
 from services.armazenamento import (
-    inicializar_sistema,
     adicionar_peca_em_caixa,
+    carregar_colunas_pecas,
+    carregar_pagina_reprovadas,
+    carregar_peca_registrada,
+    registrar_peca_reprovada,
     remover_peca_por_id,
+    existe_peca,
+    obter_ultimos_alertas,
     SistemaArmazenamento
 )
-from services.validacao import (
-    validar_peca,
-    PESO_MINIMO,
-    PESO_MAXIMO,
-    CORES_ACEITAS,
-    COMPRIMENTO_MINIMO,
-    COMPRIMENTO_MAXIMO
+from services.cache_versao import memorizar_por_versao
+from services.estado_compartilhado import EstadoCompartilhado
+from services.validacao import aplicar_validacao
+from services.regras import obter_criterios, obter_plano, verificar_regras
+from services.relatorio import (
+    SEM_PRODUTO,
+    TendenciaPeriodo,
+    formatar_indicador,
+    gerar_distribuicoes,
+    gerar_estatisticas_por_produto,
+    gerar_indicadores_spc,
+    gerar_resumo,
+    gerar_tendencia_por_hora,
+    gerar_tendencia_por_turno
 )
-from services.relatorio import gerar_estatisticas_reprovacao
 from services import database
 from models.peca import criar_peca
 
@@ -193,21 +204,31 @@ def aplicar_estilos_customizados() -> None:
     """, unsafe_allow_html=True)
 
 
+@st.cache_resource
+def obter_estado_compartilhado() -> EstadoCompartilhado:
+    """
+    Estado do sistema único do processo: a primeira sessão carrega o banco e
+    as demais reutilizam a mesma cópia.
+    """
+    return EstadoCompartilhado()
+
+
 def inicializar_session_state() -> None:
     """Inicializa o estado da sessão do Streamlit."""
-    if 'sistema' not in st.session_state:
-        st.session_state.sistema = inicializar_sistema()
+    if 'estado' not in st.session_state:
+        st.session_state.estado = obter_estado_compartilhado()
     if 'historico_cadastros' not in st.session_state:
         st.session_state.historico_cadastros = []
 
 
 def exibir_metricas_principais(sistema: SistemaArmazenamento) -> None:
     """Exibe as métricas principais do sistema em cards."""
-    total_pecas = len(sistema['pecas_aprovadas']) + len(sistema['pecas_reprovadas'])
-    total_aprovadas = len(sistema['pecas_aprovadas'])
-    total_reprovadas = len(sistema['pecas_reprovadas'])
+    resumo = gerar_resumo(sistema)
+    total_pecas = resumo['total_processadas']
+    total_aprovadas = resumo['total_aprovadas']
+    total_reprovadas = resumo['total_reprovadas']
     
-    taxa_aprovacao = (total_aprovadas / total_pecas * 100) if total_pecas > 0 else 0
+    taxa_aprovacao = resumo['percentual_aprovadas']
     
     col1, col2, col3, col4 = st.columns(4)
     
@@ -235,11 +256,59 @@ def exibir_metricas_principais(sistema: SistemaArmazenamento) -> None:
     with col4:
         st.metric(
             label="📦 Caixas Fechadas",
-            value=len(sistema['caixas_fechadas']),
-            delta=f"{len(sistema['caixa_atual']['pecas'])}/10 em aberto"
+            value=resumo['caixas_fechadas'],
+            delta=f"{resumo['pecas_caixa_atual']}/10 em aberto"
         )
 
 
+# Cpk mínimo usual para considerar o processo capaz
+CPK_MINIMO_CAPAZ = 1.33
+
+
+def exibir_indicadores_spc(sistema: SistemaArmazenamento) -> None:
+    """Exibe média, desvio, extremos, quantis e Cp/Cpk de peso e comprimento."""
+    colunas = st.columns(2)
+    distribuicoes = gerar_distribuicoes(sistema)
+    
+    for coluna, (medida, indicadores) in zip(colunas, gerar_indicadores_spc(sistema).items()):
+        with coluna:
+            st.markdown(
+                f"**{medida.capitalize()}** "
+                f"(limites {indicadores['limite_inferior']}–{indicadores['limite_superior']})"
+            )
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Média", formatar_indicador(indicadores['media']))
+            col2.metric("Desvio (σ)", formatar_indicador(indicadores['desvio_padrao']))
+            col3.metric(
+                "Mín / Máx",
+                f"{formatar_indicador(indicadores['minimo'], 1)} / {formatar_indicador(indicadores['maximo'], 1)}"
+            )
+            for col, (nome, valor) in zip(st.columns(3), distribuicoes[medida]['quantis'].items()):
+                col.metric(nome, formatar_indicador(valor))
+            col1, col2 = st.columns(2)
+            col1.metric("Cp", formatar_indicador(indicadores['cp']))
+            col2.metric("Cpk", formatar_indicador(indicadores['cpk']))
+            if indicadores['cpk'] is not None and indicadores['cpk'] < CPK_MINIMO_CAPAZ:
+                st.warning(f"⚠️ Cpk abaixo de {CPK_MINIMO_CAPAZ}: processo de {medida} pode estar derivando")
+
+
+# Quantidade de alertas de controle exibidos no dashboard
+ALERTAS_NO_DASHBOARD = 10
+
+
+def exibir_alertas_controle() -> None:
+    """Exibe os alertas de controle mais recentes gravados no banco."""
+    alertas = database.carregar_alertas(ALERTAS_NO_DASHBOARD)
+    
+    if not alertas:
+        st.success("✅ Nenhum alerta de controle: processo estável")
+        return
+    
+    for alerta in alertas:
+        st.warning(f"🚨 {alerta['registrado_em']} — {alerta['descricao']}")
+
+
+@memorizar_por_versao()
 def criar_grafico_aprovacao(sistema: SistemaArmazenamento) -> go.Figure:
     """Cria gráfico de pizza para taxa de aprovação."""
     total_aprovadas = len(sistema['pecas_aprovadas'])
@@ -278,18 +347,19 @@ def criar_grafico_aprovacao(sistema: SistemaArmazenamento) -> go.Figure:
     return fig
 
 
+@memorizar_por_versao()
 def criar_grafico_motivos_reprovacao(sistema: SistemaArmazenamento) -> go.Figure:
     """Cria gráfico de barras para motivos de reprovação."""
     if len(sistema['pecas_reprovadas']) == 0:
         return None
     
-    stats = gerar_estatisticas_reprovacao(sistema['pecas_reprovadas'])
+    reprovacoes = gerar_resumo(sistema)['reprovacoes']
     
     motivos = ['Peso Inadequado', 'Cor Inadequada', 'Comprimento Inadequado']
     valores = [
-        stats['peso_inadequado'],
-        stats['cor_inadequada'],
-        stats['comprimento_inadequado']
+        reprovacoes['peso'],
+        reprovacoes['cor'],
+        reprovacoes['comprimento']
     ]
     
     # Cores gradientes para cada barra
@@ -334,24 +404,32 @@ def criar_grafico_motivos_reprovacao(sistema: SistemaArmazenamento) -> go.Figure
     return fig
 
 
+@memorizar_por_versao()
 def criar_grafico_distribuicao_peso(sistema: SistemaArmazenamento) -> go.Figure:
-    """Cria histograma de distribuição de peso das peças."""
-    todas_pecas = sistema['pecas_aprovadas'] + sistema['pecas_reprovadas']
-    
-    if len(todas_pecas) == 0:
+    """
+    Cria histograma de distribuição de peso das peças a partir do histograma
+    incremental: o gráfico recebe no máximo MAXIMO_BARRAS barras sobre a faixa
+    fixa do histograma, qualquer que seja a quantidade de peças ou os extremos.
+    """
+    distribuicao = gerar_distribuicoes(sistema)['peso']
+    
+    if distribuicao['n'] == 0:
         return None
     
-    pesos = [peca['peso'] for peca in todas_pecas]
+    barras = distribuicao['barras']
+    criterios = obter_criterios()
     
     fig = go.Figure()
     
     # Adiciona histograma com gradiente
-    fig.add_trace(go.Histogram(
-        x=pesos,
-        nbinsx=20,
+    fig.add_trace(go.Bar(
+        x=[(barra['inicio'] + barra['fim']) / 2 for barra in barras],
+        y=[barra['quantidade'] for barra in barras],
+        width=[barra['fim'] - barra['inicio'] for barra in barras],
         name='Distribuição de Peso',
         marker=dict(
-            color='#4CAF50',
+            # Barras de excesso (valores fora da faixa do histograma) em destaque
+            color=['#FF9800' if barra['fora_da_faixa'] else '#4CAF50' for barra in barras],
             line=dict(color='rgba(255,255,255,0.2)', width=1),
             opacity=0.8
         ),
@@ -360,24 +438,36 @@ def criar_grafico_distribuicao_peso(sistema: SistemaArmazenamento) -> go.Figure:
     
     # Adiciona linhas de limite com estilo melhorado
     fig.add_vline(
-        x=PESO_MINIMO, 
+        x=criterios['peso_minimo'], 
         line_dash="dash", 
         line_color="#4CAF50", 
         line_width=2,
-        annotation_text=f"Mín: {PESO_MINIMO}g",
+        annotation_text=f"Mín: {criterios['peso_minimo']}g",
         annotation_position="top",
         annotation=dict(font_size=12, font_color='#4CAF50')
     )
     fig.add_vline(
-        x=PESO_MAXIMO, 
+        x=criterios['peso_maximo'], 
         line_dash="dash", 
         line_color="#4CAF50",
         line_width=2,
-        annotation_text=f"Máx: {PESO_MAXIMO}g",
+        annotation_text=f"Máx: {criterios['peso_maximo']}g",
         annotation_position="top",
         annotation=dict(font_size=12, font_color='#4CAF50')
     )
     
+    # Quantis estimados pelo histograma
+    for nome, valor in distribuicao['quantis'].items():
+        fig.add_vline(
+            x=valor,
+            line_dash="dot",
+            line_color="#FFC107",
+            line_width=1,
+            annotation_text=f"{nome}: {valor:.1f}g",
+            annotation_position="bottom",
+            annotation=dict(font_size=10, font_color='#FFC107')
+        )
+    
     fig.update_layout(
         title_text="<b>Distribuição de Peso das Peças</b>",
         title_font_size=20,
@@ -405,11 +495,107 @@ def criar_grafico_distribuicao_peso(sistema: SistemaArmazenamento) -> go.Figure:
     return fig
 
 
+# Intervalo padrão da tendência, em dias
+DIAS_TENDENCIA_PADRAO = 7
+
+
+def criar_grafico_tendencia(tendencia: List[TendenciaPeriodo]) -> go.Figure:
+    """Cria gráfico de peças por período com a taxa de aprovação."""
+    periodos = [item['periodo'] for item in tendencia]
+    
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=periodos,
+        y=[item['aprovadas'] for item in tendencia],
+        name='Aprovadas',
+        marker_color='#4CAF50'
+    ))
+    fig.add_trace(go.Bar(
+        x=periodos,
+        y=[item['reprovadas'] for item in tendencia],
+        name='Reprovadas',
+        marker_color='#F44336'
+    ))
+    fig.add_trace(go.Scatter(
+        x=periodos,
+        y=[item['percentual_aprovadas'] for item in tendencia],
+        name='% Aprovação',
+        yaxis='y2',
+        mode='lines+markers',
+        line=dict(color='#FFC107', width=2)
+    ))
+    
+    fig.update_layout(
+        barmode='stack',
+        height=400,
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='#FAFAFA', size=12),
+        yaxis=dict(title="<b>Peças</b>", gridcolor='rgba(255,255,255,0.1)'),
+        yaxis2=dict(title="<b>% Aprovação</b>", overlaying='y', side='right', range=[0, 100]),
+        legend=dict(orientation='h', y=1.1)
+    )
+    
+    return fig
+
+
+def exibir_tendencia() -> None:
+    """Exibe a produção por hora ou por turno em um intervalo de datas."""
+    hoje = pd.Timestamp.now().date()
+    
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        intervalo = st.date_input(
+            "Intervalo",
+            value=(hoje - pd.Timedelta(days=DIAS_TENDENCIA_PADRAO - 1), hoje),
+            max_value=hoje,
+            key='intervalo_tendencia'
+        )
+    with col2:
+        agrupamento = st.radio("Agrupar por", ["Turno", "Hora"], horizontal=True, key='agrupamento_tendencia')
+    
+    # Enquanto o usuário escolhe o intervalo, o date_input devolve só o início
+    if not isinstance(intervalo, (list, tuple)) or len(intervalo) != 2:
+        st.info("Selecione a data inicial e a final")
+        return
+    
+    inicio, fim = intervalo
+    if agrupamento == "Hora":
+        tendencia = gerar_tendencia_por_hora(inicio, fim)
+    else:
+        tendencia = gerar_tendencia_por_turno(inicio, fim)
+    
+    if not tendencia:
+        st.info("📊 Nenhuma produção no intervalo")
+        return
+    
+    st.plotly_chart(criar_grafico_tendencia(tendencia), use_container_width=True, key='grafico_tendencia')
+    
+    df_tendencia = pd.DataFrame([
+        {
+            'Período': item['periodo'],
+            'Total': item['total'],
+            'Aprovação (%)': round(item['percentual_aprovadas'], 1),
+            'Reprov. peso': item['reprovacoes']['peso'],
+            'Reprov. cor': item['reprovacoes']['cor'],
+            'Reprov. comprimento': item['reprovacoes']['comprimento'],
+            'Caixas': item['caixas_fechadas'],
+            'Peso médio (g)': formatar_indicador(item['media_peso']),
+            'Comprimento médio (cm)': formatar_indicador(item['media_comprimento'])
+        }
+        for item in tendencia
+    ])
+    st.dataframe(df_tendencia, width='stretch', hide_index=True)
+
+
 def pagina_cadastro() -> None:
     """Interface de cadastro de novas peças."""
     st.markdown("## 📝 Cadastro de Peças")
     st.markdown("*Registre novas peças para controle de qualidade automático*")
     
+    criterios = obter_criterios()
+    cores_aceitas = criterios['criterios']['cores_aceitas']
+    
     with st.form("form_cadastro", clear_on_submit=True):
         col1, col2 = st.columns(2)
         
@@ -421,7 +607,7 @@ def pagina_cadastro() -> None:
             )
             
             peso = st.number_input(
-                f"Peso (g) - Faixa aceita: {PESO_MINIMO}g a {PESO_MAXIMO}g",
+                f"Peso (g) - Faixa aceita: {criterios['peso_minimo']}g a {criterios['peso_maximo']}g",
                 min_value=0.0,
                 max_value=500.0,
                 value=100.0,
@@ -432,12 +618,14 @@ def pagina_cadastro() -> None:
         with col2:
             cor = st.selectbox(
                 "Cor",
-                options=[''] + CORES_ACEITAS + ['vermelho', 'amarelo', 'preto'],
-                help=f"Cores aceitas: {', '.join(CORES_ACEITAS)}"
+                options=[''] + cores_aceitas + [
+                    cor for cor in ('vermelho', 'amarelo', 'preto') if cor not in cores_aceitas
+                ],
+                help=f"Cores aceitas: {', '.join(cores_aceitas)}"
             )
             
             comprimento = st.number_input(
-                f"Comprimento (cm) - Faixa aceita: {COMPRIMENTO_MINIMO}cm a {COMPRIMENTO_MAXIMO}cm",
+                f"Comprimento (cm) - Faixa aceita: {criterios['comprimento_minimo']}cm a {criterios['comprimento_maximo']}cm",
                 min_value=0.0,
                 max_value=100.0,
                 value=15.0,
@@ -445,6 +633,16 @@ def pagina_cadastro() -> None:
                 format="%.1f"
             )
         
+        produtos_com_perfil = sorted(obter_plano()['produtos'])
+        codigo_produto = st.text_input(
+            "Código do Produto (opcional)",
+            placeholder="Ex: SKU-1",
+            help=(
+                "Produtos com perfil próprio: " + ", ".join(produtos_com_perfil)
+                if produtos_com_perfil else "Nenhum produto com perfil próprio; valem os critérios gerais"
+            )
+        )
+        
         submitted = st.form_submit_button("✅ Cadastrar Peça", width='stretch')
         
         if submitted:
@@ -456,45 +654,53 @@ def pagina_cadastro() -> None:
                 st.error("❌ Por favor, selecione uma cor!")
                 return
             
-            # Verifica se ID já existe
-            sistema = st.session_state.sistema
-            todas_pecas = sistema['pecas_aprovadas'] + sistema['pecas_reprovadas']
-            
-            if any(p['id'] == id_peca for p in todas_pecas):
-                st.error(f"❌ Já existe uma peça cadastrada com o ID '{id_peca}'!")
-                return
-            
             # Cria a peça
             peca = criar_peca(
                 id_peca=id_peca,
                 peso=peso,
                 cor=cor,
-                comprimento=comprimento
+                comprimento=comprimento,
+                codigo_produto=codigo_produto.strip() or None
             )
             
             # Valida a peça
-            aprovada, motivos = validar_peca(peca)
-            peca['aprovada'] = aprovada
-            peca['motivos_reprovacao'] = motivos
+            aprovada, motivos = aplicar_validacao(peca)
+            
+            # Verifica o ID e registra com acesso exclusivo ao sistema compartilhado
+            caixa_fechada, mensagem = False, ""
+            with st.session_state.estado.alterar() as sistema:
+                duplicada = existe_peca(id_peca, sistema)
+                if duplicada:
+                    alertas = []
+                elif aprovada:
+                    caixa_fechada, mensagem = adicionar_peca_em_caixa(peca, sistema)
+                    alertas = list(obter_ultimos_alertas(sistema))
+                else:
+                    registrar_peca_reprovada(peca, sistema)
+                    alertas = list(obter_ultimos_alertas(sistema))
+            
+            if duplicada:
+                st.error(f"❌ Já existe uma peça cadastrada com o ID '{id_peca}'!")
+                return
             
             # Processa o resultado
             if aprovada:
-                caixa_fechada, mensagem = adicionar_peca_em_caixa(peca, sistema)
                 st.success(f"✅ Peça {id_peca} APROVADA!")
                 st.info(f"📦 {mensagem}")
                 
                 if caixa_fechada:
                     st.balloons()
             else:
-                sistema['pecas_reprovadas'].append(peca)
-                # Sincroniza com o banco de dados
-                database.sincronizar_sistema(sistema)
                 st.error(f"❌ Peça {id_peca} REPROVADA!")
                 
                 with st.expander("📋 Ver motivos da reprovação"):
                     for motivo in motivos:
                         st.write(f"• {motivo}")
             
+            # Regras de controle disparadas por esta peça
+            for alerta in alertas:
+                st.warning(f"🚨 Processo fora de controle — {alerta['descricao']}")
+            
             # Adiciona ao histórico
             st.session_state.historico_cadastros.append({
                 'id': id_peca,
@@ -503,18 +709,61 @@ def pagina_cadastro() -> None:
             })
 
 
+# Intervalos (segundos) da atualização automática do dashboard
+INTERVALOS_ATUALIZACAO = [2, 5, 10, 30]
+
+
 def pagina_visualizacao() -> None:
     """Interface de visualização de dados e gráficos."""
     st.markdown("## 📊 Dashboard de Visualização")
     st.markdown("*Acompanhe em tempo real as métricas de qualidade da produção*")
     
-    sistema = st.session_state.sistema
+    col_automatica, col_intervalo = st.columns([1, 3])
+    
+    with col_automatica:
+        automatica = st.toggle("🔄 Atualização automática", key='atualizacao_automatica')
+    
+    if automatica:
+        with col_intervalo:
+            intervalo = st.select_slider(
+                "Intervalo (s)",
+                options=INTERVALOS_ATUALIZACAO,
+                value=5,
+                key='intervalo_atualizacao'
+            )
+        # Só o dashboard é refeito a cada intervalo, não a página inteira
+        st.fragment(run_every=intervalo)(exibir_dashboard)()
+    else:
+        exibir_dashboard()
+
+
+def exibir_dashboard() -> None:
+    """
+    Exibe métricas e gráficos, depois de trazer para o sistema compartilhado
+    o que outros processos (CLI, TUI) gravaram no banco. Sem gravações novas,
+    a verificação é uma consulta de custo constante e os gráficos memorizados
+    são reaproveitados.
+    """
+    st.session_state.estado.atualizar_do_banco()
+    sistema = st.session_state.estado.sistema
     
     # Métricas principais
     exibir_metricas_principais(sistema)
     
     st.divider()
     
+    # Controle estatístico do processo
+    if gerar_resumo(sistema)['total_processadas'] > 0:
+        st.markdown("""
+        <div class='custom-card'>
+            <h3 style='margin-top: 0;'>📈 Controle Estatístico (SPC)</h3>
+        </div>
+        """, unsafe_allow_html=True)
+        exibir_indicadores_spc(sistema)
+        st.markdown("#### 🚨 Alertas de Controle")
+        exibir_alertas_controle()
+        st.divider()
+    
     # Gráficos em cards
     col1, col2 = st.columns(2)
     
@@ -558,6 +807,149 @@ def pagina_visualizacao() -> None:
         st.plotly_chart(grafico_peso, use_container_width=True, key='grafico_peso')
     else:
         st.info("📊 Nenhuma peça cadastrada ainda")
+    
+    # Tendência por hora/turno (rollups)
+    st.divider()
+    
+    st.markdown("""
+    <div class='custom-card'>
+        <h3 style='margin-top: 0;'>📅 Tendência por Período</h3>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    exibir_tendencia()
+
+
+# Filtro de motivo da listagem de reprovadas e tamanhos de página
+OPCOES_MOTIVO = {'Todos': None, 'Peso': 'peso', 'Cor': 'cor', 'Comprimento': 'comprimento'}
+TAMANHOS_PAGINA = [25, 50, 100]
+
+
+def exibir_detalhe_reprovada(id_peca: str, sistema: SistemaArmazenamento) -> None:
+    """Exibe os dados e os motivos de reprovação de uma peça, lidos do banco (ou da memória, no journal)."""
+    peca = carregar_peca_registrada(id_peca, sistema)
+    if peca is None:
+        st.warning(f"Peça {id_peca} não encontrada")
+        return
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.write(f"**Peso:** {peca['peso']}g")
+        st.write(f"**Cor:** {peca['cor']}")
+    
+    with col2:
+        st.write(f"**Comprimento:** {peca['comprimento']}cm")
+        st.write(f"**Produto:** {peca.get('codigo_produto') or SEM_PRODUTO}")
+    
+    st.write("**Motivos de reprovação:**")
+    for motivo in peca['motivos_reprovacao']:
+        st.write(f"• {motivo}")
+
+
+def exibir_reprovadas_paginadas(sistema: SistemaArmazenamento) -> None:
+    """
+    Lista as peças reprovadas página a página, direto do banco (da memória,
+    com o journal ativo). Cada página é uma consulta de tamanho fixo, qualquer
+    que seja o total de reprovações; os detalhes de uma peça são carregados só
+    quando ela é selecionada.
+    """
+    col1, col2, col3, col4 = st.columns([2, 2, 2, 1])
+    
+    with col1:
+        busca_id = st.text_input("🔍 ID contém", key='filtro_reprovadas_id').strip()
+    with col2:
+        motivo = OPCOES_MOTIVO[st.selectbox("⚠️ Motivo", list(OPCOES_MOTIVO), key='filtro_reprovadas_motivo')]
+    with col3:
+        cor = st.text_input("🎨 Cor", key='filtro_reprovadas_cor').strip()
+    with col4:
+        tamanho = st.selectbox("Por página", TAMANHOS_PAGINA, index=1, key='tamanho_pagina_reprovadas')
+    
+    filtros = database.FiltroReprovadas()
+    if busca_id:
+        filtros['busca_id'] = busca_id
+    if motivo:
+        filtros['motivo'] = motivo
+    if cor:
+        filtros['cor'] = cor
+    
+    # Cursores das páginas visitadas; filtros novos voltam à primeira página
+    chave_filtros = (tuple(sorted(filtros.items())), tamanho)
+    if st.session_state.get('filtros_reprovadas') != chave_filtros:
+        st.session_state.filtros_reprovadas = chave_filtros
+        st.session_state.cursores_reprovadas = [None]
+    cursores = st.session_state.cursores_reprovadas
+    
+    pagina = carregar_pagina_reprovadas(sistema, filtros, cursores[-1], tamanho)
+    linhas = pagina['linhas']
+    
+    if linhas:
+        df_reprovadas = pd.DataFrame(linhas).drop(columns=['posicao'])
+        st.dataframe(
+            df_reprovadas,
+            width='stretch',
+            hide_index=True,
+            column_config={
+                'id': 'ID',
+                'peso': st.column_config.NumberColumn("Peso (g)"),
+                'cor': 'Cor',
+                'comprimento': st.column_config.NumberColumn("Comprimento (cm)"),
+                'codigo_produto': 'Produto',
+                'registrada_em': 'Registrada em (UTC)',
+                'reprovada_peso': st.column_config.CheckboxColumn("Peso"),
+                'reprovada_cor': st.column_config.CheckboxColumn("Cor"),
+                'reprovada_comprimento': st.column_config.CheckboxColumn("Comprimento"),
+            }
+        )
+    else:
+        st.info("Nenhuma peça reprovada encontrada com esses filtros")
+    
+    col_anterior, col_info, col_proxima = st.columns([1, 3, 1])
+    
+    with col_anterior:
+        if st.button("⬅️ Anterior", disabled=len(cursores) == 1, key='reprovadas_anterior'):
+            cursores.pop()
+            st.rerun()
+    with col_info:
+        st.caption(
+            f"Página {len(cursores)} · "
+            f"{gerar_resumo(sistema)['total_reprovadas']} peças reprovadas no total"
+        )
+    with col_proxima:
+        if st.button("Próxima ➡️", disabled=pagina['proxima'] is None, key='reprovadas_proxima'):
+            cursores.append(pagina['proxima'])
+            st.rerun()
+    
+    if linhas:
+        id_detalhe = st.selectbox(
+            "🔴 Detalhes da peça",
+            [linha['id'] for linha in linhas],
+            index=None,
+            placeholder="Selecione uma peça da página",
+            key='detalhe_reprovada'
+        )
+        if id_detalhe:
+            exibir_detalhe_reprovada(id_detalhe, sistema)
+
+
+@memorizar_por_versao(banco=True)
+def criar_tabela_aprovadas(sistema: SistemaArmazenamento) -> pd.DataFrame:
+    """Cria a tabela das peças aprovadas para a listagem, em colunas (do banco ou do journal)."""
+    return pd.DataFrame(carregar_colunas_pecas(
+        sistema, ['id', 'peso', 'cor', 'comprimento'], {'aprovada': True}
+    ))
+
+
+@memorizar_por_versao(banco=True)
+def criar_tabelas_caixas(sistema: SistemaArmazenamento) -> Dict[int, pd.DataFrame]:
+    """Cria a tabela de peças de cada caixa com uma única carga colunar."""
+    df_pecas = pd.DataFrame(carregar_colunas_pecas(
+        sistema, ['caixa_id', 'id', 'peso', 'cor', 'comprimento'], {'em_caixa': True}
+    ))
+    return {
+        int(caixa_id): tabela.drop(columns=['caixa_id'])
+        for caixa_id, tabela in df_pecas.groupby('caixa_id', sort=False)
+    }
 
 
 def pagina_pecas() -> None:
@@ -565,7 +957,8 @@ def pagina_pecas() -> None:
     st.markdown("## 📋 Listagem de Peças")
     st.markdown("*Visualize todas as peças processadas pelo sistema*")
     
-    sistema = st.session_state.sistema
+    st.session_state.estado.atualizar_do_banco()
+    sistema = st.session_state.estado.sistema
     
     tab1, tab2 = st.tabs(["✅ Aprovadas", "❌ Reprovadas"])
     
@@ -573,11 +966,8 @@ def pagina_pecas() -> None:
         if len(sistema['pecas_aprovadas']) == 0:
             st.info("Nenhuma peça aprovada cadastrada")
         else:
-            df_aprovadas = pd.DataFrame(sistema['pecas_aprovadas'])
-            df_aprovadas = df_aprovadas[['id', 'peso', 'cor', 'comprimento']]
-            
             st.dataframe(
-                df_aprovadas,
+                criar_tabela_aprovadas(sistema),
                 width='stretch',
                 hide_index=True
             )
@@ -586,20 +976,7 @@ def pagina_pecas() -> None:
         if len(sistema['pecas_reprovadas']) == 0:
             st.info("Nenhuma peça reprovada cadastrada")
         else:
-            for peca in sistema['pecas_reprovadas']:
-                with st.expander(f"🔴 {peca['id']} - {peca['cor']}"):
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        st.write(f"**Peso:** {peca['peso']}g")
-                        st.write(f"**Cor:** {peca['cor']}")
-                    
-                    with col2:
-                        st.write(f"**Comprimento:** {peca['comprimento']}cm")
-                    
-                    st.write("**Motivos de reprovação:**")
-                    for motivo in peca['motivos_reprovacao']:
-                        st.write(f"• {motivo}")
+            exibir_reprovadas_paginadas(sistema)
 
 
 def pagina_caixas() -> None:
@@ -607,7 +984,8 @@ def pagina_caixas() -> None:
     st.markdown("## 📦 Gerenciamento de Caixas")
     st.markdown("*Acompanhe o empacotamento e status das caixas de produção*")
     
-    sistema = st.session_state.sistema
+    st.session_state.estado.atualizar_do_banco()
+    sistema = st.session_state.estado.sistema
     
     # Caixa atual
     st.subheader("🆕 Caixa em Preenchimento")
@@ -631,10 +1009,20 @@ def pagina_caixas() -> None:
     if len(sistema['caixas_fechadas']) == 0:
         st.info("Nenhuma caixa fechada ainda")
     else:
+        tabelas = criar_tabelas_caixas(sistema)
         for caixa in sistema['caixas_fechadas']:
             with st.expander(f"📦 Caixa #{caixa['id']} - {len(caixa['pecas'])} peças"):
-                for peca in caixa['pecas']:
-                    st.write(f"• {peca['id']} - {peca['peso']}g - {peca['cor']} - {peca['comprimento']}cm")
+                st.dataframe(
+                    tabelas.get(caixa['id'], pd.DataFrame()),
+                    width='stretch',
+                    hide_index=True
+                )
+
+
+@memorizar_por_versao(maximo=1, banco=True)
+def exportar_pecas_csv(sistema: SistemaArmazenamento) -> str:
+    """Gera o CSV de todas as peças a partir da carga colunar."""
+    return pd.DataFrame(carregar_colunas_pecas(sistema)).to_csv(index=False)
 
 
 def pagina_relatorio() -> None:
@@ -642,11 +1030,13 @@ def pagina_relatorio() -> None:
     st.markdown("## 📈 Relatório Completo")
     st.markdown("*Análise detalhada de todas as métricas e indicadores de produção*")
     
-    sistema = st.session_state.sistema
+    st.session_state.estado.atualizar_do_banco()
+    sistema = st.session_state.estado.sistema
     
-    total_pecas = len(sistema['pecas_aprovadas']) + len(sistema['pecas_reprovadas'])
-    total_aprovadas = len(sistema['pecas_aprovadas'])
-    total_reprovadas = len(sistema['pecas_reprovadas'])
+    # Totais vindos das estatísticas agregadas (tempo constante)
+    resumo = gerar_resumo(sistema)
+    total_pecas = resumo['total_processadas']
+    total_reprovadas = resumo['total_reprovadas']
     
     if total_pecas == 0:
         st.info("Nenhuma peça cadastrada ainda. Cadastre peças para gerar relatórios.")
@@ -661,12 +1051,10 @@ def pagina_relatorio() -> None:
         st.metric("Total Processado", total_pecas)
     
     with col2:
-        taxa_aprovacao = (total_aprovadas / total_pecas * 100)
-        st.metric("Taxa de Aprovação", f"{taxa_aprovacao:.1f}%")
+        st.metric("Taxa de Aprovação", f"{resumo['percentual_aprovadas']:.1f}%")
     
     with col3:
-        taxa_reprovacao = (total_reprovadas / total_pecas * 100)
-        st.metric("Taxa de Reprovação", f"{taxa_reprovacao:.1f}%")
+        st.metric("Taxa de Reprovação", f"{resumo['percentual_reprovadas']:.1f}%")
     
     st.divider()
     
@@ -676,11 +1064,10 @@ def pagina_relatorio() -> None:
     col1, col2 = st.columns(2)
     
     with col1:
-        st.metric("Caixas Fechadas", len(sistema['caixas_fechadas']))
+        st.metric("Caixas Fechadas", resumo['caixas_fechadas'])
     
     with col2:
-        pecas_caixa_atual = len(sistema['caixa_atual']['pecas'])
-        st.metric("Caixa Atual", f"{pecas_caixa_atual}/10 peças")
+        st.metric("Caixa Atual", f"{resumo['pecas_caixa_atual']}/10 peças")
     
     st.divider()
     
@@ -688,18 +1075,63 @@ def pagina_relatorio() -> None:
     if total_reprovadas > 0:
         st.subheader("❌ Análise de Reprovações")
         
-        stats = gerar_estatisticas_reprovacao(sistema['pecas_reprovadas'])
+        reprovacoes = resumo['reprovacoes']
         
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            st.metric("Por Peso", stats['peso_inadequado'])
+            st.metric("Por Peso", reprovacoes['peso'])
         
         with col2:
-            st.metric("Por Cor", stats['cor_inadequada'])
+            st.metric("Por Cor", reprovacoes['cor'])
         
         with col3:
-            st.metric("Por Comprimento", stats['comprimento_inadequado'])
+            st.metric("Por Comprimento", reprovacoes['comprimento'])
+    
+    # Controle estatístico do processo
+    st.divider()
+    st.subheader("📈 Controle Estatístico (SPC)")
+    exibir_indicadores_spc(sistema)
+    
+    # Detalhamento por produto
+    por_produto = gerar_estatisticas_por_produto(sistema)
+    if set(por_produto) - {SEM_PRODUTO}:
+        st.divider()
+        st.subheader("🏷️ Por Produto")
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    'Produto': produto,
+                    'Total': estatisticas['total'],
+                    'Aprovadas': estatisticas['aprovadas'],
+                    'Reprovadas': estatisticas['reprovadas'],
+                    'Aprovação (%)': round(estatisticas['percentual_aprovadas'], 1),
+                    'Peso': estatisticas['reprovacoes']['peso'],
+                    'Cor': estatisticas['reprovacoes']['cor'],
+                    'Comprimento': estatisticas['reprovacoes']['comprimento']
+                }
+                for produto, estatisticas in por_produto.items()
+            ]),
+            hide_index=True,
+            width='stretch'
+        )
+    
+    # Exportação das peças para análise externa: a carga da tabela inteira só
+    # acontece quando pedida, não a cada exibição da página
+    st.divider()
+    st.subheader("⬇️ Exportar Dados")
+    if st.button("📄 Gerar CSV das peças"):
+        st.session_state.csv_pecas = exportar_pecas_csv(sistema)
+    
+    csv_pecas = st.session_state.get('csv_pecas')
+    if csv_pecas is not None:
+        st.download_button(
+            "⬇️ Baixar peças (CSV)",
+            data=csv_pecas,
+            file_name="pecas.csv",
+            mime="text/csv"
+        )
+        st.caption("Gere o CSV novamente para incluir as peças cadastradas depois dele.")
 
 
 def main() -> None:
@@ -711,6 +1143,9 @@ def main() -> None:
     # Inicializa o estado
     inicializar_session_state()
     
+    # Adota regras de qualidade alteradas no banco ou no arquivo de regras
+    verificar_regras()
+    
     # Título principal com design moderno
     st.markdown("""
     <div class='gradient-header'>
@@ -754,6 +1189,8 @@ def main() -> None:
         
         st.markdown("### ⚙️ Critérios de Qualidade")
         
+        criterios = obter_criterios()
+        
         # Card estilizado para critérios
         st.markdown("""
         <div style='background: rgba(76, 175, 80, 0.1); 
@@ -766,21 +1203,22 @@ def main() -> None:
             <p style='margin: 5px 0;'><strong>📏 Comprimento:</strong><br>{} - {}cm</p>
         </div>
         """.format(
-            PESO_MINIMO, PESO_MAXIMO,
-            ', '.join(CORES_ACEITAS),
-            COMPRIMENTO_MINIMO, COMPRIMENTO_MAXIMO
+            criterios['peso_minimo'], criterios['peso_maximo'],
+            ', '.join(criterios['criterios']['cores_aceitas']),
+            criterios['comprimento_minimo'], criterios['comprimento_maximo']
         ), unsafe_allow_html=True)
         
         st.markdown("---")
         
         if st.button("🔄 Recarregar Dados do Banco", type="primary", width='stretch'):
-            # Recarrega dados do banco de dados
-            st.session_state.sistema = database.carregar_sistema_completo()
+            # Recarrega do banco para todas as sessões, com a mesma carga da
+            # criação do estado (inicializar_sistema: journal, memória colunar, agregado)
+            st.session_state.estado.recarregar()
             st.success("✅ Dados recarregados do banco de dados!")
             st.rerun()
         
         if st.button("🗑️ Resetar Sistema", type="secondary", width='stretch'):
-            st.session_state.sistema = inicializar_sistema()
+            st.session_state.estado.recarregar()
             st.session_state.historico_cadastros = []
             st.success("Sistema resetado!")
             st.rerun()
@@ -6,7 +6,7 @@ import pytest
 from models.peca import criar_peca
 from models.caixa import criar_caixa
 from services.armazenamento import inicializar_sistema, SistemaArmazenamento
-from services import database
+from services import database, regras
 
 
 # ========================================
@@ -41,6 +41,19 @@ def limpar_banco_de_dados(request):
     #     database.limpar_banco()
 
 
+@pytest.fixture(autouse=True, scope="function")
+def regras_padrao():
+    """
+    Fixture que restaura os critérios de qualidade padrão em volta de cada teste.
+    
+    O plano de validação em uso é global ao processo (services.regras):
+    sem esta fixture, regras salvas por um teste valeriam para os seguintes.
+    """
+    regras.restaurar_regras_padrao()
+    yield
+    regras.restaurar_regras_padrao()
+
+
 # ========================================
 # FIXTURES DE PEÇAS
 # ========================================
@@ -15,6 +15,7 @@ from services import database
 from services.armazenamento import (
     inicializar_sistema,
     adicionar_peca_em_caixa,
+    registrar_peca_reprovada,
     remover_peca_por_id,
     SistemaArmazenamento
 )
@@ -339,6 +340,21 @@ class TestMotivosReprovacao:
         assert any("Cor" in m for m in motivos)
         assert any("Comprimento" in m for m in motivos)
     
+    def test_reprovada_registrada_persiste(self, temp_db: Path) -> None:
+        """Peça reprovada registrada pelo serviço persiste sem sincronização manual."""
+        sistema1 = inicializar_sistema()
+        
+        peca = criar_peca("P001", 120.0, "vermelho", 25.0)
+        aprovada, motivos = validar_peca(peca)
+        peca['aprovada'] = aprovada
+        peca['motivos_reprovacao'] = motivos
+        registrar_peca_reprovada(peca, sistema1)
+        
+        sistema2 = inicializar_sistema()
+        
+        assert len(sistema2['pecas_reprovadas']) == 1
+        assert sistema2['pecas_reprovadas'][0]['motivos_reprovacao'] == motivos
+    
     def test_motivo_vazio_persiste(self, temp_db: Path) -> None:
         """Peça aprovada sem motivos deve persistir corretamente."""
         sistema1 = inicializar_sistema()
@@ -0,0 +1,143 @@
+"""
+Testes unitários para o acompanhamento das alterações gravadas no banco.
+
+Testa:
+- Peças, remoções e caixas gravadas por outro processo aplicadas ao estado
+- Alterações da própria sessão ignoradas (aplicação idempotente)
+- Recarga completa quando o registro não cobre mais as alterações
+- Registro pelos eventos do journal
+"""
+
+import pytest
+
+from models.caixa import CAPACIDADE_MAXIMA_CAIXA
+from models.peca import criar_peca
+from services import acompanhamento, database
+from services.armazenamento import (
+    adicionar_peca_em_caixa,
+    inicializar_sistema,
+    registrar_peca_reprovada,
+    remover_peca_por_id
+)
+from services.estado_compartilhado import EstadoCompartilhado
+from services.relatorio import gerar_resumo
+
+
+def _cadastrar(sistema, quantidade: int, prefixo: str = "C") -> None:
+    """Cadastra peças aprovadas e uma reprovada, como a CLI faria."""
+    for i in range(quantidade):
+        adicionar_peca_em_caixa(criar_peca(f"{prefixo}{i:03d}", 100.0, "azul", 15.0, True), sistema)
+    registrar_peca_reprovada(
+        criar_peca(f"{prefixo}R01", 120.0, "azul", 15.0, False, ["Peso fora do intervalo"]), sistema
+    )
+
+
+def _resumo_caixas(sistema):
+    return (
+        [caixa['id'] for caixa in sistema['caixas_fechadas']],
+        sistema['caixa_atual']['id'],
+        [peca['id'] for peca in sistema['caixa_atual']['pecas']],
+    )
+
+
+class TestAtualizacaoIncremental:
+    """Alterações de outro processo aplicadas sem recarregar o sistema."""
+
+    @pytest.mark.unit
+    def test_igual_a_recarga_completa(self):
+        """Depois da atualização, o estado é o mesmo de uma nova carga."""
+        estado = EstadoCompartilhado()
+        outro_processo = inicializar_sistema()
+
+        _cadastrar(outro_processo, CAPACIDADE_MAXIMA_CAIXA + 3)
+        remover_peca_por_id("C001", outro_processo)
+
+        assert estado.atualizar_do_banco() is True
+        recarregado = inicializar_sistema()
+        assert gerar_resumo(estado.sistema) == gerar_resumo(recarregado)
+        assert _resumo_caixas(estado.sistema) == _resumo_caixas(recarregado)
+        assert estado.versao == 1
+
+    @pytest.mark.unit
+    def test_sem_alteracoes(self):
+        """Sem gravações novas, nada muda e a versão se mantém."""
+        estado = EstadoCompartilhado()
+
+        assert estado.atualizar_do_banco() is False
+        assert estado.versao == 0
+
+    @pytest.mark.unit
+    def test_alteracoes_da_propria_sessao(self):
+        """O que a sessão já gravou no sistema compartilhado não é aplicado de novo."""
+        estado = EstadoCompartilhado()
+        with estado.alterar() as sistema:
+            _cadastrar(sistema, CAPACIDADE_MAXIMA_CAIXA + 1)
+        antes = (gerar_resumo(estado.sistema), _resumo_caixas(estado.sistema))
+
+        assert estado.atualizar_do_banco() is False
+        assert (gerar_resumo(estado.sistema), _resumo_caixas(estado.sistema)) == antes
+        assert estado.sequencia == acompanhamento.ultima_sequencia()
+
+    @pytest.mark.unit
+    def test_peca_registrada_e_removida(self):
+        """Uma peça gravada e removida antes da atualização não aparece."""
+        estado = EstadoCompartilhado()
+        outro_processo = inicializar_sistema()
+
+        _cadastrar(outro_processo, 2)
+        remover_peca_por_id("CR01", outro_processo)
+        estado.atualizar_do_banco()
+
+        assert [peca['id'] for peca in estado.sistema['pecas_aprovadas']] == ["C000", "C001"]
+        assert len(estado.sistema['pecas_reprovadas']) == 0
+
+
+class TestRecargaCompleta:
+    """Registro que não cobre mais as alterações."""
+
+    @pytest.mark.unit
+    def test_registro_descartado(self):
+        """Alterações antigas descartadas levam a uma recarga completa."""
+        estado = EstadoCompartilhado()
+        anterior = estado.sistema
+        _cadastrar(inicializar_sistema(), 3)
+        with database.get_connection() as conn:
+            conn.execute(
+                "DELETE FROM registro_alteracoes WHERE seq = (SELECT MIN(seq) FROM registro_alteracoes)"
+            )
+
+        assert acompanhamento.buscar_alteracoes(estado.sequencia) is None
+        assert estado.atualizar_do_banco() is True
+        assert estado.sistema is not anterior
+        assert len(estado.sistema['pecas_aprovadas']) == 3
+
+    @pytest.mark.unit
+    def test_limite_do_registro(self):
+        """O registro guarda no máximo MAXIMO_REGISTRO_ALTERACOES linhas."""
+        inicializar_sistema()
+        limite = database.MAXIMO_REGISTRO_ALTERACOES
+        database.salvar_pecas_em_lote(
+            criar_peca(f"P{i:05d}", 100.0, "azul", 15.0, True) for i in range(limite + 5)
+        )
+
+        with database.get_connection() as conn:
+            total = conn.execute("SELECT COUNT(*) FROM registro_alteracoes").fetchone()[0]
+        assert total == limite
+        assert acompanhamento.buscar_alteracoes(0) is None
+
+
+class TestJournal:
+    """Eventos do journal como registro de alterações."""
+
+    @pytest.mark.unit
+    def test_eventos_aplicados(self, monkeypatch):
+        """Com o journal ativo, os eventos novos são aplicados ao estado."""
+        monkeypatch.setenv('PECAS_ARMAZENAMENTO', 'journal')
+        estado = EstadoCompartilhado()
+        outro_processo = inicializar_sistema()
+
+        _cadastrar(outro_processo, CAPACIDADE_MAXIMA_CAIXA + 2)
+
+        assert estado.atualizar_do_banco() is True
+        assert gerar_resumo(estado.sistema) == gerar_resumo(outro_processo)
+        assert _resumo_caixas(estado.sistema) == _resumo_caixas(outro_processo)
@@ -7,6 +7,7 @@ Testa:
 - Fechamento automático de caixas ao atingir capacidade máxima (10 peças)
 - Criação de nova caixa após fechamento
 - Remoção de peças por ID
+- Listagem paginada de reprovadas nos modos de tabelas e journal
 """
 
 import sys
@@ -16,11 +17,21 @@ import pytest
 from unittest.mock import patch, MagicMock
 from models.peca import criar_peca
 from models.caixa import CAPACIDADE_MAXIMA_CAIXA
+from services import database
 from services.armazenamento import (
     inicializar_sistema,
     adicionar_peca_em_caixa,
-    remover_peca_por_id
+    registrar_peca_reprovada,
+    remover_peca_por_id,
+    remover_pecas_por_ids,
+    existe_peca,
+    localizar_peca,
+    carregar_pagina_reprovadas,
+    carregar_peca_registrada,
+    carregar_colunas_pecas
 )
+from services.validacao import aplicar_validacao
+from models.lista_pecas import ListaPecas
 
 
 # ========================================
@@ -210,6 +221,278 @@ class TestAdicionarPecaEmCaixa:
         assert CAPACIDADE_MAXIMA_CAIXA == 10
 
 
+# ========================================
+# TESTES DE REGISTRO DE PEÇAS REPROVADAS
+# ========================================
+
+class TestRegistrarPecaReprovada:
+    """Testes para a função registrar_peca_reprovada()."""
+
+    @pytest.mark.unit
+    def test_registra_na_lista_de_reprovadas(self, sistema_vazio):
+        """Peça reprovada deve entrar na lista de reprovadas."""
+        peca = criar_peca("R001", 120.0, "azul", 15.0, False, ["Peso inválido"])
+
+        registrar_peca_reprovada(peca, sistema_vazio)
+
+        assert sistema_vazio['pecas_reprovadas'] == [peca]
+        assert len(sistema_vazio['caixa_atual']['pecas']) == 0
+
+    @pytest.mark.unit
+    def test_persiste_imediatamente(self, sistema_vazio):
+        """Peça reprovada deve ser persistida sem sincronização completa."""
+        peca = criar_peca("R001", 120.0, "azul", 15.0, False, ["Peso inválido"])
+
+        registrar_peca_reprovada(peca, sistema_vazio)
+
+        _, reprovadas = database.carregar_pecas()
+        assert [p['id'] for p in reprovadas] == ["R001"]
+        assert 'alteracoes' not in sistema_vazio
+
+
+class TestIndicePecas:
+    """Testes para existe_peca() e localizar_peca()."""
+
+    @pytest.mark.unit
+    def test_localiza_aprovada_na_caixa(self, sistema_vazio):
+        """Peça aprovada é localizada junto com a caixa que a contém."""
+        peca = criar_peca("P001", 100.0, "azul", 15.0, True)
+        adicionar_peca_em_caixa(peca, sistema_vazio)
+
+        localizacao = localizar_peca("P001", sistema_vazio)
+
+        assert localizacao['peca'] is peca
+        assert localizacao['aprovada'] is True
+        assert localizacao['caixa'] is sistema_vazio['caixa_atual']
+
+    @pytest.mark.unit
+    def test_localiza_reprovada_sem_caixa(self, sistema_vazio):
+        """Peça reprovada é localizada sem caixa."""
+        registrar_peca_reprovada(criar_peca("R001", 120.0, "azul", 15.0, False), sistema_vazio)
+
+        localizacao = localizar_peca("R001", sistema_vazio)
+
+        assert localizacao['aprovada'] is False
+        assert localizacao['caixa'] is None
+        assert existe_peca("R001", sistema_vazio)
+
+    @pytest.mark.unit
+    def test_inexistente(self, sistema_vazio):
+        """ID não cadastrado não é encontrado."""
+        assert not existe_peca("X999", sistema_vazio)
+        assert localizar_peca("X999", sistema_vazio) is None
+
+    @pytest.mark.unit
+    def test_indice_mantido_nas_operacoes(self, sistema_vazio):
+        """Inclusões e remoções atualizam o índice sem reconstruí-lo."""
+        existe_peca("P000", sistema_vazio)  # cria o índice
+        indice = sistema_vazio['indice_pecas']
+
+        for i in range(CAPACIDADE_MAXIMA_CAIXA + 1):
+            adicionar_peca_em_caixa(criar_peca(f"P{i:03d}", 100.0, "azul", 15.0, True), sistema_vazio)
+        remover_peca_por_id("P003", sistema_vazio)
+
+        assert sistema_vazio['indice_pecas'] is indice
+        assert not existe_peca("P003", sistema_vazio)
+        assert sistema_vazio['indice_pecas'] is indice
+        # A caixa fechada continua referenciada pela peça
+        assert localizar_peca("P000", sistema_vazio)['caixa'] is sistema_vazio['caixas_fechadas'][0]
+        assert localizar_peca("P010", sistema_vazio)['caixa'] is sistema_vazio['caixa_atual']
+
+    @pytest.mark.unit
+    def test_posicao_na_caixa_mantida(self, sistema_vazio):
+        """Retirar uma peça da caixa usa a posição do índice e atualiza a das seguintes."""
+        for i in range(5):
+            adicionar_peca_em_caixa(criar_peca(f"P{i:03d}", 100.0, "azul", 15.0, True), sistema_vazio)
+        assert localizar_peca("P003", sistema_vazio)['posicao_caixa'] == 3
+
+        remover_peca_por_id("P001", sistema_vazio)
+        remover_peca_por_id("P003", sistema_vazio)
+
+        assert [peca['id'] for peca in sistema_vazio['caixa_atual']['pecas']] == ["P000", "P002", "P004"]
+        assert [localizar_peca(f"P{i:03d}", sistema_vazio)['posicao_caixa'] for i in (0, 2, 4)] == [0, 1, 2]
+
+    @pytest.mark.unit
+    def test_reconstroi_apos_alteracao_direta(self, sistema_com_pecas_aprovadas):
+        """Listas alteradas diretamente fazem o índice ser reconstruído."""
+        assert existe_peca("PA000", sistema_com_pecas_aprovadas)
+
+        peca = criar_peca("EXT", 100.0, "azul", 15.0, True)
+        sistema_com_pecas_aprovadas['pecas_aprovadas'].append(peca)
+
+        assert existe_peca("EXT", sistema_com_pecas_aprovadas)
+
+    @pytest.mark.unit
+    def test_ids_duplicados_nao_reconstroem(self, sistema_vazio):
+        """Listas com IDs repetidos não fazem o índice ser reconstruído a cada consulta."""
+        peca = criar_peca("DUP", 100.0, "azul", 15.0, True)
+        sistema_vazio['pecas_aprovadas'].append(peca)
+        sistema_vazio['pecas_aprovadas'].append(dict(peca))
+
+        existe_peca("DUP", sistema_vazio)
+        indice = sistema_vazio['indice_pecas']
+
+        with patch('services.armazenamento._construir_indice') as construir:
+            assert existe_peca("DUP", sistema_vazio)
+            adicionar_peca_em_caixa(criar_peca("P001", 100.0, "azul", 15.0, True), sistema_vazio)
+            assert existe_peca("P001", sistema_vazio)
+
+        construir.assert_not_called()
+        assert sistema_vazio['indice_pecas'] is indice
+
+
+class TestPersistenciaIncremental:
+    """Operações do serviço devem gravar apenas o delta."""
+
+    @pytest.mark.unit
+    def test_adicionar_nao_sincroniza_sistema_completo(self, sistema_vazio):
+        """Adicionar peça não deve disparar a sincronização completa."""
+        peca = criar_peca("P001", 100.0, "azul", 15.0, True)
+
+        with patch('services.database.sincronizar_sistema') as mock_sync:
+            adicionar_peca_em_caixa(peca, sistema_vazio)
+
+        mock_sync.assert_not_called()
+        assert 'alteracoes' not in sistema_vazio
+
+    @pytest.mark.unit
+    def test_remover_nao_sincroniza_sistema_completo(self, sistema_vazio):
+        """Remover peça não deve disparar a sincronização completa."""
+        peca = criar_peca("P001", 100.0, "azul", 15.0, True)
+        adicionar_peca_em_caixa(peca, sistema_vazio)
+
+        with patch('services.database.sincronizar_sistema') as mock_sync:
+            remover_peca_por_id("P001", sistema_vazio)
+
+        mock_sync.assert_not_called()
+        aprovadas, _ = database.carregar_pecas()
+        assert aprovadas == []
+
+    @pytest.mark.unit
+    def test_alteracoes_acumulam_sem_banco(self, sistema_vazio):
+        """Sem banco, alterações ficam pendentes até a próxima persistência."""
+        peca = criar_peca("P001", 100.0, "azul", 15.0, True)
+
+        with patch('services.database.banco_existe', return_value=False):
+            adicionar_peca_em_caixa(peca, sistema_vazio)
+
+        assert "P001" in sistema_vazio['alteracoes']['pecas_salvas']
+        assert 1 in sistema_vazio['alteracoes']['caixas_salvas']
+
+
+# ========================================
+# TESTES DA LISTAGEM DE REPROVADAS
+# ========================================
+
+class TestReprovadasPaginadas:
+    """Listagem paginada de reprovadas, do banco ou da memória (journal)."""
+
+    @staticmethod
+    def _popular():
+        sistema = inicializar_sistema()
+        adicionar_peca_em_caixa(criar_peca("A001", 100.0, "azul", 15.0, True), sistema)
+        for i in range(7):
+            peca = criar_peca(f"R{i:03d}", 120.0 if i % 2 else 100.0, "vermelho", 15.0)
+            aplicar_validacao(peca)
+            registrar_peca_reprovada(peca, sistema)
+        registrar_peca_reprovada(
+            criar_peca("T001", 100.0, "azul", 30.0, False, ["Comprimento fora do intervalo"]), sistema
+        )
+        remover_peca_por_id("R002", sistema)
+        return sistema
+
+    @staticmethod
+    def _todas(sistema, filtros=None):
+        linhas, apos = [], None
+        while True:
+            pagina = carregar_pagina_reprovadas(sistema, filtros, apos, limite=3)
+            assert len(pagina['linhas']) <= 3
+            linhas.extend(pagina['linhas'])
+            apos = pagina['proxima']
+            if apos is None:
+                return [
+                    {campo: valor for campo, valor in linha.items() if campo not in ('posicao', 'registrada_em')}
+                    for linha in linhas
+                ]
+
+    @pytest.mark.unit
+    def test_journal_igual_ao_banco(self, monkeypatch):
+        """Com o journal ativo a página vem da memória, com as mesmas linhas e filtros."""
+        filtros = [None, {'motivo': 'peso'}, {'motivo': 'comprimento'}, {'cor': 'azul'}, {'busca_id': "R00"}]
+        do_banco = [self._todas(self._popular(), f) for f in filtros]
+        database.limpar_banco()
+
+        monkeypatch.setenv('PECAS_ARMAZENAMENTO', 'journal')
+        sistema = self._popular()
+
+        assert [self._todas(sistema, f) for f in filtros] == do_banco
+        assert [linha['id'] for linha in do_banco[0]] == ["T001", "R006", "R005", "R004", "R003", "R001", "R000"]
+        assert database.carregar_pagina_reprovadas()['linhas'] == []
+
+    @pytest.mark.unit
+    def test_journal_detalhe_e_motivo_invalido(self, monkeypatch):
+        """O detalhe da peça também vem da memória; motivo desconhecido é recusado."""
+        monkeypatch.setenv('PECAS_ARMAZENAMENTO', 'journal')
+        sistema = self._popular()
+
+        assert carregar_peca_registrada("T001", sistema)['motivos_reprovacao'] == ["Comprimento fora do intervalo"]
+        assert carregar_peca_registrada("R002", sistema) is None
+        with pytest.raises(ValueError):
+            carregar_pagina_reprovadas(sistema, {'motivo': 'textura'})
+
+
+class TestColunasPecas:
+    """Peças em colunas, do banco ou da memória (journal)."""
+
+    CONSULTAS = [
+        (None, None),
+        (['id', 'peso', 'cor', 'comprimento'], {'aprovada': True}),
+        (['caixa_id', 'id', 'peso'], {'em_caixa': True}),
+        (['id', 'caixa_id', 'codigo_reprovacao'], {'aprovada': False, 'cor': 'vermelho'}),
+    ]
+
+    @staticmethod
+    def _popular():
+        sistema = inicializar_sistema()
+        for i in range(CAPACIDADE_MAXIMA_CAIXA + 2):
+            adicionar_peca_em_caixa(criar_peca(f"A{i:03d}", 100.0 + i % 2, "azul", 15.0, True), sistema)
+        for i in range(3):
+            peca = criar_peca(f"R{i:03d}", 120.0, "vermelho" if i else "azul", 15.0)
+            aplicar_validacao(peca)
+            registrar_peca_reprovada(peca, sistema)
+        remover_peca_por_id("A001", sistema)
+        return sistema
+
+    @staticmethod
+    def _listas(colunas):
+        return {coluna: list(valores) for coluna, valores in colunas.items() if coluna != 'registrada_em'}
+
+    @pytest.mark.unit
+    def test_journal_igual_ao_banco(self, monkeypatch):
+        """Com o journal ativo as colunas vêm da memória, iguais às do banco."""
+        sistema = self._popular()
+        do_banco = [self._listas(carregar_colunas_pecas(sistema, c, f)) for c, f in self.CONSULTAS]
+        database.limpar_banco()
+
+        monkeypatch.setenv('PECAS_ARMAZENAMENTO', 'journal')
+        sistema = self._popular()
+
+        assert [self._listas(carregar_colunas_pecas(sistema, c, f)) for c, f in self.CONSULTAS] == do_banco
+        assert do_banco[2]['caixa_id'][:2] == [1, 1]
+        assert database.carregar_colunas_pecas(['id']) == {'id': []}
+
+    @pytest.mark.unit
+    def test_journal_sem_filtro_de_data(self, monkeypatch):
+        """A memória não guarda o instante de gravação: filtro de data é recusado."""
+        monkeypatch.setenv('PECAS_ARMAZENAMENTO', 'journal')
+        sistema = self._popular()
+
+        with pytest.raises(ValueError):
+            carregar_colunas_pecas(sistema, ['id'], {'desde': '2024-01-01 00:00:00'})
+        with pytest.raises(ValueError):
+            carregar_colunas_pecas(sistema, ['id', 'densidade'])
+
+
 # ========================================
 # TESTES DE REMOÇÃO DE PEÇAS
 # ========================================
@@ -347,6 +630,64 @@ class TestRemoverPeca:
         assert len(sistema_vazio['pecas_aprovadas']) == 0
 
 
+class TestRemocaoIndexada:
+    """Remoção pelo índice, sem percorrer as listas."""
+
+    @pytest.mark.unit
+    def test_sistema_usa_lista_pecas(self, sistema_vazio):
+        """O sistema inicializado guarda as peças em ListaPecas."""
+        assert isinstance(sistema_vazio['pecas_aprovadas'], ListaPecas)
+        assert isinstance(sistema_vazio['pecas_reprovadas'], ListaPecas)
+
+    @pytest.mark.unit
+    def test_remocao_nao_percorre_lista(self, sistema_vazio):
+        """Com o índice montado, remover não itera sobre as peças."""
+        for i in range(30):
+            adicionar_peca_em_caixa(criar_peca(f"P{i:03d}", 100.0, "azul", 15.0, True), sistema_vazio)
+        existe_peca("P000", sistema_vazio)  # monta o índice
+
+        with patch.object(ListaPecas, '__iter__', side_effect=AssertionError("varredura")):
+            sucesso, mensagem = remover_peca_por_id("P015", sistema_vazio)
+
+        assert sucesso is True
+        assert "Caixa #2" in mensagem
+        assert [p['id'] for p in sistema_vazio['caixas_fechadas'][1]['pecas']] == [
+            f"P{i:03d}" for i in range(10, 20) if i != 15
+        ]
+        assert "P015" not in [p['id'] for p in sistema_vazio['pecas_aprovadas']]
+
+    @pytest.mark.unit
+    def test_remocao_em_lote(self, sistema_vazio):
+        """remover_pecas_por_ids remove todas e persiste uma única vez."""
+        for i in range(25):
+            adicionar_peca_em_caixa(criar_peca(f"P{i:03d}", 100.0, "azul", 15.0, True), sistema_vazio)
+        ids = [f"P{i:03d}" for i in range(0, 25, 2)] + ["X999"]
+
+        with patch.object(database, 'persistir_alteracoes', wraps=database.persistir_alteracoes) as persistir:
+            resultados = remover_pecas_por_ids(ids, sistema_vazio)
+
+        assert persistir.call_count == 1
+        assert [sucesso for sucesso, _ in resultados] == [True] * 13 + [False]
+        aprovadas, _ = database.carregar_pecas()
+        assert [p['id'] for p in aprovadas] == [f"P{i:03d}" for i in range(1, 25, 2)]
+
+    @pytest.mark.unit
+    def test_lista_substituida_diretamente(self, sistema_vazio):
+        """Listas trocadas por listas comuns continuam funcionando."""
+        pecas = [criar_peca(f"P{i}", 100.0, "azul", 15.0, True) for i in range(3)]
+        for peca in pecas:
+            adicionar_peca_em_caixa(peca, sistema_vazio)
+        existe_peca("P0", sistema_vazio)  # monta o índice
+
+        sistema_vazio['pecas_aprovadas'] = [dict(peca) for peca in pecas]
+
+        sucesso, _ = remover_peca_por_id("P1", sistema_vazio)
+
+        assert sucesso is True
+        assert [p['id'] for p in sistema_vazio['pecas_aprovadas']] == ["P0", "P2"]
+        assert [p['id'] for p in sistema_vazio['caixa_atual']['pecas']] == ["P0", "P2"]
+
+
 # ========================================
 # TESTES DE CONSISTÊNCIA DE ESTADO
 # ========================================
@@ -0,0 +1,349 @@
+"""
+Testes unitários para o armazenamento colunar de peças.
+
+Testa:
+- Compatibilidade de PecaColunar com Peca
+- Internação de cores e motivos
+- Mensagens com os limites em vigor na inclusão
+- Conversão do sistema e operações do serviço no modo colunar
+- Índice de peças pelas linhas das colunas
+- Uso de memória em relação a dicts, também com o índice de peças montado
+"""
+
+import json
+import tracemalloc
+
+import pytest
+
+from models.peca import Peca, criar_peca
+from models.caixa import CAPACIDADE_MAXIMA_CAIXA, criar_caixa
+from services import database, regras
+from services.validacao import aplicar_validacao
+from services.armazenamento import (
+    adicionar_peca_em_caixa,
+    existe_peca,
+    inicializar_sistema,
+    localizar_peca,
+    registrar_peca_reprovada,
+    remover_peca_por_id
+)
+from services.armazenamento_colunar import (
+    ColunasPecas,
+    IndicePecasColunar,
+    ListaPecasColunar,
+    PecaColunar,
+    PecasCaixaColunar,
+    converter_para_colunar
+)
+
+
+@pytest.fixture
+def memoria_colunar(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Ativa o armazenamento colunar para inicializar_sistema()."""
+    monkeypatch.setenv('PECAS_MEMORIA', 'colunar')
+
+
+class TestPecaColunar:
+    """Testes da view PecaColunar."""
+
+    @pytest.mark.unit
+    def test_equivale_a_peca(self):
+        """A view tem os mesmos campos e valores da peça original."""
+        peca = criar_peca("R001", 120.0, "vermelho", 25.0, False, ["Peso", "Cor"])
+
+        view = ColunasPecas().armazenar(peca)
+
+        assert view == peca
+        assert dict(view) == peca
+        assert Peca(**view) == peca
+        assert view['aprovada'] is False
+        assert json.loads(json.dumps(dict(view))) == peca
+
+    @pytest.mark.unit
+    def test_atribuicao_grava_nas_colunas(self):
+        """Atribuir um campo altera a coluna correspondente."""
+        colunas = ColunasPecas()
+        view = colunas.armazenar(criar_peca("P001", 100.0, "azul", 15.0, False))
+
+        view['aprovada'] = True
+        view['motivos_reprovacao'] = ["Teste"]
+        view['cor'] = "verde"
+
+        assert colunas.aprovadas[0] == 1
+        assert PecaColunar(colunas, 0)['motivos_reprovacao'] == ["Teste"]
+        assert PecaColunar(colunas, 0)['cor'] == "verde"
+
+    @pytest.mark.unit
+    def test_campos_nao_podem_ser_removidos(self):
+        """Remover campo de uma view não é permitido."""
+        view = ColunasPecas().armazenar(criar_peca("P001", 100.0, "azul", 15.0))
+
+        with pytest.raises(TypeError):
+            del view['peso']
+
+    @pytest.mark.unit
+    def test_cores_e_motivos_internados(self):
+        """Valores repetidos de cor e motivos são guardados uma única vez."""
+        colunas = ColunasPecas()
+        for i in range(100):
+            colunas.armazenar(criar_peca(f"P{i}", 100.0, "azul" if i % 2 else "verde", 15.0, True))
+            colunas.armazenar(criar_peca(f"R{i}", 100.0, "roxo", 15.0, False, ["Cor inadequada"]))
+
+        assert len(colunas) == 200
+        assert len(colunas._cores) == 3
+        assert len(colunas._motivos) == 2
+
+    @pytest.mark.unit
+    def test_motivos_montados_pelo_codigo(self):
+        """Motivos derivados do código não são internados como texto."""
+        peca = criar_peca("R001", 120.0, "vermelho", 15.0)
+        aplicar_validacao(peca)
+        colunas = ColunasPecas()
+
+        view = colunas.armazenar(peca)
+
+        assert view == peca
+        assert view['codigo_reprovacao'] == 3
+        assert len(colunas._motivos) == 1
+
+    @pytest.mark.unit
+    def test_motivos_livres_com_codigo(self):
+        """Texto diferente do que o código gera é preservado."""
+        peca = criar_peca("R001", 120.0, "azul", 15.0, False, ["Rebarba"], codigo_reprovacao=1)
+
+        view = ColunasPecas().armazenar(peca)
+
+        assert view['motivos_reprovacao'] == ["Rebarba"]
+        assert dict(view) == peca
+
+    @pytest.mark.unit
+    def test_codigo_produto_internado(self):
+        """O produto é guardado uma vez por código distinto e só aparece quando existe."""
+        colunas = ColunasPecas()
+        com_produto = colunas.armazenar(criar_peca("P1", 100.0, "azul", 15.0, True, codigo_produto="SKU-1"))
+        colunas.armazenar(criar_peca("P2", 100.0, "azul", 15.0, True, codigo_produto="SKU-1"))
+        sem_produto = colunas.armazenar(criar_peca("P3", 100.0, "azul", 15.0, True))
+
+        assert com_produto['codigo_produto'] == "SKU-1"
+        assert 'codigo_produto' not in sem_produto
+        assert len(colunas._produtos) == 2
+
+    @pytest.mark.unit
+    def test_motivos_mantem_limites_da_inclusao(self):
+        """Mudar as regras não reescreve as mensagens de peças já incluídas."""
+        peca = criar_peca("R001", 90.0, "vermelho", 15.0)
+        aplicar_validacao(peca)
+        colunas = ColunasPecas()
+        view = colunas.armazenar(peca)
+
+        regras.salvar_regras({'peso_minimo': 80.0, 'peso_maximo': 120.0, 'cores_aceitas': ['vermelho']})
+
+        assert view['motivos_reprovacao'] == peca['motivos_reprovacao']
+        assert view['motivos_reprovacao'][0] == "Peso fora do intervalo (95.0-105.0g): 90.0g"
+        assert len(colunas._motivos) == 1
+
+    @pytest.mark.unit
+    def test_ids_em_coluna_compacta(self):
+        """IDs ficam concatenados em uma coluna de bytes; alterações repontam a linha."""
+        colunas = ColunasPecas()
+        view = colunas.armazenar(criar_peca("Peça-1", 100.0, "azul", 15.0, True))
+        colunas.armazenar(criar_peca("P2", 100.0, "azul", 15.0, True))
+
+        view['id'] = "P1"
+
+        assert view['id'] == "P1"
+        assert PecaColunar(colunas, 1)['id'] == "P2"
+
+
+class TestListaPecasColunar:
+    """Testes da lista de peças colunar."""
+
+    @pytest.mark.unit
+    def test_guarda_views(self):
+        """Peças incluídas viram linhas das colunas, lidas como views na mesma ordem."""
+        pecas = [criar_peca(f"P{i}", 100.0 + i, "azul", 15.0, True) for i in range(5)]
+
+        lista = ListaPecasColunar(pecas)
+
+        assert lista == pecas
+        assert all(isinstance(peca, PecaColunar) for peca in lista)
+        assert [peca['peso'] for peca in lista] == [100.0, 101.0, 102.0, 103.0, 104.0]
+
+    @pytest.mark.unit
+    def test_copia_compartilha_colunas(self):
+        """copy() reaproveita as linhas sem duplicá-las."""
+        lista = ListaPecasColunar([criar_peca("P1", 100.0, "azul", 15.0, True)])
+
+        copia = lista.copy()
+
+        assert copia[0] == lista[0]
+        assert copia[0].linha == lista[0].linha
+        assert len(lista.colunas) == 1
+
+    @pytest.mark.unit
+    def test_usa_menos_memoria_que_dicts(self):
+        """Peças colunares ocupam bem menos memória que dicts."""
+        quantidade = 5000
+
+        def medir(construir):
+            tracemalloc.start()
+            try:
+                objeto = construir()
+                tamanho, _ = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            del objeto
+            return tamanho
+
+        def como_dicts():
+            return [
+                criar_peca(f"P{i:06d}", 100.0 + i / 1000, "azul", 15.0 + i / 1000, True)
+                for i in range(quantidade)
+            ]
+
+        def como_colunas():
+            return ListaPecasColunar(
+                criar_peca(f"P{i:06d}", 100.0 + i / 1000, "azul", 15.0 + i / 1000, True)
+                for i in range(quantidade)
+            )
+
+        # Sem views guardadas nem um str por ID: poucas dezenas de bytes por peça
+        tamanho = medir(como_colunas)
+        assert tamanho < medir(como_dicts) / 5
+        assert tamanho / quantidade < 100
+
+
+class TestIndicePecasColunar:
+    """Índice de peças guardado pelas linhas das colunas."""
+
+    @staticmethod
+    def _localizacao(lista, chave, caixa=None, posicao_caixa=None):
+        return {
+            'peca': lista.obter_chave(chave), 'aprovada': True, 'caixa': caixa,
+            'chave': chave, 'posicao_caixa': posicao_caixa
+        }
+
+    @pytest.mark.unit
+    def test_inclui_consulta_e_remove(self):
+        """Inclusões, remoções e o crescimento da tabela mantêm as consultas."""
+        lista = ListaPecasColunar()
+        indice = IndicePecasColunar(lista.colunas)
+        caixa = criar_caixa(7)
+        chaves = [lista.adicionar(criar_peca(f"P{i:03d}", 100.0, "azul", 15.0, True)) for i in range(100)]
+        for i, chave in enumerate(chaves):
+            indice[f"P{i:03d}"] = self._localizacao(lista, chave, caixa if i == 5 else None, 0 if i == 5 else None)
+
+        for i in range(0, 100, 2):
+            del indice[f"P{i:03d}"]
+
+        assert len(indice) == 50
+        assert "P002" not in indice and "P003" in indice
+        assert sorted(indice) == [f"P{i:03d}" for i in range(1, 100, 2)]
+        localizacao = indice["P005"]
+        assert localizacao['caixa'] is caixa and localizacao['posicao_caixa'] == 0
+        assert localizacao['peca'].linha == lista.obter_chave(chaves[5]).linha
+        assert indice["P099"]['chave'] == chaves[99]
+        with pytest.raises(KeyError):
+            indice["P000"]
+
+    @pytest.mark.unit
+    def test_sistema_usa_indice_colunar(self, memoria_colunar):
+        """Com a memória colunar o serviço indexa as peças pelo índice colunar."""
+        sistema = inicializar_sistema()
+        for i in range(CAPACIDADE_MAXIMA_CAIXA + 1):
+            adicionar_peca_em_caixa(criar_peca(f"P{i:03d}", 100.0, "azul", 15.0, True), sistema)
+        remover_peca_por_id("P003", sistema)
+
+        assert isinstance(sistema['indice_pecas'], IndicePecasColunar)
+        assert localizar_peca("P004", sistema)['caixa'] is sistema['caixas_fechadas'][0]
+        assert localizar_peca("P004", sistema)['posicao_caixa'] == 3
+        assert localizar_peca("P010", sistema)['caixa'] is sistema['caixa_atual']
+        assert not existe_peca("P003", sistema)
+
+    @pytest.mark.unit
+    def test_memoria_por_peca_com_indice(self):
+        """Com o índice montado, cada peça continua ocupando poucas dezenas de bytes."""
+        quantidade = 20000
+        tracemalloc.start()
+        try:
+            colunas = ColunasPecas()
+            sistema = {
+                'pecas_aprovadas': ListaPecasColunar(
+                    (criar_peca(f"P{i:06d}", 100.0 + i / 1000, "azul", 15.0, True) for i in range(quantidade)),
+                    colunas
+                ),
+                'pecas_reprovadas': ListaPecasColunar(colunas=colunas),
+                'caixas_fechadas': [],
+                'caixa_atual': criar_caixa(1),
+                'contador_caixas': 1,
+            }
+            assert existe_peca("P000123", sistema)
+            tamanho, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert isinstance(sistema['indice_pecas'], IndicePecasColunar)
+        assert tamanho / quantidade < 150
+
+
+class TestSistemaColunar:
+    """Operações do serviço com PECAS_MEMORIA=colunar."""
+
+    @pytest.mark.unit
+    def test_inicializar_converte_listas(self, memoria_colunar):
+        """inicializar_sistema usa ListaPecasColunar nas duas listas."""
+        sistema = inicializar_sistema()
+
+        assert isinstance(sistema['pecas_aprovadas'], ListaPecasColunar)
+        assert sistema['pecas_reprovadas'].colunas is sistema['pecas_aprovadas'].colunas
+
+    @pytest.mark.unit
+    def test_operacoes_do_servico(self, memoria_colunar):
+        """Cadastrar, fechar caixa e remover funcionam e persistem."""
+        sistema = inicializar_sistema()
+        for i in range(CAPACIDADE_MAXIMA_CAIXA + 2):
+            adicionar_peca_em_caixa(criar_peca(f"P{i:03d}", 100.0, "azul", 15.0, True), sistema)
+        registrar_peca_reprovada(
+            criar_peca("R001", 120.0, "azul", 15.0, False, ["Peso fora do intervalo"]),
+            sistema
+        )
+
+        # Caixa e lista referenciam a mesma linha
+        assert isinstance(sistema['caixa_atual']['pecas'], PecasCaixaColunar)
+        assert sistema['caixa_atual']['pecas'][0].linha == sistema['pecas_aprovadas'][-2].linha
+        assert existe_peca("R001", sistema)
+
+        sucesso, _ = remover_peca_por_id("P011", sistema)
+        assert sucesso is True
+        assert [p['id'] for p in sistema['caixa_atual']['pecas']] == ["P010"]
+
+        aprovadas, reprovadas = database.carregar_pecas()
+        assert len(aprovadas) == CAPACIDADE_MAXIMA_CAIXA + 1
+        assert reprovadas[0]['motivos_reprovacao'] == ["Peso fora do intervalo"]
+
+    @pytest.mark.unit
+    def test_recarrega_do_banco(self, memoria_colunar):
+        """Sistema salvo é recarregado no formato colunar com as caixas ligadas."""
+        sistema = inicializar_sistema()
+        for i in range(CAPACIDADE_MAXIMA_CAIXA + 1):
+            adicionar_peca_em_caixa(criar_peca(f"P{i:03d}", 100.0, "azul", 15.0, True), sistema)
+
+        recarregado = inicializar_sistema()
+
+        fechada = recarregado['caixas_fechadas'][0]
+        assert isinstance(fechada['pecas'][0], PecaColunar)
+        assert fechada['pecas'][0].linha == recarregado['pecas_aprovadas'][0].linha
+        assert len(recarregado['pecas_aprovadas'].colunas) == CAPACIDADE_MAXIMA_CAIXA + 1
+        assert recarregado['pecas_aprovadas'] == sistema['pecas_aprovadas']
+
+    @pytest.mark.unit
+    def test_converter_peca_so_na_caixa(self):
+        """Peças presentes apenas nas caixas também são convertidas."""
+        sistema = inicializar_sistema()
+        avulsa = criar_peca("C001", 100.0, "azul", 15.0, True)
+        sistema['caixa_atual']['pecas'].append(avulsa)
+
+        converter_para_colunar(sistema)
+
+        assert isinstance(sistema['caixa_atual']['pecas'][0], PecaColunar)
+        assert sistema['caixa_atual']['pecas'][0] == avulsa
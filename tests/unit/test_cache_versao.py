@@ -0,0 +1,144 @@
+"""
+Testes unitários para a memorização por versão dos dados.
+
+Testa:
+- Marca de versão do sistema (alterações, listas alteradas diretamente, recarga)
+- Cache limitado com descarte do item menos usado
+- Funções memorizadas refeitas só quando os dados ou as regras mudam
+"""
+
+from unittest.mock import Mock
+
+import pytest
+
+from models.caixa import CAPACIDADE_MAXIMA_CAIXA
+from models.peca import criar_peca
+from services import regras
+from services.armazenamento import (
+    adicionar_peca_em_caixa,
+    inicializar_sistema,
+    obter_versao,
+    registrar_peca_reprovada,
+    remover_peca_por_id
+)
+from services.cache_versao import CacheVersionado, memorizar_por_versao
+
+
+class TestVersaoDados:
+    """Marca de versão exposta pelo armazenamento."""
+
+    @pytest.mark.unit
+    def test_muda_a_cada_alteracao(self):
+        """Inclusão, reprovação, fechamento de caixa e remoção mudam a versão."""
+        sistema = inicializar_sistema()
+        versoes = [obter_versao(sistema)]
+
+        for i in range(CAPACIDADE_MAXIMA_CAIXA):
+            adicionar_peca_em_caixa(criar_peca(f"A{i:03d}", 100.0, "azul", 15.0, True), sistema)
+            versoes.append(obter_versao(sistema))
+        registrar_peca_reprovada(
+            criar_peca("R001", 120.0, "azul", 15.0, False, ["Peso fora do intervalo"]), sistema
+        )
+        versoes.append(obter_versao(sistema))
+        remover_peca_por_id("R001", sistema)
+        versoes.append(obter_versao(sistema))
+
+        assert len(set(versoes)) == len(versoes)
+        assert obter_versao(sistema) == versoes[-1]
+
+    @pytest.mark.unit
+    def test_lista_alterada_diretamente(self):
+        """Mudanças feitas direto nas listas também mudam a versão."""
+        sistema = inicializar_sistema()
+        antes = obter_versao(sistema)
+
+        sistema['pecas_reprovadas'].append(criar_peca("R001", 120.0, "azul", 15.0, False))
+
+        assert obter_versao(sistema) != antes
+
+    @pytest.mark.unit
+    def test_sistemas_recarregados_nao_repetem(self):
+        """Duas cargas do mesmo banco têm versões diferentes."""
+        assert obter_versao(inicializar_sistema()) != obter_versao(inicializar_sistema())
+
+
+class TestCacheVersionado:
+    """Cache limitado (LRU)."""
+
+    @pytest.mark.unit
+    def test_descarta_menos_usado(self):
+        """Ao passar do máximo, sai a entrada usada há mais tempo."""
+        cache = CacheVersionado(maximo=2)
+        cache.obter('a', lambda: 1)
+        cache.obter('b', lambda: 2)
+        cache.obter('a', lambda: 0)
+        cache.obter('c', lambda: 3)
+
+        assert len(cache) == 2
+        assert cache.obter('a', lambda: 0) == 1
+        assert cache.obter('b', lambda: 0) == 0
+
+    @pytest.mark.unit
+    def test_maximo_invalido(self):
+        """O cache precisa de pelo menos uma entrada."""
+        with pytest.raises(ValueError):
+            CacheVersionado(maximo=0)
+
+
+class TestMemorizarPorVersao:
+    """Funções memorizadas pela versão do sistema."""
+
+    @pytest.mark.unit
+    def test_refaz_so_quando_dados_mudam(self):
+        """Sem alterações, o mesmo objeto é devolvido sem recalcular."""
+        construir = Mock(side_effect=lambda sistema: object())
+        memorizada = memorizar_por_versao()(construir)
+        sistema = inicializar_sistema()
+
+        primeiro = memorizada(sistema)
+        assert memorizada(sistema) is primeiro
+        assert construir.call_count == 1
+
+        adicionar_peca_em_caixa(criar_peca("A001", 100.0, "azul", 15.0, True), sistema)
+
+        assert memorizada(sistema) is not primeiro
+        assert construir.call_count == 2
+
+    @pytest.mark.unit
+    def test_refaz_quando_regras_mudam(self):
+        """Recarregar as regras invalida os resultados (gráficos desenham os limites)."""
+        construir = Mock(side_effect=lambda sistema: object())
+        memorizada = memorizar_por_versao()(construir)
+        sistema = inicializar_sistema()
+
+        memorizada(sistema)
+        regras.recarregar_regras()
+        memorizada(sistema)
+
+        assert construir.call_count == 2
+
+    @pytest.mark.unit
+    def test_versoes_limitadas(self):
+        """A função guarda no máximo o número de versões configurado."""
+        memorizada = memorizar_por_versao(maximo=3)(lambda sistema: len(sistema['pecas_aprovadas']))
+        sistema = inicializar_sistema()
+
+        for i in range(10):
+            adicionar_peca_em_caixa(criar_peca(f"A{i:03d}", 100.0, "azul", 15.0, True), sistema)
+            assert memorizada(sistema) == i + 1
+
+        assert len(memorizada.cache) == 3
+
+    @pytest.mark.unit
+    def test_banco_refaz_quando_outra_sessao_grava(self):
+        """Com banco=True, uma gravação feita por outro sistema invalida o resultado."""
+        construir = Mock(side_effect=lambda sistema: object())
+        memorizada = memorizar_por_versao(banco=True)(construir)
+        sistema = inicializar_sistema()
+        outro = inicializar_sistema()
+
+        primeiro = memorizada(sistema)
+        adicionar_peca_em_caixa(criar_peca("A001", 100.0, "azul", 15.0, True), outro)
+
+        assert memorizada(sistema) is not primeiro
+        assert construir.call_count == 2
@@ -0,0 +1,203 @@
+"""
+Testes unitários para a detecção online com as regras de Western Electric.
+
+Testa:
+- Cada regra avaliada pela janela de uma medida
+- Janela circular com soma e soma dos quadrados atualizadas
+- Base fixa (fase I ou SPC do agregado) que não acompanha a deriva
+- Alertas disparados no cadastro, gravados no banco e no journal
+"""
+
+import pytest
+
+from models.peca import criar_peca
+from services import database
+from services.armazenamento import (
+    adicionar_peca_em_caixa,
+    inicializar_sistema,
+    obter_ultimos_alertas,
+    registrar_peca_reprovada
+)
+from services.controle import (
+    MINIMO_PONTOS,
+    REGRA_2_DE_3,
+    REGRA_4_DE_5,
+    REGRA_ALEM_3_SIGMA,
+    REGRA_MESMO_LADO,
+    REGRA_TENDENCIA,
+    JanelaControle,
+    MonitorControle
+)
+
+
+# Valores alternados em torno de 100 (média 100, σ ≈ 1)
+BASE = [99.0, 101.0] * (MINIMO_PONTOS // 2)
+
+
+def _janela_com_base() -> JanelaControle:
+    janela = JanelaControle()
+    for valor in BASE:
+        assert janela.avaliar(valor) == []
+    return janela
+
+
+class TestRegras:
+    """Testes de cada regra na janela de uma medida."""
+
+    @pytest.mark.unit
+    def test_sem_base_nao_avalia_sigma(self):
+        """Antes de MINIMO_PONTOS valores, só a tendência é avaliada."""
+        janela = JanelaControle()
+        janela.avaliar(100.0)
+
+        assert janela.avaliar(500.0) == []
+
+    @pytest.mark.unit
+    def test_ponto_alem_de_3_sigma(self):
+        """Um ponto além de 3σ dispara o alerta imediatamente."""
+        janela = _janela_com_base()
+
+        assert janela.avaliar(104.0) == [REGRA_ALEM_3_SIGMA]
+
+    @pytest.mark.unit
+    def test_2_de_3_alem_de_2_sigma(self):
+        """O segundo ponto além de 2σ do mesmo lado dispara o alerta."""
+        janela = _janela_com_base()
+
+        assert janela.avaliar(102.5) == []
+        assert janela.avaliar(102.5) == [REGRA_2_DE_3]
+
+    @pytest.mark.unit
+    def test_2_sigma_em_lados_opostos(self):
+        """Pontos além de 2σ em lados opostos não contam juntos."""
+        janela = _janela_com_base()
+
+        assert janela.avaliar(102.5) == []
+        assert janela.avaliar(97.5) == []
+
+    @pytest.mark.unit
+    def test_4_de_5_alem_de_1_sigma(self):
+        """O quarto ponto além de 1σ entre os últimos cinco dispara o alerta."""
+        janela = _janela_com_base()
+
+        resultados = [janela.avaliar(valor) for valor in [101.5, 101.5, 100.0, 101.5, 101.5]]
+
+        assert resultados[-1] == [REGRA_4_DE_5]
+        assert all(regras == [] for regras in resultados[:-1])
+
+    @pytest.mark.unit
+    def test_8_do_mesmo_lado(self):
+        """Oito pontos seguidos acima da média disparam o alerta uma vez."""
+        janela = _janela_com_base()
+
+        resultados = [janela.avaliar(100.5) for _ in range(10)]
+
+        assert [i for i, regras in enumerate(resultados) if REGRA_MESMO_LADO in regras] == [7]
+
+    @pytest.mark.unit
+    def test_tendencia(self):
+        """Seis pontos seguidos subindo disparam o alerta; um empate reinicia."""
+        janela = JanelaControle()
+
+        resultados = [janela.avaliar(valor) for valor in [1.0, 2.0, 3.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0]]
+
+        assert [i for i, regras in enumerate(resultados) if REGRA_TENDENCIA in regras] == [8]
+
+    @pytest.mark.unit
+    def test_janela_circular(self):
+        """A janela guarda só os últimos valores, com somas consistentes."""
+        janela = JanelaControle(tamanho=5)
+
+        for valor in range(1, 13):
+            janela.avaliar(float(valor))
+
+        assert list(janela.valores) == [8.0, 9.0, 10.0, 11.0, 12.0]
+        assert janela.soma == pytest.approx(50.0)
+        assert janela.soma_quadrados == pytest.approx(sum(v * v for v in range(8, 13)))
+
+    @pytest.mark.unit
+    def test_base_fixa_nao_absorve_deriva(self):
+        """Depois da fase I a base não muda: a deriva segue alertando com a janela cheia dela."""
+        janela = _janela_com_base()
+        base = janela.base
+
+        resultados = [janela.avaliar(102.5) for _ in range(2 * len(janela.valores))]
+
+        assert janela.base == base
+        assert all(REGRA_2_DE_3 in regras for regras in resultados[1:])
+
+    @pytest.mark.unit
+    def test_base_informada(self):
+        """Com a base informada, as regras valem desde o primeiro valor."""
+        monitor = MonitorControle(bases={'peso': (100.0, 1.0)})
+
+        alertas = monitor.registrar(criar_peca("P001", 104.0, "azul", 15.0, True))
+
+        assert [(a['medida'], a['regra']) for a in alertas] == [('peso', REGRA_ALEM_3_SIGMA)]
+        assert monitor.janelas['comprimento'].base is None
+
+
+class TestAlertasSistema:
+    """Alertas disparados pelo cadastro de peças."""
+
+    @staticmethod
+    def _cadastrar_base(sistema) -> None:
+        for i, peso in enumerate(BASE):
+            adicionar_peca_em_caixa(criar_peca(f"P{i:03d}", peso, "azul", 15.0, True), sistema)
+
+    @pytest.mark.unit
+    def test_alerta_no_cadastro_e_no_banco(self):
+        """A peça fora de controle gera alerta exposto e gravado no banco."""
+        sistema = inicializar_sistema()
+        self._cadastrar_base(sistema)
+        assert obter_ultimos_alertas(sistema) == []
+
+        registrar_peca_reprovada(
+            criar_peca("R001", 110.0, "azul", 15.0, False, ["Peso fora do intervalo"]), sistema
+        )
+
+        alertas = obter_ultimos_alertas(sistema)
+        assert [(a['medida'], a['regra'], a['peca_id']) for a in alertas] == [
+            ('peso', REGRA_ALEM_3_SIGMA, 'R001')
+        ]
+        gravados = database.carregar_alertas()
+        assert [(a['regra'], a['peca_id'], a['valor']) for a in gravados] == [
+            (REGRA_ALEM_3_SIGMA, 'R001', 110.0)
+        ]
+        assert gravados[0]['registrado_em']
+
+    @pytest.mark.unit
+    def test_alerta_gravado_no_journal(self, monkeypatch: pytest.MonkeyPatch):
+        """Com o journal ativo, os alertas também são gravados."""
+        monkeypatch.setenv('PECAS_ARMAZENAMENTO', 'journal')
+        sistema = inicializar_sistema()
+        self._cadastrar_base(sistema)
+
+        adicionar_peca_em_caixa(criar_peca("A999", 104.0, "azul", 15.0, True), sistema)
+
+        assert [a['peca_id'] for a in database.carregar_alertas()] == ['A999']
+
+    @pytest.mark.unit
+    def test_carga_nao_dispara_alertas(self):
+        """Peças carregadas do banco não passam pelas regras."""
+        sistema = inicializar_sistema()
+        self._cadastrar_base(sistema)
+        adicionar_peca_em_caixa(criar_peca("A999", 104.0, "azul", 15.0, True), sistema)
+
+        recarregado = inicializar_sistema()
+
+        assert obter_ultimos_alertas(recarregado) == []
+        assert len(database.carregar_alertas()) == 1
+
+    @pytest.mark.unit
+    def test_recarregado_usa_spc_como_base(self):
+        """Após a carga, a base vem do SPC do agregado, sem esperar uma nova fase I."""
+        self._cadastrar_base(inicializar_sistema())
+        recarregado = inicializar_sistema()
+
+        adicionar_peca_em_caixa(criar_peca("A999", 104.0, "azul", 15.0, True), recarregado)
+
+        assert [a['regra'] for a in obter_ultimos_alertas(recarregado)] == [REGRA_ALEM_3_SIGMA]
+        media, sigma = recarregado['controle'].janelas['peso'].base
+        assert media == pytest.approx(100.0)
+        assert sigma == pytest.approx(1.026, abs=1e-3)
@@ -9,13 +9,22 @@ import pytest
 import tempfile
 import shutil
 import sqlite3
+import threading
 from pathlib import Path
-from typing import Generator
+from typing import Generator, List
 from unittest.mock import patch
 
-from services import database
-from services.armazenamento import SistemaArmazenamento
+from services import database, journal
+from services.armazenamento import (
+    SistemaArmazenamento,
+    adicionar_peca_em_caixa,
+    criar_alteracoes_pendentes,
+    inicializar_sistema
+)
 from models.peca import criar_peca
+from services.validacao import aplicar_validacao
+from services import regras
+from services.regras import salvar_perfil_produto
 from models.caixa import criar_caixa
 
 
@@ -44,6 +53,20 @@ def temp_db() -> Generator[Path, None, None]:
     shutil.rmtree(temp_dir, ignore_errors=True)
 
 
+def assert_usa_indice(sql: str, parametros: tuple, indice: str) -> None:
+    """
+    Verifica via EXPLAIN QUERY PLAN que a consulta é resolvida pelo índice
+    informado, e não por uma varredura completa da tabela.
+    """
+    with database.get_connection() as conn:
+        plano = conn.execute(f"EXPLAIN QUERY PLAN {sql}", parametros).fetchall()
+    
+    detalhes = [linha['detail'] for linha in plano]
+    assert any(indice in detalhe for detalhe in detalhes), (
+        f"Consulta não usa {indice}: {detalhes}"
+    )
+
+
 class TestSchemaDatabase:
     """Testes de criação e inicialização do schema."""
     
@@ -91,6 +114,60 @@ class TestSchemaDatabase:
         assert database.banco_existe()
 
 
+class TestIndices:
+    """Testes dos índices secundários e dos planos das consultas críticas."""
+    
+    INDICES_ESPERADOS = {
+        'idx_motivos_reprovacao_peca_id',
+        'idx_caixas_pecas_peca_id',
+        'idx_pecas_aprovada',
+        'idx_pecas_created_at',
+    }
+    
+    def _indices_existentes(self) -> set:
+        with database.get_connection() as conn:
+            rows = conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index'"
+            ).fetchall()
+        return {row['name'] for row in rows}
+    
+    def test_schema_cria_indices(self, temp_db: Path) -> None:
+        """criar_schema cria todos os índices secundários."""
+        database.criar_schema()
+        
+        assert self.INDICES_ESPERADOS <= self._indices_existentes()
+    
+    def test_indices_criados_em_banco_existente(self, temp_db: Path) -> None:
+        """Bancos criados antes dos índices os recebem na inicialização."""
+        database.criar_schema()
+        with database.get_connection() as conn:
+            for indice in self.INDICES_ESPERADOS:
+                conn.execute(f"DROP INDEX {indice}")
+        
+        database.inicializar_database()
+        database.inicializar_database()
+        
+        assert self.INDICES_ESPERADOS <= self._indices_existentes()
+    
+    @pytest.mark.parametrize("sql, parametros, indice", [
+        ("DELETE FROM motivos_reprovacao WHERE peca_id = ?", ("P001",),
+         "idx_motivos_reprovacao_peca_id"),
+        ("DELETE FROM caixas_pecas WHERE peca_id = ?", ("P001",),
+         "idx_caixas_pecas_peca_id"),
+        ("SELECT id FROM pecas WHERE aprovada = ?", (0,),
+         "idx_pecas_aprovada"),
+        ("SELECT id FROM pecas WHERE created_at >= ?", ("2025-01-01",),
+         "idx_pecas_created_at"),
+    ])
+    def test_consultas_criticas_usam_indice(
+        self, temp_db: Path, sql: str, parametros: tuple, indice: str
+    ) -> None:
+        """Consultas por peça, status e data não fazem varredura completa."""
+        database.inicializar_database()
+        
+        assert_usa_indice(sql, parametros, indice)
+
+
 class TestPersistenciaPecas:
     """Testes de salvamento e carregamento de peças."""
     
@@ -216,6 +293,116 @@ class TestPersistenciaPecas:
         assert len(aprovadas) == 1
         assert aprovadas[0]['peso'] == 102.0
         assert aprovadas[0]['cor'] == "verde"
+    
+    def test_codigo_reprovacao_sem_linhas_de_motivo(self, temp_db: Path) -> None:
+        """Motivos derivados do código não são gravados como texto."""
+        database.inicializar_database()
+        
+        peca = criar_peca("R001", 120.0, "vermelho", 15.0)
+        aplicar_validacao(peca)
+        database.salvar_peca(peca)
+        
+        with database.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM motivos_reprovacao")
+            assert cursor.fetchone()[0] == 0
+            cursor.execute("SELECT codigo_reprovacao FROM pecas WHERE id = 'R001'")
+            assert cursor.fetchone()[0] == 3
+        
+        _, reprovadas = database.carregar_pecas()
+        assert reprovadas[0]['codigo_reprovacao'] == 3
+        assert reprovadas[0]['motivos_reprovacao'] == peca['motivos_reprovacao']
+    
+    def test_mensagens_mantem_limites_da_validacao(self, temp_db: Path) -> None:
+        """Mudar as regras não reescreve as mensagens de peças já gravadas."""
+        database.inicializar_database()
+        
+        peca = criar_peca("R001", 90.0, "vermelho", 15.0)
+        aplicar_validacao(peca)
+        database.salvar_peca(peca)
+        original = list(peca['motivos_reprovacao'])
+        
+        regras.salvar_regras({'peso_minimo': 80.0, 'peso_maximo': 120.0, 'cores_aceitas': ['vermelho']})
+        
+        _, reprovadas = database.carregar_pecas()
+        assert reprovadas[0]['motivos_reprovacao'] == original
+        assert original[0] == "Peso fora do intervalo (95.0-105.0g): 90.0g"
+        assert database.carregar_peca("R001")['motivos_reprovacao'] == original
+        
+        # Peças validadas com as novas regras usam os novos limites
+        nova = criar_peca("R002", 130.0, "azul", 15.0)
+        aplicar_validacao(nova)
+        database.salvar_peca(nova)
+        assert database.carregar_peca("R002")['motivos_reprovacao'] == nova['motivos_reprovacao']
+        with database.get_connection() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM limites_validacao").fetchone()[0] == 2
+            assert conn.execute("SELECT COUNT(*) FROM motivos_reprovacao").fetchone()[0] == 0
+    
+    def test_motivos_livres_sao_preservados(self, temp_db: Path) -> None:
+        """Motivos que não correspondem ao código continuam gravados como texto."""
+        database.inicializar_database()
+        
+        peca = criar_peca(
+            "R001", 120.0, "azul", 15.0, False, ["Rebarba visível"], codigo_reprovacao=1
+        )
+        database.salvar_peca(peca)
+        
+        _, reprovadas = database.carregar_pecas()
+        assert reprovadas[0]['motivos_reprovacao'] == ["Rebarba visível"]
+        assert reprovadas[0]['codigo_reprovacao'] == 1
+    
+    def test_migra_banco_sem_coluna_de_codigo(self, temp_db: Path) -> None:
+        """Bancos antigos recebem a coluna codigo_reprovacao ao inicializar."""
+        conn = sqlite3.connect(temp_db)
+        conn.execute("""
+            CREATE TABLE pecas (
+                id TEXT PRIMARY KEY, peso REAL NOT NULL, cor TEXT NOT NULL,
+                comprimento REAL NOT NULL, aprovada INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.execute("INSERT INTO pecas (id, peso, cor, comprimento, aprovada) VALUES ('P001', 100.0, 'azul', 15.0, 1)")
+        conn.commit()
+        conn.close()
+        
+        database.inicializar_database()
+        
+        aprovadas, _ = database.carregar_pecas()
+        assert aprovadas[0]['id'] == "P001"
+        assert 'codigo_reprovacao' not in aprovadas[0]
+    
+    def test_codigo_produto_persistido(self, temp_db: Path) -> None:
+        """O produto é gravado e os motivos são remontados com o perfil dele."""
+        database.inicializar_database()
+        salvar_perfil_produto("SKU-1", {'peso_maximo': 110.0})
+        
+        peca = criar_peca("R001", 120.0, "azul", 15.0, codigo_produto="SKU-1")
+        aplicar_validacao(peca)
+        database.salvar_peca(peca)
+        
+        with database.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM motivos_reprovacao")
+            assert cursor.fetchone()[0] == 0
+        
+        _, reprovadas = database.carregar_pecas()
+        assert reprovadas[0]['codigo_produto'] == "SKU-1"
+        assert reprovadas[0]['motivos_reprovacao'] == ["Peso fora do intervalo (95.0-110.0g): 120.0g"]
+    
+    def test_perfis_produto(self, temp_db: Path) -> None:
+        """Perfis são gravados, substituídos e removidos pelo código."""
+        database.inicializar_database()
+        
+        database.salvar_perfil_produto("SKU-1", {'peso_minimo': 80.0})
+        database.salvar_perfil_produto("SKU-1", {'cores_aceitas': ['preto']})
+        database.salvar_perfil_produto("SKU-2", {})
+        
+        assert database.carregar_perfis_produto() == {
+            "SKU-1": {'cores_aceitas': ['preto']},
+            "SKU-2": {}
+        }
+        assert database.deletar_perfil_produto("SKU-2") is True
+        assert list(database.carregar_perfis_produto()) == ["SKU-1"]
 
 
 class TestPersistenciaCaixas:
@@ -318,6 +505,103 @@ class TestPersistenciaCaixas:
         assert contador == 2
 
 
+class TestPersistenciaEmLote:
+    """Testes de gravação em lote com executemany."""
+    
+    def test_salvar_pecas_em_lote(self, temp_db: Path) -> None:
+        """Todas as peças e motivos do lote são gravados."""
+        database.inicializar_database()
+        
+        pecas = [
+            criar_peca(f"P{i:03d}", 100.0, "azul", 15.0, i % 2 == 0,
+                       [] if i % 2 == 0 else ["Peso alto", "Cor inadequada"])
+            for i in range(50)
+        ]
+        database.salvar_pecas_em_lote(pecas)
+        
+        aprovadas, reprovadas = database.carregar_pecas()
+        assert len(aprovadas) == 25
+        assert len(reprovadas) == 25
+        assert all(len(p['motivos_reprovacao']) == 2 for p in reprovadas)
+    
+    def test_lote_substitui_motivos(self, temp_db: Path) -> None:
+        """Regravar uma peça substitui os motivos anteriores."""
+        database.inicializar_database()
+        peca = criar_peca("P001", 120.0, "azul", 15.0, False, ["Peso alto", "Outro"])
+        database.salvar_pecas_em_lote([peca])
+        
+        peca['motivos_reprovacao'] = ["Peso alto"]
+        database.salvar_pecas_em_lote([peca])
+        
+        _, reprovadas = database.carregar_pecas()
+        assert reprovadas[0]['motivos_reprovacao'] == ["Peso alto"]
+    
+    def test_lote_com_id_repetido_usa_ultima_ocorrencia(self, temp_db: Path) -> None:
+        """IDs repetidos no lote não duplicam motivos."""
+        database.inicializar_database()
+        
+        database.salvar_pecas_em_lote([
+            criar_peca("P001", 120.0, "azul", 15.0, False, ["Peso alto"]),
+            criar_peca("P001", 90.0, "azul", 15.0, False, ["Peso baixo"]),
+        ])
+        
+        _, reprovadas = database.carregar_pecas()
+        assert len(reprovadas) == 1
+        assert reprovadas[0]['peso'] == 90.0
+        assert reprovadas[0]['motivos_reprovacao'] == ["Peso baixo"]
+    
+    def test_salvar_caixas_em_lote(self, temp_db: Path) -> None:
+        """Caixas e associações do lote são gravadas na ordem."""
+        database.inicializar_database()
+        
+        pecas = [criar_peca(f"P{i:03d}", 100.0, "azul", 15.0, True, []) for i in range(25)]
+        database.salvar_pecas_em_lote(pecas)
+        
+        caixas = []
+        for numero, inicio in enumerate(range(0, 25, 10), start=1):
+            caixa = criar_caixa(numero)
+            caixa['pecas'] = pecas[inicio:inicio + 10]
+            caixa['fechada'] = len(caixa['pecas']) == 10
+            caixas.append(caixa)
+        database.salvar_caixas_em_lote(caixas)
+        
+        caixas_fechadas, caixa_atual, contador = database.carregar_caixas()
+        assert len(caixas_fechadas) == 2
+        assert [p['id'] for p in caixa_atual['pecas']] == [f"P{i:03d}" for i in range(20, 25)]
+        assert contador == 3
+    
+    def test_lote_de_caixas_e_atomico(self, temp_db: Path) -> None:
+        """Falha em uma caixa do lote desfaz as demais."""
+        database.inicializar_database()
+        peca = criar_peca("P001", 100.0, "azul", 15.0, True, [])
+        database.salvar_peca(peca)
+        
+        caixa_valida = criar_caixa(1)
+        caixa_valida['pecas'] = [peca]
+        caixa_invalida = criar_caixa(2)
+        caixa_invalida['pecas'] = [criar_peca("INEXISTENTE", 100.0, "azul", 15.0, True)]
+        
+        with pytest.raises(sqlite3.IntegrityError):
+            database.salvar_caixas_em_lote([caixa_valida, caixa_invalida])
+        
+        with database.get_connection() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM caixas").fetchone()[0] == 0
+    
+    def test_salvar_peca_delega_ao_lote(self, temp_db: Path) -> None:
+        """salvar_peca e salvar_caixa usam as variantes em lote."""
+        database.inicializar_database()
+        peca = criar_peca("P001", 100.0, "azul", 15.0, True, [])
+        caixa = criar_caixa(1)
+        
+        with patch.object(database, 'salvar_pecas_em_lote') as mock_pecas, \
+             patch.object(database, 'salvar_caixas_em_lote') as mock_caixas:
+            database.salvar_peca(peca)
+            database.salvar_caixa(caixa)
+        
+        mock_pecas.assert_called_once_with([peca])
+        mock_caixas.assert_called_once_with([caixa])
+
+
 class TestConfiguracao:
     """Testes de configuração do sistema."""
     
@@ -423,6 +707,462 @@ class TestSistemaCompleto:
         assert sistema['contador_caixas'] == 1
 
 
+class TestPersistenciaIncremental:
+    """Testes de persistência apenas das alterações pendentes."""
+    
+    def _sistema_vazio(self) -> SistemaArmazenamento:
+        return {
+            'pecas_aprovadas': [],
+            'pecas_reprovadas': [],
+            'caixas_fechadas': [],
+            'caixa_atual': criar_caixa(1),
+            'contador_caixas': 1
+        }
+    
+    def test_sem_alteracoes_nao_acessa_banco(self, temp_db: Path) -> None:
+        """Sem alterações pendentes, nada é gravado."""
+        database.inicializar_database()
+        sistema = self._sistema_vazio()
+        
+        with patch.object(database, 'get_connection') as mock_conn:
+            database.persistir_alteracoes(sistema)
+        
+        mock_conn.assert_not_called()
+    
+    def test_persiste_somente_delta(self, temp_db: Path) -> None:
+        """Linhas que não fazem parte do delta não são tocadas."""
+        database.inicializar_database()
+        
+        # Peça gravada por outro processo, desconhecida deste sistema
+        database.salvar_peca(criar_peca("EXT", 100.0, "azul", 15.0, True, []))
+        
+        sistema = self._sistema_vazio()
+        peca = criar_peca("P001", 100.0, "azul", 15.0, True, [])
+        sistema['pecas_aprovadas'].append(peca)
+        sistema['caixa_atual']['pecas'].append(peca)
+        sistema['alteracoes'] = criar_alteracoes_pendentes()
+        sistema['alteracoes']['pecas_salvas']["P001"] = peca
+        sistema['alteracoes']['caixas_salvas'][1] = sistema['caixa_atual']
+        
+        database.persistir_alteracoes(sistema)
+        
+        aprovadas, _ = database.carregar_pecas()
+        assert {p['id'] for p in aprovadas} == {"EXT", "P001"}
+        assert 'alteracoes' not in sistema
+        
+        _, caixa_atual, _ = database.carregar_caixas()
+        assert [p['id'] for p in caixa_atual['pecas']] == ["P001"]
+    
+    def test_remocao_reordena_caixa(self, temp_db: Path) -> None:
+        """Remover peça do meio da caixa mantém a ordem das restantes."""
+        database.inicializar_database()
+        
+        pecas = [criar_peca(f"P{i}", 100.0, "azul", 15.0, True, []) for i in range(3)]
+        caixa = criar_caixa(1)
+        caixa['pecas'] = list(pecas)
+        for peca in pecas:
+            database.salvar_peca(peca)
+        database.salvar_caixa(caixa)
+        
+        sistema = self._sistema_vazio()
+        sistema['pecas_aprovadas'] = list(pecas)
+        sistema['caixa_atual'] = caixa
+        
+        # Remove P1 e adiciona P3 no fim
+        caixa['pecas'].pop(1)
+        nova = criar_peca("P3", 100.0, "azul", 15.0, True, [])
+        caixa['pecas'].append(nova)
+        sistema['alteracoes'] = criar_alteracoes_pendentes()
+        sistema['alteracoes']['pecas_removidas'].add("P1")
+        sistema['alteracoes']['pecas_salvas']["P3"] = nova
+        sistema['alteracoes']['caixas_salvas'][1] = caixa
+        
+        database.persistir_alteracoes(sistema)
+        
+        _, caixa_atual, _ = database.carregar_caixas()
+        assert [p['id'] for p in caixa_atual['pecas']] == ["P0", "P2", "P3"]
+    
+    def test_sincronizar_descarta_alteracoes(self, temp_db: Path) -> None:
+        """Sincronização completa cobre e descarta alterações pendentes."""
+        database.inicializar_database()
+        sistema = self._sistema_vazio()
+        sistema['alteracoes'] = criar_alteracoes_pendentes()
+        
+        database.sincronizar_sistema(sistema)
+        
+        assert 'alteracoes' not in sistema
+
+
+class TestGravacaoAssincrona:
+    """Testes da gravação em segundo plano (write-behind)."""
+    
+    @pytest.fixture
+    def gravacao_assincrona(self, temp_db: Path) -> Generator[None, None, None]:
+        database.inicializar_database()
+        database.ativar_gravacao_assincrona(max_lotes=50, intervalo=0.05)
+        yield
+        database.encerrar_gravacao_assincrona()
+    
+    def _sistema_com_peca(self, id_peca: str) -> SistemaArmazenamento:
+        peca = criar_peca(id_peca, 100.0, "azul", 15.0, True, [])
+        caixa = criar_caixa(1)
+        caixa['pecas'].append(peca)
+        sistema: SistemaArmazenamento = {
+            'pecas_aprovadas': [peca],
+            'pecas_reprovadas': [],
+            'caixas_fechadas': [],
+            'caixa_atual': caixa,
+            'contador_caixas': 1
+        }
+        sistema['alteracoes'] = criar_alteracoes_pendentes()
+        sistema['alteracoes']['pecas_salvas'][id_peca] = peca
+        sistema['alteracoes']['caixas_salvas'][1] = caixa
+        return sistema
+    
+    def test_grava_apos_aguardar(self, gravacao_assincrona: None) -> None:
+        """As alterações enfileiradas estão no banco após aguardar_gravacoes."""
+        sistema = self._sistema_com_peca("P001")
+        
+        database.persistir_alteracoes(sistema)
+        assert 'alteracoes' not in sistema
+        
+        database.aguardar_gravacoes()
+        
+        aprovadas, _ = database.carregar_pecas()
+        assert [p['id'] for p in aprovadas] == ["P001"]
+    
+    def test_lote_independente_do_sistema(self, gravacao_assincrona: None) -> None:
+        """Mudanças no sistema após enfileirar não afetam o que é gravado."""
+        sistema = self._sistema_com_peca("P001")
+        
+        database.persistir_alteracoes(sistema)
+        sistema['pecas_aprovadas'][0]['peso'] = 999.0
+        database.aguardar_gravacoes()
+        
+        aprovadas, _ = database.carregar_pecas()
+        assert aprovadas[0]['peso'] == 100.0
+    
+    def test_agrupa_lotes_em_transacoes(self, temp_db: Path) -> None:
+        """Vários lotes enfileirados são gravados em menos transações."""
+        database.inicializar_database()
+        database.ativar_gravacao_assincrona(max_lotes=50, intervalo=1.0)
+        try:
+            with patch.object(database, '_aplicar_lote', wraps=database._aplicar_lote) as aplicar, \
+                    patch.object(database, 'get_connection', wraps=database.get_connection) as conexoes:
+                for i in range(20):
+                    database.persistir_alteracoes(self._sistema_com_peca(f"P{i:03d}"))
+                database.aguardar_gravacoes()
+            
+            assert aplicar.call_count == 20
+            assert conexoes.call_count < 20
+        finally:
+            database.encerrar_gravacao_assincrona()
+        
+        aprovadas, _ = database.carregar_pecas()
+        assert len(aprovadas) == 20
+    
+    def test_carregar_sistema_aguarda_fila(self, gravacao_assincrona: None) -> None:
+        """carregar_sistema_completo enxerga as alterações ainda na fila."""
+        database.persistir_alteracoes(self._sistema_com_peca("P001"))
+        
+        sistema = database.carregar_sistema_completo()
+        
+        assert [p['id'] for p in sistema['pecas_aprovadas']] == ["P001"]
+    
+    def test_encerrar_grava_pendentes_e_para_thread(self, temp_db: Path) -> None:
+        """Encerrar grava o que falta e volta ao modo síncrono."""
+        database.inicializar_database()
+        database.ativar_gravacao_assincrona(intervalo=1.0)
+        gravador = database._gravador
+        
+        database.persistir_alteracoes(self._sistema_com_peca("P001"))
+        database.encerrar_gravacao_assincrona()
+        
+        assert not gravador.thread.is_alive()
+        assert not database.gravacao_assincrona_ativa()
+        aprovadas, _ = database.carregar_pecas()
+        assert [p['id'] for p in aprovadas] == ["P001"]
+    
+    def test_erro_na_thread_propagado_ao_aguardar(self, gravacao_assincrona: None) -> None:
+        """Falha de gravação em segundo plano é relançada em aguardar_gravacoes."""
+        with patch.object(database, '_aplicar_lote', side_effect=sqlite3.OperationalError("falha")):
+            database.persistir_alteracoes(self._sistema_com_peca("P001"))
+            with pytest.raises(sqlite3.OperationalError):
+                database.aguardar_gravacoes()
+        
+        # Após relançado, o erro não é repetido
+        database.aguardar_gravacoes()
+    
+    def test_lote_com_falha_repetido(self, gravacao_assincrona: None) -> None:
+        """Um lote que falhou não é descartado: é gravado na tentativa seguinte."""
+        with patch.object(database, '_aplicar_lote', side_effect=sqlite3.OperationalError("falha")):
+            database.persistir_alteracoes(self._sistema_com_peca("P001"))
+            with pytest.raises(sqlite3.OperationalError):
+                database.aguardar_gravacoes()
+        
+        database.persistir_alteracoes(self._sistema_com_peca("P002"))
+        database.aguardar_gravacoes()
+        
+        aprovadas, _ = database.carregar_pecas()
+        assert sorted(p['id'] for p in aprovadas) == ["P001", "P002"]
+    
+    def test_erro_relancado_a_quem_agenda(self, gravacao_assincrona: None) -> None:
+        """A próxima gravação agendada recebe o erro e suas alterações ficam pendentes."""
+        with patch.object(database, '_aplicar_lote', side_effect=sqlite3.OperationalError("falha")):
+            database.persistir_alteracoes(self._sistema_com_peca("P001"))
+            database._gravador.fila.join()
+        
+        sistema = self._sistema_com_peca("P002")
+        with pytest.raises(sqlite3.OperationalError):
+            database.persistir_alteracoes(sistema)
+        assert 'alteracoes' in sistema
+        
+        database.persistir_alteracoes(sistema)
+        database.aguardar_gravacoes()
+        aprovadas, _ = database.carregar_pecas()
+        assert sorted(p['id'] for p in aprovadas) == ["P001", "P002"]
+    
+    def test_journal_usa_a_fila(
+        self, gravacao_assincrona: None, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Com o journal ativo, os eventos também são gravados em segundo plano."""
+        monkeypatch.setenv('PECAS_ARMAZENAMENTO', 'journal')
+        sistema = inicializar_sistema()
+        
+        gravador = database._gravador
+        with patch.object(gravador, 'enfileirar', wraps=gravador.enfileirar) as enfileirar:
+            for i in range(5):
+                adicionar_peca_em_caixa(criar_peca(f"J{i:03d}", 100.0, "azul", 15.0, True, []), sistema)
+        
+        assert enfileirar.call_count == 5
+        
+        assert [e['dados']['id'] for e in journal.listar_eventos()] == [f"J{i:03d}" for i in range(5)]
+    
+    def test_inativa_por_padrao(self, temp_db: Path) -> None:
+        """Sem ativação, persistir_alteracoes grava de forma síncrona."""
+        database.inicializar_database()
+        assert not database.gravacao_assincrona_ativa()
+        
+        database.persistir_alteracoes(self._sistema_com_peca("P001"))
+        
+        aprovadas, _ = database.carregar_pecas()
+        assert [p['id'] for p in aprovadas] == ["P001"]
+
+
+class TestCarregamentoEmLote:
+    """Testes do carregamento com número fixo de consultas."""
+    
+    def _popular(self, quantidade: int) -> None:
+        for i in range(quantidade):
+            aprovada = i % 3 != 0
+            motivos = [] if aprovada else ["Peso fora do intervalo", "Cor inadequada"]
+            database.salvar_peca(criar_peca(f"P{i:03d}", 100.0, "azul", 15.0, aprovada, motivos))
+        
+        aprovadas = [f"P{i:03d}" for i in range(quantidade) if i % 3 != 0]
+        for numero, inicio in enumerate(range(0, len(aprovadas), 10), start=1):
+            caixa = criar_caixa(numero)
+            caixa['pecas'] = [
+                criar_peca(id_peca, 100.0, "azul", 15.0, True)
+                for id_peca in aprovadas[inicio:inicio + 10]
+            ]
+            caixa['fechada'] = len(caixa['pecas']) == 10
+            database.salvar_caixa(caixa)
+    
+    def _contar_consultas(self) -> int:
+        consultas: List[str] = []
+        with database.get_connection() as conn:
+            conn.set_trace_callback(consultas.append)
+            try:
+                database.carregar_sistema_completo()
+            finally:
+                conn.set_trace_callback(None)
+        return sum(1 for sql in consultas if sql.lstrip().upper().startswith("SELECT"))
+    
+    def test_numero_de_consultas_independe_do_volume(self, temp_db: Path) -> None:
+        """Carregar 15 ou 90 peças usa a mesma quantidade de SELECTs."""
+        database.inicializar_database()
+        self._popular(15)
+        consultas_pequeno = self._contar_consultas()
+        
+        database.limpar_banco()
+        self._popular(90)
+        consultas_grande = self._contar_consultas()
+        
+        assert consultas_pequeno == consultas_grande == 6
+    
+    def test_peca_da_caixa_e_mesmo_objeto_das_aprovadas(self, temp_db: Path) -> None:
+        """A peça na caixa é o mesmo objeto presente em pecas_aprovadas."""
+        database.inicializar_database()
+        self._popular(15)
+        
+        sistema = database.carregar_sistema_completo()
+        
+        aprovadas_por_id = {id(p) for p in sistema['pecas_aprovadas']}
+        for caixa in sistema['caixas_fechadas'] + [sistema['caixa_atual']]:
+            for peca in caixa['pecas']:
+                assert id(peca) in aprovadas_por_id
+    
+    def test_motivos_preservam_ordem(self, temp_db: Path) -> None:
+        """Motivos agrupados mantêm a ordem de gravação."""
+        database.inicializar_database()
+        self._popular(3)
+        
+        _, reprovadas = database.carregar_pecas()
+        
+        assert reprovadas[0]['motivos_reprovacao'] == [
+            "Peso fora do intervalo", "Cor inadequada"
+        ]
+    
+    def test_caixas_mantem_ordem_das_pecas(self, temp_db: Path) -> None:
+        """Peças de cada caixa vêm na ordem de empacotamento."""
+        database.inicializar_database()
+        self._popular(30)
+        
+        caixas_fechadas, caixa_atual, contador = database.carregar_caixas()
+        
+        assert [c['id'] for c in caixas_fechadas] == [1, 2]
+        assert [p['id'] for p in caixas_fechadas[0]['pecas']][:3] == ["P001", "P002", "P004"]
+        assert caixa_atual['id'] == 3
+        assert contador == 3
+
+
+class TestListagemReprovadas:
+    """Testes da listagem paginada de peças reprovadas."""
+    
+    def _popular(self) -> None:
+        database.inicializar_database()
+        pecas = [criar_peca("A001", 100.0, "azul", 15.0, True)]
+        for i in range(7):
+            peca = criar_peca(f"R{i:03d}", 120.0 if i % 2 else 100.0, "vermelho", 15.0)
+            aplicar_validacao(peca)
+            pecas.append(peca)
+        # Peça sem código: motivos classificados pelo texto
+        pecas.append(criar_peca("T001", 100.0, "azul", 30.0, False, ["Comprimento fora do intervalo"]))
+        database.salvar_pecas_em_lote(pecas)
+    
+    def test_paginas_cobrem_todas_as_reprovadas(self, temp_db: Path) -> None:
+        """As páginas seguem do mais recente ao mais antigo, sem repetir peças."""
+        self._popular()
+        
+        ids: List[str] = []
+        apos = None
+        while True:
+            pagina = database.carregar_pagina_reprovadas(apos=apos, limite=3)
+            assert len(pagina['linhas']) <= 3
+            ids.extend(linha['id'] for linha in pagina['linhas'])
+            apos = pagina['proxima']
+            if apos is None:
+                break
+        
+        assert ids == ["T001"] + [f"R{i:03d}" for i in reversed(range(7))]
+    
+    def test_motivos_como_colunas(self, temp_db: Path) -> None:
+        """Cada critério vira uma coluna, pelo código ou pelo texto dos motivos."""
+        self._popular()
+        
+        linhas = {linha['id']: linha for linha in database.carregar_pagina_reprovadas()['linhas']}
+        
+        assert (linhas["R001"]['reprovada_peso'], linhas["R001"]['reprovada_cor']) == (True, True)
+        assert (linhas["R000"]['reprovada_peso'], linhas["R000"]['reprovada_cor']) == (False, True)
+        assert linhas["T001"]['reprovada_comprimento'] is True
+        assert linhas["T001"]['reprovada_cor'] is False
+    
+    def test_filtros(self, temp_db: Path) -> None:
+        """Filtros por motivo, cor e trecho do ID."""
+        self._popular()
+        
+        def ids(filtros: database.FiltroReprovadas) -> List[str]:
+            return [linha['id'] for linha in database.carregar_pagina_reprovadas(filtros)['linhas']]
+        
+        assert ids({'motivo': 'peso'}) == ["R005", "R003", "R001"]
+        assert ids({'motivo': 'comprimento'}) == ["T001"]
+        assert ids({'cor': 'azul'}) == ["T001"]
+        assert ids({'busca_id': "R00", 'motivo': 'cor', 'cor': 'vermelho'})[-1] == "R000"
+        with pytest.raises(ValueError):
+            database.carregar_pagina_reprovadas({'motivo': 'textura'})
+    
+    def test_pagina_usa_indice_sem_ordenar(self, temp_db: Path) -> None:
+        """Cada página é uma busca no índice, sem varrer nem ordenar as peças."""
+        database.inicializar_database()
+        sql, parametros = database._consulta_reprovadas({'motivo': 'cor'}, 100, 51)
+        
+        assert_usa_indice(sql, parametros, "idx_pecas_aprovada (aprovada=? AND rowid<?)")
+        with database.get_connection() as conn:
+            plano = conn.execute(f"EXPLAIN QUERY PLAN {sql}", parametros).fetchall()
+        assert not any("TEMP B-TREE" in linha['detail'] for linha in plano)
+    
+    def test_detalhe_sob_demanda(self, temp_db: Path) -> None:
+        """carregar_peca traz os motivos completos de uma única peça."""
+        self._popular()
+        
+        assert database.carregar_peca("T001")['motivos_reprovacao'] == ["Comprimento fora do intervalo"]
+        assert len(database.carregar_peca("R001")['motivos_reprovacao']) == 2
+        assert database.carregar_peca("X999") is None
+
+
+class TestCarregamentoColunar:
+    """Testes do carregamento das peças em colunas."""
+    
+    def _popular(self) -> None:
+        database.inicializar_database()
+        caixa = criar_caixa(1)
+        caixa['pecas'] = [
+            criar_peca("A002", 101.0, "verde", 16.0, True),
+            criar_peca("A001", 100.0, "azul", 15.0, True),
+        ]
+        database.salvar_pecas_em_lote(caixa['pecas'])
+        database.salvar_caixa(caixa)
+        database.salvar_peca(criar_peca("R001", 120.0, "azul", 15.0, False, ["Peso fora do intervalo"]))
+    
+    def test_colunas_em_uma_consulta(self, temp_db: Path) -> None:
+        """Todas as colunas vêm de uma única consulta, com o mesmo comprimento."""
+        self._popular()
+        consultas: List[str] = []
+        
+        with database.get_connection() as conn:
+            conn.set_trace_callback(consultas.append)
+            try:
+                colunas = database.carregar_colunas_pecas()
+            finally:
+                conn.set_trace_callback(None)
+        
+        assert len([sql for sql in consultas if sql.lstrip().upper().startswith("SELECT")]) == 1
+        assert set(colunas) == set(database.COLUNAS_PECAS)
+        assert {len(valores) for valores in colunas.values()} == {3}
+        assert list(colunas['aprovada']) == [True, True, False]
+        assert list(colunas['peso']) == [101.0, 100.0, 120.0]
+    
+    def test_projecao_e_filtros(self, temp_db: Path) -> None:
+        """Só as colunas pedidas, das peças que passam pelos filtros."""
+        self._popular()
+        
+        colunas = database.carregar_colunas_pecas(['id', 'peso'], {'aprovada': False, 'cor': 'azul'})
+        
+        assert list(colunas) == ['id', 'peso']
+        assert colunas['id'] == ["R001"]
+        assert database.carregar_colunas_pecas(['id'], {'cor': 'preto'}) == {'id': []}
+        with pytest.raises(ValueError):
+            database.carregar_colunas_pecas(['id', 'densidade'])
+    
+    def test_pecas_por_caixa(self, temp_db: Path) -> None:
+        """Com em_caixa, as peças vêm por caixa, na ordem da caixa."""
+        self._popular()
+        
+        colunas = database.carregar_colunas_pecas(['caixa_id', 'id'], {'em_caixa': True})
+        
+        assert colunas == {'caixa_id': [1, 1], 'id': ["A002", "A001"]}
+    
+    def test_arrays_numpy(self, temp_db: Path) -> None:
+        """Com NumPy, as colunas numéricas vêm como arrays tipados."""
+        np = pytest.importorskip("numpy")
+        self._popular()
+        
+        colunas = database.carregar_colunas_pecas(['peso', 'aprovada'])
+        
+        assert colunas['peso'].dtype == np.float64
+        assert colunas['aprovada'].dtype == np.bool_
+
+
 class TestUtilidades:
     """Testes de funções utilitárias."""
     
@@ -453,6 +1193,97 @@ class TestUtilidades:
         assert not temp_db.exists()
 
 
+class TestGerenciadorConexao:
+    """Testes da conexão de longa duração por thread."""
+    
+    def test_reutiliza_conexao(self, temp_db: Path) -> None:
+        """Chamadas sucessivas usam a mesma conexão."""
+        database.inicializar_database()
+        
+        with database.get_connection() as conn1:
+            pass
+        with database.get_connection() as conn2:
+            pass
+        
+        assert conn1 is conn2
+    
+    def test_pragmas_configurados(self, temp_db: Path) -> None:
+        """WAL, synchronous, cache e foreign keys são aplicados na abertura."""
+        database.inicializar_database()
+        
+        with database.get_connection() as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+            assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+            assert conn.execute("PRAGMA cache_size").fetchone()[0] == -database.CACHE_PAGINAS_KIB
+    
+    def test_troca_de_caminho_reabre_conexao(self, temp_db: Path) -> None:
+        """Alterar DB_PATH abre uma conexão para o novo arquivo."""
+        database.inicializar_database()
+        with database.get_connection() as conn1:
+            pass
+        
+        database.DB_PATH = temp_db.with_name("outro.db")
+        database.inicializar_database()
+        with database.get_connection() as conn2:
+            pass
+        
+        assert conn1 is not conn2
+        assert temp_db.with_name("outro.db").exists()
+    
+    def test_fechar_conexoes_reabre_no_proximo_uso(self, temp_db: Path) -> None:
+        """Após fechar_conexoes, uma nova conexão é aberta."""
+        database.inicializar_database()
+        with database.get_connection() as conn1:
+            pass
+        
+        database.fechar_conexoes()
+        
+        with database.get_connection() as conn2:
+            conn2.execute("SELECT 1")
+        assert conn1 is not conn2
+    
+    def test_threads_usam_conexoes_distintas(self, temp_db: Path) -> None:
+        """Cada thread mantém sua própria conexão."""
+        database.inicializar_database()
+        conexoes = []
+        
+        def usar_conexao() -> None:
+            with database.get_connection() as conn:
+                conexoes.append(conn)
+                conn.execute("SELECT COUNT(*) FROM pecas").fetchone()
+        
+        thread = threading.Thread(target=usar_conexao)
+        thread.start()
+        thread.join()
+        
+        with database.get_connection() as conn:
+            assert conexoes[0] is not conn
+    
+    def test_transacao_aninhada_faz_rollback_completo(self, temp_db: Path) -> None:
+        """Erro no bloco externo desfaz também o que o bloco interno gravou."""
+        database.inicializar_database()
+        
+        with pytest.raises(RuntimeError):
+            with database.get_connection():
+                database.salvar_peca(criar_peca("P001", 100.0, "azul", 15.0, True, []))
+                raise RuntimeError("falha após gravação aninhada")
+        
+        aprovadas, _ = database.carregar_pecas()
+        assert aprovadas == []
+    
+    def test_remover_banco_remove_arquivos_wal(self, temp_db: Path) -> None:
+        """remover_banco apaga também os arquivos -wal e -shm."""
+        database.inicializar_database()
+        database.salvar_peca(criar_peca("P001", 100.0, "azul", 15.0, True, []))
+        
+        database.remover_banco()
+        
+        assert not temp_db.exists()
+        assert not Path(str(temp_db) + "-wal").exists()
+        assert not Path(str(temp_db) + "-shm").exists()
+
+
 class TestTransacaoRollback:
     """Testes para cobertura do bloco de rollback em get_connection (linhas 41-43)."""
     
@@ -0,0 +1,203 @@
+"""
+Testes unitários para os histogramas incrementais das medidas.
+
+Testa:
+- Classes, inclusão, retirada e combinação de histogramas
+- Faixa fixa com classes de excesso
+- Quantis estimados e barras agrupadas
+- Histogramas mantidos no agregado (memória, banco e relatório)
+"""
+
+import random
+
+import pytest
+
+from models.peca import criar_peca
+from services.armazenamento import (
+    adicionar_peca_em_caixa,
+    inicializar_sistema,
+    registrar_peca_reprovada,
+    remover_peca_por_id
+)
+from services.distribuicao import (
+    CLASSES_POR_UNIDADE,
+    MAXIMO_BARRAS,
+    adicionar_valor,
+    agrupar_barras,
+    criar_histograma,
+    estimar_quantil,
+    faixa_padrao,
+    indice_classe,
+    mesclar_histogramas,
+    montar_histograma,
+    remover_valor
+)
+from services.relatorio import gerar_distribuicoes, gerar_distribuicoes_do_banco, gerar_relatorio_completo
+
+
+class TestHistograma:
+    """Testes das operações sobre um histograma."""
+
+    @pytest.mark.unit
+    def test_indice_classe(self):
+        """Valores na borda da classe não caem na classe anterior."""
+        assert indice_classe(100.3) == 1003
+        assert indice_classe(100.39) == 1003
+        assert indice_classe(-0.05) == -1
+
+    @pytest.mark.unit
+    def test_retirada_descarta_classe_vazia(self):
+        """Retirar todos os valores de uma classe a remove do histograma."""
+        histograma = criar_histograma(90.0, 110.0)
+        adicionar_valor(histograma, 100.0)
+        adicionar_valor(histograma, 100.05)
+        adicionar_valor(histograma, 101.0)
+
+        remover_valor(histograma, 101.0)
+
+        assert histograma['classes'] == {1000: 2}
+
+    @pytest.mark.unit
+    def test_excesso_fora_da_faixa(self):
+        """Valores fora da faixa vão para as classes de excesso, sem criar classes."""
+        histograma = criar_histograma(90.0, 110.0)
+        for valor in [100.0, 89.9, 1000.0, 5000.0, 110.0]:
+            adicionar_valor(histograma, valor)
+
+        remover_valor(histograma, 5000.0)
+
+        assert histograma['classes'] == {1000: 1}
+        assert (histograma['abaixo'], histograma['acima']) == (1, 2)
+        assert montar_histograma({
+            'inicio': '900', 'fim': '1100', 'classes': {'1000': 1}, 'abaixo': 1, 'acima': 2
+        }) == histograma
+
+    @pytest.mark.unit
+    def test_faixa_dos_criterios(self):
+        """A faixa padrão são os limites de aceitação com MARGEM_FAIXA de cada lado."""
+        assert faixa_padrao('peso') == (85.0, 115.0)
+        assert faixa_padrao('comprimento') == (0.0, 30.0)
+
+    @pytest.mark.unit
+    def test_mesclar(self):
+        """Combinar histogramas equivale a contar todos os valores em um só."""
+        a, b, ambos = (criar_histograma(90.0, 110.0) for _ in range(3))
+        for valor in [99.0, 100.0, 100.0, 80.0]:
+            adicionar_valor(a, valor)
+            adicionar_valor(ambos, valor)
+        for valor in [100.0, 102.5, 130.0]:
+            adicionar_valor(b, valor)
+            adicionar_valor(ambos, valor)
+
+        mesclar_histogramas(a, b)
+
+        assert a == ambos
+
+    @pytest.mark.unit
+    def test_quantis_proximos_dos_exatos(self):
+        """O erro dos quantis fica dentro de uma largura de classe."""
+        gerador = random.Random(7)
+        valores = sorted(gerador.gauss(100.0, 1.5) for _ in range(5000))
+        histograma = criar_histograma(85.0, 115.0)
+        for valor in valores:
+            adicionar_valor(histograma, valor)
+
+        for q in (0.5, 0.95, 0.99):
+            exato = valores[int(q * len(valores)) - 1]
+            assert estimar_quantil(histograma, q) == pytest.approx(exato, abs=1 / CLASSES_POR_UNIDADE)
+
+    @pytest.mark.unit
+    def test_quantil_limitado_aos_extremos(self):
+        """Com os extremos conhecidos, a estimativa não sai do intervalo real."""
+        histograma = criar_histograma(85.0, 115.0)
+        for _ in range(10):
+            adicionar_valor(histograma, 100.0)
+
+        assert estimar_quantil(histograma, 0.99) > 100.0
+        assert estimar_quantil(histograma, 0.99, 100.0, 100.0) == 100.0
+        assert estimar_quantil(criar_histograma(85.0, 115.0), 0.5) is None
+
+    @pytest.mark.unit
+    def test_quantil_no_excesso(self):
+        """Quantis nas classes de excesso ficam entre a borda da faixa e o extremo."""
+        histograma = criar_histograma(85.0, 115.0)
+        for valor in [100.0] * 8 + [200.0, 300.0]:
+            adicionar_valor(histograma, valor)
+
+        assert estimar_quantil(histograma, 0.95) == 115.0
+        assert estimar_quantil(histograma, 0.95, 100.0, 300.0) == pytest.approx(115.0 + 0.75 * 185.0)
+
+    @pytest.mark.unit
+    def test_barras_com_tamanho_limitado(self):
+        """As barras cobrem a faixa, somam todos os valores e não passam de MAXIMO_BARRAS."""
+        histograma = criar_histograma(80.0, 120.0)
+        for i in range(2000):
+            adicionar_valor(histograma, 50.0 + i * 0.05)
+
+        barras = agrupar_barras(histograma)
+
+        assert len(barras) <= MAXIMO_BARRAS
+        assert sum(barra['quantidade'] for barra in barras) == 2000
+        assert [barras[0]['fora_da_faixa'], barras[-1]['fora_da_faixa']] == [True, True]
+        assert barras[1]['inicio'] == 80.0
+        assert barras[-2]['fim'] == pytest.approx(120.0)
+        assert all(b['fim'] == pytest.approx(p['inicio']) for b, p in zip(barras, barras[1:]))
+
+    @pytest.mark.unit
+    def test_barras_nao_dependem_de_extremos(self):
+        """Um valor extremo vai para a barra de excesso sem alargar as demais."""
+        histograma = criar_histograma(85.0, 115.0)
+        for valor in [99.0, 100.0, 101.0]:
+            adicionar_valor(histograma, valor)
+        sem_extremo = agrupar_barras(histograma)
+
+        adicionar_valor(histograma, 10000.0)
+        com_extremo = agrupar_barras(histograma)
+
+        assert com_extremo[:-1] == sem_extremo
+        assert com_extremo[-1]['quantidade'] == 1
+        assert com_extremo[-1]['fim'] - com_extremo[-1]['inicio'] == pytest.approx(
+            sem_extremo[0]['fim'] - sem_extremo[0]['inicio']
+        )
+
+
+class TestDistribuicaoSistema:
+    """Histogramas mantidos pelo serviço de armazenamento."""
+
+    @staticmethod
+    def _popular():
+        sistema = inicializar_sistema()
+        for i in range(40):
+            adicionar_peca_em_caixa(
+                criar_peca(f"P{i:03d}", 97.0 + i * 0.2, "azul", 14.0 + i * 0.1, True), sistema
+            )
+        registrar_peca_reprovada(
+            criar_peca("R001", 120.3, "azul", 15.0, False, ["Peso fora do intervalo"]), sistema
+        )
+        return sistema
+
+    @pytest.mark.unit
+    def test_quantis_e_remocao(self):
+        """Os quantis acompanham inclusões e remoções sem percorrer as peças."""
+        sistema = self._popular()
+
+        # R001 (120.3) está acima da faixa de peso (85-115): p99 fica entre a borda e o máximo
+        assert 115.0 < gerar_distribuicoes(sistema)['peso']['quantis']['p99'] <= 120.3
+
+        remover_peca_por_id("R001", sistema)
+
+        peso = gerar_distribuicoes(sistema)['peso']
+        assert peso['n'] == 40
+        assert peso['quantis']['p99'] <= 97.0 + 39 * 0.2
+        assert "p95" in gerar_relatorio_completo(sistema)
+
+    @pytest.mark.unit
+    def test_banco_igual_a_memoria(self):
+        """O GROUP BY das classes no banco chega ao mesmo histograma."""
+        sistema = self._popular()
+
+        em_memoria = gerar_distribuicoes(sistema)
+        do_banco = gerar_distribuicoes_do_banco()
+
+        assert do_banco == em_memoria
+        assert sistema['estatisticas']['distribuicao']['peso']['acima'] == 1
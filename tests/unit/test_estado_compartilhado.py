@@ -0,0 +1,79 @@
+"""
+Testes unitários para o estado compartilhado entre sessões.
+
+Testa:
+- Uma única carga para várias sessões
+- Versão incrementada por alteração e recarga
+- Alterações concorrentes serializadas
+"""
+
+import threading
+from unittest.mock import Mock
+
+import pytest
+
+from models.peca import criar_peca
+from services.armazenamento import adicionar_peca_em_caixa, existe_peca, inicializar_sistema
+from services.estado_compartilhado import EstadoCompartilhado
+
+
+class TestEstadoCompartilhado:
+    """Testes do EstadoCompartilhado."""
+
+    @pytest.mark.unit
+    def test_carrega_uma_vez(self):
+        """O sistema é carregado na criação e lido sem nova carga."""
+        carregar = Mock(side_effect=inicializar_sistema)
+        estado = EstadoCompartilhado(carregar)
+
+        sessoes = [estado.sistema for _ in range(10)]
+
+        carregar.assert_called_once()
+        assert all(sistema is estado.sistema for sistema in sessoes)
+        assert estado.versao == 0
+
+    @pytest.mark.unit
+    def test_alterar_incrementa_versao(self):
+        """Cada alteração, bem-sucedida ou não, muda a versão."""
+        estado = EstadoCompartilhado()
+
+        with estado.alterar() as sistema:
+            adicionar_peca_em_caixa(criar_peca("P001", 100.0, "azul", 15.0, True), sistema)
+        with pytest.raises(RuntimeError):
+            with estado.alterar():
+                raise RuntimeError("falha no cadastro")
+
+        assert estado.versao == 2
+        assert existe_peca("P001", estado.sistema)
+
+    @pytest.mark.unit
+    def test_recarregar(self):
+        """A recarga troca o sistema de todas as sessões."""
+        estado = EstadoCompartilhado()
+        anterior = estado.sistema
+
+        estado.recarregar()
+
+        assert estado.sistema is not anterior
+        assert estado.versao == 1
+
+    @pytest.mark.unit
+    def test_alteracoes_concorrentes(self):
+        """Sessões cadastrando ao mesmo tempo não perdem nem duplicam peças."""
+        estado = EstadoCompartilhado()
+
+        def cadastrar(sessao: int) -> None:
+            for i in range(20):
+                with estado.alterar() as sistema:
+                    id_peca = f"P{i:03d}"
+                    if not existe_peca(id_peca, sistema):
+                        adicionar_peca_em_caixa(criar_peca(id_peca, 100.0, "azul", 15.0, True), sistema)
+
+        threads = [threading.Thread(target=cadastrar, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(estado.sistema['pecas_aprovadas']) == 20
+        assert estado.versao == 80
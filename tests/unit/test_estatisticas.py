@@ -0,0 +1,217 @@
+"""
+Testes unitários para o agregado incremental de estatísticas.
+
+Testa:
+- Atualização dos contadores ao incluir, remover peças e fechar caixas
+- Recalculo quando as listas são alteradas fora do serviço
+- Persistência do agregado (tabelas e journal) e reaproveitamento na carga
+"""
+
+import json
+from unittest.mock import patch
+
+import pytest
+
+from models.peca import criar_peca
+from models.caixa import CAPACIDADE_MAXIMA_CAIXA
+from services import database, estatisticas
+from services.armazenamento import (
+    adicionar_peca_em_caixa,
+    inicializar_sistema,
+    registrar_peca_reprovada,
+    remover_peca_por_id
+)
+from services.estatisticas import (
+    CHAVE_CONFIG_ESTATISTICAS,
+    PREFIXO_CONFIG_PRODUTO,
+    calcular_estatisticas,
+    contar_reprovacoes,
+    desserializar_estatisticas,
+    obter_estatisticas,
+    obter_medidas_spc,
+    serializar_estatisticas
+)
+from services.validacao import aplicar_validacao
+
+
+def _popular(sistema) -> None:
+    """Caixa fechada, peças de dois produtos e reprovações com e sem código."""
+    for i in range(CAPACIDADE_MAXIMA_CAIXA + 2):
+        produto = "SKU-1" if i % 2 else None
+        adicionar_peca_em_caixa(
+            criar_peca(f"A{i:03d}", 100.0, "azul", 15.0, True, codigo_produto=produto), sistema
+        )
+    reprovada = criar_peca("R001", 120.0, "vermelho", 15.0, codigo_produto="SKU-1")
+    aplicar_validacao(reprovada)
+    registrar_peca_reprovada(reprovada, sistema)
+    registrar_peca_reprovada(
+        criar_peca("R002", 100.0, "azul", 30.0, False, ["Comprimento fora do intervalo"]),
+        sistema
+    )
+
+
+class TestContadores:
+    """Testes da atualização incremental dos contadores."""
+
+    @pytest.mark.unit
+    def test_contar_reprovacoes_por_codigo_e_texto(self):
+        """O código tem precedência; sem código, cada motivo conta uma vez."""
+        com_codigo = criar_peca("R1", 120.0, "azul", 15.0, False, ["Cor inadequada"], codigo_reprovacao=5)
+        sem_codigo = criar_peca("R2", 120.0, "roxo", 15.0, False, ["Peso alto", "Cor inadequada"])
+
+        assert contar_reprovacoes(com_codigo) == {'peso': 1, 'cor': 0, 'comprimento': 1}
+        assert contar_reprovacoes(sem_codigo) == {'peso': 1, 'cor': 1, 'comprimento': 0}
+
+    @pytest.mark.unit
+    def test_incremental_igual_ao_calculo_completo(self):
+        """Os contadores mantidos pelo serviço batem com o recálculo completo."""
+        sistema = inicializar_sistema()
+        _popular(sistema)
+
+        agregado = sistema['estatisticas']
+        assert agregado == calcular_estatisticas(sistema)
+        assert agregado['aprovadas'] == CAPACIDADE_MAXIMA_CAIXA + 2
+        assert agregado['reprovadas'] == 2
+        assert agregado['caixas_fechadas'] == 1
+        assert agregado['reprovacoes'] == {'peso': 1, 'cor': 1, 'comprimento': 1}
+        assert agregado['produtos']['SKU-1']['reprovadas'] == 1
+
+    @pytest.mark.unit
+    def test_remocao_desconta(self):
+        """Remover peças desconta os contadores e descarta produtos zerados."""
+        sistema = inicializar_sistema()
+        registrar_peca_reprovada(
+            criar_peca("R001", 120.0, "azul", 15.0, False, ["Peso fora do intervalo"], codigo_produto="SKU-9"),
+            sistema
+        )
+        adicionar_peca_em_caixa(criar_peca("A001", 100.0, "azul", 15.0, True), sistema)
+
+        remover_peca_por_id("R001", sistema)
+        obter_medidas_spc(sistema)  # R001 era o peso máximo
+
+        agregado = sistema['estatisticas']
+        assert agregado['reprovadas'] == 0
+        assert agregado['reprovacoes']['peso'] == 0
+        assert 'SKU-9' not in agregado['produtos']
+        assert agregado == calcular_estatisticas(sistema)
+
+    @pytest.mark.unit
+    def test_listas_alteradas_diretamente_recalcula(self):
+        """Com totais divergentes das listas, obter_estatisticas recalcula."""
+        sistema = inicializar_sistema()
+        sistema['pecas_reprovadas'].append(
+            criar_peca("R001", 120.0, "azul", 15.0, False, ["Peso fora do intervalo"])
+        )
+
+        agregado = obter_estatisticas(sistema)
+
+        assert agregado['reprovadas'] == 1
+        assert agregado['reprovacoes']['peso'] == 1
+        assert sistema['estatisticas'] is agregado
+
+
+class TestPersistenciaEstatisticas:
+    """Testes da gravação e carga do agregado."""
+
+    @pytest.mark.unit
+    def test_serializacao_ida_e_volta(self):
+        """O JSON gravado reconstrói o mesmo agregado; texto inválido vira None."""
+        sistema = inicializar_sistema()
+        _popular(sistema)
+
+        texto = serializar_estatisticas(sistema['estatisticas'])
+
+        assert desserializar_estatisticas(texto) == sistema['estatisticas']
+        assert desserializar_estatisticas("") is None
+        assert desserializar_estatisticas("{invalido") is None
+        assert desserializar_estatisticas(json.dumps({'aprovadas': 1})) is None
+
+    @pytest.mark.unit
+    def test_gravado_junto_com_as_alteracoes(self):
+        """Cada persistência grava o agregado em sistema_config."""
+        sistema = inicializar_sistema()
+        _popular(sistema)
+
+        gravado = database.carregar_estatisticas_gravadas()
+
+        assert gravado == sistema['estatisticas']
+        assert set(json.loads(database.carregar_config(CHAVE_CONFIG_ESTATISTICAS))) == {
+            'aprovadas', 'reprovadas', 'reprovacoes', 'caixas_fechadas', 'spc', 'distribuicao'
+        }
+
+    @pytest.mark.unit
+    def test_regrava_so_produtos_alterados(self):
+        """Uma peça nova regrava os totais gerais e o seu produto, não os demais."""
+        sistema = inicializar_sistema()
+        _popular(sistema)
+        marcador = json.dumps({'aprovadas': -1})
+        database.salvar_config(PREFIXO_CONFIG_PRODUTO, marcador)
+
+        adicionar_peca_em_caixa(criar_peca("B001", 100.0, "azul", 15.0, True, codigo_produto="SKU-1"), sistema)
+        remover_peca_por_id("A003", sistema)
+
+        assert database.carregar_config(PREFIXO_CONFIG_PRODUTO) == marcador
+        sku = json.loads(database.carregar_config(PREFIXO_CONFIG_PRODUTO + "SKU-1"))
+        assert sku == sistema['estatisticas']['produtos']['SKU-1']
+
+    @pytest.mark.unit
+    def test_produto_zerado_e_removido(self):
+        """Produto sem peças sai do agregado e de sistema_config."""
+        sistema = inicializar_sistema()
+        adicionar_peca_em_caixa(criar_peca("A001", 100.0, "azul", 15.0, True, codigo_produto="SKU-9"), sistema)
+
+        remover_peca_por_id("A001", sistema)
+
+        assert database.carregar_config(PREFIXO_CONFIG_PRODUTO + "SKU-9") == ""
+        assert database.carregar_estatisticas_gravadas() == sistema['estatisticas']
+
+    @pytest.mark.unit
+    def test_alteracao_fora_do_servico_invalida(self):
+        """Peça regravada direto no banco invalida o agregado, mesmo com os mesmos totais."""
+        _popular(inicializar_sistema())
+        database.salvar_peca(criar_peca("A000", 100.0, "azul", 15.0, True, codigo_produto="SKU-2"))
+
+        assert database.carregar_estatisticas_gravadas() is None
+        sistema = inicializar_sistema()
+        assert sistema['estatisticas'] == calcular_estatisticas(sistema)
+        assert sistema['estatisticas']['produtos']['SKU-2']['aprovadas'] == 1
+
+    @pytest.mark.unit
+    def test_carga_reaproveita_agregado(self):
+        """Na carga, o agregado gravado é usado sem percorrer as peças."""
+        _popular(inicializar_sistema())
+
+        with patch.object(estatisticas, 'calcular_estatisticas') as calcular:
+            sistema = inicializar_sistema()
+
+        calcular.assert_not_called()
+        assert sistema['estatisticas']['aprovadas'] == CAPACIDADE_MAXIMA_CAIXA + 2
+        assert sistema['estatisticas']['produtos']['SKU-1']['aprovadas'] == 6
+
+    @pytest.mark.unit
+    def test_agregado_divergente_e_recalculado(self):
+        """Agregado que não confere com as tabelas é descartado na carga."""
+        _popular(inicializar_sistema())
+        database.salvar_config(CHAVE_CONFIG_ESTATISTICAS, json.dumps({
+            'aprovadas': 1, 'reprovadas': 0, 'caixas_fechadas': 0,
+            'reprovacoes': {'peso': 0, 'cor': 0, 'comprimento': 0}, 'produtos': {}
+        }))
+
+        sistema = inicializar_sistema()
+
+        assert sistema['estatisticas'] == calcular_estatisticas(sistema)
+        assert sistema['estatisticas']['reprovadas'] == 2
+
+    @pytest.mark.unit
+    def test_journal_reaproveita_snapshot(self, monkeypatch: pytest.MonkeyPatch):
+        """No journal, o agregado vai no snapshot e é atualizado pelos eventos."""
+        monkeypatch.setenv('PECAS_ARMAZENAMENTO', 'journal')
+        sistema = inicializar_sistema()
+        _popular(sistema)
+        remover_peca_por_id("A001", sistema)
+
+        with patch.object(estatisticas, 'calcular_estatisticas') as calcular:
+            recarregado = inicializar_sistema()
+
+        calcular.assert_not_called()
+        assert recarregado['estatisticas'] == sistema['estatisticas']
@@ -0,0 +1,268 @@
+"""
+Testes unitários para o motor de armazenamento por journal de eventos.
+
+Testa:
+- Gravação de eventos com um único INSERT por operação
+- Reconstrução do sistema a partir do journal
+- Snapshots automáticos e compactação
+- Inicialização do sistema com PECAS_ARMAZENAMENTO=journal
+"""
+
+import pytest
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
+from typing import Generator, List
+from unittest.mock import Mock
+
+from models.peca import criar_peca
+from models.caixa import CAPACIDADE_MAXIMA_CAIXA, criar_caixa
+from services import database, journal
+from services.armazenamento import (
+    SistemaArmazenamento,
+    adicionar_peca_em_caixa,
+    inicializar_sistema,
+    registrar_peca_reprovada,
+    remover_peca_por_id
+)
+
+
+@pytest.fixture
+def banco_journal(monkeypatch: pytest.MonkeyPatch) -> Generator[Path, None, None]:
+    """Banco temporário com o motor de journal ativo."""
+    original_db_path = database.DB_PATH
+    temp_dir = Path(tempfile.mkdtemp())
+    database.DB_PATH = temp_dir / "test_journal.db"
+    monkeypatch.setenv('PECAS_ARMAZENAMENTO', 'journal')
+    database.inicializar_database()
+
+    yield database.DB_PATH
+
+    database.DB_PATH = original_db_path
+    shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def _resumo(sistema: SistemaArmazenamento) -> dict:
+    """Estado do sistema reduzido a IDs, para comparação."""
+    return {
+        'aprovadas': [p['id'] for p in sistema['pecas_aprovadas']],
+        'reprovadas': [p['id'] for p in sistema['pecas_reprovadas']],
+        'fechadas': [(c['id'], [p['id'] for p in c['pecas']]) for c in sistema['caixas_fechadas']],
+        'atual': (sistema['caixa_atual']['id'], [p['id'] for p in sistema['caixa_atual']['pecas']]),
+        'contador': sistema['contador_caixas']
+    }
+
+
+def _popular(sistema: SistemaArmazenamento, quantidade: int) -> None:
+    for i in range(quantidade):
+        adicionar_peca_em_caixa(criar_peca(f"A{i:03d}", 100.0, "azul", 15.0, True, []), sistema)
+    registrar_peca_reprovada(
+        criar_peca("R001", 120.0, "verde", 15.0, False, ["Peso fora do intervalo"]),
+        sistema
+    )
+
+
+class TestEventos:
+    """Testes de gravação de eventos."""
+
+    def test_operacoes_geram_eventos(self, banco_journal: Path) -> None:
+        """Cada operação grava seu evento, incluindo o fechamento de caixa."""
+        sistema = inicializar_sistema()
+        _popular(sistema, CAPACIDADE_MAXIMA_CAIXA)
+        remover_peca_por_id("A000", sistema)
+
+        tipos = [evento['tipo'] for evento in journal.listar_eventos()]
+
+        assert tipos == (
+            [journal.EVENTO_PECA_REGISTRADA] * CAPACIDADE_MAXIMA_CAIXA
+            + [journal.EVENTO_CAIXA_FECHADA, journal.EVENTO_PECA_REGISTRADA,
+               journal.EVENTO_PECA_REMOVIDA]
+        )
+
+    def test_nao_grava_tabelas_normalizadas(self, banco_journal: Path) -> None:
+        """Com o journal ativo, as tabelas de peças não são tocadas."""
+        sistema = inicializar_sistema()
+        _popular(sistema, 3)
+
+        aprovadas, reprovadas = database.carregar_pecas()
+        assert aprovadas == [] and reprovadas == []
+        assert 'alteracoes' not in sistema
+
+    def test_registro_usa_um_insert(self, banco_journal: Path) -> None:
+        """Registrar uma peça executa um único INSERT no banco."""
+        sistema = inicializar_sistema()
+        comandos: List[str] = []
+
+        with database.get_connection() as conn:
+            conn.set_trace_callback(comandos.append)
+            try:
+                adicionar_peca_em_caixa(criar_peca("P001", 100.0, "azul", 15.0, True, []), sistema)
+            finally:
+                conn.set_trace_callback(None)
+
+        inserts = [sql for sql in comandos if sql.lstrip().upper().startswith("INSERT")]
+        assert len(inserts) == 1
+        assert "eventos" in inserts[0]
+
+    def test_listar_eventos_desde(self, banco_journal: Path) -> None:
+        """listar_eventos retorna apenas eventos posteriores ao seq informado."""
+        sistema = inicializar_sistema()
+        _popular(sistema, 2)
+
+        eventos = journal.listar_eventos()
+        posteriores = journal.listar_eventos(eventos[0]['seq'])
+
+        assert [e['seq'] for e in posteriores] == [e['seq'] for e in eventos[1:]]
+        assert eventos[0]['dados']['id'] == "A000"
+
+
+class TestReconstrucao:
+    """Testes de reconstrução do sistema a partir do journal."""
+
+    def test_reconstroi_estado(self, banco_journal: Path) -> None:
+        """O sistema carregado do journal é igual ao estado em memória."""
+        sistema = inicializar_sistema()
+        _popular(sistema, CAPACIDADE_MAXIMA_CAIXA + 3)
+        remover_peca_por_id("A011", sistema)
+        remover_peca_por_id("R001", sistema)
+
+        recarregado = inicializar_sistema()
+
+        assert _resumo(recarregado) == _resumo(sistema)
+        assert recarregado['caixas_fechadas'][0]['fechada'] is True
+
+    def test_pecas_compartilhadas_com_caixas(self, banco_journal: Path) -> None:
+        """Uma peça aprovada é o mesmo objeto na lista e na caixa."""
+        sistema = inicializar_sistema()
+        _popular(sistema, 2)
+
+        recarregado = journal.carregar_sistema()
+
+        assert recarregado['pecas_aprovadas'][0] is recarregado['caixa_atual']['pecas'][0]
+
+    def test_journal_vazio_retorna_none(self, banco_journal: Path) -> None:
+        """Sem snapshot nem eventos não há o que reconstruir."""
+        assert journal.carregar_sistema() is None
+
+    def test_journal_vazio_parte_das_tabelas(self, banco_journal: Path) -> None:
+        """Ao ativar o journal, o estado atual das tabelas vira o primeiro snapshot."""
+        peca = criar_peca("T001", 100.0, "azul", 15.0, True, [])
+        caixa = criar_caixa(1)
+        caixa['pecas'].append(peca)
+        database.salvar_peca(peca)
+        database.salvar_caixa(caixa)
+
+        sistema = inicializar_sistema()
+
+        assert [p['id'] for p in sistema['pecas_aprovadas']] == ["T001"]
+        assert _resumo(journal.carregar_sistema()) == _resumo(sistema)
+
+    def test_evento_desconhecido(self) -> None:
+        """Tipos de evento desconhecidos são rejeitados."""
+        sistema: SistemaArmazenamento = {
+            'pecas_aprovadas': [],
+            'pecas_reprovadas': [],
+            'caixas_fechadas': [],
+            'caixa_atual': criar_caixa(1),
+            'contador_caixas': 1
+        }
+        with pytest.raises(ValueError):
+            journal.aplicar_evento(sistema, journal.criar_evento("invalido", {}))
+
+
+class TestSnapshots:
+    """Testes de snapshots e compactação."""
+
+    def test_snapshot_automatico(
+        self, banco_journal: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Um snapshot é gravado a cada INTERVALO_SNAPSHOT eventos."""
+        monkeypatch.setattr(journal, 'INTERVALO_SNAPSHOT', 5)
+        sistema = inicializar_sistema()
+        _popular(sistema, 7)
+
+        with database.get_connection() as conn:
+            seqs = [linha[0] for linha in conn.execute(
+                "SELECT seq_evento FROM snapshots ORDER BY seq_evento"
+            )]
+
+        # O automático após 5 eventos substitui o inicial (journal vazio)
+        assert seqs == [5]
+        assert len(journal.listar_eventos()) == 8
+        assert _resumo(journal.carregar_sistema()) == _resumo(sistema)
+
+    def test_intervalo_conta_eventos_reaplicados(
+        self, banco_journal: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Eventos reaplicados na carga contam para o próximo snapshot."""
+        monkeypatch.setattr(journal, 'INTERVALO_SNAPSHOT', 5)
+        _popular(inicializar_sistema(), 3)
+
+        sistema = inicializar_sistema()
+        adicionar_peca_em_caixa(criar_peca("B001", 100.0, "azul", 15.0, True, []), sistema)
+
+        with database.get_connection() as conn:
+            seqs = [linha[0] for linha in conn.execute("SELECT seq_evento FROM snapshots")]
+        assert seqs == [5]
+
+    def test_intervalo_cresce_com_o_estado(
+        self, banco_journal: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Com o estado maior, os snapshots ficam mais espaçados (custo constante por evento)."""
+        monkeypatch.setattr(journal, 'INTERVALO_SNAPSHOT', 1)
+        inserir = journal._inserir_snapshot
+        seqs: List[int] = []
+
+        def registrar(cursor, seq_evento: int, estado: str) -> None:
+            seqs.append(seq_evento)
+            inserir(cursor, seq_evento, estado)
+
+        monkeypatch.setattr(journal, '_inserir_snapshot', registrar)
+        sistema = inicializar_sistema()
+        _popular(sistema, 60)
+
+        intervalos = [depois - antes for antes, depois in zip(seqs, seqs[1:])]
+        assert intervalos == sorted(intervalos)
+        assert len(seqs) < 10
+        assert _resumo(journal.carregar_sistema()) == _resumo(sistema)
+
+    def test_eventos_e_snapshot_na_mesma_transacao(
+        self, banco_journal: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Uma falha ao gravar o snapshot desfaz também os eventos do lote."""
+        monkeypatch.setattr(journal, 'INTERVALO_SNAPSHOT', 1)
+        sistema = inicializar_sistema()
+        monkeypatch.setattr(
+            journal, '_inserir_snapshot', Mock(side_effect=sqlite3.OperationalError("disco cheio"))
+        )
+
+        with pytest.raises(sqlite3.OperationalError):
+            _popular(sistema, 1)
+
+        assert journal.listar_eventos() == []
+
+    def test_compactar_mantem_estado(
+        self, banco_journal: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Compactar remove eventos cobertos pelo snapshot sem alterar o estado."""
+        monkeypatch.setattr(journal, 'INTERVALO_SNAPSHOT', 5)
+        sistema = inicializar_sistema()
+        _popular(sistema, 7)
+
+        removidos = journal.compactar_journal()
+
+        assert removidos == 5
+        assert [e['seq'] for e in journal.listar_eventos()] == [6, 7, 8]
+        assert _resumo(journal.carregar_sistema()) == _resumo(sistema)
+
+    def test_snapshot_manual(self, banco_journal: Path) -> None:
+        """gravar_snapshot sem seq usa o último evento do journal."""
+        sistema = inicializar_sistema()
+        _popular(sistema, 3)
+
+        seq = journal.gravar_snapshot(sistema)
+
+        assert seq == journal.listar_eventos()[-1]['seq']
+        assert journal.compactar_journal() == 4
+        assert _resumo(journal.carregar_sistema()) == _resumo(sistema)
@@ -11,6 +11,7 @@ Testa:
 import pytest
 from models.peca import criar_peca, Peca
 from models.caixa import criar_caixa, Caixa, CAPACIDADE_MAXIMA_CAIXA
+from models.lista_pecas import ListaPecas
 
 
 # ========================================
@@ -139,6 +140,22 @@ class TestCriarPeca:
         assert peca['cor'] == cor
         assert peca['comprimento'] == comprimento
 
+    @pytest.mark.unit
+    def test_codigo_reprovacao_opcional(self):
+        """codigo_reprovacao só existe quando informado."""
+        sem_codigo = criar_peca("P001", 100.0, "azul", 15.0)
+        com_codigo = criar_peca("P002", 120.0, "azul", 15.0, False, [], codigo_reprovacao=1)
+
+        assert 'codigo_reprovacao' not in sem_codigo
+        assert com_codigo['codigo_reprovacao'] == 1
+
+    @pytest.mark.unit
+    def test_codigo_produto_opcional(self):
+        """codigo_produto só existe quando informado (string vazia equivale a ausente)."""
+        assert 'codigo_produto' not in criar_peca("P001", 100.0, "azul", 15.0)
+        assert 'codigo_produto' not in criar_peca("P001", 100.0, "azul", 15.0, codigo_produto="")
+        assert criar_peca("P002", 100.0, "azul", 15.0, codigo_produto="SKU-1")['codigo_produto'] == "SKU-1"
+
 
 # ========================================
 # TESTES DO MODELO CAIXA
@@ -243,6 +260,128 @@ class TestCriarCaixa:
         assert len(caixa['pecas']) == 10
 
 
+# ========================================
+# TESTES DE LISTA DE PEÇAS
+# ========================================
+
+class TestListaPecas:
+    """Testes para ListaPecas (lista com remoção em O(1))."""
+
+    def _pecas(self, quantidade):
+        return [criar_peca(f"P{i:03d}", 100.0, "azul", 15.0, aprovada=True) for i in range(quantidade)]
+
+    @pytest.mark.unit
+    def test_comporta_se_como_lista(self):
+        """Ordem, tamanho, indexação, fatias e igualdade equivalem a uma lista."""
+        pecas = self._pecas(5)
+        lista = ListaPecas(pecas)
+
+        assert len(lista) == 5
+        assert list(lista) == pecas
+        assert lista == pecas
+        assert lista[0] is pecas[0]
+        assert lista[-1] is pecas[-1]
+        assert lista[1:3] == pecas[1:3]
+        assert pecas[2] in lista
+        assert lista + [] == pecas
+
+    @pytest.mark.unit
+    def test_remover_chave_preserva_ordem(self):
+        """Remover pela chave mantém a ordem das demais e as outras chaves."""
+        pecas = self._pecas(4)
+        lista = ListaPecas()
+        chaves = [lista.adicionar(peca) for peca in pecas]
+
+        removida = lista.remover_chave(chaves[1])
+
+        assert removida is pecas[1]
+        assert lista == [pecas[0], pecas[2], pecas[3]]
+        assert lista.obter_chave(chaves[3]) is pecas[3]
+        assert lista.obter_chave(chaves[1]) is None
+
+    @pytest.mark.unit
+    def test_operacoes_posicionais(self):
+        """append, pop, insert, remove e atribuição por fatia continuam válidos."""
+        pecas = self._pecas(4)
+        lista = ListaPecas(pecas[:2])
+
+        lista.append(pecas[2])
+        lista.insert(0, pecas[3])
+        assert lista == [pecas[3], pecas[0], pecas[1], pecas[2]]
+
+        assert lista.pop() is pecas[2]
+        assert lista.pop(0) is pecas[3]
+        lista.remove(pecas[0])
+        assert lista == [pecas[1]]
+
+        lista[:] = pecas
+        assert lista == pecas
+
+    @pytest.mark.unit
+    def test_visao_posicional_incremental(self):
+        """Remover pela chave não obriga a refazer a lista para o acesso por posição."""
+        pecas = self._pecas(5)
+        lista = ListaPecas()
+        chaves = [lista.adicionar(peca) for peca in pecas]
+        posicional = lista[:]
+        versao = lista.versao
+
+        lista.remover_chave(chaves[2])
+        lista.append(pecas[2])
+
+        assert lista == [pecas[0], pecas[1], pecas[3], pecas[4], pecas[2]]
+        assert lista[2] is pecas[3]
+        assert lista.versao == versao + 2
+        assert posicional == pecas
+
+    @pytest.mark.unit
+    def test_remocao_por_lapide(self):
+        """Remover pela chave marca a posição; a compactação vem depois, sem mudar as chaves."""
+        pecas = self._pecas(8)
+        lista = ListaPecas()
+        chaves = [lista.adicionar(peca) for peca in pecas]
+
+        lista.remover_chave(chaves[1])
+        assert len(lista._pecas) == 8
+        assert len(lista) == 7
+        assert list(lista) == [pecas[0]] + pecas[2:]
+        assert [chave for chave, _ in lista.itens_recentes(chaves[4])] == [chaves[3], chaves[2], chaves[0]]
+
+        lista.remover_chave(chaves[5])
+        lista.remover_chave(chaves[6])
+        assert len(lista._pecas) == 5
+        assert lista == [pecas[0], pecas[2], pecas[3], pecas[4], pecas[7]]
+        assert lista.obter_chave(chaves[7]) is pecas[7]
+        assert [chave for chave, _ in lista.itens()] == [chaves[i] for i in (0, 2, 3, 4, 7)]
+
+    @pytest.mark.unit
+    def test_acesso_por_posicao_apos_remocao(self):
+        """Índices e fatias desconsideram as posições removidas."""
+        pecas = self._pecas(10)
+        lista = ListaPecas()
+        chaves = [lista.adicionar(peca) for peca in pecas]
+
+        lista.remover_chave(chaves[0])
+
+        assert lista[0] is pecas[1]
+        assert lista[-1] is pecas[9]
+        assert lista[1:3] == pecas[2:4]
+        del lista[0]
+        assert lista.obter_chave(chaves[2]) is pecas[2]
+        assert len(lista) == 8
+
+    @pytest.mark.unit
+    def test_copia_independente(self):
+        """copy() gera outra ListaPecas com as mesmas peças."""
+        lista = ListaPecas(self._pecas(3))
+
+        copia = lista.copy()
+        copia.pop()
+
+        assert len(lista) == 3
+        assert isinstance(copia, ListaPecas)
+
+
 # ========================================
 # TESTES DE INTEGRAÇÃO ENTRE MODELOS
 # ========================================
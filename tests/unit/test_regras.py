@@ -0,0 +1,247 @@
+"""
+Testes unitários para o motor de regras de qualidade.
+
+Testa:
+- Compilação e validação da configuração
+- Carga das regras do banco (sistema_config) e de arquivo
+- Troca atômica do plano na recarga, mantendo o anterior em caso de erro
+- Substituições de critérios por produto
+"""
+
+import json
+import threading
+from pathlib import Path
+
+import pytest
+
+from models.peca import criar_peca
+from services.regras import (
+    CHAVE_CONFIG_REGRAS,
+    compilar_regras,
+    obter_criterios,
+    obter_plano,
+    recarregar_regras,
+    remover_perfil_produto,
+    salvar_perfil_produto,
+    salvar_regras,
+    verificar_regras
+)
+from services import database
+from services.validacao import validar_lote, validar_peca
+
+
+@pytest.fixture
+def arquivo_regras(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Arquivo de regras apontado por PECAS_REGRAS."""
+    caminho = tmp_path / "regras.json"
+    caminho.write_text(json.dumps({'peso_minimo': 90.0}), encoding='utf-8')
+    monkeypatch.setenv('PECAS_REGRAS', str(caminho))
+    return caminho
+
+
+class TestCompilarRegras:
+    """Testes de compilar_regras()."""
+
+    @pytest.mark.unit
+    def test_configuracao_vazia_usa_padrao(self):
+        """Sem campos, valem os critérios padrão."""
+        plano = compilar_regras({})
+
+        assert plano['padrao']['peso_minimo'] == 95.0
+        assert plano['padrao']['cores_aceitas'] == frozenset({'azul', 'verde'})
+        assert plano['padrao']['texto_cores'] == "azul ou verde"
+        assert plano['produtos'] == {}
+
+    @pytest.mark.unit
+    def test_produto_herda_criterios_gerais(self):
+        """Produtos substituem apenas os campos informados."""
+        plano = compilar_regras({
+            'peso_maximo': 110,
+            'produtos': {'SKU-1': {'cores_aceitas': ['Preto']}}
+        })
+
+        sku = plano['produtos']['SKU-1']
+        assert sku['peso_maximo'] == 110.0
+        assert sku['cores_aceitas'] == frozenset({'preto'})
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("config", [
+        {'peso_minimo': 'cem'},
+        {'peso_minimo': 120.0},
+        {'comprimento_maximo': 5.0},
+        {'cores_aceitas': []},
+        {'cores_aceitas': 'azul'},
+        {'densidade': 1.0},
+        {'produtos': {'SKU-1': {'peso_maximo': 1.0}}},
+        {'produtos': []},
+    ])
+    def test_configuracao_invalida(self, config):
+        """Configurações inconsistentes são rejeitadas."""
+        with pytest.raises(ValueError):
+            compilar_regras(config)
+
+
+class TestRecargaRegras:
+    """Testes de carga e troca do plano em uso."""
+
+    @pytest.mark.unit
+    def test_salvar_regras_troca_plano(self):
+        """salvar_regras grava em sistema_config e passa a validar com as novas regras."""
+        peca = criar_peca("P001", 92.0, "azul", 15.0)
+        assert validar_peca(peca)[0] is False
+
+        plano = salvar_regras({'peso_minimo': 90.0})
+
+        assert plano['origem'] == 'banco'
+        assert json.loads(database.carregar_config(CHAVE_CONFIG_REGRAS)) == {'peso_minimo': 90.0}
+        assert validar_peca(peca)[0] is True
+        assert validar_lote([92.0], ["azul"], [15.0])['aprovadas'] == [True]
+
+    @pytest.mark.unit
+    def test_mensagens_usam_limites_em_uso(self):
+        """As mensagens de reprovação mostram os limites configurados."""
+        salvar_regras({'peso_maximo': 110.0, 'cores_aceitas': ['preto', 'branco']})
+
+        _, motivos = validar_peca(criar_peca("P001", 120.0, "azul", 15.0))
+
+        assert motivos == [
+            "Peso fora do intervalo (95.0-110.0g): 120.0g",
+            "Cor inadequada (esperado: preto ou branco): azul"
+        ]
+
+    @pytest.mark.unit
+    def test_verificar_detecta_alteracao_no_banco(self):
+        """Alteração feita por outra interface é adotada por verificar_regras."""
+        recarregar_regras()
+        assert verificar_regras() is False
+
+        database.salvar_config(CHAVE_CONFIG_REGRAS, json.dumps({'comprimento_maximo': 30.0}))
+
+        assert verificar_regras() is True
+        assert obter_criterios()['comprimento_maximo'] == 30.0
+        assert verificar_regras() is False
+
+    @pytest.mark.unit
+    def test_regra_invalida_mantem_plano_atual(self):
+        """Com JSON ou critérios inválidos o plano anterior continua em uso."""
+        salvar_regras({'peso_minimo': 90.0})
+        versao = obter_plano()['versao']
+
+        database.salvar_config(CHAVE_CONFIG_REGRAS, "{invalido")
+        with pytest.raises(ValueError):
+            recarregar_regras()
+        assert verificar_regras() is False
+
+        assert obter_plano()['versao'] == versao
+        assert obter_criterios()['peso_minimo'] == 90.0
+
+    @pytest.mark.unit
+    def test_salvar_regra_invalida_nao_grava(self):
+        """salvar_regras valida antes de gravar."""
+        with pytest.raises(ValueError):
+            salvar_regras({'peso_minimo': 200.0})
+
+        assert database.carregar_config(CHAVE_CONFIG_REGRAS) == ""
+
+    @pytest.mark.unit
+    def test_arquivo_tem_precedencia(self, arquivo_regras):
+        """Com PECAS_REGRAS as regras vêm do arquivo e são recarregadas quando ele muda."""
+        database.salvar_config(CHAVE_CONFIG_REGRAS, json.dumps({'peso_minimo': 80.0}))
+
+        plano = recarregar_regras()
+        assert plano['origem'] == str(arquivo_regras)
+        assert obter_criterios()['peso_minimo'] == 90.0
+
+        arquivo_regras.write_text(json.dumps({'peso_minimo': 85.0}), encoding='utf-8')
+
+        assert verificar_regras() is True
+        assert obter_criterios()['peso_minimo'] == 85.0
+
+    @pytest.mark.unit
+    def test_criterios_por_produto(self):
+        """obter_criterios resolve o produto e recai nos gerais se desconhecido."""
+        salvar_regras({'produtos': {'SKU-1': {'peso_minimo': 50.0}}})
+
+        assert obter_criterios('SKU-1')['peso_minimo'] == 50.0
+        assert obter_criterios('SKU-2')['peso_minimo'] == 95.0
+        assert obter_criterios()['peso_minimo'] == 95.0
+
+    @pytest.mark.unit
+    def test_validacao_concorrente_com_recarga(self):
+        """Validações em paralelo com recargas sempre veem um plano completo."""
+        erros = []
+        parar = threading.Event()
+
+        def validar():
+            while not parar.is_set():
+                criterios = obter_criterios()
+                if criterios['peso_minimo'] > criterios['peso_maximo']:
+                    erros.append(criterios)
+
+        threads = [threading.Thread(target=validar) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for i in range(50):
+            salvar_regras({'peso_minimo': 90.0 + i % 5, 'peso_maximo': 100.0 + i % 5})
+        parar.set()
+        for thread in threads:
+            thread.join()
+
+        assert erros == []
+        assert obter_plano()['versao'] >= 50
+
+
+class TestPerfisProduto:
+    """Testes dos perfis de tolerância por produto gravados no banco."""
+
+    @pytest.mark.unit
+    def test_perfil_gravado_entra_no_plano(self):
+        """salvar_perfil_produto grava em perfis_produto e atualiza a tabela do plano."""
+        salvar_perfil_produto("SKU-1", {'peso_minimo': 80.0, 'cores_aceitas': ['preto']})
+
+        assert database.carregar_perfis_produto() == {
+            "SKU-1": {'peso_minimo': 80.0, 'cores_aceitas': ['preto']}
+        }
+        criterios = obter_criterios("SKU-1")
+        assert criterios['peso_minimo'] == 80.0
+        assert criterios['peso_maximo'] == 105.0
+        assert criterios['cores_aceitas'] == frozenset({'preto'})
+
+    @pytest.mark.unit
+    def test_perfil_do_banco_sobrepoe_configuracao(self):
+        """Campos do perfil gravado prevalecem sobre os produtos da configuração."""
+        salvar_regras({'produtos': {'SKU-1': {'peso_minimo': 50.0, 'peso_maximo': 60.0}}})
+
+        salvar_perfil_produto("SKU-1", {'peso_maximo': 70.0})
+
+        assert obter_criterios("SKU-1")['peso_minimo'] == 50.0
+        assert obter_criterios("SKU-1")['peso_maximo'] == 70.0
+
+    @pytest.mark.unit
+    def test_perfil_invalido_nao_grava(self):
+        """Perfil inconsistente com os critérios gerais é rejeitado sem gravar."""
+        with pytest.raises(ValueError):
+            salvar_perfil_produto("SKU-1", {'peso_minimo': 200.0})
+        with pytest.raises(ValueError):
+            salvar_perfil_produto("  ", {'peso_minimo': 90.0})
+
+        assert database.carregar_perfis_produto() == {}
+
+    @pytest.mark.unit
+    def test_remover_perfil(self):
+        """Sem perfil, o produto volta aos critérios gerais."""
+        salvar_perfil_produto("SKU-1", {'peso_minimo': 80.0})
+
+        assert remover_perfil_produto("SKU-1") is True
+        assert remover_perfil_produto("SKU-1") is False
+        assert obter_criterios("SKU-1")['peso_minimo'] == 95.0
+
+    @pytest.mark.unit
+    def test_verificar_detecta_perfil_novo(self):
+        """Perfil gravado por outra interface é adotado por verificar_regras."""
+        recarregar_regras()
+
+        database.salvar_perfil_produto("SKU-2", {'comprimento_maximo': 40.0})
+
+        assert verificar_regras() is True
+        assert obter_criterios("SKU-2")['comprimento_maximo'] == 40.0
@@ -10,11 +10,23 @@ Testa:
 """
 
 import pytest
+from unittest.mock import patch
 from models.peca import criar_peca
 from services.relatorio import (
     gerar_relatorio_completo,
+    gerar_relatorio_do_banco,
+    gerar_resumo,
+    gerar_resumo_do_banco,
     gerar_estatisticas_reprovacao,
-    analisar_motivos_reprovacao
+    gerar_estatisticas_por_produto,
+    analisar_motivos_reprovacao,
+    SEM_PRODUTO
+)
+from services import database
+from services.armazenamento import (
+    adicionar_peca_em_caixa,
+    inicializar_sistema,
+    registrar_peca_reprovada
 )
 
 
@@ -143,6 +155,30 @@ class TestAnalisarMotivosReprovacao:
         assert contadores['cor'] == 1
         assert contadores['comprimento'] == 1
 
+    @pytest.mark.unit
+    def test_conta_pelo_codigo_de_reprovacao(self):
+        """Com codigo_reprovacao a contagem não depende do texto das mensagens."""
+        pecas = [
+            criar_peca("P001", 120.0, "vermelho", 15.0, False, ["Fora do padrão"], codigo_reprovacao=3),
+            criar_peca("P002", 100.0, "azul", 25.0, False, ["Peso? não"], codigo_reprovacao=4)
+        ]
+
+        contadores = analisar_motivos_reprovacao(pecas)
+
+        assert contadores == {'peso': 1, 'cor': 1, 'comprimento': 1}
+
+    @pytest.mark.unit
+    def test_mistura_pecas_com_e_sem_codigo(self):
+        """Peças antigas, sem código, continuam contadas pelo texto."""
+        pecas = [
+            criar_peca("P001", 120.0, "azul", 15.0, False, ["Peso fora"], codigo_reprovacao=1),
+            criar_peca("P002", 120.0, "azul", 15.0, False, ["Peso fora"])
+        ]
+
+        contadores = analisar_motivos_reprovacao(pecas)
+
+        assert contadores['peso'] == 2
+
 
 # ========================================
 # TESTES DE ESTATÍSTICAS DE REPROVAÇÃO
@@ -410,3 +446,147 @@ class TestGerarRelatorioCompleto:
         assert "Por peso inadequado: 2 peças" in relatorio
         assert "Por cor inadequada: 1 peças" in relatorio or "Por cor inadequada: 1 peça" in relatorio
         assert "Por comprimento inadequado: 0 peças" in relatorio
+
+
+# ========================================
+# TESTES POR PRODUTO
+# ========================================
+
+class TestEstatisticasPorProduto:
+    """Testes para gerar_estatisticas_por_produto()."""
+
+    @pytest.mark.unit
+    def test_agrupa_por_produto(self):
+        """Contagens e motivos são separados por codigo_produto."""
+        sistema = inicializar_sistema()
+        sistema['pecas_aprovadas'].extend([
+            criar_peca("P001", 100.0, "azul", 15.0, True, codigo_produto="SKU-B"),
+            criar_peca("P002", 100.0, "azul", 15.0, True, codigo_produto="SKU-A"),
+            criar_peca("P003", 100.0, "azul", 15.0, True)
+        ])
+        sistema['pecas_reprovadas'].append(
+            criar_peca("R001", 120.0, "azul", 15.0, False, ["Peso"], codigo_reprovacao=1, codigo_produto="SKU-A")
+        )
+
+        estatisticas = gerar_estatisticas_por_produto(sistema)
+
+        assert list(estatisticas) == ["SKU-A", "SKU-B", SEM_PRODUTO]
+        assert estatisticas["SKU-A"]['total'] == 2
+        assert estatisticas["SKU-A"]['percentual_aprovadas'] == 50.0
+        assert estatisticas["SKU-A"]['reprovacoes'] == {'peso': 1, 'cor': 0, 'comprimento': 0}
+        assert estatisticas[SEM_PRODUTO]['aprovadas'] == 1
+
+    @pytest.mark.unit
+    def test_relatorio_inclui_secao_por_produto(self):
+        """A seção por produto só aparece quando há peças com produto."""
+        sistema = inicializar_sistema()
+        sistema['pecas_aprovadas'].append(criar_peca("P001", 100.0, "azul", 15.0, True))
+        assert "POR PRODUTO" not in gerar_relatorio_completo(sistema)
+
+        sistema['pecas_aprovadas'].append(
+            criar_peca("P002", 100.0, "azul", 15.0, True, codigo_produto="SKU-A")
+        )
+        relatorio = gerar_relatorio_completo(sistema)
+
+        assert "POR PRODUTO" in relatorio
+        assert "SKU-A: 1 peças, 1 aprovadas (100.0%), 0 reprovadas" in relatorio
+
+
+# ========================================
+# TESTES DO RESUMO
+# ========================================
+
+class TestGerarResumo:
+    """Testes para gerar_resumo()."""
+
+    @pytest.mark.unit
+    def test_resumo_vem_das_estatisticas(self):
+        """O resumo usa os contadores mantidos pelo serviço, sem percorrer as peças."""
+        sistema = inicializar_sistema()
+        for i in range(3):
+            adicionar_peca_em_caixa(criar_peca(f"P{i}", 100.0, "azul", 15.0, True), sistema)
+        registrar_peca_reprovada(
+            criar_peca("R001", 120.0, "azul", 15.0, False, ["Peso fora do intervalo"]),
+            sistema
+        )
+
+        with patch('services.estatisticas.calcular_estatisticas') as calcular:
+            resumo = gerar_resumo(sistema)
+
+        calcular.assert_not_called()
+        assert resumo['total_processadas'] == 4
+        assert resumo['percentual_aprovadas'] == 75.0
+        assert resumo['pecas_caixa_atual'] == 3
+        assert resumo['reprovacoes'] == {'peso': 1, 'cor': 0, 'comprimento': 0}
+
+
+# ========================================
+# TESTES DO RELATÓRIO PELO BANCO
+# ========================================
+
+def _popular_sistema_variado():
+    """Sistema com caixa fechada, produtos e reprovações com e sem código."""
+    sistema = inicializar_sistema()
+    for i in range(13):
+        produto = "SKU-A" if i % 3 == 0 else None
+        adicionar_peca_em_caixa(
+            criar_peca(f"P{i:03d}", 100.0, "azul", 15.0, True, codigo_produto=produto), sistema
+        )
+    registrar_peca_reprovada(
+        criar_peca("R001", 120.0, "vermelho", 15.0, False, ["Peso", "Cor"], codigo_reprovacao=3, codigo_produto="SKU-A"),
+        sistema
+    )
+    registrar_peca_reprovada(
+        criar_peca("R002", 100.0, "azul", 30.0, False, ["Comprimento fora do intervalo", "Rebarba"]),
+        sistema
+    )
+    registrar_peca_reprovada(
+        criar_peca("R003", 120.0, "Roxo", 15.0, False, ["PESO alto", "Cor inadequada"]),
+        sistema
+    )
+    return sistema
+
+
+class TestRelatorioDoBanco:
+    """Testes de gerar_resumo_do_banco() e gerar_relatorio_do_banco()."""
+
+    @pytest.mark.unit
+    def test_mesmo_relatorio_que_em_memoria(self):
+        """As consultas de agregação produzem o mesmo relatório do sistema em memória."""
+        sistema = _popular_sistema_variado()
+
+        assert gerar_relatorio_do_banco() == gerar_relatorio_completo(sistema)
+        assert gerar_resumo_do_banco() == gerar_resumo(sistema)
+
+    @pytest.mark.unit
+    def test_nao_carrega_as_pecas(self):
+        """O modo banco não monta o sistema em memória."""
+        _popular_sistema_variado()
+
+        with patch.object(database, 'carregar_sistema_completo') as carregar, \
+                patch.object(database, '_carregar_mapa_pecas') as carregar_pecas:
+            resumo = gerar_resumo_do_banco()
+
+        carregar.assert_not_called()
+        carregar_pecas.assert_not_called()
+        assert resumo['total_processadas'] == 16
+        assert resumo['caixas_fechadas'] == 1
+        assert resumo['pecas_caixa_atual'] == 3
+        assert resumo['reprovacoes'] == {'peso': 2, 'cor': 2, 'comprimento': 1}
+
+    @pytest.mark.unit
+    def test_banco_vazio(self):
+        """Sem peças, o resumo do banco é zerado."""
+        resumo = gerar_resumo_do_banco()
+
+        assert resumo['total_processadas'] == 0
+        assert resumo['percentual_aprovadas'] == 0.0
+        assert resumo['pecas_caixa_atual'] == 0
+
+    @pytest.mark.unit
+    def test_journal_ativo(self, monkeypatch: pytest.MonkeyPatch):
+        """Com o journal ativo, o relatório reflete os eventos gravados."""
+        monkeypatch.setenv('PECAS_ARMAZENAMENTO', 'journal')
+        sistema = _popular_sistema_variado()
+
+        assert gerar_relatorio_do_banco() == gerar_relatorio_completo(sistema)
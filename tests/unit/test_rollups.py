@@ -0,0 +1,135 @@
+"""
+Testes unitários para os rollups por hora e por turno.
+
+Testa:
+- Atualização pelos gatilhos ao gravar, alterar e remover peças e caixas
+- Hora e turno de cada peça (turno noturno pertence ao dia em que começou)
+- Reconstrução a partir das tabelas
+- Consultas de tendência do relatório
+"""
+
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from models.caixa import CAPACIDADE_MAXIMA_CAIXA
+from models.peca import criar_peca
+from services import database, rollups
+from services.armazenamento import (
+    adicionar_peca_em_caixa,
+    inicializar_sistema,
+    registrar_peca_reprovada,
+    remover_peca_por_id
+)
+from services.relatorio import gerar_tendencia_por_hora, gerar_tendencia_por_turno
+from services.validacao import aplicar_validacao
+
+
+ONTEM = date.today() - timedelta(days=1)
+AMANHA = date.today() + timedelta(days=1)
+
+
+def _popular(sistema) -> None:
+    """Uma caixa fechada, uma reprovação com código e uma só com texto."""
+    for i in range(CAPACIDADE_MAXIMA_CAIXA):
+        adicionar_peca_em_caixa(criar_peca(f"A{i:03d}", 100.0, "azul", 15.0, True), sistema)
+    reprovada = criar_peca("R001", 120.0, "vermelho", 15.0)
+    aplicar_validacao(reprovada)
+    registrar_peca_reprovada(reprovada, sistema)
+    registrar_peca_reprovada(
+        criar_peca("R002", 100.0, "azul", 30.0, False, ["Comprimento fora do intervalo"]), sistema
+    )
+
+
+def _somar(tendencia):
+    return {
+        'total': sum(item['total'] for item in tendencia),
+        'reprovadas': sum(item['reprovadas'] for item in tendencia),
+        'peso': sum(item['reprovacoes']['peso'] for item in tendencia),
+        'cor': sum(item['reprovacoes']['cor'] for item in tendencia),
+        'comprimento': sum(item['reprovacoes']['comprimento'] for item in tendencia),
+        'caixas_fechadas': sum(item['caixas_fechadas'] for item in tendencia),
+    }
+
+
+class TestGatilhos:
+    """Rollups atualizados a cada gravação."""
+
+    @pytest.mark.unit
+    def test_hora_e_turno_somam_o_mesmo(self):
+        """Os dois níveis recebem todas as peças, reprovações e caixas."""
+        _popular(inicializar_sistema())
+
+        por_hora = _somar(gerar_tendencia_por_hora(ONTEM, AMANHA))
+        por_turno = _somar(gerar_tendencia_por_turno(ONTEM, AMANHA))
+
+        esperado = {
+            'total': CAPACIDADE_MAXIMA_CAIXA + 2, 'reprovadas': 2,
+            'peso': 1, 'cor': 1, 'comprimento': 1, 'caixas_fechadas': 1
+        }
+        assert por_hora == esperado
+        assert por_turno == esperado
+
+    @pytest.mark.unit
+    def test_remocao_e_regravacao(self):
+        """Remover desconta; regravar a mesma peça não conta de novo."""
+        sistema = inicializar_sistema()
+        _popular(sistema)
+
+        remover_peca_por_id("R001", sistema)
+        database.sincronizar_sistema(sistema)
+
+        totais = _somar(gerar_tendencia_por_hora(ONTEM, AMANHA))
+        assert totais['total'] == CAPACIDADE_MAXIMA_CAIXA + 1
+        assert (totais['peso'], totais['cor'], totais['comprimento']) == (0, 0, 1)
+
+    @pytest.mark.unit
+    def test_medias(self):
+        """As médias vêm das somas de peso e comprimento."""
+        sistema = inicializar_sistema()
+        adicionar_peca_em_caixa(criar_peca("A001", 99.0, "azul", 14.0, True), sistema)
+        adicionar_peca_em_caixa(criar_peca("A002", 101.0, "azul", 16.0, True), sistema)
+
+        [periodo] = gerar_tendencia_por_hora(ONTEM, AMANHA)
+
+        assert periodo['media_peso'] == pytest.approx(100.0)
+        assert periodo['media_comprimento'] == pytest.approx(15.0)
+        assert periodo['percentual_aprovadas'] == 100.0
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("hora_local", [5, 6, 13, 14, 21, 22, 23])
+    def test_turno_da_peca(self, hora_local: int):
+        """Turnos de 8 horas a partir das 6h; o noturno fica no dia em que começou."""
+        local = datetime(2024, 3, 10, hora_local, 30).astimezone()
+        utc = local.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        with database.get_connection() as conn:
+            conn.execute(
+                "INSERT INTO pecas (id, peso, cor, comprimento, aprovada, created_at) "
+                "VALUES ('X', 100.0, 'azul', 15.0, 1, ?)",
+                (utc,)
+            )
+
+        [turno] = gerar_tendencia_por_turno(date(2024, 3, 9), date(2024, 3, 10))
+        [hora] = gerar_tendencia_por_hora(date(2024, 3, 10), date(2024, 3, 10))
+
+        inicio_turno = local - timedelta(hours=rollups.INICIO_PRIMEIRO_TURNO)
+        numero = inicio_turno.hour // rollups.HORAS_POR_TURNO + 1
+        assert turno['periodo'] == f"{inicio_turno.date().isoformat()} turno {numero}"
+        assert hora['periodo'] == f"2024-03-10 {hora_local:02d}:00"
+
+
+class TestReconstrucao:
+    """Preenchimento dos rollups a partir das tabelas."""
+
+    @pytest.mark.unit
+    def test_reconstruir_igual_aos_gatilhos(self):
+        """Recalcular com GROUP BY chega às mesmas linhas dos gatilhos."""
+        _popular(inicializar_sistema())
+        horas = database.carregar_rollups_horas("0", "9")
+        turnos = database.carregar_rollups_turnos("0", "9")
+
+        with database.get_connection() as conn:
+            rollups.reconstruir_rollups(conn.cursor())
+
+        assert database.carregar_rollups_horas("0", "9") == horas
+        assert database.carregar_rollups_turnos("0", "9") == turnos
@@ -0,0 +1,169 @@
+"""
+Testes unitários para o controle estatístico de processo incremental.
+
+Testa:
+- Média e variância de Welford contra o cálculo direto
+- Remoção de valores (Welford invertido) e extremos pendentes
+- Índices Cp e Cpk
+- Indicadores do sistema (memória e banco)
+"""
+
+import statistics
+
+import pytest
+
+from models.peca import criar_peca
+from services.armazenamento import (
+    adicionar_peca_em_caixa,
+    inicializar_sistema,
+    registrar_peca_reprovada,
+    remover_peca_por_id
+)
+from services.relatorio import gerar_indicadores_spc, gerar_indicadores_spc_do_banco, gerar_relatorio_completo
+from services.spc import (
+    adicionar_valor,
+    calcular_indicadores,
+    criar_medida,
+    desvio_padrao,
+    recalcular_extremos,
+    remover_valor
+)
+
+
+VALORES = [98.5, 101.2, 99.8, 100.4, 102.9, 97.6, 100.0, 100.0]
+
+
+class TestWelford:
+    """Testes das atualizações incrementais de uma medida."""
+
+    @pytest.mark.unit
+    def test_media_e_desvio(self):
+        """Média e desvio amostral batem com o cálculo direto."""
+        medida = criar_medida()
+        for valor in VALORES:
+            adicionar_valor(medida, valor)
+
+        assert medida['n'] == len(VALORES)
+        assert medida['media'] == pytest.approx(statistics.mean(VALORES))
+        assert desvio_padrao(medida) == pytest.approx(statistics.stdev(VALORES))
+        assert (medida['minimo'], medida['maximo']) == (97.6, 102.9)
+
+    @pytest.mark.unit
+    def test_remocao_desfaz_inclusao(self):
+        """Remover um valor equivale a nunca tê-lo incluído."""
+        medida = criar_medida()
+        for valor in VALORES:
+            adicionar_valor(medida, valor)
+
+        remover_valor(medida, 101.2)
+
+        restantes = [v for v in VALORES if v != 101.2]
+        assert medida['media'] == pytest.approx(statistics.mean(restantes))
+        assert desvio_padrao(medida) == pytest.approx(statistics.stdev(restantes))
+        assert medida['extremos_exatos'] is True
+
+    @pytest.mark.unit
+    def test_remover_unico_extremo(self):
+        """Sem outro valor igual ao extremo removido, os extremos ficam pendentes."""
+        medida = criar_medida()
+        for valor in [100.0, 100.0, 110.0]:
+            adicionar_valor(medida, valor)
+
+        remover_valor(medida, 100.0)
+        assert medida['extremos_exatos'] is True
+
+        remover_valor(medida, 110.0)
+        assert medida['extremos_exatos'] is False
+
+        recalcular_extremos(medida, [100.0])
+        assert (medida['minimo'], medida['maximo'], medida['extremos_exatos']) == (100.0, 100.0, True)
+
+    @pytest.mark.unit
+    def test_remover_ultimo_valor_zera(self):
+        """Sem valores, a medida volta ao estado inicial."""
+        medida = criar_medida()
+        adicionar_valor(medida, 100.0)
+
+        remover_valor(medida, 100.0)
+
+        assert medida == criar_medida()
+
+
+class TestIndicadores:
+    """Testes de Cp e Cpk."""
+
+    @pytest.mark.unit
+    def test_cp_e_cpk(self):
+        """Cp usa a largura da tolerância; Cpk a distância ao limite mais próximo."""
+        medida = criar_medida()
+        for valor in VALORES:
+            adicionar_valor(medida, valor)
+        sigma = statistics.stdev(VALORES)
+        media = statistics.mean(VALORES)
+
+        indicadores = calcular_indicadores(medida, 95.0, 105.0)
+
+        assert indicadores['cp'] == pytest.approx(10.0 / (6 * sigma))
+        assert indicadores['cpk'] == pytest.approx(min(105.0 - media, media - 95.0) / (3 * sigma))
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("valores", [[], [100.0], [100.0, 100.0]])
+    def test_sem_dispersao(self, valores):
+        """Com menos de 2 valores ou desvio nulo, Cp e Cpk não são calculados."""
+        medida = criar_medida()
+        for valor in valores:
+            adicionar_valor(medida, valor)
+
+        indicadores = calcular_indicadores(medida, 95.0, 105.0)
+
+        assert indicadores['cp'] is None
+        assert indicadores['cpk'] is None
+
+
+class TestSPCSistema:
+    """Indicadores mantidos pelo serviço de armazenamento."""
+
+    @staticmethod
+    def _popular():
+        sistema = inicializar_sistema()
+        for i, peso in enumerate(VALORES):
+            adicionar_peca_em_caixa(criar_peca(f"P{i:03d}", peso, "azul", 15.0 + i / 10, True), sistema)
+        registrar_peca_reprovada(
+            criar_peca("R001", 120.0, "azul", 15.0, False, ["Peso fora do intervalo"]), sistema
+        )
+        return sistema
+
+    @pytest.mark.unit
+    def test_inclui_aprovadas_e_reprovadas(self):
+        """Todas as peças medidas entram no SPC, com os limites gerais."""
+        sistema = self._popular()
+
+        peso = gerar_indicadores_spc(sistema)['peso']
+
+        assert peso['n'] == len(VALORES) + 1
+        assert peso['media'] == pytest.approx(statistics.mean(VALORES + [120.0]))
+        assert (peso['limite_inferior'], peso['limite_superior']) == (95.0, 105.0)
+        assert "CONTROLE ESTATÍSTICO" in gerar_relatorio_completo(sistema)
+
+    @pytest.mark.unit
+    def test_remocao_do_extremo(self):
+        """Remover a peça de peso máximo corrige o máximo na consulta."""
+        sistema = self._popular()
+
+        remover_peca_por_id("R001", sistema)
+
+        peso = gerar_indicadores_spc(sistema)['peso']
+        assert peso['maximo'] == 102.9
+        assert peso['desvio_padrao'] == pytest.approx(statistics.stdev(VALORES))
+
+    @pytest.mark.unit
+    def test_banco_igual_a_memoria(self):
+        """As consultas de agregação chegam aos mesmos indicadores."""
+        sistema = self._popular()
+
+        em_memoria = gerar_indicadores_spc(sistema)
+        do_banco = gerar_indicadores_spc_do_banco()
+
+        for medida in ('peso', 'comprimento'):
+            for campo in ('n', 'media', 'desvio_padrao', 'minimo', 'maximo', 'cp', 'cpk'):
+                assert do_banco[medida][campo] == pytest.approx(em_memoria[medida][campo])
@@ -14,6 +14,11 @@ from services.validacao import (
     validar_cor,
     validar_comprimento,
     validar_peca,
+    validar_lote,
+    avaliar_peca,
+    aplicar_validacao,
+    descrever_motivos,
+    MotivoReprovacao,
     PESO_MINIMO,
     PESO_MAXIMO,
     CORES_ACEITAS,
@@ -21,6 +26,7 @@ from services.validacao import (
     COMPRIMENTO_MAXIMO
 )
 from models.peca import criar_peca
+from services.regras import salvar_perfil_produto
 
 
 # ========================================
@@ -445,3 +451,162 @@ class TestValidarPeca:
 
         assert all(isinstance(m, str) for m in motivos)
         assert all(len(m) > 0 for m in motivos)
+
+
+# ========================================
+# TESTES DE VALIDAÇÃO EM LOTE
+# ========================================
+
+class TestValidarLote:
+    """Testes para validar_lote() e descrever_motivos()."""
+
+    PESOS = [PESO_MINIMO - 0.1, PESO_MINIMO, 100.0, PESO_MAXIMO, PESO_MAXIMO + 0.1]
+    CORES = ["azul", " Verde ", "AZUL", "vermelho", ""]
+    COMPRIMENTOS = [COMPRIMENTO_MINIMO - 0.1, COMPRIMENTO_MINIMO, 15.0, COMPRIMENTO_MAXIMO, 25.0]
+
+    def _combinacoes(self):
+        return [
+            (peso, cor, comprimento)
+            for peso in self.PESOS
+            for cor in self.CORES
+            for comprimento in self.COMPRIMENTOS
+        ]
+
+    @pytest.mark.unit
+    def test_equivale_a_validar_peca(self):
+        """Aprovação e mensagens coincidem com validar_peca em todas as combinações."""
+        combinacoes = self._combinacoes()
+        pesos, cores, comprimentos = (list(coluna) for coluna in zip(*combinacoes))
+
+        resultado = validar_lote(pesos, cores, comprimentos)
+
+        for i, (peso, cor, comprimento) in enumerate(combinacoes):
+            aprovada, motivos = validar_peca(criar_peca("P", peso, cor, comprimento))
+            assert resultado['aprovadas'][i] == aprovada
+            assert descrever_motivos(resultado['codigos'][i], peso, cor, comprimento) == motivos
+
+    @pytest.mark.unit
+    def test_codigos_combinados(self):
+        """Cada critério reprovado liga seu bit no código."""
+        resultado = validar_lote([120.0, 100.0], ["vermelho", "azul"], [25.0, 15.0])
+
+        assert resultado['codigos'] == [
+            MotivoReprovacao.PESO | MotivoReprovacao.COR | MotivoReprovacao.COMPRIMENTO,
+            MotivoReprovacao.NENHUM
+        ]
+        assert resultado['aprovadas'] == [False, True]
+
+    @pytest.mark.unit
+    def test_lote_vazio(self):
+        """Lote vazio gera resultado vazio."""
+        assert validar_lote([], [], []) == {'aprovadas': [], 'codigos': []}
+
+    @pytest.mark.unit
+    def test_colunas_de_tamanhos_diferentes(self):
+        """Colunas desalinhadas são rejeitadas."""
+        with pytest.raises(ValueError):
+            validar_lote([100.0, 100.0], ["azul"], [15.0, 15.0])
+
+    @pytest.mark.unit
+    def test_arrays_numpy(self):
+        """Com arrays NumPy o resultado é o mesmo das listas."""
+        np = pytest.importorskip("numpy")
+        pesos, cores, comprimentos = (list(coluna) for coluna in zip(*self._combinacoes()))
+
+        esperado = validar_lote(pesos, cores, comprimentos)
+        resultado = validar_lote(np.array(pesos), np.array(cores), np.array(comprimentos))
+
+        assert resultado['codigos'].tolist() == esperado['codigos']
+        assert resultado['aprovadas'].tolist() == esperado['aprovadas']
+
+
+class TestAplicarValidacao:
+    """Testes para avaliar_peca() e aplicar_validacao()."""
+
+    @pytest.mark.unit
+    def test_avaliar_peca_retorna_bitmask(self):
+        """avaliar_peca liga um bit por critério reprovado."""
+        assert avaliar_peca(criar_peca("P001", 100.0, "azul", 15.0)) == MotivoReprovacao.NENHUM
+        assert avaliar_peca(criar_peca("P002", 120.0, "azul", 25.0)) == (
+            MotivoReprovacao.PESO | MotivoReprovacao.COMPRIMENTO
+        )
+
+    @pytest.mark.unit
+    def test_grava_codigo_e_mensagens_na_peca(self):
+        """A peça recebe aprovada, código e as mesmas mensagens de validar_peca."""
+        peca = criar_peca("P001", 120.0, "vermelho", 15.0)
+        esperado = validar_peca(peca)
+
+        resultado = aplicar_validacao(peca)
+
+        assert resultado == esperado
+        assert peca['aprovada'] is False
+        assert peca['codigo_reprovacao'] == MotivoReprovacao.PESO | MotivoReprovacao.COR
+        assert peca['motivos_reprovacao'] == esperado[1]
+
+    @pytest.mark.unit
+    def test_peca_aprovada_tem_codigo_zero(self, peca_valida):
+        """Peça aprovada fica com código NENHUM e sem motivos."""
+        aplicar_validacao(peca_valida)
+
+        assert peca_valida['aprovada'] is True
+        assert peca_valida['codigo_reprovacao'] == 0
+        assert peca_valida['motivos_reprovacao'] == []
+
+
+class TestPerfisProdutoValidacao:
+    """Validação com perfis de tolerância por produto."""
+
+    @pytest.mark.unit
+    def test_peca_usa_perfil_do_produto(self):
+        """A mesma medição é aprovada ou reprovada conforme o produto."""
+        salvar_perfil_produto("SKU-LEVE", {'peso_minimo': 50.0, 'peso_maximo': 60.0})
+
+        leve = criar_peca("P001", 55.0, "azul", 15.0, codigo_produto="SKU-LEVE")
+        padrao = criar_peca("P002", 55.0, "azul", 15.0)
+        desconhecido = criar_peca("P003", 55.0, "azul", 15.0, codigo_produto="SKU-X")
+
+        assert aplicar_validacao(leve) == (True, [])
+        assert validar_peca(padrao)[0] is False
+        assert validar_peca(desconhecido)[0] is False
+
+    @pytest.mark.unit
+    def test_mensagem_mostra_limites_do_produto(self):
+        """Os motivos citam a faixa do perfil do produto."""
+        salvar_perfil_produto("SKU-LEVE", {'peso_minimo': 50.0, 'peso_maximo': 60.0})
+
+        _, motivos = validar_peca(criar_peca("P001", 70.0, "azul", 15.0, codigo_produto="SKU-LEVE"))
+
+        assert motivos == ["Peso fora do intervalo (50.0-60.0g): 70.0g"]
+
+    @pytest.mark.unit
+    def test_lote_com_produtos(self):
+        """validar_lote aplica o perfil de cada peça e preserva a ordem."""
+        salvar_perfil_produto("SKU-LEVE", {'peso_minimo': 50.0, 'peso_maximo': 60.0})
+        pesos = [55.0, 55.0, 100.0, 100.0]
+        produtos = ["SKU-LEVE", None, "SKU-LEVE", "SKU-X"]
+
+        resultado = validar_lote(pesos, ["azul"] * 4, [15.0] * 4, produtos=produtos)
+
+        assert resultado['aprovadas'] == [True, False, False, True]
+        assert resultado['codigos'] == [0, 1, 1, 0]
+
+    @pytest.mark.unit
+    def test_lote_com_produtos_numpy(self):
+        """Com arrays NumPy o agrupamento por produto dá o mesmo resultado."""
+        np = pytest.importorskip("numpy")
+        salvar_perfil_produto("SKU-LEVE", {'peso_minimo': 50.0, 'peso_maximo': 60.0})
+        pesos = [55.0, 55.0, 100.0, 100.0]
+        produtos = ["SKU-LEVE", None, "SKU-LEVE", "SKU-X"]
+
+        resultado = validar_lote(
+            np.array(pesos), np.array(["azul"] * 4), np.array([15.0] * 4), produtos=produtos
+        )
+
+        assert resultado['codigos'].tolist() == [0, 1, 1, 0]
+
+    @pytest.mark.unit
+    def test_lote_coluna_de_produtos_desalinhada(self):
+        """Coluna de produtos com tamanho diferente é rejeitada."""
+        with pytest.raises(ValueError):
+            validar_lote([100.0], ["azul"], [15.0], produtos=[None, None])
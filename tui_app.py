@@ -12,10 +12,19 @@ from textual.binding import Binding
 from textual import on
 from rich.text import Text
 
-from services.armazenamento import SistemaArmazenamento, inicializar_sistema, adicionar_peca_em_caixa, remover_peca_por_id
+from services.armazenamento import (
+    SistemaArmazenamento,
+    inicializar_sistema,
+    adicionar_peca_em_caixa,
+    registrar_peca_reprovada,
+    remover_peca_por_id,
+    existe_peca,
+    obter_ultimos_alertas
+)
 from models.peca import criar_peca
-from services.validacao import validar_peca
-from services.relatorio import analisar_motivos_reprovacao
+from services import database, regras
+from services.validacao import aplicar_validacao
+from services.relatorio import formatar_indicador, gerar_distribuicoes, gerar_indicadores_spc, gerar_resumo
 from models.caixa import CAPACIDADE_MAXIMA_CAIXA
 from utils.rich_styles import (
     ICON_FABRICA,
@@ -31,6 +40,10 @@ from utils.rich_styles import (
 )
 
 
+# Quantidade de alertas de controle exibidos no relatório
+ALERTAS_NO_RELATORIO = 5
+
+
 # ============================================================================
 # MENU PRINCIPAL
 # ============================================================================
@@ -135,6 +148,8 @@ class CadastroScreen(Screen):
                 Input(placeholder="Ex: azul ou verde", id="input_cor"),
                 Label("Comprimento (cm):"),
                 Input(placeholder="Ex: 15.0", id="input_comprimento"),
+                Label("Código do produto (opcional):"),
+                Input(placeholder="Ex: SKU-1", id="input_produto"),
                 Horizontal(
                     Button("Cadastrar", variant="success", id="btn_cadastrar"),
                     Button("Cancelar", variant="error", id="btn_cancelar"),
@@ -164,6 +179,7 @@ class CadastroScreen(Screen):
         peso_str = self.query_one("#input_peso", Input).value.strip()
         cor = self.query_one("#input_cor", Input).value.strip()
         comprimento_str = self.query_one("#input_comprimento", Input).value.strip()
+        codigo_produto = self.query_one("#input_produto", Input).value.strip()
 
         mensagem_widget = self.query_one("#mensagem", Static)
 
@@ -174,8 +190,7 @@ class CadastroScreen(Screen):
 
         # Verifica se ID já existe
         sistema: SistemaArmazenamento = self.app.sistema  # type: ignore
-        todas_pecas = sistema['pecas_aprovadas'] + sistema['pecas_reprovadas']
-        if any(p['id'] == id_peca for p in todas_pecas):
+        if existe_peca(id_peca, sistema):
             mensagem_widget.update(f"[red]{ICON_ERROR} Já existe uma peça com ID '{id_peca}'[/red]")
             return
 
@@ -204,28 +219,37 @@ class CadastroScreen(Screen):
             return
 
         # Cria e valida peça
-        peca = criar_peca(id_peca, peso, cor, comprimento)
-        aprovada, motivos = validar_peca(peca)
-        peca['aprovada'] = aprovada
-        peca['motivos_reprovacao'] = motivos
+        peca = criar_peca(id_peca, peso, cor, comprimento, codigo_produto=codigo_produto or None)
+        aprovada, motivos = aplicar_validacao(peca)
 
         if aprovada:
             _, msg = adicionar_peca_em_caixa(peca, sistema)
             mensagem_widget.update(
                 f"[green]{ICON_SUCCESS} Peça {id_peca} APROVADA![/green]\n[cyan]{msg}[/cyan]"
+                + self._formatar_alertas()
             )
             # Limpa os campos
             self.query_one("#input_id", Input).value = ""
             self.query_one("#input_peso", Input).value = ""
             self.query_one("#input_cor", Input).value = ""
             self.query_one("#input_comprimento", Input).value = ""
+            self.query_one("#input_produto", Input).value = ""
         else:
-            sistema['pecas_reprovadas'].append(peca)
+            registrar_peca_reprovada(peca, sistema)
             motivos_str = "\n".join(f"• {m}" for m in motivos)
             mensagem_widget.update(
                 f"[red]{ICON_ERROR} Peça {id_peca} REPROVADA![/red]\n[yellow]Motivos:\n{motivos_str}[/yellow]"
+                + self._formatar_alertas()
             )
 
+    def _formatar_alertas(self) -> str:
+        """Alertas de controle disparados pela peça recém-cadastrada"""
+        alertas = obter_ultimos_alertas(self.app.sistema)  # type: ignore
+        if not alertas:
+            return ""
+        linhas = "\n".join(f"• {alerta['descricao']}" for alerta in alertas)
+        return f"\n[bold magenta]{ICON_WARNING} Processo fora de controle:\n{linhas}[/bold magenta]"
+
 
 # ============================================================================
 # TELA DE LISTAGEM
@@ -488,21 +512,18 @@ class RelatorioScreen(Screen):
         """Gera e exibe o relatório"""
         sistema: SistemaArmazenamento = self.app.sistema  # type: ignore
 
-        total_aprovadas = len(sistema['pecas_aprovadas'])
-        total_reprovadas = len(sistema['pecas_reprovadas'])
-        total_processadas = total_aprovadas + total_reprovadas
+        # Totais vindos das estatísticas agregadas (tempo constante)
+        resumo = gerar_resumo(sistema)
+        total_aprovadas = resumo['total_aprovadas']
+        total_reprovadas = resumo['total_reprovadas']
+        total_processadas = resumo['total_processadas']
+        percentual_aprovadas = resumo['percentual_aprovadas']
+        percentual_reprovadas = resumo['percentual_reprovadas']
 
-        if total_processadas > 0:
-            percentual_aprovadas = (total_aprovadas / total_processadas) * 100
-            percentual_reprovadas = (total_reprovadas / total_processadas) * 100
-        else:
-            percentual_aprovadas = 0.0
-            percentual_reprovadas = 0.0
-
-        total_caixas_fechadas = len(sistema['caixas_fechadas'])
-        pecas_caixa_atual = len(sistema['caixa_atual']['pecas'])
+        total_caixas_fechadas = resumo['caixas_fechadas']
+        pecas_caixa_atual = resumo['pecas_caixa_atual']
 
-        contadores_motivos = analisar_motivos_reprovacao(sistema['pecas_reprovadas'])
+        contadores_motivos = resumo['reprovacoes']
 
         content = f"""
 [bold white]═══════════════════════════════════════════════════════[/bold white]
@@ -545,6 +566,38 @@ class RelatorioScreen(Screen):
         else:
             content += "\n[bold green]Nenhuma peça reprovada! 🎉[/bold green]\n"
 
+        content += f"""
+[bold white]═══════════════════════════════════════════════════════[/bold white]
+[bold cyan]          📈 CONTROLE ESTATÍSTICO (SPC)               [/bold cyan]
+[bold white]═══════════════════════════════════════════════════════[/bold white]
+"""
+
+        if total_processadas > 0:
+            distribuicoes = gerar_distribuicoes(sistema)
+            for medida, indicadores in gerar_indicadores_spc(sistema).items():
+                content += (
+                    f"\n[bold]{medida.capitalize()}[/bold] "
+                    f"(limites {indicadores['limite_inferior']}-{indicadores['limite_superior']})\n"
+                    f"  Média: {formatar_indicador(indicadores['media'])}  "
+                    f"σ: {formatar_indicador(indicadores['desvio_padrao'])}  "
+                    f"Mín: {formatar_indicador(indicadores['minimo'])}  "
+                    f"Máx: {formatar_indicador(indicadores['maximo'])}\n"
+                    f"  Cp: {formatar_indicador(indicadores['cp'])}  "
+                    f"Cpk: {formatar_indicador(indicadores['cpk'])}\n"
+                    + "  " + "  ".join(
+                        f"{nome}: {formatar_indicador(valor)}"
+                        for nome, valor in distribuicoes[medida]['quantis'].items()
+                    ) + "\n"
+                )
+        else:
+            content += "\n[dim]Sem medições ainda.[/dim]\n"
+
+        alertas = database.carregar_alertas(ALERTAS_NO_RELATORIO)
+        if alertas:
+            content += f"\n[bold magenta]{ICON_WARNING} Alertas de controle recentes:[/bold magenta]\n"
+            for alerta in alertas:
+                content += f"[magenta]{alerta['registrado_em']}[/magenta] {alerta['descricao']}\n"
+
         self.query_one("#relatorio_content", Static).update(content)
 
 
@@ -571,12 +624,22 @@ class PecasApp(App):
         self.title = "Sistema de Gestão de Peças"
         self.sub_title = "Navegue com as setas ↑↓ | Enter para selecionar | Q ou ESC para sair"
         self.push_screen(MenuScreen())
+        # Adota regras de qualidade alteradas sem reiniciar a aplicação
+        regras.verificar_regras()
+        self.set_interval(regras.INTERVALO_VERIFICACAO_REGRAS, regras.verificar_regras)
+
+    def on_unmount(self) -> None:
+        """Ao sair, garante que as gravações pendentes cheguem ao banco"""
+        database.aguardar_gravacoes()
 
 
 def run_tui_app() -> None:
     """Executa a aplicação TUI interativa"""
     app = PecasApp()
-    app.run()
+    try:
+        app.run()
+    finally:
+        database.encerrar_gravacao_assincrona()
 
 
 if __name__ == "__main__":
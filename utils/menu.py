@@ -5,8 +5,14 @@ Funções de interface do menu interativo.
 import os
 from typing import Optional
 from models.peca import criar_peca
-from services.validacao import validar_peca
-from services.armazenamento import SistemaArmazenamento, adicionar_peca_em_caixa, remover_peca_por_id
+from services.validacao import aplicar_validacao
+from services.armazenamento import (
+    SistemaArmazenamento,
+    adicionar_peca_em_caixa,
+    registrar_peca_reprovada,
+    remover_peca_por_id,
+    existe_peca
+)
 from services.relatorio import gerar_relatorio_completo
 from models.caixa import CAPACIDADE_MAXIMA_CAIXA
 from rich.panel import Panel
@@ -124,8 +130,7 @@ def cadastrar_peca_interface(sistema: SistemaArmazenamento) -> None:
         return
 
     # Verifica se ID já existe
-    todas_pecas = sistema['pecas_aprovadas'] + sistema['pecas_reprovadas']
-    if any(p['id'] == id_peca for p in todas_pecas):
+    if existe_peca(id_peca, sistema):
         console.print(formatar_erro(f"Já existe uma peça com ID '{id_peca}'"))
         return
 
@@ -142,18 +147,19 @@ def cadastrar_peca_interface(sistema: SistemaArmazenamento) -> None:
     if comprimento is None:
         return
 
+    codigo_produto = input("Código do produto (opcional): ").strip()
+
     # Cria peça
     peca = criar_peca(
         id_peca=id_peca,
         peso=peso,
         cor=cor,
-        comprimento=comprimento
+        comprimento=comprimento,
+        codigo_produto=codigo_produto or None
     )
 
     # Valida peça
-    aprovada, motivos = validar_peca(peca)
-    peca['aprovada'] = aprovada
-    peca['motivos_reprovacao'] = motivos
+    aprovada, motivos = aplicar_validacao(peca)
 
     console.print()
     if aprovada:
@@ -165,7 +171,7 @@ def cadastrar_peca_interface(sistema: SistemaArmazenamento) -> None:
         console.print("\n[bold red]Motivos:[/bold red]")
         for motivo in motivos:
             console.print(f"  [red]•[/red] {motivo}")
-        sistema['pecas_reprovadas'].append(peca)
+        registrar_peca_reprovada(peca, sistema)
 
 
 def listar_pecas_interface(sistema: SistemaArmazenamento) -> None:
@@ -385,29 +391,24 @@ def gerar_relatorio_interface(sistema: SistemaArmazenamento) -> None:
     Args:
         sistema: Estado atual do sistema
     """
-    from services.relatorio import analisar_motivos_reprovacao
+    from services.relatorio import gerar_resumo
 
     console.print()
 
-    # Calcula estatísticas
-    total_aprovadas = len(sistema['pecas_aprovadas'])
-    total_reprovadas = len(sistema['pecas_reprovadas'])
-    total_processadas = total_aprovadas + total_reprovadas
-
-    # Calcula percentuais
-    if total_processadas > 0:
-        percentual_aprovadas = (total_aprovadas / total_processadas) * 100
-        percentual_reprovadas = (total_reprovadas / total_processadas) * 100
-    else:
-        percentual_aprovadas = 0.0
-        percentual_reprovadas = 0.0
+    # Estatísticas agregadas (tempo constante)
+    resumo = gerar_resumo(sistema)
+    total_aprovadas = resumo['total_aprovadas']
+    total_reprovadas = resumo['total_reprovadas']
+    total_processadas = resumo['total_processadas']
+    percentual_aprovadas = resumo['percentual_aprovadas']
+    percentual_reprovadas = resumo['percentual_reprovadas']
 
     # Contabiliza caixas
-    total_caixas_fechadas = len(sistema['caixas_fechadas'])
-    pecas_caixa_atual = len(sistema['caixa_atual']['pecas'])
+    total_caixas_fechadas = resumo['caixas_fechadas']
+    pecas_caixa_atual = resumo['pecas_caixa_atual']
 
-    # Analisa motivos de reprovação
-    contadores_motivos = analisar_motivos_reprovacao(sistema['pecas_reprovadas'])
+    # Motivos de reprovação
+    contadores_motivos = resumo['reprovacoes']
 
     # === PAINEL 1: RESUMO GERAL ===
     resumo_content = f"""[bold cyan]Total de peças processadas:[/bold cyan] {formatar_valor_numerico(total_processadas, '')}